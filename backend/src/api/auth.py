@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import RedirectResponse, JSONResponse
-from msal import ConfidentialClientApplication
-import requests
+import asyncio
+import httpx
 import json
 import os
 import jwt
@@ -10,6 +10,9 @@ from datetime import datetime, timedelta
 from urllib.parse import urlencode
 
 from core.auth_service import auth_service
+from core.graph_client import graph_client
+from core.msal_client import get_msal_factory
+from core.token_verifier import get_token_verifier
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,12 +30,6 @@ AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
 SCOPES = ["https://graph.microsoft.com/.default"]
 JWT_SECRET = os.getenv("JWT_SECRET", "mi_secreto_super_seguro_para_jwt_tokens")
 
-client_instance = ConfidentialClientApplication(
-    client_id = CLIENT_ID,
-    client_credential = CLIENT_SECRET,
-    authority = AUTHORITY
-)
-
 @router.get("/login")
 def login(request: Request):
     # Crear URL de autorización con REDIRECT_URI
@@ -83,8 +80,10 @@ async def auth_callback(request: Request):
         logger.warning("Callback sin código de autorización")
         return JSONResponse(content={"error": "Código de autorización no encontrado"}, status_code=400)
     
-    # Adquirir token con el código recibido
-    request_token = client_instance.acquire_token_by_authorization_code(
+    # Adquirir token con el código recibido (MSAL es bloqueante: se ejecuta en un hilo).
+    # La aplicación MSAL es la compartida, con caché de tokens y del authority persistente.
+    request_token = await asyncio.to_thread(
+        get_msal_factory().acquire_token_by_authorization_code,
         code=code,
         scopes=SCOPES,
         redirect_uri=REDIRECT_URI
@@ -93,7 +92,7 @@ async def auth_callback(request: Request):
     if "access_token" in request_token:
         try:
             # Obtener perfil del usuario
-            nombre, correo = requestProfile(request_token["access_token"])
+            nombre, correo = await requestProfile(request_token["access_token"])
             
             # Crear token JWT
             user_data = {"name": nombre, "email": correo}
@@ -114,26 +113,15 @@ async def auth_callback(request: Request):
             )
             
             return response
-        except requests.HTTPError as e:
+        except httpx.HTTPError as e:
             raise HTTPException(status_code=400, detail=f"Failed to fetch profile information: {str(e)}")
     else:
         error_msg = request_token.get("error_description", "Token acquisition failed")
         raise HTTPException(status_code=400, detail=error_msg)
 
-def requestProfile(token):
+async def requestProfile(token):
     """Obtener datos del perfil desde Microsoft Graph API"""
-    headers = {
-        'Authorization': 'Bearer ' + token,
-        'Content-Type': 'application/json'
-    }
-    response = requests.get('https://graph.microsoft.com/v1.0/me', headers=headers)
-    response.raise_for_status()
-    profile = response.json()
-    
-    nombre = profile.get('displayName', 'Usuario')
-    correo = profile.get('mail') or profile.get('userPrincipalName', 'sin-correo@example.com')
-    
-    return nombre, correo
+    return await graph_client.get_profile(token, default_email="sin-correo@example.com")
 
 @router.get("/verify-token")
 async def verify_token(request: Request):
@@ -144,7 +132,7 @@ async def verify_token(request: Request):
         return JSONResponse(content={"isValid": False, "error": "No token provided"}, status_code=401)
     
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+        payload = await get_token_verifier().verify(token)
         return JSONResponse(content={
             "isValid": True,
             "user": {
@@ -156,6 +144,13 @@ async def verify_token(request: Request):
         return JSONResponse(content={"isValid": False, "error": "Token expired"}, status_code=401)
     except jwt.InvalidTokenError:
         return JSONResponse(content={"isValid": False, "error": "Invalid token"}, status_code=401)
+    except httpx.HTTPError as e:
+        # JWKS de Entra ID inaccesible: no se sabe si el token es válido, no es un 401
+        logger.error("No se pudo descargar el JWKS para verificar el token: %s", e)
+        return JSONResponse(
+            content={"isValid": False, "error": "Token verification unavailable: signing keys could not be fetched"},
+            status_code=503,
+        )
 
 @router.get("/logout")
 async def logout():
@@ -1,44 +1,159 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+import logging
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header, Response
 from core.schema_http import (
     RequestHTTPChat, ResponseHTTPChat,
     RequestHTTPVote, ResponseHTTPVote,
     ResponseHTTPStartConversation, RequestHTTPStartConversation,RequestHTTPUpdateState,
     RequestHTTPSessions, ResponseHTTPSessions,
-    ResponseHTTPOneSession, RequestHTTPOneSession
+    ResponseHTTPOneSession, RequestHTTPOneSession,
+    RequestHTTPChatJob, ResponseHTTPChatJob
 )
-from core.utils import genereta_id
-import pdb
 from inference.graphs.restaurant_graph import RestaurantChatAgent
-from langchain_core.messages import HumanMessage
-from core.utils import extract_text_content,extract_word_content,extract_excel_content
-# from core.schema_services import AzureServices
-from inference.graphs.mysql_saver import MySQLSaver
-from core.mysql_order_manager import MySQLOrderManager
-import os
+from core.admission import HIGH_DEMAND_REPLY, AdmissionRejected, chat_admission
+from core.background_tasks import task_supervisor
+from core.chat_job_store import JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_REJECTED, JOB_RUNNING, get_chat_job_store
+from core.config import settings
+from core.idempotency import IdempotencyConflict, idempotency_store
+from core.utils import new_id
+from core.whatsapp_client import send_whatsapp_message
 
 chat_agent_router = APIRouter()
 
+# Pool de workers de los trabajos de chat asíncronos
+task_supervisor.configure("chat_job", max_concurrency=settings.chat_job_workers, max_pending=settings.chat_job_max_pending)
+
+JOB_FAILED_REPLY = "😔 No pudimos procesar tu mensaje. Por favor intenta de nuevo."
+
 # Declarar explícitamente la variable global
 restaurant_chat_agent = None
 
-@chat_agent_router.post("/message", response_model=ResponseHTTPChat)
-async def endpoint_message(request: RequestHTTPChat):
+def get_restaurant_chat_agent() -> RestaurantChatAgent:
     """
-    Endpoint para procesar el mensaje y generar respuesta.
+    Retorna el agente del restaurante, compilando el grafo una sola vez por proceso.
+    Se invoca en el arranque (lifespan) para no pagar la compilación en el primer mensaje.
     """
     global restaurant_chat_agent
-    
+
     if restaurant_chat_agent is None:
         restaurant_chat_agent = RestaurantChatAgent()
+    return restaurant_chat_agent
+
+@chat_agent_router.post("/message", response_model=ResponseHTTPChat)
+async def endpoint_message(request: RequestHTTPChat, response: Response,
+                           idempotency_key: Optional[str] = Header(None)):
+    """
+    Endpoint para procesar el mensaje y generar respuesta.
+    Pasa por el control de admisión; si el turno se descarta por carga responde
+    con un mensaje de alta demanda (id vacío) y el encabezado Retry-After.
+
+    Con el encabezado Idempotency-Key (o `message_id` en el cuerpo) una reentrega
+    del mismo mensaje recibe la respuesta original sin volver a ejecutar el agente.
+    """
+    async def turn():
+        message_id, text = await _run_turn(request)
+        return {"id": message_id, "text": text}
+
+    try:
+        result, replayed = await idempotency_store.run("chat", idempotency_key or request.message_id, turn)
+    except AdmissionRejected as e:
+        # Un turno descartado no se guarda: la reentrega podrá procesarse
+        response.headers["Retry-After"] = str(max(1, round(e.retry_after)))
+        return {"id": "", "text": HIGH_DEMAND_REPLY}
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _run_turn(request: RequestHTTPChat) -> tuple:
+    """Ejecuta un turno del agente bajo el control de admisión. Retorna (id del mensaje, texto)."""
+    agent = get_restaurant_chat_agent()
+    async with chat_admission.admit(request.user_id):
+        new_state, message_id = await agent.invoke_flow(
+            user_input=request.query,
+            conversation_id=request.conversation_id,
+            conversation_name=request.conversation_name,
+            user_id=request.user_id,
+            restaurant_name=request.restaurant_name
+        )
+    return message_id, new_state["messages"][-1].content
 
-    new_state, message_id = await restaurant_chat_agent.invoke_flow(
-        user_input=request.query,
-        conversation_id=request.conversation_id,
-        conversation_name=request.conversation_name,
-        user_id=request.user_id,
-        restaurant_name=request.restaurant_name
-    )
-    final_msg = new_state["messages"][-1]
-    
-    return {"id": message_id, "text": final_msg.content}
+
+async def run_chat_job(job_id: str, request: RequestHTTPChatJob) -> None:
+    """
+    Procesa un trabajo de chat en el pool de workers y guarda el resultado.
+    Con delivery="whatsapp" también envía la respuesta al usuario.
+    """
+    store = get_chat_job_store()
+    await store.update(job_id, status=JOB_RUNNING)
+    try:
+        message_id, text = await _run_turn(request)
+        await store.update(job_id, status=JOB_DONE, message_id=message_id, text=text)
+    except AdmissionRejected as e:
+        text = HIGH_DEMAND_REPLY
+        await store.update(job_id, status=JOB_REJECTED, text=text, error=e.reason)
+    except Exception as e:
+        logging.exception("Error procesando el trabajo de chat %s: %s", job_id, e)
+        text = JOB_FAILED_REPLY
+        await store.update(job_id, status=JOB_FAILED, text=text, error=str(e))
+
+    if request.delivery == "whatsapp":
+        await send_whatsapp_message(request.user_id, text)
+
+
+@chat_agent_router.post("/jobs", response_model=ResponseHTTPChatJob, status_code=202)
+async def endpoint_create_chat_job(request: RequestHTTPChatJob, response: Response,
+                                   idempotency_key: Optional[str] = Header(None)):
+    """
+    Encola el mensaje y retorna de inmediato (202) con el id del trabajo, sin
+    mantener la conexión abierta durante el turno del agente.
+    El resultado se consulta en GET /agent/chat/jobs/{job_id} o, con
+    delivery="whatsapp", se envía directamente al usuario.
+    Una reentrega con la misma clave de idempotencia recibe el mismo job_id.
+    """
+    try:
+        result, replayed = await idempotency_store.run(
+            "chat.jobs", idempotency_key or request.message_id, lambda: _enqueue_chat_job(request)
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _enqueue_chat_job(request: RequestHTTPChatJob) -> dict:
+    # Ordenado por tiempo: las altas de jobs caen al final del índice de chat_jobs
+    job_id = new_id()
+    store = get_chat_job_store()
+    await store.create({
+        "job_id": job_id,
+        "user_id": request.user_id,
+        "status": JOB_QUEUED,
+        "delivery": request.delivery,
+        "request": request.model_dump(),
+    })
+    if not task_supervisor.submit("chat_job", job_id, run_chat_job, job_id, request):
+        await store.update(job_id, status=JOB_REJECTED, text=HIGH_DEMAND_REPLY, error="queue_full")
+        return {"job_id": job_id, "status": JOB_REJECTED, "text": HIGH_DEMAND_REPLY, "error": "queue_full"}
+    return {"job_id": job_id, "status": JOB_QUEUED}
+
+
+@chat_agent_router.get("/jobs/{job_id}", response_model=ResponseHTTPChatJob)
+async def endpoint_get_chat_job(job_id: str):
+    """
+    Retorna el estado de un trabajo de chat y, cuando terminó, la respuesta del agente.
+    """
+    job = await get_chat_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "id": job.get("message_id"),
+        "text": job.get("text"),
+        "error": job.get("error"),
+    }
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, File, Form, HTTPException, Request, Response, UploadFile
 from pydantic import BaseModel
 from typing import Optional, List,Literal
 import logging
 from datetime import datetime
-from core.schema_http import Product, AddProductRequest, UpdateProductRequest, DeleteProductRequest
+from core.schema_http import (
+    Product, AddProductRequest, UpdateProductRequest, DeleteProductRequest,
+    CatalogImportResult, BulkPriceUpdateRequest,
+)
+from core.catalog_io import MEDIA_TYPES, catalog_format, dump_catalog, parse_catalog
 # Import the MySQL inventory manager
 from core.mysql_inventory_manager import MySQLInventoryManager
+from inference.graphs.context_prefetch import invalidate_menu_snapshot
+from core.http_cache import make_etag, not_modified, set_cache_headers
 
 # Instancia del administrador de inventario - ya está correctamente como una instancia global
 inventory_manager = MySQLInventoryManager()
@@ -29,6 +35,7 @@ async def add_product(request: AddProductRequest):
             unit=request.unit,
             price=request.price
         )
+        invalidate_menu_snapshot(request.restaurant_id)
         return product
     except Exception as e:
         logging.error("Error agregando producto: %s", str(e))
@@ -36,16 +43,26 @@ async def add_product(request: AddProductRequest):
 
 
 @inventory_router.get("/inventory", response_model=List[Product])
-async def get_inventory(restaurant_id: Literal["go_papa"] = None):
+async def get_inventory(request: Request, response: Response, restaurant_id: Literal["go_papa"] = None):
     """
     Ruta para obtener el inventario de un restaurante.
     Se debe pasar el restaurant_id como query parameter.
+
+    Responde con un ETag según la versión del inventario; si el cliente envía
+    If-None-Match con esa versión se retorna 304 sin consultar los productos.
     """
     try:
+        version = await inventory_manager.get_inventory_version(restaurant_id)
+        etag = make_etag("inventory", restaurant_id, version) if version is not None else None
+        if etag:
+            cached = not_modified(request, etag)
+            if cached is not None:
+                return cached
 
         products = await inventory_manager.get_inventory(restaurant_id)
         if not products:
             raise HTTPException(status_code=404, detail="No se encontraron productos en el inventario")
+        set_cache_headers(response, etag)
         return products
     except Exception as e:
         logging.error("Error obteniendo inventario: %s", str(e))
@@ -73,6 +90,7 @@ async def update_product(request: UpdateProductRequest):
         updated_product = await inventory_manager.update_product(request.product_id, updated_fields)
         if not updated_product:
             raise HTTPException(status_code=404, detail="Producto no encontrado")
+        invalidate_menu_snapshot(request.restaurant_id)
         return updated_product
     except Exception as e:
         logging.error("Error actualizando producto: %s", str(e))
@@ -91,7 +109,80 @@ async def delete_product(request: DeleteProductRequest):
         )
         if not result:
             raise HTTPException(status_code=404, detail="Producto no encontrado")
+        invalidate_menu_snapshot(request.restaurant_id)
         return {"detail": "Producto eliminado exitosamente"}
     except Exception as e:
         logging.error("Error eliminando producto: %s", str(e))
         raise HTTPException(status_code=500, detail="Error eliminando producto")
+
+
+@inventory_router.post("/import", response_model=CatalogImportResult)
+async def import_catalog(
+    file: UploadFile = File(...),
+    restaurant_id: str = Form(...),
+    format: Optional[Literal["csv", "json", "xlsx"]] = Form(None),
+    dry_run: bool = Form(False),
+):
+    """
+    Carga masiva del catálogo desde un archivo CSV, JSON o XLSX (formato por
+    parámetro o por la extensión). Los productos se insertan o actualizan por
+    nombre en una sola transacción y se responde la diferencia: nuevos,
+    actualizados (con los valores antes y después) y sin cambios.
+    Con dry_run=true solo se calcula la diferencia.
+    """
+    try:
+        rows = parse_catalog(await file.read(), catalog_format(file.filename, format))
+        result = await inventory_manager.import_catalog(restaurant_id, rows, dry_run=dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=500, detail="Error cargando el catálogo")
+    if not dry_run and (result["inserted"] or result["updated"]):
+        invalidate_menu_snapshot(restaurant_id)
+    return result
+
+
+@inventory_router.get("/export")
+async def export_catalog(restaurant_id: str, format: Literal["csv", "json", "xlsx"] = "csv"):
+    """
+    Exporta el catálogo del restaurante en el formato pedido, con las mismas
+    columnas que acepta /import (el archivo exportado se puede volver a cargar).
+    """
+    products = await inventory_manager.export_catalog(restaurant_id)
+    try:
+        content = dump_catalog(products, format)
+    except ImportError as e:
+        # XLSX requiere openpyxl
+        raise HTTPException(status_code=501, detail=f"Formato {format} no disponible: {e}")
+    return Response(
+        content=content,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="inventario_{restaurant_id}.{format}"'},
+    )
+
+
+@inventory_router.put("/bulk_update", response_model=CatalogImportResult)
+async def bulk_update(request: BulkPriceUpdateRequest):
+    """
+    Cambio masivo de precios en una sola transacción: precios (y existencias)
+    por producto en `items` y/o un ajuste porcentual con `percent`, redondeado
+    a `round_to` y opcionalmente solo para un tipo de producto.
+    """
+    if not request.items and request.percent is None:
+        raise HTTPException(status_code=400, detail="Envíe items o percent")
+    try:
+        result = await inventory_manager.bulk_update_prices(
+            request.restaurant_id,
+            items=[item.model_dump() for item in request.items],
+            percent=request.percent,
+            round_to=request.round_to,
+            tipo_producto=request.tipo_producto,
+            dry_run=request.dry_run,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=500, detail="Error actualizando precios")
+    if not request.dry_run and result["updated"]:
+        invalidate_menu_snapshot(request.restaurant_id)
+    return result
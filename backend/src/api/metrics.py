@@ -0,0 +1,87 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+
+from core.admission import chat_admission
+from core.asgi_middleware import request_metrics
+from core.background_tasks import task_supervisor
+from core.idempotency import idempotency_store
+from core.product_matching import product_match_stats
+from inference.tools.tool_serializers import tool_token_report
+from inference.graphs.context_prefetch import turn_metrics
+from inference.graphs.restaurant_graph import get_llm_with_tools
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/background_jobs", response_model=Dict[str, Any])
+async def get_background_jobs_metrics():
+    """
+    Retorna las métricas del supervisor de tareas en segundo plano:
+    trabajos encolados, en ejecución, coalescidos, rechazados y fallidos por tipo.
+    """
+    return task_supervisor.metrics()
+
+
+@metrics_router.get("/tool_tokens", response_model=Dict[str, Any])
+async def get_tool_tokens_report():
+    """
+    Retorna, por herramienta, los tokens enviados al LLM frente a la serialización original.
+    Solo acumula datos con TOOL_TOKEN_REPORT=true.
+    """
+    return tool_token_report.report()
+
+
+@metrics_router.get("/turns", response_model=Dict[str, Any])
+async def get_turn_metrics():
+    """
+    Retorna los contadores de turnos de chat: saltos de LLM, llamadas a herramientas de consulta,
+    consultas de precarga y cargas de perfil evitadas.
+    """
+    return turn_metrics.report()
+
+
+@metrics_router.get("/llm", response_model=Dict[str, Any])
+async def get_llm_metrics():
+    """
+    Retorna las métricas de las llamadas al LLM: hedges, fallas, uso del modelo de respaldo,
+    estado del circuit breaker y p95 observado. Vacío si aún no se ha creado el cliente.
+    """
+    if get_llm_with_tools.cache_info().currsize == 0:
+        return {}
+    return get_llm_with_tools().metrics()
+
+
+@metrics_router.get("/admission", response_model=Dict[str, Any])
+async def get_admission_metrics():
+    """
+    Retorna el estado del control de admisión del chat: turnos en curso, profundidad de la cola
+    y rechazos por límite por usuario, cola llena o espera vencida.
+    """
+    return chat_admission.metrics()
+
+
+@metrics_router.get("/idempotency", response_model=Dict[str, Any])
+async def get_idempotency_metrics():
+    """
+    Retorna cuántas solicitudes se ejecutaron y cuántas se respondieron repitiendo la original
+    (desde memoria, desde MySQL o esperando a la solicitud en curso).
+    """
+    return idempotency_store.metrics()
+
+
+@metrics_router.get("/http", response_model=Dict[str, Any])
+async def get_http_metrics():
+    """
+    Retorna las métricas HTTP: solicitudes en curso, conteo por código de estado y,
+    por ruta, histograma de latencia (ms) con p50/p95/p99 aproximados.
+    """
+    return request_metrics.report()
+
+
+@metrics_router.get("/product_matching", response_model=Dict[str, Any])
+async def get_product_matching_metrics():
+    """
+    Retorna cómo se resolvieron los productos nombrados por el LLM (nombre idéntico, id, nombre
+    normalizado, parecido o id del inventario) y los saltos de LLM que evitó en update_order_product.
+    """
+    return product_match_stats.report()
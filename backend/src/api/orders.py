@@ -1,10 +1,22 @@
-from fastapi import APIRouter, HTTPException, Body, Query
-from typing import Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Body, Header, Query, Request, Response
+from typing import Optional, Dict, Any, Literal
+from datetime import date
+import asyncio
 import logging
 
 # Import the MySQL order manager
 from core.mysql_order_manager import MySQLOrderManager
-from core.schema_http import RequestHTTPUpdateState
+from core.mysql_inventory_manager import InsufficientStock
+from core.schema_http import (
+    RequestHTTPUpdateState, ResponseHTTPTodayOrders, ResponseHTTPAllOrders,
+    ResponseHTTPOrdersExport, ResponseHTTPSalesReport, ResponseHTTPOrdersReport,
+)
+from core.idempotency import IdempotencyConflict, idempotency_store
+from core.clock import get_clock
+from core.http_cache import make_etag, not_modified, set_cache_headers
+from core.config import settings
+from core.order_export import load_orders, order_exporter, sales_report
+from core.order_reports import order_report_snapshot
 
 # Crear el router de órdenes con un prefijo y etiqueta
 orders_router = APIRouter()
@@ -13,16 +25,27 @@ orders_router = APIRouter()
 order_manager = MySQLOrderManager()
 
 
-@orders_router.get("/today", response_model=Dict[str, Any])
-async def get_today_orders_not_paid():
+@orders_router.get("/today", response_model=ResponseHTTPTodayOrders, response_model_exclude_unset=True)
+async def get_today_orders_not_paid(request: Request, response: Response):
     """
     Retorna todos los pedidos creados el día actual (UTC) cuyo estado sea distinto de 'pagado',
     agrupando en el campo 'products' todos los productos que comparten el mismo 'enum_order_table'.
+
+    El ETag combina el día y el contador de cambios de la tabla orders; con
+    If-None-Match vigente se retorna 304 sin consultar los pedidos.
     """
+    version = await order_manager.get_orders_version()
+    etag = make_etag("orders.today", get_clock().today(), version) if version is not None else None
+    if etag:
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
     # Utilizar la instancia global
     orders = await order_manager.get_today_orders_not_paid()
     if not orders:
         raise HTTPException(status_code=404, detail="No se encontraron pedidos para hoy.")
+    set_cache_headers(response, etag)
     return orders
 
 @orders_router.get("/latest/{address}", response_model=Dict[str, Any])
@@ -86,7 +109,8 @@ async def delete_order(order_id: str, partition_key: Optional[str] = None):
     return {"detail": "Pedido eliminado correctamente.", "id": order_id}
 
 @orders_router.post("/create", response_model=Dict[str, Any])
-async def create_order(order: Dict[str, Any] = Body(...)):
+async def create_order(response: Response, order: Dict[str, Any] = Body(...),
+                       idempotency_key: Optional[str] = Header(None)):
     """
     Crea un nuevo pedido en la base de datos.
     
@@ -105,11 +129,30 @@ async def create_order(order: Dict[str, Any] = Body(...)):
         "user_name": "Santiago",
         "user_id": "user123"
     }
+
+    Con el encabezado Idempotency-Key, repetir la petición retorna el pedido
+    creado originalmente sin insertar otra fila.
+
+    Si el producto no tiene existencias suficientes responde 409 con la cantidad disponible.
     """
-    # Utilizar la instancia global
-    created_order = await order_manager.create_order(order)
-    if created_order is None:
-        raise HTTPException(status_code=500, detail="Error al crear el pedido.")
+    async def create():
+        # Utilizar la instancia global
+        created_order = await order_manager.create_order(order)
+        if created_order is None:
+            raise HTTPException(status_code=500, detail="Error al crear el pedido.")
+        return created_order
+
+    try:
+        created_order, replayed = await idempotency_store.run("orders.create", idempotency_key, create)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except InsufficientStock as e:
+        raise HTTPException(status_code=409, detail={
+            "error": "insufficient_stock", "product_id": e.product_id,
+            "requested": e.requested, "available": e.available,
+        })
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
     return created_order
 
 
@@ -132,7 +175,7 @@ async def update_order_state_by_user(user_id: str = Query(...), state: str = Que
     return {"orders": updated_orders}
 
 
-@orders_router.get("/all", response_model=Dict[str, Any])
+@orders_router.get("/all", response_model=ResponseHTTPAllOrders, response_model_exclude_unset=True)
 async def get_all_orders():
     """
     Retorna todos los pedidos en la base de datos,
@@ -144,3 +187,52 @@ async def get_all_orders():
         raise HTTPException(status_code=404, detail="No se encontraron pedidos.")
     return orders
 
+
+@orders_router.post("/export", response_model=ResponseHTTPOrdersExport)
+async def export_orders():
+    """
+    Exporta a archivos columnares (ORDERS_EXPORT_DIR) los pedidos nuevos o
+    modificados desde la última marca de agua. Es incremental: llamarlo de
+    nuevo sin cambios no escribe nada.
+    """
+    try:
+        return await order_exporter.export()
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=f"Formato {settings.orders_export_format} no disponible: {e}")
+
+
+@orders_router.get("/reports", response_model=ResponseHTTPOrdersReport)
+async def get_orders_report(start: Optional[date] = None, end: Optional[date] = None,
+                            top: int = Query(10, ge=1, le=100)):
+    """
+    Ingresos por producto, mapa de calor día/hora, ticket promedio, tiempo de
+    pendiente a completado y adiciones más pedidas entre `start` y `end`
+    (inclusive). Se calcula sobre una instantánea en memoria de los archivos
+    exportados, que solo se recarga después de una exportación nueva.
+    """
+    try:
+        return await asyncio.to_thread(order_report_snapshot.report, start, end, top)
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=f"Formato {settings.orders_export_format} no disponible: {e}")
+
+
+@orders_router.get("/reports/sales", response_model=ResponseHTTPSalesReport)
+async def get_sales_report(group_by: Literal["day", "hour", "product"] = "day",
+                           start: Optional[date] = None, end: Optional[date] = None):
+    """
+    Ventas por día, hora del día o producto entre `start` y `end` (inclusive),
+    calculadas sobre los archivos exportados por /orders/export, sin consultar
+    MySQL. Los pedidos posteriores a la última exportación no se incluyen.
+    """
+    try:
+        frame = await asyncio.to_thread(load_orders, settings.orders_export_dir, settings.orders_export_format, start, end)
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=f"Formato {settings.orders_export_format} no disponible: {e}")
+    rows = sales_report(frame, group_by)
+    return {
+        "group_by": group_by,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "total_revenue": round(sum(row["revenue"] for row in rows), 2),
+        "rows": rows,
+    }
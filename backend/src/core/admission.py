@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from core.config import settings
+
+# Respuesta amable cuando se descarta un mensaje por carga
+HIGH_DEMAND_REPLY = (
+    "🙏 En este momento estamos con alta demanda y no pudimos atender tu mensaje. "
+    "Por favor escríbenos de nuevo en unos instantes."
+)
+
+# Por encima de este número de usuarios se purgan los buckets que ya están llenos
+MAX_TRACKED_USERS = 10000
+
+
+class AdmissionRejected(Exception):
+    """El turno no fue admitido: `reason` es rate_limited, queue_full o queue_timeout."""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Control de admisión delante de `RestaurantChatAgent.invoke_flow`.
+
+    - Token bucket por usuario: cada usuario recupera `user_rate_per_minute`
+      turnos por minuto con ráfagas de hasta `user_burst`, así un usuario que
+      envía muchos mensajes seguidos no le quita cupo a los demás.
+    - Semáforo global: como máximo `max_concurrency` turnos a la vez (cada turno
+      usa conexiones del pool de MySQL y llamadas a OpenAI).
+    - Cola de espera acotada: hasta `max_queue` turnos esperan un cupo en orden
+      de llegada, cada uno como máximo `queue_timeout` segundos; el resto se descarta.
+    """
+
+    def __init__(self, max_concurrency: int = 20, max_queue: int = 100, queue_timeout: float = 10.0,
+                 user_rate_per_minute: float = 10.0, user_burst: int = 5):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.user_rate = user_rate_per_minute / 60.0
+        self.user_burst = user_burst
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._in_flight = 0
+        self._queued = 0
+        self._stats: Dict[str, float] = {
+            "admitted": 0, "rate_limited": 0, "queue_full": 0, "queue_timeout": 0,
+            "max_queue_depth": 0, "total_wait_seconds": 0.0,
+        }
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _take_token(self, user_id: str) -> Optional[float]:
+        """Consume un token del usuario. Retorna None si lo hubo, o los segundos hasta el próximo."""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(user_id, (float(self.user_burst), now))
+        tokens = min(float(self.user_burst), tokens + (now - updated_at) * self.user_rate)
+        if tokens < 1:
+            self._buckets[user_id] = (tokens, now)
+            return (1 - tokens) / self.user_rate if self.user_rate > 0 else self.queue_timeout
+        self._buckets[user_id] = (tokens - 1, now)
+        if len(self._buckets) > MAX_TRACKED_USERS:
+            self._prune_buckets(now)
+        return None
+
+    def _prune_buckets(self, now: float) -> None:
+        # Un bucket que ya se habría llenado equivale a no tenerlo
+        full_after = self.user_burst / self.user_rate if self.user_rate > 0 else float("inf")
+        for user_id in [u for u, (_, updated_at) in self._buckets.items() if now - updated_at >= full_after]:
+            del self._buckets[user_id]
+
+    def _reject(self, reason: str, user_id: str, retry_after: float) -> AdmissionRejected:
+        self._stats[reason] += 1
+        logging.warning("Turno rechazado (%s) para %s; en curso=%d, en cola=%d",
+                        reason, user_id, self._in_flight, self._queued)
+        return AdmissionRejected(reason, retry_after=retry_after)
+
+    @asynccontextmanager
+    async def admit(self, user_id: str) -> AsyncIterator[None]:
+        """
+        Admite un turno o lanza AdmissionRejected.
+
+        Uso:
+            async with chat_admission.admit(user_id):
+                await agent.invoke_flow(...)
+        """
+        wait = self._take_token(user_id)
+        if wait is not None:
+            raise self._reject("rate_limited", user_id, wait)
+
+        semaphore = self._get_semaphore()
+        start = time.monotonic()
+        if not semaphore.locked():
+            # Hay cupo libre: acquire() no suspende
+            await semaphore.acquire()
+        elif self._queued >= self.max_queue:
+            raise self._reject("queue_full", user_id, self.queue_timeout)
+        else:
+            self._queued += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queued)
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject("queue_timeout", user_id, self.queue_timeout)
+            finally:
+                self._queued -= 1
+
+        self._stats["admitted"] += 1
+        self._stats["total_wait_seconds"] += time.monotonic() - start
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            semaphore.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        admitted = self._stats["admitted"]
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": self._queued,
+            **{name: int(value) for name, value in self._stats.items() if name != "total_wait_seconds"},
+            "rejected": int(self._stats["rate_limited"] + self._stats["queue_full"] + self._stats["queue_timeout"]),
+            "avg_wait_seconds": round(self._stats["total_wait_seconds"] / admitted, 4) if admitted else 0.0,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "tracked_users": len(self._buckets),
+        }
+
+
+# Instancia global para /agent/chat/message
+chat_admission = AdmissionController(
+    max_concurrency=settings.chat_max_concurrency,
+    max_queue=settings.chat_max_queue,
+    queue_timeout=settings.chat_queue_timeout_seconds,
+    user_rate_per_minute=settings.chat_user_rate_per_minute,
+    user_burst=settings.chat_user_burst,
+)
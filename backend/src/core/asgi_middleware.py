@@ -0,0 +1,145 @@
+"""
+Middlewares ASGI puros.
+
+A diferencia de `@app.middleware("http")` (BaseHTTPMiddleware), no crean una
+tarea extra por solicitud ni copian el cuerpo de la respuesta, y no rompen las
+respuestas en streaming: solo envuelven `send` para tocar los encabezados.
+"""
+import bisect
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from core.http_cache import NO_STORE
+
+# Límites superiores (ms) de los buckets del histograma de latencia
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class CacheControlMiddleware:
+    """
+    Aplica la política por defecto (sin caché) a las respuestas cuya ruta no
+    definió su propio Cache-Control, por ejemplo las lecturas con ETag.
+    """
+
+    def __init__(self, app, default: str = NO_STORE):
+        self.app = app
+        self.default_headers = [
+            (b"cache-control", default.encode("latin-1")),
+            (b"pragma", b"no-cache"),
+            (b"expires", b"0"),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cache_control(message):
+            if message["type"] == "http.response.start":
+                headers = message.setdefault("headers", [])
+                if not any(name.lower() == b"cache-control" for name, _ in headers):
+                    message["headers"] = list(headers) + self.default_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_control)
+
+
+class RequestMetrics:
+    """Histogramas de latencia por ruta, conteo de estados y solicitudes en curso."""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self._status: Dict[str, int] = {}
+        self.in_flight = 0
+
+    def record(self, route: str, status: int, duration_ms: float) -> None:
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    "count": 0, "sum_ms": 0.0, "max_ms": 0.0,
+                    "buckets": [0] * (len(self.buckets_ms) + 1), "status": {},
+                }
+            stats["count"] += 1
+            stats["sum_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            stats["buckets"][bisect.bisect_left(self.buckets_ms, duration_ms)] += 1
+            status_class = f"{status // 100}xx"
+            stats["status"][status_class] = stats["status"].get(status_class, 0) + 1
+            self._status[str(status)] = self._status.get(str(status), 0) + 1
+
+    def _percentile(self, buckets: List[int], count: int, pct: float) -> Optional[float]:
+        """Percentil aproximado: límite superior del bucket que lo contiene."""
+        if not count:
+            return None
+        target = pct / 100 * count
+        seen = 0
+        for index, bucket_count in enumerate(buckets):
+            seen += bucket_count
+            if seen >= target:
+                return float(self.buckets_ms[index]) if index < len(self.buckets_ms) else None
+        return None
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {}
+            for route, stats in self._routes.items():
+                labels = [f"le_{limit}" for limit in self.buckets_ms] + ["le_inf"]
+                routes[route] = {
+                    "count": stats["count"],
+                    "avg_ms": round(stats["sum_ms"] / stats["count"], 3),
+                    "max_ms": round(stats["max_ms"], 3),
+                    "p50_ms": self._percentile(stats["buckets"], stats["count"], 50),
+                    "p95_ms": self._percentile(stats["buckets"], stats["count"], 95),
+                    "p99_ms": self._percentile(stats["buckets"], stats["count"], 99),
+                    "histogram_ms": dict(zip(labels, stats["buckets"])),
+                    "status": dict(stats["status"]),
+                }
+            return {"in_flight": self.in_flight, "status": dict(self._status), "routes": routes}
+
+
+request_metrics = RequestMetrics()
+
+
+class ServerTimingMiddleware:
+    """
+    Mide cada solicitud HTTP: agrega `Server-Timing: app;dur=<ms>` (tiempo hasta
+    los encabezados) y registra la latencia total por ruta en `RequestMetrics`.
+
+    La ruta se toma de la plantilla del endpoint ("/orders/{order_id}"), no de la
+    URL, para que los histogramas no crezcan con cada id.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                duration_ms = (time.perf_counter() - start) * 1000
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", f"app;dur={duration_ms:.1f}".encode("latin-1"))
+                ]
+            await send(message)
+
+        self.metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            self.metrics.in_flight -= 1
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            self.metrics.record(f"{scope['method']} {route_path}", status_code, (time.perf_counter() - start) * 1000)
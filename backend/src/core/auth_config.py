@@ -13,6 +13,11 @@ class AuthSettings(BaseSettings):
     REDIRECT_PATH: str = "/auth/callback"
     AUTHORITY: Optional[str] = None
     SCOPES: List[str] = ["https://graph.microsoft.com/.default"]
+    JWT_SECRET: str = "mi_secreto_super_seguro_para_jwt_tokens"
+    # Verificación de tokens de Entra ID; por defecto se derivan del tenant
+    JWKS_URI: Optional[str] = None
+    ISSUER: Optional[str] = None
+    AUDIENCE: Optional[str] = None
     
     class Config:
         env_file = ".env"
@@ -23,6 +28,12 @@ class AuthSettings(BaseSettings):
         super().__init__(**kwargs)
         if not self.AUTHORITY:
             self.AUTHORITY = f"https://login.microsoftonline.com/{self.TENANT_ID}"
+        if not self.JWKS_URI:
+            self.JWKS_URI = f"https://login.microsoftonline.com/{self.TENANT_ID}/discovery/v2.0/keys"
+        if not self.ISSUER:
+            self.ISSUER = f"https://login.microsoftonline.com/{self.TENANT_ID}/v2.0"
+        if not self.AUDIENCE:
+            self.AUDIENCE = self.CLIENT_ID
 
 
 @lru_cache()
@@ -1,10 +1,11 @@
-from fastapi import Request
 from fastapi.responses import JSONResponse
+import httpx
+from starlette.datastructures import Headers
 import logging
-import time
-from typing import List, Callable, Optional
-import jwt
-from jwt.exceptions import PyJWTError
+from typing import List, Optional
+from jwt.exceptions import ExpiredSignatureError, PyJWTError
+
+from core.token_verifier import TokenVerifier, get_token_verifier
 
 logger = logging.getLogger(__name__)
 
@@ -27,88 +28,70 @@ def is_excluded_route(path: str) -> bool:
     """Determina si una ruta está excluida de autenticación."""
     return any(path.startswith(route) for route in EXCLUDED_ROUTES)
 
-# Clase para validar tokens y extraer su información
-class TokenValidator:
-    """Clase para validar tokens de Microsoft Entra ID."""
-    
-    @staticmethod
-    def decode_token(token: str) -> Optional[dict]:
-        """Decodifica un token JWT sin verificación criptográfica.
-        
-        Esta función extrae información básica del token pero NO valida
-        su autenticidad. La validación real se hace al consultar Microsoft Graph.
-        
-        Args:
-            token: Token JWT a decodificar
-            
-        Returns:
-            Diccionario con los datos del token o None si es inválido
-        """
-        try:
-            # Decodificar sin verificar firma para obtener información básica
-            # Esto es solo para extraer datos, la validación real se hace con Microsoft Graph
-            decoded = jwt.decode(token, options={"verify_signature": False})
-            return decoded
-        except PyJWTError as e:
-            logger.warning(f"Error al decodificar token: {e}")
-            return None
+def _unauthorized(detail: str) -> JSONResponse:
+    return JSONResponse(status_code=401, content={"detail": detail})
+
+def _unavailable(detail: str) -> JSONResponse:
+    return JSONResponse(status_code=503, content={"detail": detail})
 
-# Middleware de autenticación para FastAPI
-async def auth_middleware(request: Request, call_next):
+# Middleware de autenticación (ASGI puro)
+class AuthMiddleware:
     """Middleware que verifica la autenticación de las solicitudes.
     
-    Verifica que las solicitudes a rutas protegidas incluyan un token válido.
+    Verifica que las solicitudes a rutas protegidas incluyan un token válido:
+    firma (JWKS de Entra ID o JWT_SECRET), expiración, emisor y audiencia.
+    Los claims del token quedan en `request.state.user`.
     Las rutas excluidas (definidas en EXCLUDED_ROUTES) no requieren autenticación.
-    
-    Args:
-        request: Objeto Request de FastAPI
-        call_next: Función para llamar al siguiente middleware o endpoint
-        
-    Returns:
-        Respuesta HTTP apropiada
+    Es un middleware ASGI puro: no envuelve la respuesta de las solicitudes
+    autorizadas, solo responde 401 antes de llegar a la aplicación (503 si no
+    se pudo descargar el JWKS: la validez del token es desconocida, no inválida).
+    Los tiempos por solicitud los registra ServerTimingMiddleware.
+
+    Uso:
+        app.add_middleware(AuthMiddleware)
     """
-    start_time = time.time()
-    
-    # Verificar si la ruta está excluida de autenticación
-    if is_excluded_route(request.url.path):
-        return await call_next(request)
-    
-    # Verificar la presencia del encabezado de autorización
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        logger.warning(f"Acceso denegado a {request.url.path}: falta token de autorización")
-        return JSONResponse(
-            status_code=401,
-            content={"detail": "Se requiere autenticación"}
-        )
-    
-    # Extraer y validar el token
-    token = auth_header.replace("Bearer ", "")
-    token_data = TokenValidator.decode_token(token)
-    
-    if not token_data:
-        logger.warning(f"Acceso denegado a {request.url.path}: token inválido")
-        return JSONResponse(
-            status_code=401,
-            content={"detail": "Token inválido o malformado"}
-        )
-    
-    # Verificar expiración del token
-    current_time = int(time.time())
-    expiry_time = token_data.get("exp", 0)
-    
-    if current_time > expiry_time:
-        logger.warning(f"Acceso denegado a {request.url.path}: token expirado")
-        return JSONResponse(
-            status_code=401,
-            content={"detail": "Token expirado"}
-        )
-    
-    # Continuar con la solicitud si el token parece válido
-    response = await call_next(request)
-    
-    # Registrar tiempo de procesamiento
-    process_time = time.time() - start_time
-    logger.debug(f"Procesado en {process_time:.4f} seg: {request.method} {request.url.path}")
-    
-    return response 
\ No newline at end of file
+
+    def __init__(self, app, verifier: Optional[TokenVerifier] = None):
+        self.app = app
+        self._verifier = verifier
+
+    @property
+    def verifier(self) -> TokenVerifier:
+        if self._verifier is None:
+            self._verifier = get_token_verifier()
+        return self._verifier
+
+    async def __call__(self, scope, receive, send):
+        # Rutas relativas al root_path ("/orders/today", no "/api/orders/today")
+        if scope["type"] != "http" or is_excluded_route(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        # Verificar la presencia del encabezado de autorización
+        auth_header = Headers(scope=scope).get("authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            logger.warning(f"Acceso denegado a {path}: falta token de autorización")
+            await _unauthorized("Se requiere autenticación")(scope, receive, send)
+            return
+
+        # Extraer y verificar el token
+        token = auth_header.replace("Bearer ", "")
+        try:
+            claims = await self.verifier.verify(token)
+        except ExpiredSignatureError:
+            logger.warning(f"Acceso denegado a {path}: token expirado")
+            await _unauthorized("Token expirado")(scope, receive, send)
+            return
+        except PyJWTError as e:
+            logger.warning(f"Acceso denegado a {path}: token inválido ({e})")
+            await _unauthorized("Token inválido o malformado")(scope, receive, send)
+            return
+        except httpx.HTTPError as e:
+            # JWKS inaccesible: no se puede verificar la firma, igual que en /auth/verify-token
+            logger.error(f"No se pudo verificar el token para {path}: {e}")
+            await _unavailable("No se pudo verificar el token: claves de firma no disponibles")(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["user"] = claims
+        await self.app(scope, receive, send)
@@ -1,9 +1,11 @@
 from msal import ConfidentialClientApplication
-import requests
+import httpx
 from typing import Tuple, Dict, Any, Optional
 import logging
 
 from core.auth_config import get_auth_settings
+from core.graph_client import graph_client
+from core.msal_client import MSALClientFactory, get_msal_factory
 
 logger = logging.getLogger(__name__)
 
@@ -13,16 +15,16 @@ class AuthService:
     
     def __init__(self):
         self.settings = get_auth_settings()
-        self.client_instance = self._create_msal_app()
     
-    def _create_msal_app(self) -> ConfidentialClientApplication:
-        """Crea y configura la aplicación MSAL para autenticación."""
+    @property
+    def msal_factory(self) -> MSALClientFactory:
+        return get_msal_factory()
+    
+    @property
+    def client_instance(self) -> ConfidentialClientApplication:
+        """Aplicación MSAL compartida; se crea (y descubre el authority) en el primer uso."""
         try:
-            return ConfidentialClientApplication(
-                client_id=self.settings.CLIENT_ID,
-                client_credential=self.settings.CLIENT_SECRET,
-                authority=self.settings.AUTHORITY
-            )
+            return self.msal_factory.get_app()
         except Exception as e:
             logger.error(f"Error al crear la aplicación MSAL: {e}")
             raise
@@ -57,7 +59,7 @@ class AuthService:
             Diccionario con el token de acceso y otra información
         """
         try:
-            result = self.client_instance.acquire_token_by_authorization_code(
+            result = self.msal_factory.acquire_token_by_authorization_code(
                 code=code,
                 scopes=self.settings.SCOPES,
                 redirect_uri=f"{self.settings.FRONTEND_URL}{self.settings.REDIRECT_PATH}"
@@ -72,9 +74,11 @@ class AuthService:
             logger.error(f"Error al adquirir token: {e}")
             raise
     
-    def get_user_info(self, access_token: str) -> Tuple[str, str]:
+    async def get_user_info(self, access_token: str) -> Tuple[str, str]:
         """Obtiene información del usuario desde Microsoft Graph API.
         
+        Usa el cliente HTTP asíncrono compartido (conexiones reutilizadas).
+        
         Args:
             access_token: Token de acceso válido
             
@@ -82,22 +86,9 @@ class AuthService:
             Tupla con (nombre_usuario, correo_usuario)
         """
         try:
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Content-Type': 'application/json'
-            }
-            response = requests.get('https://graph.microsoft.com/v1.0/me', headers=headers)
-            response.raise_for_status()
-            
-            profile = response.json()
-            logger.debug(f"Perfil obtenido: {profile}")
-            
-            nombre = profile.get('displayName', 'Usuario')
-            correo = profile.get('mail') or profile.get('userPrincipalName', 'sin-correo')
-            
-            return nombre, correo
-        except requests.HTTPError as e:
-            logger.error(f"Error HTTP al obtener perfil de usuario: {e.response.text if hasattr(e, 'response') else e}")
+            return await graph_client.get_profile(access_token)
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Error HTTP al obtener perfil de usuario: {e.response.text}")
             raise
         except Exception as e:
             logger.error(f"Error desconocido al obtener perfil de usuario: {e}")
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Hashable, Optional, Set, Tuple
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_PENDING = 1000
+
+
+class TaskSupervisor:
+    """
+    Lanza tareas en segundo plano manteniendo una referencia fuerte a cada una.
+
+    asyncio solo guarda referencias débiles a las tareas, así que un
+    `asyncio.create_task(...)` sin guardar el resultado puede ser recolectado
+    antes de terminar. El supervisor conserva las tareas hasta que finalizan,
+    registra sus errores y permite esperarlas al apagar la aplicación.
+
+    Además de `spawn` (tarea suelta), `submit` encola trabajos por tipo con:
+        - concurrencia máxima por tipo de trabajo,
+        - un límite de trabajos pendientes por tipo (los excedentes se rechazan),
+        - coalescencia por clave: si ya hay un trabajo pendiente con la misma
+          clave, se reemplaza por el más reciente (gana la última versión),
+        - métricas por tipo (`metrics()`).
+    """
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self._limits: Dict[str, Tuple[int, int]] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._pending_jobs: Dict[Tuple[str, Hashable], Tuple[Callable[..., Awaitable[Any]], tuple, dict]] = {}
+        self._workers: Set[Tuple[str, Hashable]] = set()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def spawn(self, coro: Coroutine[Any, Any, Any], name: Optional[str] = None) -> asyncio.Task:
+        """
+        Programa una corrutina en el loop actual sin esperar su resultado.
+
+        La tarea hereda el contexto (contextvars) de quien la lanza.
+        """
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        return task
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if task.cancelled():
+            logging.warning("Tarea en segundo plano cancelada: %s", task.get_name())
+            return
+        error = task.exception()
+        if error is not None:
+            logging.error(
+                "Error en tarea en segundo plano %s: %s", task.get_name(), error,
+                exc_info=(type(error), error, error.__traceback__)
+            )
+
+    def configure(self, job_type: str, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                  max_pending: int = DEFAULT_MAX_PENDING) -> None:
+        """Define los límites de un tipo de trabajo. Debe llamarse antes del primer `submit`."""
+        self._limits[job_type] = (max_concurrency, max_pending)
+        self._semaphores.pop(job_type, None)
+
+    def _job_stats(self, job_type: str) -> Dict[str, float]:
+        if job_type not in self._stats:
+            self._stats[job_type] = {
+                "submitted": 0, "coalesced": 0, "rejected": 0,
+                "queued": 0, "running": 0, "succeeded": 0, "failed": 0,
+                "total_seconds": 0.0,
+            }
+        return self._stats[job_type]
+
+    def submit(self, job_type: str, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> bool:
+        """
+        Encola un trabajo en segundo plano.
+
+        :param job_type: Tipo de trabajo (define la concurrencia y el límite de pendientes).
+        :param key: Clave de coalescencia; dos trabajos con la misma clave no corren a la vez
+                    y, si uno aún no ha empezado, el nuevo lo reemplaza.
+        :param func: Función asíncrona a ejecutar con `*args` y `**kwargs`.
+        :return: True si el trabajo quedó encolado (o coalescido), False si se rechazó.
+        """
+        stats = self._job_stats(job_type)
+        stats["submitted"] += 1
+        job_key = (job_type, key)
+
+        if job_key in self._pending_jobs:
+            # Ya hay un trabajo sin empezar para esta clave: gana el más reciente
+            self._pending_jobs[job_key] = (func, args, kwargs)
+            stats["coalesced"] += 1
+            return True
+
+        _, max_pending = self._limits.get(job_type, (DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_PENDING))
+        if stats["queued"] >= max_pending:
+            stats["rejected"] += 1
+            logging.warning("Trabajo %s rechazado para %s: cola llena (%d)", job_type, key, max_pending)
+            return False
+
+        self._pending_jobs[job_key] = (func, args, kwargs)
+        stats["queued"] += 1
+        if job_key not in self._workers:
+            self._workers.add(job_key)
+            self.spawn(self._run_jobs(job_key), name=f"{job_type}:{key}")
+        return True
+
+    def _semaphore(self, job_type: str) -> asyncio.Semaphore:
+        if job_type not in self._semaphores:
+            max_concurrency, _ = self._limits.get(job_type, (DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_PENDING))
+            self._semaphores[job_type] = asyncio.Semaphore(max_concurrency)
+        return self._semaphores[job_type]
+
+    async def _run_jobs(self, job_key: Tuple[str, Hashable]) -> None:
+        """Ejecuta los trabajos de una clave uno a uno hasta que no queden pendientes."""
+        job_type, key = job_key
+        stats = self._job_stats(job_type)
+        try:
+            while job_key in self._pending_jobs:
+                async with self._semaphore(job_type):
+                    func, args, kwargs = self._pending_jobs.pop(job_key)
+                    stats["queued"] -= 1
+                    stats["running"] += 1
+                    start = time.perf_counter()
+                    try:
+                        await func(*args, **kwargs)
+                        stats["succeeded"] += 1
+                    except Exception as e:
+                        stats["failed"] += 1
+                        logging.exception("Error en trabajo %s para %s: %s", job_type, key, e)
+                    finally:
+                        stats["running"] -= 1
+                        stats["total_seconds"] += time.perf_counter() - start
+        finally:
+            self._workers.discard(job_key)
+            if self._pending_jobs.pop(job_key, None) is not None:
+                # El worker fue cancelado con un trabajo aún en cola
+                stats["queued"] -= 1
+
+    @property
+    def pending(self) -> int:
+        """Número de tareas aún en ejecución."""
+        return len(self._tasks)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Métricas por tipo de trabajo más el número de tareas vivas."""
+        job_types = {}
+        for job_type, stats in self._stats.items():
+            finished = stats["succeeded"] + stats["failed"]
+            max_concurrency, max_pending = self._limits.get(job_type, (DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_PENDING))
+            job_types[job_type] = {
+                **{name: int(value) for name, value in stats.items() if name != "total_seconds"},
+                "avg_seconds": round(stats["total_seconds"] / finished, 4) if finished else 0.0,
+                "max_concurrency": max_concurrency,
+                "max_pending": max_pending,
+            }
+        return {"live_tasks": len(self._tasks), "job_types": job_types}
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """Espera a que terminen las tareas pendientes; cancela las que superen el timeout."""
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logging.warning("Se cancelaron %d tareas en segundo plano al apagar", len(pending))
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+# Instancia global compartida por las herramientas y la aplicación
+task_supervisor = TaskSupervisor()
+task_supervisor.configure("update_user", max_concurrency=5, max_pending=500)
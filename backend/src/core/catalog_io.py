@@ -0,0 +1,223 @@
+"""
+Lectura y escritura del catálogo de inventario en CSV, JSON y XLSX.
+
+Las filas se normalizan a las columnas de `inventory` (name, quantity, unit,
+price, descripcion, tipo_producto); los encabezados en español (nombre,
+cantidad, precio, ...) también se aceptan. La clave natural de un producto es
+(restaurant_id, name).
+"""
+import csv
+import io
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from core.utils import extract_excel_content
+
+CATALOG_FORMATS = ("csv", "json", "xlsx")
+# Columnas del catálogo, en el orden de exportación
+CATALOG_COLUMNS = ("id", "name", "quantity", "unit", "price", "descripcion", "tipo_producto")
+# Columnas que se pueden cargar o actualizar en bloque
+CATALOG_FIELDS = ("quantity", "unit", "price", "descripcion", "tipo_producto")
+PRODUCT_TYPES = ("menu", "adicion")
+# Valores de un producto nuevo para las columnas que el archivo no trae
+CATALOG_DEFAULTS = {"quantity": 0, "unit": "unidad", "price": None, "descripcion": "", "tipo_producto": "menu"}
+
+_HEADER_ALIASES = {
+    "nombre": "name", "producto": "name",
+    "cantidad": "quantity", "existencias": "quantity", "stock": "quantity",
+    "unidad": "unit",
+    "precio": "price",
+    "descripción": "descripcion", "description": "descripcion",
+    "tipo": "tipo_producto", "type": "tipo_producto",
+}
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def catalog_format(filename: Optional[str], declared: Optional[str] = None) -> str:
+    """Formato del archivo según el parámetro explícito o la extensión del nombre."""
+    fmt = (declared or (filename or "").rsplit(".", 1)[-1]).lower()
+    if fmt == "xls":
+        fmt = "xlsx"
+    if fmt not in CATALOG_FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt or 'desconocido'} (use {', '.join(CATALOG_FORMATS)})")
+    return fmt
+
+
+def _is_blank(value: Any) -> bool:
+    # pandas deja NaN (float que no es igual a sí mismo) en las celdas vacías
+    return value is None or (isinstance(value, str) and not value.strip()) or (isinstance(value, float) and value != value)
+
+
+def normalize_row(raw: Dict[str, Any], line: int) -> Dict[str, Any]:
+    """
+    Convierte una fila leída del archivo en un producto con tipos de la tabla.
+    Las columnas ausentes o vacías no se incluyen (al actualizar se conservan).
+
+    :raises ValueError: Si falta el nombre o un valor no tiene el tipo esperado.
+    """
+    row: Dict[str, Any] = {}
+    for key, value in raw.items():
+        column = str(key).strip().lower()
+        column = _HEADER_ALIASES.get(column, column)
+        if column in ("name",) + CATALOG_FIELDS and not _is_blank(value):
+            row[column] = value.strip() if isinstance(value, str) else value
+    if not row.get("name"):
+        raise ValueError(f"Fila {line}: falta el nombre del producto")
+    row["name"] = str(row["name"])
+    try:
+        if "quantity" in row:
+            quantity = float(row["quantity"])
+            if not quantity.is_integer():
+                raise ValueError
+            row["quantity"] = int(quantity)
+        if "price" in row:
+            row["price"] = float(row["price"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Fila {line} ({row['name']}): cantidad o precio inválidos")
+    for column in ("unit", "descripcion"):
+        if column in row:
+            row[column] = str(row[column])
+    if "tipo_producto" in row:
+        row["tipo_producto"] = str(row["tipo_producto"]).lower()
+        if row["tipo_producto"] not in PRODUCT_TYPES:
+            raise ValueError(f"Fila {line} ({row['name']}): tipo_producto debe ser {' o '.join(PRODUCT_TYPES)}")
+    return row
+
+
+def parse_catalog(content: bytes, fmt: str) -> List[Dict[str, Any]]:
+    """
+    Lee un catálogo en CSV, JSON (lista de objetos o {"products": [...]}) o XLSX.
+
+    :raises ValueError: Si el archivo no se puede leer, una fila es inválida o un nombre se repite.
+    """
+    if fmt == "csv":
+        text = content.decode("utf-8-sig")
+        try:
+            dialect = csv.Sniffer().sniff(text[:2048], delimiters=",;\t") if text.strip() else csv.excel
+        except csv.Error:
+            # Una sola columna no tiene separador que detectar
+            dialect = csv.excel
+        raw_rows = list(csv.DictReader(io.StringIO(text), dialect=dialect))
+    elif fmt == "json":
+        data = json.loads(content)
+        raw_rows = data.get("products", []) if isinstance(data, dict) else data
+    elif fmt == "xlsx":
+        jsonl = extract_excel_content(content)
+        raw_rows = [json.loads(line) for line in jsonl.splitlines() if line.strip()]
+    else:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    if not isinstance(raw_rows, list) or not all(isinstance(raw, dict) for raw in raw_rows):
+        raise ValueError("El catálogo debe ser una lista de productos")
+
+    rows, seen = [], set()
+    # Línea 2 = primera fila de datos bajo el encabezado en CSV/XLSX
+    for line, raw in enumerate(raw_rows, start=2 if fmt != "json" else 1):
+        row = normalize_row(raw, line)
+        if row["name"].lower() in seen:
+            raise ValueError(f"Fila {line}: el producto '{row['name']}' está repetido en el archivo")
+        seen.add(row["name"].lower())
+        rows.append(row)
+    return rows
+
+
+def _same_value(column: str, old: Any, new: Any) -> bool:
+    if column == "price" and old is not None and new is not None:
+        # price es DECIMAL(12,2) en MySQL: se compara al centavo
+        return round(float(old), 2) == round(float(new), 2)
+    return old == new
+
+
+def diff_catalog(existing: List[Dict[str, Any]], rows: List[Dict[str, Any]],
+                 new_id: Callable[[], str]) -> Dict[str, Any]:
+    """
+    Compara las filas normalizadas con los productos actuales del restaurante
+    usando el nombre (sin distinguir mayúsculas) como clave natural.
+
+    Parámetros:
+        existing: Productos actuales del inventario (filas de la tabla).
+        rows: Filas normalizadas con `normalize_row`.
+        new_id: Generador de ids para los productos nuevos.
+
+    Retorna:
+        Dict con "upserts" (productos completos a escribir), "inserted",
+        "updated" y "unchanged" (nombres) y "changes" ({nombre: {columna: [antes, después]}}).
+    """
+    by_name = {product["name"].lower(): product for product in existing}
+    result = {"upserts": [], "inserted": [], "updated": [], "unchanged": [], "changes": {}}
+    for row in rows:
+        current = by_name.get(row["name"].lower())
+        if current is None:
+            product = {"id": new_id(), "name": row["name"]}
+            product.update({column: row.get(column, CATALOG_DEFAULTS[column]) for column in CATALOG_FIELDS})
+            result["upserts"].append(product)
+            result["inserted"].append(row["name"])
+            continue
+        changes = {
+            column: [current.get(column), row[column]]
+            for column in CATALOG_FIELDS
+            if column in row and not _same_value(column, current.get(column), row[column])
+        }
+        if not changes:
+            result["unchanged"].append(current["name"])
+            continue
+        product = {column: current.get(column) for column in ("id", "name") + CATALOG_FIELDS}
+        product.update({column: new for column, (_, new) in changes.items()})
+        result["upserts"].append(product)
+        result["updated"].append(current["name"])
+        result["changes"][current["name"]] = changes
+    return result
+
+
+def price_change_rows(existing: List[Dict[str, Any]], items: Optional[List[Dict[str, Any]]] = None,
+                      percent: Optional[float] = None, round_to: Optional[float] = None,
+                      tipo_producto: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Filas de catálogo para un cambio masivo de precios: valores explícitos por
+    producto (`items` con product_id o name y price y/o quantity) o un ajuste
+    porcentual sobre todos los productos con precio (opcionalmente de un tipo).
+
+    :raises ValueError: Si un producto de `items` no existe en el inventario.
+    """
+    by_id = {product["id"]: product for product in existing}
+    by_name = {product["name"].lower(): product for product in existing}
+    rows: Dict[str, Dict[str, Any]] = {}
+    if percent is not None:
+        for product in existing:
+            if product.get("price") is None or (tipo_producto and product.get("tipo_producto") != tipo_producto):
+                continue
+            price = float(product["price"]) * (1 + percent / 100)
+            price = round(price / round_to) * round_to if round_to else round(price, 2)
+            rows[product["name"].lower()] = {"name": product["name"], "price": price}
+    for line, item in enumerate(items or [], start=1):
+        product = by_id.get(item.get("product_id")) or by_name.get(str(item.get("name") or "").lower())
+        if product is None:
+            raise ValueError(f"Elemento {line}: producto no encontrado ({item.get('product_id') or item.get('name')})")
+        row = rows.setdefault(product["name"].lower(), {"name": product["name"]})
+        row.update({column: item[column] for column in ("price", "quantity") if item.get(column) is not None})
+    return list(rows.values())
+
+
+def dump_catalog(products: List[Dict[str, Any]], fmt: str) -> bytes:
+    """Serializa los productos del inventario con las columnas del catálogo."""
+    rows = [{column: product.get(column) for column in CATALOG_COLUMNS} for product in products]
+    if fmt == "csv":
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=CATALOG_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+        # BOM para que Excel abra el CSV con tildes correctas
+        return ("\ufeff" + output.getvalue()).encode("utf-8")
+    if fmt == "json":
+        return json.dumps(rows, ensure_ascii=False, indent=2).encode("utf-8")
+    if fmt == "xlsx":
+        import pandas as pd
+
+        output = io.BytesIO()
+        pd.DataFrame(rows, columns=list(CATALOG_COLUMNS)).to_excel(output, index=False, sheet_name="inventario")
+        return output.getvalue()
+    raise ValueError(f"Formato no soportado: {fmt}")
@@ -0,0 +1,57 @@
+"""
+Contadores de cambios por tabla (y restaurante) para versionar lecturas.
+
+Cada escritura de pedidos o inventario incrementa su contador en la misma
+transacción; los endpoints de lectura arman el ETag con ese número y, si el
+cliente ya tiene esa versión, responden 304 sin ejecutar la consulta pesada.
+
+Cada contador es una fila bloqueada hasta el commit. Una transacción que
+incrementa varios los toma siempre en el mismo orden, para que dos escrituras
+concurrentes no se bloqueen mutuamente (deadlock):
+    1. "inventory:<restaurante>" (en orden de restaurante),
+    2. "orders".
+"""
+import logging
+from typing import Optional
+
+from aiomysql import Error
+
+from core.db_pool import DBConnectionPool
+
+CHANGE_COUNTERS_DDL = """
+CREATE TABLE IF NOT EXISTS change_counters (
+    name VARCHAR(100) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+)
+"""
+
+
+async def bump_version(cursor, name: str) -> None:
+    """
+    Incrementa el contador `name` con el cursor de la escritura (antes de su commit).
+    Un error aquí no debe tumbar la escritura, solo se registra.
+    """
+    try:
+        await cursor.execute(
+            "INSERT INTO change_counters (name, version) VALUES (%s, 1) "
+            "ON DUPLICATE KEY UPDATE version = version + 1",
+            (name,),
+        )
+    except Error as err:
+        logging.error("No se pudo incrementar el contador de cambios %s: %s", name, err)
+
+
+async def get_version(name: str) -> Optional[int]:
+    """Retorna la versión actual de `name` (0 si nunca cambió), o None si no se pudo leer."""
+    try:
+        pool = await DBConnectionPool().get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT version FROM change_counters WHERE name = %s", (name,))
+                row = await cursor.fetchone()
+                # Lectura fuera de transacción: no reutilizar un snapshot viejo
+                await conn.commit()
+                return int(row[0]) if row else 0
+    except Exception as e:
+        logging.error("No se pudo leer el contador de cambios %s: %s", name, e)
+        return None
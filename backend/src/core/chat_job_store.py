@@ -0,0 +1,188 @@
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import aiomysql
+from aiomysql import Error
+
+from core.clock import get_clock
+from core.config import settings
+from core.db_pool import DBConnectionPool
+
+# Estados de un trabajo de chat
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_REJECTED = "rejected"
+JOB_FAILED = "failed"
+
+JOB_FIELDS = ("job_id", "user_id", "status", "delivery", "request", "message_id", "text", "error", "created_at", "updated_at")
+
+
+class ChatJobStore(ABC):
+    """
+    Almacén del estado de los trabajos de chat asíncronos (POST /agent/chat/jobs).
+
+    Un trabajo es un diccionario con los campos de JOB_FIELDS. Las
+    implementaciones solo necesitan `create`, `update` y `get`.
+    """
+
+    @abstractmethod
+    async def create(self, job: Dict[str, Any]) -> None:
+        """Registra un trabajo nuevo (created_at y updated_at los asigna el almacén)."""
+
+    @abstractmethod
+    async def update(self, job_id: str, **fields: Any) -> None:
+        """Actualiza campos de un trabajo existente; un job_id desconocido se ignora."""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna el trabajo, o None si no existe o ya venció."""
+
+
+class InMemoryChatJobStore(ChatJobStore):
+    """
+    Almacén en el proceso. Los trabajos se descartan tras `ttl_seconds` y no
+    sobreviven a un reinicio; con varias instancias use MySQLChatJobStore.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_jobs: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        expired = [job_id for job_id, (expires_at, _) in self._jobs.items() if expires_at <= now]
+        for job_id in expired:
+            del self._jobs[job_id]
+        # Si aún se supera el máximo, se descartan los más antiguos (orden de inserción)
+        while len(self._jobs) >= self.max_jobs:
+            del self._jobs[next(iter(self._jobs))]
+
+    async def create(self, job: Dict[str, Any]) -> None:
+        now = get_clock().db_now()
+        with self._lock:
+            self._purge()
+            self._jobs[job["job_id"]] = (time.monotonic() + self.ttl_seconds,
+                                         {**job, "created_at": now, "updated_at": now})
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                expires_at, job = self._jobs[job_id]
+                job.update(fields, updated_at=get_clock().db_now())
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return dict(entry[1])
+
+
+class MySQLChatJobStore(ChatJobStore):
+    """Almacén en la tabla `chat_jobs`, compartido por todas las instancias."""
+
+    def __init__(self):
+        self.db_pool = DBConnectionPool()
+        self._table_ready = False
+
+    async def _create_tables(self):
+        """Crea la tabla de trabajos si no existe."""
+        if self._table_ready:
+            return
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    await cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS chat_jobs (
+                        job_id VARCHAR(64) PRIMARY KEY,
+                        user_id VARCHAR(255) NOT NULL,
+                        status VARCHAR(20) NOT NULL,
+                        delivery VARCHAR(20) NOT NULL,
+                        request JSON,
+                        message_id VARCHAR(255),
+                        text TEXT,
+                        error TEXT,
+                        created_at DATETIME NOT NULL,
+                        updated_at DATETIME NOT NULL,
+                        INDEX (user_id),
+                        INDEX (created_at)
+                    )
+                    """)
+                    await conn.commit()
+                    self._table_ready = True
+                except Error as err:
+                    logging.error(f"Error creating chat_jobs table: {err}")
+
+    async def create(self, job: Dict[str, Any]) -> None:
+        await self._create_tables()
+        now = get_clock().db_now()
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    INSERT INTO chat_jobs (job_id, user_id, status, delivery, request, created_at, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (job["job_id"], job["user_id"], job["status"], job["delivery"],
+                     json.dumps(job.get("request"), ensure_ascii=False), now, now),
+                )
+                await conn.commit()
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        columns = [name for name in fields if name in JOB_FIELDS and name not in ("job_id", "request", "created_at")]
+        if not columns:
+            return
+        assignments = ", ".join(f"{name} = %s" for name in columns)
+        values = [fields[name] for name in columns] + [get_clock().db_now(), job_id]
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    await cursor.execute(f"UPDATE chat_jobs SET {assignments}, updated_at = %s WHERE job_id = %s", values)
+                    await conn.commit()
+                except Error as err:
+                    logging.error("Error actualizando el trabajo de chat %s: %s", job_id, err)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        await self._create_tables()
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                try:
+                    await cursor.execute("SELECT * FROM chat_jobs WHERE job_id = %s", (job_id,))
+                    job = await cursor.fetchone()
+                except Error as err:
+                    logging.error("Error consultando el trabajo de chat %s: %s", job_id, err)
+                    return None
+        if job and isinstance(job.get("request"), str):
+            job["request"] = json.loads(job["request"])
+        return job
+
+
+_chat_job_store: Optional[ChatJobStore] = None
+
+
+def get_chat_job_store() -> ChatJobStore:
+    """Retorna el almacén configurado en CHAT_JOB_STORE ("memory" por defecto o "mysql")."""
+    global _chat_job_store
+    if _chat_job_store is None:
+        if settings.chat_job_store == "mysql":
+            _chat_job_store = MySQLChatJobStore()
+        else:
+            _chat_job_store = InMemoryChatJobStore(ttl_seconds=settings.chat_job_ttl_seconds)
+    return _chat_job_store
+
+
+def set_chat_job_store(store: ChatJobStore) -> None:
+    """Reemplaza el almacén (por ejemplo, uno propio o uno de pruebas)."""
+    global _chat_job_store
+    _chat_job_store = store
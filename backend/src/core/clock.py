@@ -0,0 +1,97 @@
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo
+
+BOGOTA_TZ = ZoneInfo("America/Bogota")
+
+
+class Clock:
+    """
+    Reloj de la aplicación en hora de Bogotá.
+
+    Devuelve datetimes con zona horaria (zoneinfo) y los cachea con resolución
+    de un segundo, que es la misma resolución de las columnas DATETIME de MySQL.
+    Las columnas DATETIME guardan la hora local de Bogotá sin zona, por eso
+    `db_now()` y `day_bounds()` devuelven datetimes naive en esa hora local.
+    """
+
+    def __init__(self, tz: ZoneInfo = BOGOTA_TZ):
+        self.tz = tz
+        self._cached_second: Optional[int] = None
+        self._cached_now: Optional[datetime] = None
+
+    def _epoch(self) -> float:
+        return time.time()
+
+    def now(self) -> datetime:
+        """Hora actual con zona horaria, truncada al segundo."""
+        second = int(self._epoch())
+        if second != self._cached_second:
+            self._cached_now = datetime.fromtimestamp(second, self.tz)
+            self._cached_second = second
+        return self._cached_now
+
+    def db_now(self) -> datetime:
+        """Hora actual como datetime naive en hora local, lista para columnas DATETIME."""
+        return self.now().replace(tzinfo=None)
+
+    def today(self) -> date:
+        """Fecha actual en hora de Bogotá."""
+        return self.now().date()
+
+    def day_bounds(self, day: Optional[date] = None) -> Tuple[datetime, datetime]:
+        """
+        Retorna el inicio y el fin (inclusivo) de un día en hora local naive.
+
+        :param day: Día a consultar. Por defecto el día actual en Bogotá.
+        :return: Tupla (inicio, fin) para usar en filtros BETWEEN sobre DATETIME.
+        """
+        day = day or self.today()
+        start = datetime.combine(day, dt_time.min)
+        return start, start + timedelta(days=1) - timedelta(microseconds=1)
+
+    def day_start(self, day: Optional[date] = None) -> datetime:
+        """Inicio del día (00:00:00) en hora local naive."""
+        return self.day_bounds(day)[0]
+
+    def localize(self, value: datetime) -> datetime:
+        """Convierte un datetime a la zona del reloj; los naive se asumen en hora local."""
+        if value.tzinfo is None:
+            return value.replace(tzinfo=self.tz)
+        return value.astimezone(self.tz)
+
+
+class FrozenClock(Clock):
+    """Reloj fijo para pruebas. Se puede avanzar manualmente con `advance`."""
+
+    def __init__(self, frozen_at: datetime, tz: ZoneInfo = BOGOTA_TZ):
+        super().__init__(tz)
+        self._frozen_epoch = self.localize(frozen_at).timestamp()
+
+    def _epoch(self) -> float:
+        return self._frozen_epoch
+
+    def advance(self, **kwargs) -> None:
+        """Avanza el reloj; acepta los mismos argumentos que `timedelta`."""
+        self._frozen_epoch += timedelta(**kwargs).total_seconds()
+
+
+_clock: Clock = Clock()
+
+
+def get_clock() -> Clock:
+    """Retorna el reloj activo de la aplicación."""
+    return _clock
+
+
+def set_clock(clock: Clock) -> Clock:
+    """
+    Reemplaza el reloj activo (por ejemplo, con un FrozenClock en pruebas).
+
+    :return: El reloj anterior, para poder restaurarlo.
+    """
+    global _clock
+    previous = _clock
+    _clock = clock
+    return previous
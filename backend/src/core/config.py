@@ -1,5 +1,6 @@
 from dotenv import load_dotenv, find_dotenv
 import os
+import tempfile
 
 load_dotenv(find_dotenv(), override=True)
 
@@ -8,6 +9,14 @@ class Settings():
         # OpenAI Configuration
         self.openai_api_key: str = os.getenv("OPENAI_API_KEY")
         self.openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini-2024-07-18")
+        self.openai_fallback_model: str = os.getenv("OPENAI_FALLBACK_MODEL")
+
+        # LLM call deadlines, hedging and circuit breaker
+        self.llm_turn_budget_seconds: float = float(os.getenv("LLM_TURN_BUDGET_SECONDS", "25"))
+        self.llm_call_timeout_seconds: float = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "15"))
+        self.llm_hedge_after_seconds: float = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "5"))
+        self.llm_breaker_failures: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+        self.llm_breaker_cooldown_seconds: float = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
         
         # Database Configuration
         self.db_user: str = os.getenv("DB_USER")
@@ -15,4 +24,75 @@ class Settings():
         self.db_host: str = os.getenv("DB_HOST")
         self.db_database: str = os.getenv("DB_DATABASE")
         
+        # Admission control for /agent/chat/message
+        self.chat_max_concurrency: int = int(os.getenv("CHAT_MAX_CONCURRENCY", "20"))
+        self.chat_max_queue: int = int(os.getenv("CHAT_MAX_QUEUE", "100"))
+        self.chat_queue_timeout_seconds: float = float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", "10"))
+        self.chat_user_rate_per_minute: float = float(os.getenv("CHAT_USER_RATE_PER_MINUTE", "10"))
+        self.chat_user_burst: int = int(os.getenv("CHAT_USER_BURST", "5"))
+
+        # Asynchronous chat jobs (POST /agent/chat/jobs)
+        self.chat_job_store: str = os.getenv("CHAT_JOB_STORE", "memory")  # memory | mysql
+        self.chat_job_ttl_seconds: float = float(os.getenv("CHAT_JOB_TTL_SECONDS", "3600"))
+        self.chat_job_workers: int = int(os.getenv("CHAT_JOB_WORKERS", "10"))
+        self.chat_job_max_pending: int = int(os.getenv("CHAT_JOB_MAX_PENDING", "500"))
+
+        # Idempotency keys (chat and order creation)
+        self.idempotency_ttl_seconds: float = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+        self.idempotency_cache_size: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+        self.idempotency_use_db: bool = os.getenv("IDEMPOTENCY_USE_DB", "true").lower() == "true"
+        # In-progress keys whose lease is not renewed (crashed instance) can be retried after this
+        self.idempotency_lease_seconds: float = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "120"))
+
+        # Stock reservations: how long menu rendering trusts cached quantities
+        self.stock_availability_ttl_seconds: float = float(os.getenv("STOCK_AVAILABILITY_TTL_SECONDS", "30"))
+
+        # Menu search index (search_menu_tool): results per query and full rebuild interval
+        self.menu_search_top_k: int = int(os.getenv("MENU_SEARCH_TOP_K", "5"))
+        self.menu_search_ttl_seconds: float = float(os.getenv("MENU_SEARCH_TTL_SECONDS", "300"))
+
+        # Monthly partitions: upkeep of future months runs always, retention only when enabled
+        self.partition_maintenance_interval_hours: float = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL_HOURS", "24"))
+        # Retention of orders / conversations history
+        self.retention_enabled: bool = os.getenv("RETENTION_ENABLED", "false").lower() == "true"
+        self.retention_target: str = os.getenv("RETENTION_TARGET", "table")  # table | jsonl
+        self.retention_archive_dir: str = os.getenv("RETENTION_ARCHIVE_DIR", "archive")
+        self.retention_interval_hours: float = float(os.getenv("RETENTION_INTERVAL_HOURS", "24"))
+        self.retention_batch_size: int = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+        self.orders_retention_days: int = int(os.getenv("ORDERS_RETENTION_DAYS", "180"))
+        self.conversations_retention_days: int = int(os.getenv("CONVERSATIONS_RETENTION_DAYS", "30"))
+        self.retention_closed_states: list = os.getenv("RETENTION_CLOSED_STATES", "pagado,completado,cancelado").split(",")
+
+        # Incremental columnar export of orders (sales reports read these files)
+        self.orders_export_enabled: bool = os.getenv("ORDERS_EXPORT_ENABLED", "false").lower() == "true"
+        self.orders_export_dir: str = os.getenv("ORDERS_EXPORT_DIR", os.path.join("exports", "orders"))
+        self.orders_export_format: str = os.getenv("ORDERS_EXPORT_FORMAT", "parquet")  # parquet | arrow
+        self.orders_export_chunk_size: int = int(os.getenv("ORDERS_EXPORT_CHUNK_SIZE", "5000"))
+        self.orders_export_interval_minutes: float = float(os.getenv("ORDERS_EXPORT_INTERVAL_MINUTES", "15"))
+        # Rows updated more recently than this are left for the next run (late commits)
+        self.orders_export_safety_lag_seconds: float = float(os.getenv("ORDERS_EXPORT_SAFETY_LAG_SECONDS", "300"))
+
+        # WhatsApp gateway
+        self.whatsapp_api_url: str = os.getenv("WHATSAPP_API_URL", "http://198.244.188.104:3001")
+        self.whatsapp_message_path: str = os.getenv("WHATSAPP_MESSAGE_PATH", "/api/send-message")
+
+        # Token verification (JWKS) and outbound HTTP to Microsoft Graph / Entra ID
+        self.jwks_refresh_seconds: float = float(os.getenv("JWKS_REFRESH_SECONDS", "3600"))
+        self.auth_token_cache_size: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+        self.graph_api_url: str = os.getenv("GRAPH_API_URL", "https://graph.microsoft.com/v1.0")
+        self.graph_timeout_seconds: float = float(os.getenv("GRAPH_TIMEOUT_SECONDS", "10"))
+        self.graph_max_connections: int = int(os.getenv("GRAPH_MAX_CONNECTIONS", "20"))
+
+        # Shared MSAL application: encrypted persistent token / discovery cache
+        self.msal_cache_path: str = os.getenv("MSAL_CACHE_PATH", os.path.join(tempfile.gettempdir(), "tars_msal_cache.bin"))
+        self.msal_cache_key: str = os.getenv("MSAL_CACHE_KEY")
+
+        # HTTP responses
+        self.gzip_minimum_size: int = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+        self.gzip_compress_level: int = int(os.getenv("GZIP_COMPRESS_LEVEL", "6"))
+
+        # Tool results (token report / recording for offline measurement)
+        self.tool_token_report: bool = os.getenv("TOOL_TOKEN_REPORT", "false").lower() == "true"
+        self.tool_result_record_path: str = os.getenv("TOOL_RESULT_RECORD_PATH")
+        
 settings = Settings()
\ No newline at end of file
@@ -6,6 +6,7 @@ import aiomysql
 from aiomysql import Pool
 
 from core.config import settings
+from core.money import MONEY_CONVERSIONS
 
 class DBConnectionPool:
     """
@@ -45,6 +46,7 @@ class DBConnectionPool:
                         pool_recycle=1200,  # Reducido de 1800 a 1200 para reciclar conexiones cada 20 minutos
                         echo=True,  # Activar logging de consultas SQL para debugging
                         charset='utf8mb4',  # Soporte para caracteres Unicode completo
+                        conv=MONEY_CONVERSIONS,  # DECIMAL (precios, line_total) -> float
                         connect_timeout=10.0  # Timeout para conexiones
                     )
                     self._pool_initialized = True
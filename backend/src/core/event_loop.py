@@ -0,0 +1,31 @@
+import asyncio
+import logging
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+def install_uvloop() -> bool:
+    """
+    Instala uvloop como política de event loop si está disponible.
+
+    uvloop es opcional: sin él se usa el loop estándar de asyncio.
+    uvicorn ya lo selecciona por sí solo (`--loop auto`) cuando está instalado;
+    esta función es para scripts y procesos que crean su propio loop.
+
+    :return: True si se instaló uvloop, False si se usa el loop por defecto.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        logging.info("uvloop no está instalado; se usa el event loop por defecto")
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def run(main: Coroutine[Any, Any, T], use_uvloop: bool = True) -> T:
+    """Equivalente a `asyncio.run`, usando uvloop cuando está disponible."""
+    if use_uvloop:
+        install_uvloop()
+    return asyncio.run(main)
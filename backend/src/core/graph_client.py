@@ -0,0 +1,74 @@
+import logging
+from typing import Optional, Tuple
+
+import httpx
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Cliente HTTP asíncrono compartido para Microsoft Graph y Entra ID (JWKS).
+
+    Reutiliza conexiones (keep-alive) entre solicitudes en lugar de abrir una
+    conexión TLS nueva por cada llamada como hacía `requests.get`.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.graph_timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=settings.graph_max_connections,
+                max_keepalive_connections=settings.graph_max_connections,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Cierra el cliente compartido (al apagar la aplicación)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class GraphClient:
+    """Consultas a Microsoft Graph con el cliente HTTP compartido."""
+
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, base_url: str = settings.graph_api_url):
+        self._http_client = http_client
+        self.base_url = base_url.rstrip("/")
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client()
+
+    async def get_profile(self, access_token: str, default_email: str = "sin-correo") -> Tuple[str, str]:
+        """
+        Obtiene el perfil del usuario (/me).
+
+        :param access_token: Token de acceso de Graph del usuario.
+        :param default_email: Correo a retornar si el perfil no tiene mail ni userPrincipalName.
+        :return: (nombre_usuario, correo_usuario)
+        :raises httpx.HTTPStatusError: Si Graph responde con error.
+        """
+        response = await self.http_client.get(
+            f"{self.base_url}/me",
+            headers={"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"},
+        )
+        response.raise_for_status()
+        profile = response.json()
+        logger.debug(f"Perfil obtenido: {profile}")
+
+        nombre = profile.get("displayName", "Usuario")
+        correo = profile.get("mail") or profile.get("userPrincipalName", default_email)
+        return nombre, correo
+
+
+# Instancia global
+graph_client = GraphClient()
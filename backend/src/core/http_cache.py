@@ -0,0 +1,39 @@
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+# Política por defecto de las respuestas que no definen la suya
+NO_STORE = "no-cache, no-store, must-revalidate, max-age=0"
+# Se puede guardar, pero siempre se revalida con If-None-Match
+REVALIDATE = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """ETag débil a partir de las partes que definen la versión del recurso."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # La comparación de If-None-Match es débil: se ignora el prefijo W/
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(request: Request, etag: str, cache_control: str = REVALIDATE) -> Optional[Response]:
+    """Retorna una respuesta 304 si el cliente ya tiene esta versión; None en caso contrario."""
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    return None
+
+
+def set_cache_headers(response: Response, etag: Optional[str] = None, cache_control: str = REVALIDATE) -> None:
+    """Define ETag y Cache-Control de una respuesta de la ruta."""
+    if etag:
+        response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
@@ -0,0 +1,319 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import aiomysql
+from aiomysql import Error
+
+from core.background_tasks import task_supervisor
+from core.clock import get_clock
+from core.config import settings
+from core.db_pool import DBConnectionPool
+
+# Cada cuántas reservas se purgan las claves vencidas de la tabla
+PURGE_EVERY_CLAIMS = 500
+# Intervalo de consulta mientras otra instancia procesa la misma clave
+POLL_INTERVAL_SECONDS = 0.5
+
+
+class IdempotencyConflict(Exception):
+    """Otra solicitud con la misma clave sigue en proceso y no terminó a tiempo."""
+
+
+class IdempotencyStore:
+    """
+    Deduplicación de solicitudes por clave de idempotencia (por ejemplo, el id
+    del mensaje de WhatsApp), para que una reentrega del gateway no vuelva a
+    ejecutar el agente ni a insertar pedidos.
+
+    - Una LRU en memoria responde las repeticiones recientes sin ir a MySQL.
+    - La tabla `idempotency_keys` (con vencimiento) cubre reinicios y varias
+      instancias: la primera solicitud reserva la clave con un INSERT y las
+      demás esperan y reciben la respuesta original.
+    - Si la solicitud original falla, la clave se libera y un reintento puede
+      ejecutarse de nuevo.
+    - Una clave en proceso tiene un arriendo corto (`lease_seconds`) que la
+      solicitud renueva mientras corre. Si la instancia se cae a mitad de la
+      solicitud el arriendo vence y la siguiente reentrega toma la clave, en
+      vez de recibir 409 hasta que venza la clave completa.
+
+    Si MySQL no está disponible se sigue funcionando solo con la memoria del proceso.
+    """
+
+    def __init__(self, ttl_seconds: float = 86400, cache_size: int = 10000,
+                 wait_seconds: float = 30.0, use_db: bool = True, lease_seconds: Optional[float] = None):
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self.wait_seconds = wait_seconds
+        # Más largo que la espera de los duplicados: no se toma una clave que aún podría responder
+        self.lease_seconds = lease_seconds if lease_seconds is not None else 4 * wait_seconds
+        self.use_db = use_db
+        self.db_pool = DBConnectionPool()
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._table_ready = False
+        self._claims = 0
+        self._stats = {"executed": 0, "replayed_memory": 0, "replayed_db": 0, "joined_inflight": 0, "conflicts": 0}
+
+    # --- LRU en memoria ---
+
+    def _cache_get(self, cache_key: Tuple[str, str]) -> Optional[Tuple[float, Any]]:
+        with self._cache_lock:
+            entry = self._cache.get(cache_key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._cache[cache_key]
+                return None
+            self._cache.move_to_end(cache_key)
+            return entry
+
+    def _cache_put(self, cache_key: Tuple[str, str], response: Any) -> None:
+        with self._cache_lock:
+            self._cache[cache_key] = (time.monotonic() + self.ttl_seconds, response)
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # --- Tabla de deduplicación ---
+
+    async def _create_tables(self):
+        """Crea la tabla de claves de idempotencia si no existe."""
+        if self._table_ready:
+            return
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    scope VARCHAR(50) NOT NULL,
+                    idem_key VARCHAR(255) NOT NULL,
+                    status VARCHAR(20) NOT NULL,
+                    response JSON,
+                    created_at DATETIME NOT NULL,
+                    expires_at DATETIME NOT NULL,
+                    lease_until DATETIME NULL,
+                    PRIMARY KEY (scope, idem_key),
+                    INDEX (expires_at)
+                )
+                """)
+                await conn.commit()
+        self._table_ready = True
+
+    async def _db_claim(self, scope: str, key: str) -> bool:
+        """
+        Reserva la clave. Retorna True si esta solicitud debe ejecutarse: clave
+        nueva, vencida, o en proceso con el arriendo vencido (la instancia que la
+        tomó se cayó).
+        """
+        await self._create_tables()
+        now = get_clock().db_now()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        takeover = "(expires_at < %s OR (status = 'in_progress' AND lease_until < %s))"
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                # MySQL evalúa cada asignación con los valores ya actualizados: las columnas de la
+                # condición (status, lease_until, expires_at) se asignan al final y en este orden,
+                # para que la condición siga siendo la de la fila original hasta la última asignación
+                await cursor.execute(
+                    f"""
+                    INSERT INTO idempotency_keys
+                        (scope, idem_key, status, response, created_at, expires_at, lease_until)
+                    VALUES (%s, %s, 'in_progress', NULL, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                        response = IF({takeover}, NULL, response),
+                        created_at = IF({takeover}, VALUES(created_at), created_at),
+                        status = IF({takeover}, 'in_progress', status),
+                        lease_until = IF({takeover}, VALUES(lease_until), lease_until),
+                        expires_at = IF(expires_at < %s, VALUES(expires_at), expires_at)
+                    """,
+                    (scope, key, now, expires_at, lease_until, *([now] * 8), now),
+                )
+                await conn.commit()
+                # 1 = insertada, 2 = fila vencida o abandonada reutilizada, 0 = ya existía
+                return cursor.rowcount in (1, 2)
+
+    async def _db_renew(self, scope: str, key: str) -> None:
+        """Extiende el arriendo de una clave en proceso de esta instancia."""
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "UPDATE idempotency_keys SET lease_until = %s "
+                    "WHERE scope = %s AND idem_key = %s AND status = 'in_progress'",
+                    (get_clock().db_now() + timedelta(seconds=self.lease_seconds), scope, key),
+                )
+                await conn.commit()
+
+    async def _renew_lease(self, scope: str, key: str) -> None:
+        """Renueva el arriendo cada tercio de su duración mientras la solicitud corre."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self._db_renew(scope, key)
+            except Exception as e:
+                logging.error("No se pudo renovar la clave de idempotencia %s:%s: %s", scope, key, e)
+
+    async def _db_get(self, scope: str, key: str) -> Optional[Dict[str, Any]]:
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(
+                    "SELECT status, response FROM idempotency_keys WHERE scope = %s AND idem_key = %s",
+                    (scope, key),
+                )
+                return await cursor.fetchone()
+
+    async def _db_complete(self, scope: str, key: str, response: Any) -> None:
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "UPDATE idempotency_keys SET status = 'done', response = %s WHERE scope = %s AND idem_key = %s",
+                    (json.dumps(response, ensure_ascii=False, default=str), scope, key),
+                )
+                await conn.commit()
+
+    async def _db_release(self, scope: str, key: str) -> None:
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "DELETE FROM idempotency_keys WHERE scope = %s AND idem_key = %s AND status = 'in_progress'",
+                    (scope, key),
+                )
+                await conn.commit()
+
+    async def purge_expired(self) -> int:
+        """Elimina las claves vencidas de la tabla. Retorna cuántas se borraron."""
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                try:
+                    await cursor.execute("DELETE FROM idempotency_keys WHERE expires_at < %s LIMIT 5000",
+                                         (get_clock().db_now(),))
+                    await conn.commit()
+                    return cursor.rowcount
+                except Error as err:
+                    logging.error("Error purgando claves de idempotencia: %s", err)
+                    return 0
+
+    async def _wait_for_db_response(self, scope: str, key: str) -> Any:
+        """Espera a que la instancia que reservó la clave guarde su respuesta."""
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            row = await self._db_get(scope, key)
+            if row is None:
+                # La solicitud original falló y liberó la clave
+                raise IdempotencyConflict(f"La solicitud original {scope}:{key} falló; reintente")
+            if row["status"] == "done":
+                response = row["response"]
+                return json.loads(response) if isinstance(response, str) else response
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+        raise IdempotencyConflict(f"La solicitud {scope}:{key} sigue en proceso")
+
+    # --- API ---
+
+    async def run(self, scope: str, key: Optional[str], func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Ejecuta `func` una sola vez por (scope, key) y repite su respuesta en los duplicados.
+
+        :param scope: Endpoint o tipo de operación ("chat", "orders.create", ...).
+        :param key: Clave de idempotencia; sin clave `func` se ejecuta siempre.
+        :param func: Corrutina sin argumentos que produce la respuesta (serializable a JSON).
+        :return: (respuesta, True si es una repetición de la original).
+        :raises IdempotencyConflict: Si la original sigue en proceso tras `wait_seconds` o falló.
+        """
+        if not key:
+            return await func(), False
+        cache_key = (scope, key)
+
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            self._stats["replayed_memory"] += 1
+            return cached[1], True
+
+        # Duplicado concurrente en el mismo proceso: esperar el resultado de la original
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            self._stats["joined_inflight"] += 1
+            try:
+                return await asyncio.wait_for(asyncio.shield(inflight), timeout=self.wait_seconds), True
+            except asyncio.TimeoutError:
+                self._stats["conflicts"] += 1
+                raise IdempotencyConflict(f"La solicitud {scope}:{key} sigue en proceso")
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            claimed = True
+            if self.use_db:
+                try:
+                    claimed = await self._db_claim(scope, key)
+                except Exception as e:
+                    logging.error("Tabla de idempotencia no disponible, se usa solo memoria: %s", e)
+                    claimed = True
+            if not claimed:
+                try:
+                    response = await self._wait_for_db_response(scope, key)
+                except IdempotencyConflict:
+                    self._stats["conflicts"] += 1
+                    raise
+                self._stats["replayed_db"] += 1
+                self._cache_put(cache_key, response)
+                future.set_result(response)
+                return response, True
+
+            renewal = asyncio.create_task(self._renew_lease(scope, key)) if self.use_db else None
+            try:
+                response = await func()
+            except BaseException:
+                if self.use_db:
+                    try:
+                        await self._db_release(scope, key)
+                    except Exception as e:
+                        logging.error("No se pudo liberar la clave de idempotencia %s:%s: %s", scope, key, e)
+                raise
+            finally:
+                if renewal is not None:
+                    renewal.cancel()
+            self._stats["executed"] += 1
+            self._cache_put(cache_key, response)
+            future.set_result(response)
+            if self.use_db:
+                try:
+                    await self._db_complete(scope, key, response)
+                except Exception as e:
+                    logging.error("No se pudo guardar la respuesta idempotente %s:%s: %s", scope, key, e)
+                self._claims += 1
+                if self._claims % PURGE_EVERY_CLAIMS == 0:
+                    task_supervisor.spawn(self.purge_expired(), name="purge_idempotency_keys")
+            return response, False
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e if isinstance(e, Exception) else IdempotencyConflict(str(e)))
+                # Evita el aviso "Future exception was never retrieved" si nadie esperaba
+                future.exception()
+            raise
+        finally:
+            self._inflight.pop(cache_key, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self._stats, "cached_keys": len(self._cache), "inflight": len(self._inflight)}
+
+
+# Instancia global compartida por los endpoints de chat y pedidos
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.idempotency_ttl_seconds,
+    cache_size=settings.idempotency_cache_size,
+    use_db=settings.idempotency_use_db,
+    lease_seconds=settings.idempotency_lease_seconds,
+)
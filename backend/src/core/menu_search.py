@@ -0,0 +1,209 @@
+"""
+Búsqueda léxica sobre el menú (nombre y descripción de `inventory`).
+
+Cada restaurante tiene un índice invertido en memoria con puntaje BM25; el
+nombre pesa más que la descripción. Textos y consultas se normalizan igual:
+sin tildes, en minúsculas y sin palabras vacías ("quiero la gringa" ->
+"gringa"). Un término de la consulta que no está en el vocabulario se
+reemplaza por los términos más parecidos por trigramas ("grinda" ~ "gringa",
+"salchi" ~ "salchipapa").
+
+El índice se carga completo desde MySQL la primera vez y cada
+MENU_SEARCH_TTL_SECONDS (cambios de otras instancias); las escrituras del
+inventario en este proceso lo actualizan producto por producto.
+"""
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from core.config import settings
+
+# Frases equivalentes en las consultas, aplicadas sobre el texto normalizado
+QUERY_ALIASES = ((r"\bpor dos\b", "x2"), (r"\bx 2\b", "x2"))
+STOPWORDS = frozenset({
+    "a", "al", "con", "de", "del", "dame", "el", "en", "la", "las", "lo", "los", "me", "mi", "para",
+    "por", "porfa", "quiero", "regalame", "sin", "su", "un", "una", "unas", "unos", "y",
+})
+NAME_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Similitud mínima (Jaccard de trigramas) para tomar un término parecido del vocabulario
+FUZZY_MIN_SIMILARITY = 0.4
+FUZZY_MAX_TERMS = 3
+# Resultados con menos de esta fracción del mejor puntaje se descartan
+MIN_RELATIVE_SCORE = 0.3
+
+
+def fold(text: Optional[str]) -> str:
+    """Texto sin tildes, en minúsculas y con solo letras, dígitos y espacios ("Ñoño-X2" -> "nono x2")."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    plain = "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", plain).split())
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    folded = fold(text)
+    for pattern, replacement in QUERY_ALIASES:
+        folded = re.sub(pattern, replacement, folded)
+    return [token for token in folded.split() if token not in STOPWORDS]
+
+
+def trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MenuIndex:
+    """Índice BM25 de los productos de un restaurante. No es seguro entre hilos (ver MenuSearch)."""
+
+    def __init__(self):
+        self.items: Dict[str, Dict[str, Any]] = {}
+        self._terms: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def upsert(self, item: Dict[str, Any]) -> None:
+        """Agrega o reemplaza un producto (solo se reindexan sus propios términos)."""
+        product_id = item["id"]
+        self.remove(product_id)
+        terms = Counter({term: NAME_WEIGHT * count for term, count in Counter(tokenize(item.get("name"))).items()})
+        terms.update(tokenize(item.get("descripcion")))
+        self.items[product_id] = dict(item)
+        self._terms[product_id] = terms
+        self._lengths[product_id] = sum(terms.values())
+        self._total_length += self._lengths[product_id]
+        for term, count in terms.items():
+            postings = self._postings.setdefault(term, {})
+            if not postings:
+                for trigram in trigrams(term):
+                    self._trigrams.setdefault(trigram, set()).add(term)
+            postings[product_id] = count
+
+    def remove(self, product_id: str) -> None:
+        terms = self._terms.pop(product_id, None)
+        if terms is None:
+            return
+        del self.items[product_id]
+        self._total_length -= self._lengths.pop(product_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[product_id]
+            if not postings:
+                del self._postings[term]
+                for trigram in trigrams(term):
+                    self._trigrams[trigram].discard(term)
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """El término (peso 1) o, si no está en el menú, los más parecidos con su similitud como peso."""
+        if term in self._postings:
+            return [(term, 1.0)]
+        query = trigrams(term)
+        candidates = set().union(*(self._trigrams.get(trigram, ()) for trigram in query))
+        scored = []
+        for candidate in candidates:
+            similarity = len(query & trigrams(candidate)) / len(query | trigrams(candidate))
+            # Prefijo ("salchi" -> "salchipapa"): los trigramas solos lo castigan por longitud
+            if len(term) >= 3 and candidate.startswith(term):
+                similarity = max(similarity, 0.8)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                scored.append((candidate, similarity))
+        return sorted(scored, key=lambda pair: (-pair[1], pair[0]))[:FUZZY_MAX_TERMS]
+
+    def search(self, query: str, k: int, tipo_producto: Optional[str] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Los `k` productos con mayor puntaje BM25 para la consulta, como
+        (puntaje, producto). Empates: por nombre, para que el resultado sea estable.
+        """
+        if not self.items:
+            return []
+        average_length = self._total_length / len(self.items)
+        scores: Dict[str, float] = {}
+        for term in dict.fromkeys(tokenize(query)):
+            for indexed, weight in self._expand(term):
+                postings = self._postings[indexed]
+                idf = math.log(1 + (len(self.items) - len(postings) + 0.5) / (len(postings) + 0.5))
+                for product_id, count in postings.items():
+                    norm = count + BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[product_id] / average_length)
+                    scores[product_id] = scores.get(product_id, 0.0) + weight * idf * count * (BM25_K1 + 1) / norm
+        ranked = sorted(
+            ((score, self.items[product_id]) for product_id, score in scores.items()
+             if tipo_producto is None or self.items[product_id].get("tipo_producto") == tipo_producto),
+            key=lambda pair: (-pair[0], fold(pair[1].get("name"))),
+        )
+        if not ranked:
+            return []
+        best = ranked[0][0]
+        return [(round(score, 3), item) for score, item in ranked[:k] if score >= best * MIN_RELATIVE_SCORE]
+
+
+class MenuSearch:
+    """
+    Índices por restaurante compartidos por el proceso. Los índices vencidos
+    (o nunca cargados) se reportan con `needs_load` y se reemplazan con `load`.
+    """
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self._indexes: Dict[str, Tuple[float, MenuIndex]] = {}
+        self._lock = threading.Lock()
+
+    def needs_load(self, restaurant_id: str) -> bool:
+        with self._lock:
+            entry = self._indexes.get(restaurant_id)
+            return entry is None or entry[0] <= time.monotonic()
+
+    def load(self, restaurant_id: str, items: Iterable[Dict[str, Any]]) -> None:
+        """Reconstruye el índice del restaurante con todos sus productos."""
+        index = MenuIndex()
+        for item in items:
+            index.upsert(item)
+        with self._lock:
+            self._indexes[restaurant_id] = (time.monotonic() + self.ttl_seconds, index)
+
+    def upsert(self, restaurant_id: str, items: Iterable[Dict[str, Any]]) -> None:
+        """Aplica productos escritos en este proceso (si el índice del restaurante ya existe)."""
+        with self._lock:
+            entry = self._indexes.get(restaurant_id)
+            if entry is not None:
+                for item in items:
+                    current = entry[1].items.get(item["id"], {})
+                    entry[1].upsert({**current, **item})
+
+    def remove(self, restaurant_id: str, product_ids: Iterable[str]) -> None:
+        with self._lock:
+            entry = self._indexes.get(restaurant_id)
+            if entry is not None:
+                for product_id in product_ids:
+                    entry[1].remove(product_id)
+
+    def invalidate(self, restaurant_id: Optional[str] = None) -> None:
+        with self._lock:
+            if restaurant_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(restaurant_id, None)
+
+    def items(self, restaurant_id: str) -> List[Dict[str, Any]]:
+        """Los productos indexados del restaurante (vacío si el índice no está cargado)."""
+        with self._lock:
+            entry = self._indexes.get(restaurant_id)
+            return list(entry[1].items.values()) if entry is not None else []
+
+    def search(self, restaurant_id: str, query: str, k: int,
+               tipo_producto: Optional[str] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        with self._lock:
+            entry = self._indexes.get(restaurant_id)
+            return entry[1].search(query, k, tipo_producto) if entry is not None else []
+
+
+# Índices compartidos por todas las instancias del gestor de inventario en el proceso
+menu_search = MenuSearch(ttl_seconds=settings.menu_search_ttl_seconds)
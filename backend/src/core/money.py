@@ -0,0 +1,47 @@
+"""
+Representación del dinero.
+
+Los precios (`orders.price`, `inventory.price`) y el total de cada línea
+(`orders.line_total`, columna generada price * quantity) se guardan como
+DECIMAL(12,2): los montos y las sumas en SQL (SUM(line_total)) son exactos al
+centavo, sin el redondeo de FLOAT.
+
+Al leer, el pool convierte DECIMAL a float (MONEY_CONVERSIONS) para que los
+pedidos y el menú sigan saliendo como números en JSON (ni orjson ni json.dumps
+serializan Decimal). Los totales se calculan en MySQL, no sumando esos float.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any, Optional
+
+from pymysql.constants import FIELD_TYPE
+from pymysql.converters import decoders
+
+MONEY_SQL_TYPE = "DECIMAL(12,2)"
+# price * quantity con quantity INT: dos dígitos más de holgura
+LINE_TOTAL_SQL = "line_total DECIMAL(14,2) AS (COALESCE(price, 0) * quantity) STORED"
+CENT = Decimal("0.01")
+
+# Decodificadores del pool: iguales a los de PyMySQL salvo DECIMAL -> float
+MONEY_CONVERSIONS = dict(decoders)
+MONEY_CONVERSIONS[FIELD_TYPE.DECIMAL] = float
+MONEY_CONVERSIONS[FIELD_TYPE.NEWDECIMAL] = float
+
+
+def to_money(value: Any) -> Optional[Decimal]:
+    """
+    Monto redondeado al centavo para escribir en una columna DECIMAL
+    (50000 -> Decimal("50000.00")). None se conserva.
+
+    Lanza:
+        ValueError: Si el valor no es un número.
+    """
+    if value is None:
+        return None
+    try:
+        # str(): 0.1 como float no es exactamente 0.1
+        amount = Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"Monto inválido: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Monto inválido: {value!r}")
+    return amount
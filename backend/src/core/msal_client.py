@@ -0,0 +1,210 @@
+"""
+Aplicación MSAL compartida con caché persistente y cifrado.
+
+Antes, `api/auth.py` y `AuthService` creaban cada uno su
+`ConfidentialClientApplication` al importar el módulo. Cada creación hace el
+descubrimiento del authority (GET .well-known/openid-configuration), y cada
+reinicio de la instancia empezaba con el caché de tokens vacío.
+
+Aquí hay una sola aplicación por proceso, creada en el primer uso:
+    - el caché de tokens de MSAL (`SerializableTokenCache`) y el caché HTTP de
+      MSAL (`http_cache`, donde quedan los metadatos del authority) se
+      guardan juntos en un archivo cifrado con Fernet (AES-128-CBC + HMAC),
+    - tras un reinicio se cargan del archivo, así que no se repite el
+      descubrimiento y los tokens siguen disponibles para `acquire_token_silent`.
+
+La clave de cifrado es MSAL_CACHE_KEY (clave Fernet) o, si no se define, una
+derivada de CLIENT_SECRET. Si el archivo no se puede descifrar se empieza con
+un caché vacío.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import msal
+from cryptography.fernet import Fernet, InvalidToken
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def derive_cache_key(secret: str) -> bytes:
+    """Clave Fernet derivada de un secreto existente (por ejemplo CLIENT_SECRET)."""
+    return base64.urlsafe_b64encode(hashlib.sha256(f"msal-cache:{secret}".encode("utf-8")).digest())
+
+
+class EncryptedFileStore:
+    """Blob cifrado en un archivo, con escritura atómica (archivo temporal + rename)."""
+
+    def __init__(self, path: str, key: bytes):
+        self.path = path
+        self._fernet = Fernet(key)
+
+    def load(self) -> Optional[bytes]:
+        try:
+            with open(self.path, "rb") as f:
+                return self._fernet.decrypt(f.read())
+        except FileNotFoundError:
+            return None
+        except InvalidToken:
+            logger.warning("No se pudo descifrar el caché de MSAL en %s; se empieza vacío", self.path)
+            return None
+
+    def save(self, data: bytes) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".msal_cache")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._fernet.encrypt(data))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class MSALClientFactory:
+    """
+    Crea (una sola vez, en el primer uso) la `ConfidentialClientApplication`
+    compartida y persiste sus cachés después de cada adquisición de tokens.
+
+    :param client_id: Id de la aplicación en Entra ID.
+    :param client_credential: Secreto de la aplicación.
+    :param authority: URL del authority (https://login.microsoftonline.com/<tenant>).
+    :param store: Almacén cifrado de los cachés (None: solo memoria).
+    :param http_client: Cliente HTTP para MSAL (None: el de MSAL, basado en requests).
+    :param app_options: Argumentos adicionales para `ConfidentialClientApplication`.
+    """
+
+    def __init__(self, client_id: str, client_credential: str, authority: str,
+                 store: Optional[EncryptedFileStore] = None, http_client: Any = None, **app_options):
+        self.client_id = client_id
+        self.client_credential = client_credential
+        self.authority = authority
+        self.store = store
+        self.http_client = http_client
+        self.app_options = app_options
+        self.token_cache = msal.SerializableTokenCache()
+        self.http_cache: Dict[str, Any] = {}
+        self._app: Optional[msal.ConfidentialClientApplication] = None
+        self._lock = threading.Lock()
+        self._persisted_http_keys: frozenset = frozenset()
+        self._stats: Dict[str, Any] = {"app_created_ms": None, "cache_loaded": False, "cache_saves": 0}
+
+    def _load(self) -> None:
+        data = self.store.load() if self.store is not None else None
+        if not data:
+            return
+        try:
+            payload = json.loads(data)
+            self.token_cache.deserialize(payload["token_cache"])
+            # Contenido autenticado por Fernet: solo lo pudo escribir quien tiene la clave
+            self.http_cache = pickle.loads(base64.b64decode(payload["http_cache"]))
+            self._persisted_http_keys = frozenset(self.http_cache)
+            self._stats["cache_loaded"] = True
+        except Exception as e:
+            logger.warning("Caché de MSAL inválido; se empieza vacío: %s", e)
+            self.token_cache = msal.SerializableTokenCache()
+            self.http_cache = {}
+
+    def get_app(self) -> msal.ConfidentialClientApplication:
+        """Retorna la aplicación compartida; la primera llamada carga los cachés y descubre el authority."""
+        if self._app is not None:
+            return self._app
+        with self._lock:
+            if self._app is None:
+                start = time.perf_counter()
+                self._load()
+                options = dict(self.app_options)
+                if self.http_client is not None:
+                    options["http_client"] = self.http_client
+                self._app = msal.ConfidentialClientApplication(
+                    client_id=self.client_id,
+                    client_credential=self.client_credential,
+                    authority=self.authority,
+                    token_cache=self.token_cache,
+                    http_cache=self.http_cache,
+                    **options,
+                )
+                self._stats["app_created_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                # Guardar los metadatos del authority recién descubiertos
+                self.persist()
+        return self._app
+
+    def persist(self) -> None:
+        """Guarda los cachés si cambiaron desde la última vez."""
+        if self.store is None:
+            return
+        http_keys = frozenset(self.http_cache)
+        if not self.token_cache.has_state_changed and http_keys == self._persisted_http_keys:
+            return
+        payload = json.dumps({
+            "token_cache": self.token_cache.serialize(),
+            "http_cache": base64.b64encode(pickle.dumps(dict(self.http_cache))).decode("ascii"),
+        })
+        try:
+            self.store.save(payload.encode("utf-8"))
+        except OSError as e:
+            logger.error("No se pudo guardar el caché de MSAL: %s", e)
+            return
+        self.token_cache.has_state_changed = False
+        self._persisted_http_keys = http_keys
+        self._stats["cache_saves"] += 1
+
+    def acquire_token_by_authorization_code(self, code: str, scopes: List[str], redirect_uri: str) -> Dict[str, Any]:
+        """Canjea el código de autorización (bloqueante: llamar con asyncio.to_thread)."""
+        result = self.get_app().acquire_token_by_authorization_code(code=code, scopes=scopes, redirect_uri=redirect_uri)
+        self.persist()
+        return result
+
+    def acquire_token_silent(self, scopes: List[str], username: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Token del caché (o renovado con el refresh token) para la cuenta, sin interacción del usuario."""
+        app = self.get_app()
+        accounts = app.get_accounts(username=username)
+        if not accounts:
+            return None
+        result = app.acquire_token_silent(scopes, account=accounts[0])
+        self.persist()
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self._stats, "created": self._app is not None, "http_cache_entries": len(self.http_cache)}
+
+
+_msal_factory: Optional[MSALClientFactory] = None
+_msal_factory_lock = threading.Lock()
+
+
+def get_msal_factory() -> MSALClientFactory:
+    """Fábrica global, configurada con AuthSettings y MSAL_CACHE_PATH / MSAL_CACHE_KEY."""
+    global _msal_factory
+    if _msal_factory is None:
+        with _msal_factory_lock:
+            if _msal_factory is None:
+                from core.auth_config import get_auth_settings
+
+                auth_settings = get_auth_settings()
+                key = settings.msal_cache_key.encode("ascii") if settings.msal_cache_key \
+                    else derive_cache_key(auth_settings.CLIENT_SECRET)
+                store = EncryptedFileStore(settings.msal_cache_path, key) if settings.msal_cache_path else None
+                _msal_factory = MSALClientFactory(
+                    client_id=auth_settings.CLIENT_ID,
+                    client_credential=auth_settings.CLIENT_SECRET,
+                    authority=auth_settings.AUTHORITY,
+                    store=store,
+                )
+    return _msal_factory
+
+
+def get_msal_app() -> msal.ConfidentialClientApplication:
+    """Aplicación MSAL compartida por /auth y AuthService."""
+    return get_msal_factory().get_app()
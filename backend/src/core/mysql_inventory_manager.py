@@ -1,13 +1,90 @@
 import logging
+import threading
+import time
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Iterable, Tuple
 
 import aiomysql
 from aiomysql import Error
 
 from core.config import settings
 from core.db_pool import DBConnectionPool
-from core.utils import current_colombian_time
+from core.clock import get_clock
+from core.change_counters import CHANGE_COUNTERS_DDL, bump_version, get_version
+from core.utils import new_id
+from core.money import MONEY_SQL_TYPE, to_money
+from core.catalog_io import CATALOG_COLUMNS, CATALOG_FIELDS, diff_catalog, price_change_rows
+from core.menu_search import menu_search
+from core.product_matching import ProductMatch, match_product
+
+# Filas por sentencia INSERT ... ON DUPLICATE KEY UPDATE en la carga masiva
+CATALOG_UPSERT_BATCH = 500
+
+
+def new_product_id() -> str:
+    """Id de producto único y ordenado por fecha de alta (UUIDv7), aunque se agreguen varios a la vez."""
+    return new_id("p-")
+
+
+def inventory_version_name(restaurant_id: Optional[str]) -> str:
+    """Nombre del contador de cambios del inventario de un restaurante."""
+    return f"inventory:{restaurant_id}"
+
+
+class InsufficientStock(Exception):
+    """No hay existencias suficientes para reservar la cantidad pedida."""
+
+    def __init__(self, product_id: str, requested: int, available: int):
+        super().__init__(f"Existencias insuficientes de {product_id}: pedidas {requested}, disponibles {available}")
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+
+
+class StockAvailabilityCache:
+    """
+    Existencias por producto de cada restaurante, para pintar el menú
+    ("agotado") sin consultar MySQL en cada turno.
+
+    Las reservas y liberaciones de este proceso se aplican al caché al
+    confirmarse su transacción; los cambios de otras instancias se ven al
+    vencer el TTL.
+    """
+
+    def __init__(self, ttl_seconds: float = 30):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[float, Dict[str, int]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, restaurant_id: str) -> Optional[Dict[str, int]]:
+        with self._lock:
+            entry = self._entries.get(restaurant_id)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return dict(entry[1])
+
+    def put(self, restaurant_id: str, quantities: Dict[str, int]) -> None:
+        with self._lock:
+            self._entries[restaurant_id] = (time.monotonic() + self.ttl_seconds, dict(quantities))
+
+    def apply(self, deltas: Iterable[Tuple[str, int]]) -> None:
+        """Suma a las existencias cacheadas los cambios (product_id, delta) ya confirmados."""
+        with self._lock:
+            for product_id, delta in deltas:
+                for _, quantities in self._entries.values():
+                    if product_id in quantities:
+                        quantities[product_id] += delta
+
+    def invalidate(self, restaurant_id: Optional[str] = None) -> None:
+        with self._lock:
+            if restaurant_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(restaurant_id, None)
+
+
+# Caché compartido por todas las instancias del gestor en el proceso
+stock_availability = StockAvailabilityCache(ttl_seconds=settings.stock_availability_ttl_seconds)
 
 
 class MySQLInventoryManager:
@@ -30,18 +107,22 @@ class MySQLInventoryManager:
             async with conn.cursor() as cursor:
                 try:
                     # Crear tabla de inventario
-                    await cursor.execute("""
+                    await cursor.execute(f"""
                     CREATE TABLE IF NOT EXISTS inventory (
                         id VARCHAR(255) PRIMARY KEY,
                         restaurant_id VARCHAR(255) NOT NULL,
                         name VARCHAR(255) NOT NULL,
                         quantity INT NOT NULL,
                         unit VARCHAR(50) NOT NULL,
-                        price FLOAT,
+                        price {MONEY_SQL_TYPE},
+                        descripcion TEXT,
+                        tipo_producto ENUM('menu', 'adicion') DEFAULT 'menu',
                         last_updated DATETIME NOT NULL,
-                        INDEX (restaurant_id)
+                        INDEX (restaurant_id),
+                        UNIQUE KEY uq_inventory_restaurant_name (restaurant_id, name)
                     )
                     """)
+                    await cursor.execute(CHANGE_COUNTERS_DDL)
                     await conn.commit()
                     logging.info("Inventory table created successfully")
                 except Error as err:
@@ -53,9 +134,10 @@ class MySQLInventoryManager:
         """
         try:
             pool = await self.db_pool.get_pool()
+            now = get_clock().db_now()
             
             product = {
-                "id": f"p-{datetime.strptime(current_colombian_time(), '%Y-%m-%d %H:%M:%S').timestamp()}",
+                "id": new_product_id(),
                 "restaurant_id": restaurant_id,
                 "name": name,
                 "quantity": quantity,
@@ -63,27 +145,32 @@ class MySQLInventoryManager:
                 "price": price,
                 "descripcion": descripcion,
                 "tipo_producto": tipo_producto,
-                "last_updated": datetime.strptime(current_colombian_time(), '%Y-%m-%d %H:%M:%S')
+                "last_updated": now
             }
             
             async with pool.acquire() as conn:
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
                     try:
                         query = """INSERT INTO inventory 
-                                (id, restaurant_id, name, quantity, unit, price, last_updated)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s)"""
+                                (id, restaurant_id, name, quantity, unit, price, descripcion, tipo_producto, last_updated)
+                                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"""
                         values = (
                             product["id"],
                             product["restaurant_id"],
                             product["name"],
                             product["quantity"],
                             product["unit"],
-                            product["price"],
+                            to_money(product["price"]),
+                            product["descripcion"],
+                            product["tipo_producto"],
                             product["last_updated"]
                         )
                         
                         await cursor.execute(query, values)
+                        await bump_version(cursor, inventory_version_name(restaurant_id))
                         await conn.commit()
+                        stock_availability.invalidate(restaurant_id)
+                        menu_search.upsert(restaurant_id, [product])
                         
                         # Convert datetime to isoformat for consistency with the interface
                         product["last_updated"] = product["last_updated"].isoformat()
@@ -98,6 +185,75 @@ class MySQLInventoryManager:
             logging.exception("Error general al agregar producto: %s", e)
             return None
     
+    async def get_inventory_version(self, restaurant_id: str = None) -> Optional[int]:
+        """
+        Retorna el contador de cambios del inventario del restaurante (se incrementa al
+        agregar, actualizar o eliminar productos). None si no se pudo leer.
+        """
+        return await get_version(inventory_version_name(restaurant_id))
+
+    async def reserve_stock(self, cursor, product_id: str, quantity: int) -> int:
+        """
+        Descuenta `quantity` unidades del producto dentro de la transacción del cursor
+        (la misma del INSERT del pedido). El UPDATE condicional es atómico: dos
+        reservas concurrentes no pueden dejar la cantidad por debajo de cero.
+
+        Parámetros:
+            cursor: Cursor de la transacción en curso (sin commit).
+            product_id (str): Id del producto en el inventario.
+            quantity (int): Unidades a reservar.
+
+        Retorna:
+            int: Unidades reservadas; 0 si el producto no está en el inventario
+            (no se controla su stock).
+
+        Lanza:
+            InsufficientStock: Si el producto existe pero no alcanzan las existencias.
+        """
+        if quantity <= 0:
+            return 0
+        await cursor.execute(
+            "UPDATE inventory SET quantity = quantity - %s WHERE id = %s AND quantity >= %s",
+            (quantity, product_id, quantity),
+        )
+        if cursor.rowcount == 1:
+            return quantity
+        await cursor.execute("SELECT quantity FROM inventory WHERE id = %s", (product_id,))
+        row = await cursor.fetchone()
+        if row is None:
+            logging.warning("Producto %s fuera del inventario: se registra sin reservar existencias", product_id)
+            return 0
+        available = row["quantity"] if isinstance(row, dict) else row[0]
+        raise InsufficientStock(product_id, quantity, available)
+
+    async def release_stock(self, cursor, reservations: Dict[str, int]) -> None:
+        """
+        Devuelve al inventario las unidades reservadas {product_id: unidades}
+        dentro de la transacción del cursor (cancelación, eliminación o cambio del pedido).
+        """
+        items = [(units, product_id) for product_id, units in reservations.items() if units > 0]
+        if items:
+            await cursor.executemany("UPDATE inventory SET quantity = quantity + %s WHERE id = %s", items)
+
+    async def get_availability(self, restaurant_id: str) -> Dict[str, int]:
+        """
+        Existencias {product_id: cantidad} del restaurante, desde el caché si está vigente.
+        """
+        cached = stock_availability.get(restaurant_id)
+        if cached is not None:
+            return cached
+        try:
+            pool = await self.db_pool.get_pool()
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("SELECT id, quantity FROM inventory WHERE restaurant_id = %s", (restaurant_id,))
+                    quantities = {product_id: quantity for product_id, quantity in await cursor.fetchall()}
+        except Exception as e:
+            logging.exception("Error al obtener existencias del inventario: %s", e)
+            return {}
+        stock_availability.put(restaurant_id, quantities)
+        return quantities
+
     async def get_inventory(self, restaurant_id: str = None) -> List[Dict[str, Any]]:
         """
         Obtiene el inventario de un restaurante.
@@ -116,6 +272,8 @@ class MySQLInventoryManager:
                         for product in products:
                             product["last_updated"] = product["last_updated"].isoformat()
                         
+                        # Las existencias leídas renuevan el caché de disponibilidad
+                        stock_availability.put(restaurant_id, {product["id"]: product["quantity"] for product in products})
                         return products
                     except Error as err:
                         logging.exception("Error al obtener inventario: %s", err)
@@ -171,6 +329,66 @@ class MySQLInventoryManager:
             logging.exception("Error general al obtener adiciones del inventario: %s", e)
             return []
     
+    async def _load_menu_index(self, restaurant_id: str) -> None:
+        """Carga (o recarga si venció) el índice del menú del restaurante."""
+        if menu_search.needs_load(restaurant_id):
+            products = await self.get_inventory(restaurant_id)
+            # Un error de MySQL retorna []: no dejar el menú vacío hasta el próximo TTL
+            if products:
+                menu_search.load(restaurant_id, products)
+
+    async def search_menu(self, restaurant_id: str, query: str, k: int = 5,
+                          tipo_producto: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Los `k` productos del restaurante que mejor coinciden con `query` por nombre
+        y descripción (ver core.menu_search), con sus existencias actuales y el puntaje.
+
+        Parámetros:
+            restaurant_id (str): ID del restaurante.
+            query (str): Texto del cliente ("la gringa", "go papa por dos").
+            k (int): Máximo de productos retornados.
+            tipo_producto (Optional[str]): "menu" o "adicion" para filtrar.
+
+        Retorna:
+            List[Dict[str, Any]]: Productos ordenados por puntaje (lista vacía si ninguno coincide).
+        """
+        await self._load_menu_index(restaurant_id)
+        results = menu_search.search(restaurant_id, query, k, tipo_producto)
+        if not results:
+            return []
+        availability = await self.get_availability(restaurant_id)
+        return [
+            {**item, "quantity": availability.get(item["id"], item.get("quantity")), "score": score}
+            for score, item in results
+        ]
+
+    async def resolve_product(self, restaurant_id: str, product_name: Optional[str] = None,
+                              product_id: Optional[str] = None) -> Optional[ProductMatch]:
+        """
+        El producto del menú al que se refiere el LLM: primero por id exacto y si
+        no, por nombre idéntico o normalizado (ver core.product_matching). Sin
+        coincidencia por parecido: contra el menú completo, "Go Papa X3" se
+        parecería a la adición "Papa" y se pediría otro producto.
+        Se busca sobre el índice en memoria del menú, sin consultar MySQL si ya
+        está cargado.
+
+        Parámetros:
+            restaurant_id (str): ID del restaurante.
+            product_name (Optional[str]): Nombre como lo escribió el LLM ("Go papa x2").
+            product_id (Optional[str]): ID del producto, si lo envió.
+
+        Retorna:
+            Optional[ProductMatch]: El producto y cómo se resolvió, o None si no hay uno claro.
+        """
+        await self._load_menu_index(restaurant_id)
+        items = menu_search.items(restaurant_id)
+        if product_id:
+            by_id = next((item for item in items if item["id"] == product_id), None)
+            if by_id is not None:
+                kind = "exact" if product_name in (None, by_id.get("name")) else "id"
+                return ProductMatch(by_id, kind, 1.0)
+        return match_product(items, product_name, fuzzy=False)
+
     async def update_product(self, product_id: str, updated_fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Actualiza la información de un producto en el inventario.
@@ -192,7 +410,7 @@ class MySQLInventoryManager:
                         
                         # Update the product with new fields
                         product.update(updated_fields)
-                        product["last_updated"] = datetime.strptime(current_colombian_time(), '%Y-%m-%d %H:%M:%S')
+                        product["last_updated"] = get_clock().db_now()
                         
                         # Prepare the update query
                         fields = [f"{key} = %s" for key in updated_fields.keys()]
@@ -200,12 +418,14 @@ class MySQLInventoryManager:
                         query = f"UPDATE inventory SET {', '.join(fields)} WHERE id = %s"
                         
                         # Prepare values for the query
-                        values = list(updated_fields.values())
+                        values = [to_money(value) if key == "price" else value for key, value in updated_fields.items()]
                         values.append(product["last_updated"])
                         values.append(product_id)
                         
                         await cursor.execute(query, values)
+                        await bump_version(cursor, inventory_version_name(product["restaurant_id"]))
                         await conn.commit()
+                        stock_availability.invalidate(product["restaurant_id"])
                         
                         # Get the updated product
                         query = "SELECT * FROM inventory WHERE id = %s"
@@ -214,6 +434,7 @@ class MySQLInventoryManager:
                         
                         if updated_product:
                             updated_product["last_updated"] = updated_product["last_updated"].isoformat()
+                            menu_search.upsert(updated_product["restaurant_id"], [updated_product])
                         
                         logging.info("Producto actualizado: %s", product_id)
                         return updated_product
@@ -237,10 +458,14 @@ class MySQLInventoryManager:
                     try:
                         query = "DELETE FROM inventory WHERE id = %s AND restaurant_id = %s"
                         await cursor.execute(query, (product_id, restaurant_id))
+                        if cursor.rowcount > 0:
+                            await bump_version(cursor, inventory_version_name(restaurant_id))
                         await conn.commit()
+                        stock_availability.invalidate(restaurant_id)
                         
                         deleted = cursor.rowcount > 0
                         if deleted:
+                            menu_search.remove(restaurant_id, [product_id])
                             logging.info("Producto eliminado: %s", product_id)
                         else:
                             logging.warning("Producto no encontrado para eliminar: %s", product_id)
@@ -254,6 +479,145 @@ class MySQLInventoryManager:
             logging.exception("Error general al eliminar producto: %s", e)
             return False
     
+    async def _upsert_products(self, cursor, restaurant_id: str, products: List[Dict[str, Any]]) -> None:
+        """
+        Escribe los productos con INSERT ... ON DUPLICATE KEY UPDATE de varias filas
+        (CATALOG_UPSERT_BATCH por sentencia) dentro de la transacción del cursor.
+        Un producto existente coincide por id o por (restaurant_id, name).
+        """
+        now = get_clock().db_now()
+        columns = ("id", "restaurant_id", "name") + CATALOG_FIELDS + ("last_updated",)
+        updates = ", ".join(f"{column} = VALUES({column})" for column in CATALOG_FIELDS + ("last_updated",))
+        for start in range(0, len(products), CATALOG_UPSERT_BATCH):
+            batch = products[start:start + CATALOG_UPSERT_BATCH]
+            placeholders = ", ".join(["(" + ", ".join(["%s"] * len(columns)) + ")"] * len(batch))
+            values = []
+            for product in batch:
+                values.extend([product["id"], restaurant_id, product["name"]])
+                values.extend(to_money(product[column]) if column == "price" else product[column]
+                              for column in CATALOG_FIELDS)
+                values.append(now)
+            await cursor.execute(
+                f"INSERT INTO inventory ({', '.join(columns)}) VALUES {placeholders} "
+                f"ON DUPLICATE KEY UPDATE {updates}",
+                values,
+            )
+
+    async def _apply_catalog(self, restaurant_id: str,
+                             build_rows: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+                             dry_run: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Aplica filas de catálogo en una sola transacción: bloquea los productos del
+        restaurante (SELECT ... FOR UPDATE), arma las filas con `build_rows(actuales)`,
+        calcula la diferencia y escribe solo los productos nuevos o cambiados.
+
+        Retorna:
+            Dict con inserted, updated (con los cambios por columna) y unchanged;
+            None si falló la base de datos.
+
+        Lanza:
+            ValueError: Si `build_rows` rechaza las filas (no se escribe nada).
+        """
+        try:
+            pool = await self.db_pool.get_pool()
+
+            async with pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    try:
+                        await cursor.execute(
+                            f"SELECT {', '.join(CATALOG_COLUMNS)} FROM inventory WHERE restaurant_id = %s FOR UPDATE",
+                            (restaurant_id,),
+                        )
+                        existing = await cursor.fetchall()
+                        diff = diff_catalog(existing, build_rows(existing), new_product_id)
+
+                        if diff["upserts"] and not dry_run:
+                            await self._upsert_products(cursor, restaurant_id, diff["upserts"])
+                            await bump_version(cursor, inventory_version_name(restaurant_id))
+                            await conn.commit()
+                            stock_availability.invalidate(restaurant_id)
+                            menu_search.upsert(restaurant_id, diff["upserts"])
+                        else:
+                            # Sin cambios o simulación: libera los bloqueos
+                            await conn.rollback()
+
+                        logging.info(
+                            "Catálogo de %s%s: %d nuevos, %d actualizados, %d sin cambios",
+                            restaurant_id, " (simulación)" if dry_run else "",
+                            len(diff["inserted"]), len(diff["updated"]), len(diff["unchanged"]),
+                        )
+                        return {
+                            "restaurant_id": restaurant_id,
+                            "dry_run": dry_run,
+                            "inserted": diff["inserted"],
+                            "updated": [{"name": name, "changes": diff["changes"][name]} for name in diff["updated"]],
+                            "unchanged": diff["unchanged"],
+                        }
+                    except ValueError:
+                        await conn.rollback()
+                        raise
+                    except Error as err:
+                        await conn.rollback()
+                        logging.exception("Error al cargar el catálogo: %s", err)
+                        return None
+        except ValueError:
+            raise
+        except Exception as e:
+            logging.exception("Error general al cargar el catálogo: %s", e)
+            return None
+
+    async def import_catalog(self, restaurant_id: str, rows: List[Dict[str, Any]],
+                             dry_run: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Carga masiva del catálogo: inserta o actualiza los productos por nombre
+        (clave natural restaurant_id + name) en una sola transacción.
+
+        Parámetros:
+            restaurant_id (str): ID del restaurante.
+            rows (List[Dict]): Filas normalizadas (`core.catalog_io.parse_catalog`).
+                Las columnas ausentes conservan su valor en los productos existentes.
+            dry_run (bool): Solo calcula la diferencia, sin escribir.
+
+        Retorna:
+            Dict con los productos insertados, actualizados y sin cambios; None si hubo un error.
+        """
+        return await self._apply_catalog(restaurant_id, lambda existing: rows, dry_run)
+
+    async def bulk_update_prices(self, restaurant_id: str, items: Optional[List[Dict[str, Any]]] = None,
+                                 percent: Optional[float] = None, round_to: Optional[float] = None,
+                                 tipo_producto: Optional[str] = None,
+                                 dry_run: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Cambio masivo de precios (y existencias) en una sola transacción, con la
+        misma diferencia que `import_catalog`. Ver `core.catalog_io.price_change_rows`.
+
+        Lanza:
+            ValueError: Si algún producto de `items` no existe.
+        """
+        return await self._apply_catalog(
+            restaurant_id,
+            lambda existing: price_change_rows(existing, items, percent, round_to, tipo_producto),
+            dry_run,
+        )
+
+    async def export_catalog(self, restaurant_id: str) -> List[Dict[str, Any]]:
+        """
+        Productos del restaurante con las columnas del catálogo, para exportarlos.
+        """
+        try:
+            pool = await self.db_pool.get_pool()
+            async with pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(
+                        f"SELECT {', '.join(CATALOG_COLUMNS)} FROM inventory WHERE restaurant_id = %s "
+                        "ORDER BY tipo_producto, name",
+                        (restaurant_id,),
+                    )
+                    return list(await cursor.fetchall())
+        except Exception as e:
+            logging.exception("Error al exportar el catálogo: %s", e)
+            return []
+
     async def close(self):
         """Cierra el pool de conexiones."""
         if self.db_pool:
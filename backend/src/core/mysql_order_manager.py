@@ -1,16 +1,34 @@
 import logging
 import json
-import uuid
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 
 import aiomysql
 from aiomysql import Error
 
 from core.config import settings
 from core.db_pool import DBConnectionPool
-from core.utils import current_colombian_time
-import pdb
+from core.clock import get_clock
+from core.change_counters import CHANGE_COUNTERS_DDL, bump_version, get_version
+from core.partitioning import default_partition_clause
+from core.money import LINE_TOTAL_SQL, MONEY_SQL_TYPE, to_money
+from core.product_matching import match_product, product_match_stats
+from core.mysql_inventory_manager import (
+    InsufficientStock, MySQLInventoryManager, inventory_version_name, stock_availability,
+)
+
+# Contador de cambios de la tabla orders (ETag de /orders/today)
+ORDERS_VERSION = "orders"
+
+# Estados en los que el pedido ya no retiene existencias
+CANCELLED_STATES = ("cancelado",)
+# Estados en los que aún se puede modificar un producto del pedido
+EDITABLE_STATES = ("pendiente", "en preparacion", "en preparación")
+# Estado que marca el fin de la preparación (completed_at, reportes de tiempos)
+COMPLETED_STATE = "completado"
+# Las filas de un mismo enum_order_table se crean en la misma sesión: acotar la
+# búsqueda a este margen antes del último pedido limita las particiones leídas
+ORDER_GROUP_WINDOW = timedelta(days=1)
 
 class MySQLOrderManager:
     def __init__(self):
@@ -19,6 +37,7 @@ class MySQLOrderManager:
         Usa el pool de conexiones compartido en lugar de crear uno propio.
         """
         self.db_pool = DBConnectionPool()
+        self.inventory_manager = MySQLInventoryManager()
         logging.info(
             "Gestor de pedidos MySQL inicializado. Base de datos: '%s'",
             settings.db_database
@@ -32,55 +51,158 @@ class MySQLOrderManager:
             async with conn.cursor() as cursor:
                 try:
                     # Crear tabla de pedidos
-                    await cursor.execute("""
+                    # Particionada por mes (core.partitioning): la clave primaria incluye created_at
+                    await cursor.execute(f"""
                     CREATE TABLE IF NOT EXISTS orders (
-                        id VARCHAR(255) PRIMARY KEY,
+                        id BIGINT AUTO_INCREMENT,
                         enum_order_table VARCHAR(255) NOT NULL,
                         product_id VARCHAR(255) NOT NULL,
                         product_name VARCHAR(255) NOT NULL,
                         quantity INT NOT NULL,
-                        price FLOAT DEFAULT 0,
+                        price {MONEY_SQL_TYPE} NOT NULL DEFAULT 0,
+                        {LINE_TOTAL_SQL},
                         details TEXT,
                         state VARCHAR(50) DEFAULT 'pendiente',
                         address VARCHAR(255) NOT NULL,
                         user_name VARCHAR(255),
                         user_id VARCHAR(255),
                         restaurant_id VARCHAR(255) DEFAULT 'go_papa',
+                        reserved_quantity INT NOT NULL DEFAULT 0,
+                        observaciones TEXT,
+                        adicion TEXT,
                         created_at DATETIME NOT NULL,
                         updated_at DATETIME NOT NULL,
+                        completed_at DATETIME NULL,
+                        PRIMARY KEY (id, created_at),
                         INDEX (enum_order_table),
                         INDEX (address),
                         INDEX (state),
                         INDEX (created_at),
-                        INDEX (user_id)
-                    )
+                        INDEX (user_id),
+                        INDEX ix_orders_updated (updated_at, id)
+                    ) {default_partition_clause("created_at")}
                     """)
+                    await cursor.execute(CHANGE_COUNTERS_DDL)
                     await conn.commit()
                     logging.info("Orders table created successfully")
                 except Error as err:
                     logging.error(f"Error creating tables: {err}")
     
+    async def _release_reservations(self, cursor, where: str, params: tuple) -> List[Tuple[str, int]]:
+        """
+        Devuelve al inventario lo reservado por los pedidos que cumplen `where` y deja
+        su reserved_quantity en 0, dentro de la transacción del cursor (DictCursor).
+        Retorna los cambios (product_id, +unidades) para el caché de existencias.
+        """
+        await cursor.execute(
+            f"SELECT product_id, reserved_quantity, restaurant_id FROM orders "
+            f"WHERE {where} AND reserved_quantity > 0 FOR UPDATE",
+            params,
+        )
+        rows = await cursor.fetchall()
+        if not rows:
+            return []
+        reservations: Dict[str, int] = {}
+        for row in rows:
+            reservations[row["product_id"]] = reservations.get(row["product_id"], 0) + row["reserved_quantity"]
+        await self.inventory_manager.release_stock(cursor, reservations)
+        await cursor.execute(f"UPDATE orders SET reserved_quantity = 0 WHERE {where} AND reserved_quantity > 0", params)
+        for restaurant_id in sorted({row["restaurant_id"] for row in rows}):
+            await bump_version(cursor, inventory_version_name(restaurant_id))
+        return list(reservations.items())
+
+    async def _rebalance_reservation(self, cursor, product_order: Dict[str, Any], new_product_id: str,
+                                     new_quantity: int) -> List[Tuple[str, int]]:
+        """
+        Ajusta la reserva de una fila del pedido a su nuevo producto/cantidad dentro de
+        la transacción del cursor. Actualiza product_order["reserved_quantity"] y
+        retorna los cambios (product_id, delta) para el caché de existencias.
+
+        Lanza:
+            InsufficientStock: Si no alcanzan las existencias para el aumento.
+        """
+        old_product_id = product_order["product_id"]
+        old_reserved = int(product_order.get("reserved_quantity") or 0)
+        deltas = []
+        if new_product_id == old_product_id:
+            extra = new_quantity - old_reserved
+            if extra > 0:
+                reserved = await self.inventory_manager.reserve_stock(cursor, new_product_id, extra)
+                # Producto sin control de stock: la reserva anterior queda como estaba
+                new_reserved = old_reserved + reserved
+            else:
+                await self.inventory_manager.release_stock(cursor, {old_product_id: -extra})
+                new_reserved = new_quantity
+            deltas.append((new_product_id, old_reserved - new_reserved))
+        else:
+            await self.inventory_manager.release_stock(cursor, {old_product_id: old_reserved})
+            new_reserved = await self.inventory_manager.reserve_stock(cursor, new_product_id, new_quantity)
+            deltas += [(old_product_id, old_reserved), (new_product_id, -new_reserved)]
+        if new_reserved != old_reserved:
+            await bump_version(cursor, inventory_version_name(product_order.get("restaurant_id") or "go_papa"))
+        product_order["reserved_quantity"] = new_reserved
+        return deltas
+
+    async def _match_order_product(self, orders_in_group: List[Dict[str, Any]],
+                                   product_name: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        La fila del pedido a la que se refiere `product_name` y cómo se resolvió
+        ("exact", "id", "normalized", "fuzzy", "inventory_id" o "missing").
+
+        Si el nombre no coincide con ninguna fila, se resuelve contra el menú del
+        restaurante y se busca la fila con ese product_id.
+        """
+        match = match_product(orders_in_group, product_name, name_key="product_name", id_key="product_id")
+        if match:
+            return match.item, match.kind
+        restaurant_id = orders_in_group[0].get("restaurant_id") or "go_papa"
+        resolved = await self.inventory_manager.resolve_product(restaurant_id, product_name, product_name)
+        if resolved:
+            rows = [order for order in orders_in_group if order.get("product_id") == resolved.item["id"]]
+            if len(rows) == 1:
+                return rows[0], "inventory_id"
+        return None, "missing"
+
     async def create_order(self, order: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Crea una nueva orden en la base de datos."""
+        """
+        Crea una nueva orden en la base de datos.
+
+        En la misma transacción del INSERT reserva las existencias del producto
+        (UPDATE condicional sobre inventory), así que nunca se vende más de lo
+        que hay aunque lleguen muchos pedidos a la vez.
+
+        Lanza:
+            InsufficientStock: Si el producto está en el inventario y no alcanzan sus existencias.
+        """
         try:
-            # Asignar fecha de creación si no existe
-            if "created_at" not in order:
-                # Usar la hora de Colombia en lugar de datetime.now()
-                order["created_at"] = current_colombian_time()
-            
-            # Convertir fechas ISO a objetos datetime para MySQL
-            created_at = datetime.strptime(order["created_at"].replace('Z', '+00:00'), '%Y-%m-%d %H:%M:%S') if 'T' not in order["created_at"] else datetime.fromisoformat(order["created_at"].replace('Z', '+00:00'))
             # Usar la hora de Colombia en lugar de datetime.now()
-            updated_at = datetime.strptime(current_colombian_time(), '%Y-%m-%d %H:%M:%S')
+            clock = get_clock()
+            updated_at = clock.db_now()
+            
+            # Asignar fecha de creación si no existe; las fechas recibidas (ISO o
+            # 'YYYY-MM-DD HH:MM:SS') se normalizan a hora local de Bogotá
+            if order.get("created_at"):
+                created_at = order["created_at"]
+                if isinstance(created_at, str):
+                    created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+                if created_at.tzinfo is not None:
+                    created_at = clock.localize(created_at).replace(tzinfo=None)
+            else:
+                created_at = updated_at
             
             pool = await self.db_pool.get_pool()
             async with pool.acquire() as conn:
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
                     try:
+                        # Reservar existencias antes del INSERT (bloquea solo la fila del producto)
+                        reserved_quantity = await self.inventory_manager.reserve_stock(
+                            cursor, order.get("product_id"), int(order.get("quantity") or 0)
+                        )
+                        
                         # Preparar los campos y valores para la inserción
                         fields = ["enum_order_table", "product_id", "product_name", 
                                 "quantity", "state", "address", "user_name", "user_id",
-                                "created_at", "updated_at"]
+                                "reserved_quantity", "created_at", "updated_at"]
                         
                         # Agregar campos opcionales si existen
                         if "price" in order:
@@ -103,13 +225,22 @@ class MySQLOrderManager:
                                 values.append(created_at)
                             elif field == "updated_at":
                                 values.append(updated_at)
+                            elif field == "reserved_quantity":
+                                values.append(reserved_quantity)
+                            elif field == "price":
+                                values.append(to_money(order["price"]) or 0)
                             else:
                                 values.append(order.get(field, None))
                         
                         # Ejecutar la inserción
                         query = f"INSERT INTO orders ({fields_str}) VALUES ({placeholders})"
                         await cursor.execute(query, values)
+                        # Contadores en el orden de change_counters: inventario antes que orders
+                        if reserved_quantity:
+                            await bump_version(cursor, inventory_version_name(order.get("restaurant_id", "go_papa")))
+                        await bump_version(cursor, ORDERS_VERSION)
                         await conn.commit()
+                        stock_availability.apply([(order.get("product_id"), -reserved_quantity)])
                         
                         # Recuperar el ID auto-incrementado
                         order_id = cursor.lastrowid
@@ -120,14 +251,27 @@ class MySQLOrderManager:
                         
                         logging.info("Pedido creado con id: %s", created_order.get("id"))
                         return created_order
+                    except InsufficientStock as err:
+                        await conn.rollback()
+                        logging.warning("Pedido rechazado: %s", err)
+                        raise
                     except Error as err:
                         await conn.rollback()
                         logging.exception("Error al crear el pedido: %s", err)
                         return None
+        except InsufficientStock:
+            raise
         except Exception as e:
             logging.exception("Error general al crear orden: %s", e)
             return None
     
+    async def get_orders_version(self) -> Optional[int]:
+        """
+        Retorna el contador de cambios de la tabla orders (se incrementa en cada escritura).
+        None si no se pudo leer.
+        """
+        return await get_version(ORDERS_VERSION)
+
     async def get_order(self, order_id: str, partition_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Recupera un pedido a partir de su ID.
@@ -199,10 +343,8 @@ class MySQLOrderManager:
                         # Forzar commit para asegurar datos actualizados
                         await conn.commit()
                         
-                        # Obtener la fecha actual (solo la parte de la fecha, sin la hora)
-                        today_str = current_colombian_time().split()[0]  # Obtener solo la fecha (YYYY-MM-DD)
-                        today = datetime.strptime(today_str, '%Y-%m-%d').date()
-                        today_start = datetime.combine(today, datetime.min.time())
+                        # Inicio del día actual en hora de Bogotá
+                        today_start = get_clock().day_start()
                         
                         # Obtener el último pedido para el usuario del día actual
                         await cursor.execute(
@@ -225,8 +367,8 @@ class MySQLOrderManager:
                         enum_order_table_str = str(enum_order_table)
                         logging.info(f"Buscando pedidos con enum_order_table: {enum_order_table_str} (tipo: {type(enum_order_table_str)})")
                         await cursor.execute(
-                            "SELECT * FROM orders WHERE enum_order_table = %s ORDER BY created_at ASC", 
-                            (enum_order_table_str,)
+                            "SELECT * FROM orders WHERE enum_order_table = %s AND created_at >= %s ORDER BY created_at ASC", 
+                            (enum_order_table_str, latest_order["created_at"] - ORDER_GROUP_WINDOW)
                         )
                         orders_in_group = await cursor.fetchall()
                         
@@ -272,7 +414,7 @@ class MySQLOrderManager:
     
     async def get_today_orders_not_paid(self) -> Dict[str, Any]:
         """
-        Retorna todos los pedidos creados el día actual (UTC) cuyo estado sea distinto de 'pagado',
+        Retorna todos los pedidos creados el día actual (hora de Bogotá) cuyo estado sea distinto de 'pagado',
         agrupando en el campo 'products' todos los productos que comparten el mismo 'enum_order_table'.
 
         Retorna:
@@ -311,12 +453,27 @@ class MySQLOrderManager:
                     await conn.begin()
                     
                     async with conn.cursor(aiomysql.DictCursor) as cursor:
-                        # Obtener la fecha actual en formato UTC
-                        today = datetime.now().date()
-                        today_start = datetime.combine(today, datetime.min.time())
-                        today_end = datetime.combine(today, datetime.max.time())
+                        # Límites del día actual en hora de Bogotá
+                        today_start, today_end = get_clock().day_bounds()
+                        
+                        # Totales del tablero en una sola agregación: el estado de cada pedido
+                        # es el de su fila más reciente y las ventas suman line_total (DECIMAL)
+                        await cursor.execute("""
+                            SELECT COUNT(*) AS total_orders,
+                                   COALESCE(SUM(state = 'pendiente'), 0) AS pending_orders,
+                                   COALESCE(SUM(state = 'completado'), 0) AS complete_orders,
+                                   COALESCE(SUM(CASE WHEN state = 'completado' THEN order_total END), 0) AS total_sales
+                            FROM (
+                                SELECT SUM(line_total) AS order_total,
+                                       SUBSTRING_INDEX(GROUP_CONCAT(state ORDER BY created_at DESC, id DESC SEPARATOR ','), ',', 1) AS state
+                                FROM orders
+                                WHERE created_at BETWEEN %s AND %s
+                                AND state != 'pagado'
+                                GROUP BY enum_order_table
+                            ) AS today_orders
+                        """, (today_start, today_end))
+                        stats = await cursor.fetchone()
                         
-                        # Obtener todos los pedidos y procesarlos en memoria
                         await cursor.execute("""
                             SELECT * FROM orders 
                             WHERE created_at BETWEEN %s AND %s 
@@ -326,78 +483,47 @@ class MySQLOrderManager:
                         
                         all_orders = await cursor.fetchall()
                         
-                        # Commit la transacción explícitamente
+                        # Commit la transacción explícitamente (ambas lecturas ven la misma instantánea)
                         await conn.commit()
                         
-                        # Procesar los resultados en memoria para evitar más consultas
-                        orders_by_group = {}
-                        
                         # Agrupar pedidos por enum_order_table
+                        orders_by_group = {}
                         for order in all_orders:
-                            enum_order_table = order['enum_order_table']
-                            if enum_order_table not in orders_by_group:
-                                orders_by_group[enum_order_table] = []
-                            orders_by_group[enum_order_table].append(order)
-                        
-                        # Estadísticas
-                        total_orders = len(orders_by_group)
-                        pending_orders = 0
-                        complete_orders = 0
-                        total_sales = 0.0
+                            orders_by_group.setdefault(order['enum_order_table'], []).append(order)
                         
                         # Construir la lista de pedidos consolidados
                         orders_list = []
                         
                         for enum_order_table, orders_in_group in orders_by_group.items():
-                            if not orders_in_group:
-                                continue
-                            
                             first_order = orders_in_group[0]
                             last_order = orders_in_group[-1]
                             
-                            consolidated_order = {
+                            orders_list.append({
                                 "id": enum_order_table,
                                 "table_id": first_order.get("address", ""),
                                 "customer_name": first_order.get("user_name", ""),
-                                "products": [],
+                                "products": [
+                                    {
+                                        "name": order.get("product_name", ""),
+                                        "quantity": order.get("quantity", 0),
+                                        "price": order.get("price", 0.0),
+                                        "observations": order.get("observaciones", order.get("details", "")),
+                                        "adicion": order.get("adicion", "")
+                                    }
+                                    for order in orders_in_group
+                                ],
                                 "created_at": first_order["created_at"].isoformat() if isinstance(first_order["created_at"], datetime) else first_order["created_at"],
                                 "updated_at": last_order["updated_at"].isoformat() if isinstance(last_order["updated_at"], datetime) else last_order["updated_at"],
                                 "state": last_order.get("state", "pendiente")
-                            }
-                            
-                            # Agregar productos al pedido consolidado
-                            order_total = 0.0
-                            for order in orders_in_group:
-                                product_price = order.get("price", 0.0)
-                                product_quantity = order.get("quantity", 0)
-                                product_total = product_price * product_quantity
-                                
-                                product = {
-                                    "name": order.get("product_name", ""),
-                                    "quantity": product_quantity,
-                                    "price": product_price,
-                                    "observations": order.get("observaciones", order.get("details", "")),
-                                    "adicion": order.get("adicion", "")
-                                }
-                                consolidated_order["products"].append(product)
-                                order_total += product_total
-                            
-                            # Actualizar estadísticas
-                            if consolidated_order["state"] == "pendiente":
-                                pending_orders += 1
-                            elif consolidated_order["state"] == "completado":
-                                complete_orders += 1
-                                total_sales += order_total
-                            
-                            orders_list.append(consolidated_order)
+                            })
                         
                         # Construir el resultado final
                         result = {
                             "stats": {
-                                "total_orders": total_orders,
-                                "pending_orders": pending_orders,
-                                "complete_orders": complete_orders,
-                                "total_sales": total_sales
+                                "total_orders": int(stats["total_orders"]),
+                                "pending_orders": int(stats["pending_orders"]),
+                                "complete_orders": int(stats["complete_orders"]),
+                                "total_sales": float(stats["total_sales"])
                             },
                             "orders": orders_list
                         }
@@ -433,13 +559,23 @@ class MySQLOrderManager:
                         # Update only orders that are not in 'terminado' state
                         update_query = """
                         UPDATE orders 
-                        SET state = %s, updated_at = %s 
+                        SET state = %s, updated_at = %s, completed_at = COALESCE(completed_at, %s)
                         WHERE user_id = %s AND state != 'terminado'
                         """
                         
-                        now = datetime.now()
-                        await cursor.execute(update_query, (new_state, now, user_id))
+                        now = get_clock().db_now()
+                        released = []
+                        if new_state in CANCELLED_STATES:
+                            # Return reserved stock of the cancelled orders to the inventory
+                            released = await self._release_reservations(
+                                cursor, "user_id = %s AND state != 'terminado'", (user_id,)
+                            )
+                        # completed_at guarda la primera vez que el pedido pasó a completado
+                        completed_at = now if new_state == COMPLETED_STATE else None
+                        await cursor.execute(update_query, (new_state, now, completed_at, user_id))
+                        await bump_version(cursor, ORDERS_VERSION)
                         await conn.commit()
+                        stock_availability.apply(released)
                         
                         # Fetch the updated orders
                         await cursor.execute("SELECT * FROM orders WHERE user_id = %s", (user_id,))
@@ -459,6 +595,7 @@ class MySQLOrderManager:
                             logging.warning("No orders found for user: %s", user_id)
                             return None
                     except Error as err:
+                        await conn.rollback()
                         logging.exception("Error updating orders for user %s: %s", user_id, err)
                         return None
         except Exception as e:
@@ -482,9 +619,8 @@ class MySQLOrderManager:
             async with pool.acquire() as conn:
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
                     try:
-                        # Obtener la fecha actual (solo la parte de la fecha, sin la hora)
-                        today = datetime.now().date()
-                        today_start = datetime.combine(today, datetime.min.time())
+                        # Inicio del día actual en hora de Bogotá
+                        today_start = get_clock().day_start()
                         
                         # Get the latest order with the most recent enum_order_table
                         query = """
@@ -632,13 +768,21 @@ class MySQLOrderManager:
                             logging.warning("No se encontraron pedidos con enum_order_table: %s", enum_order_table)
                             return None
                         
-                        # Actualizar el estado de todos los pedidos con el mismo enum_order_table
-                        now = datetime.now()
+                        # Actualizar el estado de todos los pedidos con el mismo enum_order_table;
+                        # al cancelar, las existencias reservadas vuelven al inventario
+                        now = get_clock().db_now()
+                        released = []
+                        if state in CANCELLED_STATES:
+                            released = await self._release_reservations(cursor, "enum_order_table = %s", (enum_order_table,))
+                        # completed_at guarda la primera vez que el pedido pasó a completado
                         await cursor.execute(
-                            "UPDATE orders SET state = %s, updated_at = %s WHERE enum_order_table = %s",
-                            (state, now, enum_order_table)
+                            "UPDATE orders SET state = %s, updated_at = %s, completed_at = COALESCE(completed_at, %s) "
+                            "WHERE enum_order_table = %s",
+                            (state, now, now if state == COMPLETED_STATE else None, enum_order_table)
                         )
+                        await bump_version(cursor, ORDERS_VERSION)
                         await conn.commit()
+                        stock_availability.apply(released)
                         
                         # Obtener todos los pedidos actualizados
                         await cursor.execute(
@@ -670,8 +814,7 @@ class MySQLOrderManager:
                         for order in orders_in_group:
                             product_price = float(order.get("price", 0.0))
                             product_quantity = int(order.get("quantity", 0))
-                            product_total = product_price * product_quantity
-                            order_total += product_total
+                            order_total += order.get("line_total") or 0.0
                             
                             product = {
                                 "name": order.get("product_name", ""),
@@ -688,6 +831,7 @@ class MySQLOrderManager:
                         return consolidated_order
                         
                     except Error as err:
+                        await conn.rollback()
                         logging.exception("Error al actualizar el estado de los pedidos con enum_order_table %s: %s", enum_order_table, err)
                         return None
         except Exception as e:
@@ -709,22 +853,25 @@ class MySQLOrderManager:
             pool = await self.db_pool.get_pool()
             
             async with pool.acquire() as conn:
-                async with conn.cursor() as cursor:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
                     try:
                         # Verificar si el pedido existe
-                        await cursor.execute("SELECT COUNT(*) FROM orders WHERE enum_order_table = %s", (enum_order_table,))
+                        await cursor.execute("SELECT COUNT(*) AS count FROM orders WHERE enum_order_table = %s", (enum_order_table,))
                         result = await cursor.fetchone()
-                        count = result[0]
+                        count = result["count"]
                         
                         if count == 0:
                             logging.warning(f"Intentando eliminar un pedido que no existe: {enum_order_table}")
                             return False
                         
-                        # Eliminar todos los productos asociados a este pedido
+                        # Devolver las existencias reservadas y eliminar todos los productos del pedido
+                        released = await self._release_reservations(cursor, "enum_order_table = %s", (enum_order_table,))
                         await cursor.execute("DELETE FROM orders WHERE enum_order_table = %s", (enum_order_table,))
+                        deleted_rows = cursor.rowcount
+                        await bump_version(cursor, ORDERS_VERSION)
                         await conn.commit()
+                        stock_availability.apply(released)
                         
-                        deleted_rows = cursor.rowcount
                         logging.info(f"Pedido eliminado: {enum_order_table}, {deleted_rows} productos eliminados")
                         
                         return deleted_rows > 0
@@ -754,7 +901,8 @@ class MySQLOrderManager:
         
         Parámetros:
             enum_order_table (str): Identificador del pedido a actualizar.
-            product_name (str): Nombre del producto a actualizar.
+            product_name (str): Nombre (o ID) del producto a actualizar; no importan tildes,
+                mayúsculas ni el orden de las palabras ("Go papa x2" = "Go Papa X2").
             updates (Dict[str, Any]): Diccionario con los campos a actualizar, puede incluir:
                 - quantity (int): Nueva cantidad del producto.
                 - details (str): Nuevas observaciones para el producto.
@@ -772,14 +920,17 @@ class MySQLOrderManager:
             async with pool.acquire() as conn:
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
                     try:
-                        # Verificar si existen pedidos con ese enum_order_table
+                        # Solo las columnas para ubicar la fila y reajustar su reserva
                         await cursor.execute(
-                            "SELECT * FROM orders WHERE enum_order_table = %s ORDER BY created_at ASC",
+                            "SELECT id, created_at, product_id, product_name, quantity, reserved_quantity, "
+                            "restaurant_id, state FROM orders WHERE enum_order_table = %s "
+                            "ORDER BY created_at ASC FOR UPDATE",
                             (enum_order_table,)
                         )
                         orders_in_group = await cursor.fetchall()
                         
                         if not orders_in_group:
+                            await conn.rollback()
                             logging.warning("No se encontraron pedidos con enum_order_table: %s", enum_order_table)
                             return None
                         
@@ -787,33 +938,36 @@ class MySQLOrderManager:
                         last_order = orders_in_group[-1]
                         current_state = last_order.get("state", "")
                         
-                        if current_state not in ["pendiente", "en preparacion", "en preparación"]:
+                        if current_state not in EDITABLE_STATES:
+                            await conn.rollback()
                             logging.warning(
                                 "No se puede actualizar el pedido %s porque su estado actual es '%s'", 
                                 enum_order_table, current_state
                             )
                             return None
                         
-                        # Buscar el producto específico a actualizar
-                        product_order = None
-                        for order in orders_in_group:
-                            if order.get("product_name") == product_name:
-                                product_order = order
-                                break
+                        # Buscar el producto: id, nombre normalizado o parecido, o el id del inventario
+                        product_order, match_kind = await self._match_order_product(orders_in_group, product_name)
+                        product_match_stats.record("update_order_product", match_kind)
                         
                         if not product_order:
+                            # Liberar los bloqueos del FOR UPDATE y devolver la conexión limpia al pool
+                            await conn.rollback()
                             logging.warning(
                                 "No se encontró el producto '%s' en el pedido %s", 
                                 product_name, enum_order_table
                             )
                             return None
+                        if match_kind != "exact":
+                            logging.info("Producto '%s' resuelto como '%s' (%s) en el pedido %s",
+                                         product_name, product_order["product_name"], match_kind, enum_order_table)
                         
                         # Preparar los campos a actualizar
                         update_fields = []
                         update_values = []
                         
                         # Actualizar la hora de actualización usando la hora colombiana
-                        now = datetime.strptime(current_colombian_time(), '%Y-%m-%d %H:%M:%S')
+                        now = get_clock().db_now()
                         update_fields.append("updated_at = %s")
                         update_values.append(now)
                         
@@ -835,7 +989,7 @@ class MySQLOrderManager:
                         # Actualizar precio si se proporciona
                         if "price" in updates:
                             update_fields.append("price = %s")
-                            update_values.append(updates["price"])
+                            update_values.append(to_money(updates["price"]) or 0)
                         
                         # Cambiar el nombre del producto si se proporciona
                         if "new_product_name" in updates:
@@ -852,19 +1006,34 @@ class MySQLOrderManager:
                             logging.warning("No se proporcionaron campos para actualizar en el pedido %s", enum_order_table)
                             return None
                         
-                        # Construir la consulta de actualización
-                        update_query = f"UPDATE orders SET {', '.join(update_fields)} WHERE id = %s"
-                        update_values.append(product_order["id"])
+                        # Reajustar la reserva si cambia la cantidad o el producto
+                        stock_deltas = []
+                        if "quantity" in updates or "new_product_id" in updates:
+                            stock_deltas = await self._rebalance_reservation(
+                                cursor, product_order,
+                                updates.get("new_product_id", product_order["product_id"]),
+                                int(updates.get("quantity", product_order["quantity"])),
+                            )
+                            update_fields.append("reserved_quantity = %s")
+                            update_values.append(product_order["reserved_quantity"])
+                        
+                        # Una sola fila por su clave primaria completa (id, created_at): poda la partición
+                        update_query = f"UPDATE orders SET {', '.join(update_fields)} WHERE id = %s AND created_at = %s"
+                        update_values += [product_order["id"], product_order["created_at"]]
                         
                         # Ejecutar la actualización
                         await cursor.execute(update_query, update_values)
-                        await conn.commit()
                         
-                        # Verificar si la actualización fue exitosa
+                        # Verificar si la actualización fue exitosa (antes de bump_version, que cambia rowcount)
                         if cursor.rowcount == 0:
+                            await conn.rollback()
                             logging.warning("No se pudo actualizar el producto %s en el pedido %s", product_name, enum_order_table)
                             return None
                         
+                        await bump_version(cursor, ORDERS_VERSION)
+                        await conn.commit()
+                        stock_availability.apply(stock_deltas)
+                        
                         # Obtener todos los pedidos actualizados
                         await cursor.execute(
                             "SELECT * FROM orders WHERE enum_order_table = %s ORDER BY created_at ASC",
@@ -900,10 +1069,16 @@ class MySQLOrderManager:
                         logging.info("Producto %s actualizado en el pedido %s", product_name, enum_order_table)
                         return consolidated_order
                         
+                    except InsufficientStock as err:
+                        await conn.rollback()
+                        logging.warning("Cambio rechazado en el pedido %s: %s", enum_order_table, err)
+                        raise
                     except Error as err:
                         await conn.rollback()
                         logging.exception("Error al actualizar el producto %s en el pedido %s: %s", product_name, enum_order_table, err)
                         return None
+        except InsufficientStock:
+            raise
         except Exception as e:
             logging.exception("Error general al actualizar el producto: %s", e)
             return None
@@ -0,0 +1,254 @@
+"""
+Exportación incremental de `orders` a archivos columnares y reportes de ventas
+sobre esos archivos.
+
+`OrderExporter` lee la tabla por lotes con paginación por clave
+(updated_at, id) a partir de la marca de agua guardada, normaliza cada lote con
+operaciones vectorizadas de pandas y lo escribe particionado por día de
+creación:
+
+    <dir>/date=2025-01-05/part-000042.parquet
+    <dir>/_watermark.json
+
+La marca de agua avanza sobre `updated_at`, que la aplicación escribe antes del
+commit: una transacción que fija updated_at=T y hace commit después de que se
+exportó una fila con updated_at > T quedaría atrás de la marca para siempre.
+Por eso solo se exportan las filas con updated_at anterior a ahora menos
+ORDERS_EXPORT_SAFETY_LAG_SECONDS (bastante más que la transacción de pedidos
+más larga); lo más reciente sale en la corrida siguiente.
+
+Un pedido modificado después de exportado vuelve a salir en una parte nueva;
+al leer se conserva la última versión de cada fila (mayor updated_at). Las
+filas eliminadas de MySQL (o archivadas por la retención) siguen en los archivos.
+
+Los formatos parquet y arrow (Feather v2) requieren pyarrow.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiomysql
+import numpy as np
+import pandas as pd
+
+from core.background_tasks import task_supervisor
+from core.clock import get_clock
+from core.config import settings
+from core.db_pool import DBConnectionPool
+
+# Columnas exportadas de orders, en orden
+EXPORT_COLUMNS = (
+    "id", "enum_order_table", "product_id", "product_name", "quantity", "price", "state",
+    "user_id", "restaurant_id", "adicion", "created_at", "updated_at", "completed_at",
+)
+WATERMARK_FILE = "_watermark.json"
+# Estados que no cuentan como venta
+NON_SALE_STATES = ("cancelado",)
+REPORT_GROUPS = ("day", "hour", "product")
+
+# formato -> (extensión, escritura(frame, ruta), lectura(ruta))
+EXPORT_FORMATS: Dict[str, Tuple[str, Callable[[pd.DataFrame, str], None], Callable[[str], pd.DataFrame]]] = {
+    "parquet": (".parquet", lambda frame, path: frame.to_parquet(path, index=False), pd.read_parquet),
+    "arrow": (".arrow", lambda frame, path: frame.to_feather(path), pd.read_feather),
+}
+
+
+def normalize_orders(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Filas de orders -> DataFrame con tipos fijos y columnas derivadas
+    (revenue = quantity * price, date, hour), sin bucles por fila.
+    """
+    frame = pd.DataFrame.from_records(rows, columns=list(EXPORT_COLUMNS))
+    frame["id"] = frame["id"].astype("int64")
+    frame["quantity"] = pd.to_numeric(frame["quantity"], errors="coerce").fillna(0).astype("int32")
+    frame["price"] = pd.to_numeric(frame["price"], errors="coerce").fillna(0.0).astype("float64")
+    frame["revenue"] = frame["quantity"].to_numpy(dtype=np.float64) * frame["price"].to_numpy()
+    for column in ("created_at", "updated_at", "completed_at"):
+        frame[column] = pd.to_datetime(frame[column]).astype("datetime64[us]")
+    frame["date"] = frame["created_at"].dt.strftime("%Y-%m-%d")
+    frame["hour"] = frame["created_at"].dt.hour.astype("int8")
+    for column in ("enum_order_table", "product_id", "product_name", "state", "user_id", "restaurant_id", "adicion"):
+        frame[column] = frame[column].astype("string")
+    frame["state"] = frame["state"].str.lower()
+    return frame
+
+
+def read_watermark(export_dir: str) -> Dict[str, Any]:
+    """Marca de agua de la última exportación: {"updated_at", "id", "sequence"}."""
+    try:
+        with open(os.path.join(export_dir, WATERMARK_FILE), encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"updated_at": None, "id": 0, "sequence": 0}
+
+
+def write_watermark(export_dir: str, watermark: Dict[str, Any]) -> None:
+    path = os.path.join(export_dir, WATERMARK_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(watermark, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def write_partitions(frame: pd.DataFrame, export_dir: str, sequence: int, fmt: str) -> List[str]:
+    """
+    Escribe un lote normalizado en una parte por día de creación. El nombre de la
+    parte depende solo de la secuencia: repetir un lote tras una falla la reemplaza.
+    """
+    extension, write, _ = EXPORT_FORMATS[fmt]
+    paths = []
+    for day, part in frame.groupby("date", sort=True):
+        directory = os.path.join(export_dir, f"date={day}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{sequence:06d}{extension}")
+        write(part.drop(columns=["date"]).reset_index(drop=True), path)
+        paths.append(path)
+    return paths
+
+
+def load_orders(export_dir: str, fmt: str, start: Optional[date] = None, end: Optional[date] = None) -> pd.DataFrame:
+    """
+    Lee las particiones de los días entre `start` y `end` (inclusive) y deja la
+    última versión de cada fila. Solo se abren los directorios de ese rango.
+    """
+    extension, _, read = EXPORT_FORMATS[fmt]
+    frames = []
+    if os.path.isdir(export_dir):
+        for entry in sorted(os.listdir(export_dir)):
+            if not entry.startswith("date="):
+                continue
+            day = entry[len("date="):]
+            if (start and day < start.isoformat()) or (end and day > end.isoformat()):
+                continue
+            directory = os.path.join(export_dir, entry)
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(extension):
+                    frames.append(read(os.path.join(directory, name)).assign(date=day))
+    if not frames:
+        return normalize_orders([])
+    frame = pd.concat(frames, ignore_index=True)
+    return frame.sort_values(["updated_at", "id"]).drop_duplicates("id", keep="last").reset_index(drop=True)
+
+
+def sales_report(frame: pd.DataFrame, group_by: str) -> List[Dict[str, Any]]:
+    """
+    Ingresos, unidades y pedidos (enum_order_table distintos) por día, hora del
+    día o producto, excluyendo los pedidos cancelados.
+    """
+    if group_by not in REPORT_GROUPS:
+        raise ValueError(f"Agrupación no soportada: {group_by} (use {', '.join(REPORT_GROUPS)})")
+    sales = frame[~frame["state"].isin(NON_SALE_STATES)]
+    key = {"day": "date", "hour": "hour", "product": "product_name"}[group_by]
+    grouped = sales.groupby(key, sort=True).agg(
+        revenue=("revenue", "sum"), units=("quantity", "sum"), orders=("enum_order_table", "nunique"),
+    )
+    if group_by == "product":
+        grouped = grouped.sort_values("revenue", ascending=False)
+    return [
+        {"key": str(index), "revenue": round(float(row.revenue), 2), "units": int(row.units), "orders": int(row.orders)}
+        for index, row in zip(grouped.index, grouped.itertuples(index=False))
+    ]
+
+
+class OrderExporter:
+    def __init__(self, export_dir: str, fmt: str = "parquet", chunk_size: int = 5000,
+                 safety_lag_seconds: float = 300):
+        """
+        Parámetros:
+            export_dir (str): Carpeta raíz de las particiones y la marca de agua.
+            fmt (str): "parquet" o "arrow".
+            chunk_size (int): Filas por consulta (y por parte escrita).
+            safety_lag_seconds (float): Antigüedad mínima de updated_at para exportar una fila
+                (las transacciones en curso ya hicieron commit).
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Formato de exportación no soportado: {fmt} (use {', '.join(EXPORT_FORMATS)})")
+        self.export_dir = export_dir
+        self.fmt = fmt
+        self.chunk_size = chunk_size
+        self.safety_lag_seconds = safety_lag_seconds
+        self.db_pool = DBConnectionPool()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _fetch_chunk(self, cursor, watermark: Dict[str, Any], cutoff: datetime) -> List[Dict[str, Any]]:
+        columns = ", ".join(EXPORT_COLUMNS)
+        if watermark["updated_at"] is None:
+            await cursor.execute(
+                f"SELECT {columns} FROM orders WHERE updated_at < %s ORDER BY updated_at, id LIMIT %s",
+                (cutoff, self.chunk_size),
+            )
+        else:
+            # Paginación por clave sobre el índice (updated_at, id): sin OFFSET
+            updated_at = datetime.fromisoformat(watermark["updated_at"])
+            await cursor.execute(
+                f"SELECT {columns} FROM orders "
+                "WHERE updated_at < %s AND (updated_at > %s OR (updated_at = %s AND id > %s)) "
+                "ORDER BY updated_at, id LIMIT %s",
+                (cutoff, updated_at, updated_at, watermark["id"], self.chunk_size),
+            )
+        return list(await cursor.fetchall())
+
+    async def export(self) -> Dict[str, Any]:
+        """
+        Exporta las filas nuevas o modificadas desde la última marca de agua y
+        hasta hace `safety_lag_seconds`.
+
+        Retorna:
+            Dict con las filas exportadas, las partes escritas y la nueva marca de agua.
+        """
+        async with self._lock:
+            os.makedirs(self.export_dir, exist_ok=True)
+            watermark = read_watermark(self.export_dir)
+            # Mismo reloj con el que los gestores escriben updated_at
+            cutoff = get_clock().db_now() - timedelta(seconds=self.safety_lag_seconds)
+            exported, files = 0, []
+            pool = await self.db_pool.get_pool()
+            async with pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    while True:
+                        rows = await self._fetch_chunk(cursor, watermark, cutoff)
+                        # Lectura consistente por lote sin retener bloqueos entre lotes
+                        await conn.commit()
+                        if not rows:
+                            break
+                        frame = normalize_orders(rows)
+                        sequence = watermark["sequence"] + 1
+                        files += await asyncio.to_thread(write_partitions, frame, self.export_dir, sequence, self.fmt)
+                        last = rows[-1]
+                        watermark = {"updated_at": last["updated_at"].isoformat(), "id": last["id"], "sequence": sequence}
+                        await asyncio.to_thread(write_watermark, self.export_dir, watermark)
+                        exported += len(rows)
+                        if len(rows) < self.chunk_size:
+                            break
+            logging.info("Exportación de pedidos: %d filas en %d partes", exported, len(files))
+            return {"rows": exported, "files": len(files), "watermark": watermark}
+
+    def start(self, interval_seconds: float) -> None:
+        """Exporta periódicamente en segundo plano (una sola vez)."""
+        if self._task is None or self._task.done():
+            self._task = task_supervisor.spawn(self._loop(interval_seconds), name="orders_export")
+
+    async def _loop(self, interval_seconds: float) -> None:
+        while True:
+            try:
+                await self.export()
+            except Exception as e:
+                logging.exception("Error exportando pedidos: %s", e)
+            await asyncio.sleep(interval_seconds)
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+order_exporter = OrderExporter(
+    export_dir=settings.orders_export_dir,
+    fmt=settings.orders_export_format,
+    chunk_size=settings.orders_export_chunk_size,
+    safety_lag_seconds=settings.orders_export_safety_lag_seconds,
+)
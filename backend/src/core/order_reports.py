@@ -0,0 +1,161 @@
+"""
+Motor de reportes de pedidos sobre una instantánea columnar en memoria.
+
+`OrderReportSnapshot` carga los archivos de la exportación incremental
+(core.order_export) una sola vez en arreglos NumPy (códigos enteros para
+productos y pedidos, fechas como int64) y los reutiliza mientras la marca de
+agua no cambie. Los reportes se calculan con bincount / ufunc.at sobre esos
+arreglos, sin bucles por fila:
+
+    - ingresos y unidades por producto,
+    - mapa de calor día de la semana x hora,
+    - ticket promedio (ingreso por pedido),
+    - tiempo de pendiente a completado,
+    - adiciones más pedidas.
+"""
+import logging
+import threading
+from datetime import date, datetime, time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.config import settings
+from core.order_export import NON_SALE_STATES, load_orders, read_watermark
+
+WEEKDAYS = ("lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo")
+# Separadores de varias adiciones en el mismo texto ("queso extra, tocineta + maicitos")
+ADDON_SEPARATORS = r"\s*[,;+]\s*"
+
+
+class ReportColumns:
+    """Columnas de la instantánea: arreglos NumPy alineados por fila de pedido."""
+
+    def __init__(self, frame: pd.DataFrame):
+        sales = frame[~frame["state"].isin(NON_SALE_STATES)].sort_values("created_at", kind="stable")
+        self.rows = len(sales)
+        self.created_at = sales["created_at"].to_numpy(dtype="datetime64[us]")
+        self.completed_at = sales["completed_at"].to_numpy(dtype="datetime64[us]")
+        self.quantity = sales["quantity"].to_numpy(dtype=np.int64)
+        self.revenue = sales["revenue"].to_numpy(dtype=np.float64)
+        self.weekday = sales["created_at"].dt.weekday.to_numpy(dtype=np.int64)
+        self.hour = sales["created_at"].dt.hour.to_numpy(dtype=np.int64)
+        self.product_code, self.products = pd.factorize(sales["product_name"].fillna("").to_numpy(dtype=object))
+        self.order_code, self.orders = pd.factorize(sales["enum_order_table"].fillna("").to_numpy(dtype=object))
+        # Textos de adición distintos -> nombres de adición: se separa una vez por texto, no por fila
+        self.addon_code, texts = pd.factorize(sales["adicion"].fillna("").str.lower().to_numpy(dtype=object))
+        self.addon_texts = len(texts)
+        names = pd.Series(texts, dtype="string").str.split(ADDON_SEPARATORS, regex=True).explode().str.strip()
+        names = names[names.str.len() > 0]
+        self.addon_text = names.index.to_numpy(dtype=np.int64)
+        self.addon_name, self.addons = pd.factorize(names.to_numpy(dtype=object))
+
+    def window(self, start: Optional[date], end: Optional[date]) -> slice:
+        """Filas creadas entre start y end (inclusive): búsqueda binaria sobre created_at ordenado."""
+        low = 0 if start is None else int(np.searchsorted(self.created_at, np.datetime64(datetime.combine(start, time.min)), "left"))
+        high = self.rows if end is None else int(np.searchsorted(self.created_at, np.datetime64(datetime.combine(end, time.max)), "right"))
+        return slice(low, high)
+
+
+def revenue_by_product(columns: ReportColumns, rows: slice, top: int) -> list:
+    codes = columns.product_code[rows]
+    revenue = np.bincount(codes, weights=columns.revenue[rows], minlength=len(columns.products))
+    units = np.bincount(codes, weights=columns.quantity[rows], minlength=len(columns.products))
+    ranked = np.argsort(-revenue, kind="stable")[:top]
+    return [
+        {"product": str(columns.products[i]), "revenue": round(float(revenue[i]), 2), "units": int(units[i])}
+        for i in ranked if units[i] > 0
+    ]
+
+
+def hourly_heatmap(columns: ReportColumns, rows: slice) -> Dict[str, Any]:
+    """Ingresos por día de la semana (filas, lunes=0) y hora del día (columnas)."""
+    cells = columns.weekday[rows] * 24 + columns.hour[rows]
+    revenue = np.bincount(cells, weights=columns.revenue[rows], minlength=7 * 24).reshape(7, 24)
+    return {"weekdays": list(WEEKDAYS), "revenue": np.round(revenue, 2).tolist()}
+
+
+def ticket_stats(columns: ReportColumns, rows: slice) -> Dict[str, Any]:
+    """Ingreso por pedido (enum_order_table): promedio, mediana y cantidad de pedidos."""
+    per_order = np.bincount(columns.order_code[rows], weights=columns.revenue[rows], minlength=len(columns.orders))
+    per_order = per_order[np.bincount(columns.order_code[rows], minlength=len(columns.orders)) > 0]
+    if per_order.size == 0:
+        return {"orders": 0, "average": 0.0, "median": 0.0}
+    return {"orders": int(per_order.size), "average": round(float(per_order.mean()), 2),
+            "median": round(float(np.median(per_order)), 2)}
+
+
+def fulfillment_stats(columns: ReportColumns, rows: slice) -> Dict[str, Any]:
+    """
+    Minutos de pendiente (primera fila del pedido) a completado (primer
+    completed_at del pedido), para los pedidos que llegaron a completado.
+    """
+    codes = columns.order_code[rows]
+    never = np.iinfo(np.int64).max
+    created = np.full(len(columns.orders), never, dtype=np.int64)
+    completed = np.full(len(columns.orders), never, dtype=np.int64)
+    np.minimum.at(created, codes, columns.created_at[rows].astype(np.int64))
+    done = ~np.isnat(columns.completed_at[rows])
+    np.minimum.at(completed, codes[done], columns.completed_at[rows][done].astype(np.int64))
+    finished = (completed != never) & (created != never)
+    minutes = (completed[finished] - created[finished]) / 60_000_000
+    if minutes.size == 0:
+        return {"orders": 0, "average_minutes": None, "p50_minutes": None, "p90_minutes": None}
+    p50, p90 = np.percentile(minutes, [50, 90])
+    return {"orders": int(minutes.size), "average_minutes": round(float(minutes.mean()), 1),
+            "p50_minutes": round(float(p50), 1), "p90_minutes": round(float(p90), 1)}
+
+
+def top_addons(columns: ReportColumns, rows: slice, top: int) -> list:
+    """Veces que se pidió cada adición (una línea con "queso, tocineta" cuenta para ambas)."""
+    per_text = np.bincount(columns.addon_code[rows], minlength=columns.addon_texts)
+    counts = np.bincount(columns.addon_name, weights=per_text[columns.addon_text], minlength=len(columns.addons))
+    ranked = np.argsort(-counts, kind="stable")[:top]
+    return [{"addon": str(columns.addons[i]), "count": int(counts[i])} for i in ranked if counts[i] > 0]
+
+
+class OrderReportSnapshot:
+    def __init__(self, export_dir: str, fmt: str):
+        """
+        Parámetros:
+            export_dir (str): Carpeta de la exportación incremental de pedidos.
+            fmt (str): Formato de los archivos exportados.
+        """
+        self.export_dir = export_dir
+        self.fmt = fmt
+        self._columns: Optional[ReportColumns] = None
+        self._sequence: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def columns(self) -> ReportColumns:
+        """Columnas de la instantánea; se recargan solo si hubo una exportación nueva."""
+        sequence = read_watermark(self.export_dir)["sequence"]
+        with self._lock:
+            if self._columns is None or sequence != self._sequence:
+                self._columns = ReportColumns(load_orders(self.export_dir, self.fmt))
+                self._sequence = sequence
+                logging.info("Instantánea de reportes cargada: %d filas (exportación %s)", self._columns.rows, sequence)
+            return self._columns
+
+    def report(self, start: Optional[date] = None, end: Optional[date] = None, top: int = 10) -> Dict[str, Any]:
+        """
+        Todos los reportes para los pedidos creados entre `start` y `end`
+        (inclusive), excluyendo los cancelados.
+        """
+        columns = self.columns()
+        rows = columns.window(start, end)
+        return {
+            "start": start.isoformat() if start else None,
+            "end": end.isoformat() if end else None,
+            "rows": rows.stop - rows.start,
+            "total_revenue": round(float(columns.revenue[rows].sum()), 2),
+            "products": revenue_by_product(columns, rows, top),
+            "heatmap": hourly_heatmap(columns, rows),
+            "ticket": ticket_stats(columns, rows),
+            "fulfillment": fulfillment_stats(columns, rows),
+            "addons": top_addons(columns, rows, top),
+        }
+
+
+order_report_snapshot = OrderReportSnapshot(export_dir=settings.orders_export_dir, fmt=settings.orders_export_format)
@@ -0,0 +1,209 @@
+"""
+Particionado mensual por `created_at` de las tablas que crecen sin límite
+(`orders` y `conversations`).
+
+Cada mes es una partición RANGE COLUMNS `pYYYYMM`, más `pmax` para las fechas
+futuras. Las consultas del día o de los últimos días filtran por `created_at`
+y MySQL solo recorre las particiones de ese rango (partition pruning); las
+particiones de meses ya archivados se eliminan con DROP PARTITION.
+
+MySQL exige que toda clave única incluya la columna de particionado: la clave
+primaria de las tablas particionadas es (id, created_at).
+
+`partition_maintenance` crea las particiones de los próximos meses al arrancar
+y luego periódicamente, con o sin retención activa: si faltaran, las filas
+nuevas caerían en pmax y las consultas por fecha dejarían de podar.
+"""
+import asyncio
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence
+
+from core.background_tasks import task_supervisor
+from core.clock import get_clock
+from core.config import settings
+from core.db_pool import DBConnectionPool
+
+# Tablas particionadas por mes y su columna de fecha
+PARTITIONED_TABLES = {"orders": "created_at", "conversations": "created_at"}
+# Particiones que se crean por adelantado para los meses siguientes
+MONTHS_AHEAD = 3
+MAXVALUE_PARTITION = "pmax"
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    month = value.month - 1 + months
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Nombre de la partición de un mes: p202501."""
+    return f"p{month.year:04d}{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Mes de una partición pYYYYMM; None para pmax u otros nombres."""
+    if len(name) != 7 or not name[1:].isdigit():
+        return None
+    return date(int(name[1:5]), int(name[5:7]), 1)
+
+
+def _month_partitions(first: date, last: date) -> List[str]:
+    partitions, month = [], month_start(first)
+    while month <= last:
+        upper = add_months(month, 1)
+        partitions.append(f"PARTITION {partition_name(month)} VALUES LESS THAN ('{upper.isoformat()}')")
+        month = upper
+    return partitions
+
+
+def partition_clause(column: str, first: date, last: date) -> str:
+    """
+    Cláusula PARTITION BY con una partición por mes entre `first` y `last`
+    (inclusive) y `pmax` para lo posterior.
+    """
+    partitions = _month_partitions(first, last)
+    partitions.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    return f"PARTITION BY RANGE COLUMNS({column}) (\n    " + ",\n    ".join(partitions) + "\n)"
+
+
+def default_partition_clause(column: str, today: Optional[date] = None) -> str:
+    """Particiones del mes actual y los MONTHS_AHEAD siguientes (tablas nuevas)."""
+    today = today or get_clock().today()
+    return partition_clause(column, today, add_months(month_start(today), MONTHS_AHEAD))
+
+
+async def list_partitions(cursor, table: str) -> List[str]:
+    """Particiones de la tabla en orden; lista vacía si no está particionada."""
+    await cursor.execute(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION",
+        (table,),
+    )
+    rows = await cursor.fetchall()
+    return [row["PARTITION_NAME"] if isinstance(row, dict) else row[0] for row in rows]
+
+
+def missing_partitions_statement(table: str, existing: Sequence[str], until: date) -> Optional[str]:
+    """
+    ALTER TABLE ... REORGANIZE PARTITION pmax que agrega los meses que faltan
+    hasta `until` (inclusive); None si ya existen. Con el mantenimiento
+    periódico pmax solo tiene filas con fechas futuras y reorganizarla casi no
+    copia datos; si el mantenimiento estuvo detenido, la primera corrida mueve
+    las filas que cayeron en pmax a sus meses.
+    """
+    months = [month for month in map(partition_month, existing) if month]
+    if MAXVALUE_PARTITION not in existing or not months:
+        return None
+    first = add_months(max(months), 1)
+    if first > month_start(until):
+        return None
+    partitions = _month_partitions(first, until)
+    partitions.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    return f"ALTER TABLE {table} REORGANIZE PARTITION {MAXVALUE_PARTITION} INTO (\n    " + ",\n    ".join(partitions) + "\n)"
+
+
+async def ensure_future_partitions(cursor, table: str, today: Optional[date] = None,
+                                   months_ahead: int = MONTHS_AHEAD) -> int:
+    """Crea las particiones de los próximos meses. Retorna cuántas se agregaron."""
+    today = today or get_clock().today()
+    existing = await list_partitions(cursor, table)
+    statement = missing_partitions_statement(table, existing, add_months(month_start(today), months_ahead))
+    if statement is None:
+        return 0
+    await cursor.execute(statement)
+    # Una partición nueva por mes; pmax se vuelve a crear con MAXVALUE
+    added = statement.count("VALUES LESS THAN ('")
+    logging.info("Particiones agregadas a %s: %d", table, added)
+    return added
+
+
+async def drop_empty_partitions_before(cursor, table: str, cutoff: date) -> List[str]:
+    """
+    Elimina las particiones de meses completos anteriores a `cutoff` que ya no
+    tienen filas (todo se archivó). Las que aún tienen filas se conservan.
+    """
+    dropped = []
+    for name in await list_partitions(cursor, table):
+        month = partition_month(name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+        await cursor.execute(f"SELECT 1 FROM {table} PARTITION ({name}) LIMIT 1")
+        if await cursor.fetchone() is None:
+            dropped.append(name)
+    if dropped:
+        await cursor.execute(f"ALTER TABLE {table} DROP PARTITION {', '.join(dropped)}")
+        logging.info("Particiones eliminadas de %s: %s", table, ", ".join(dropped))
+    return dropped
+
+
+async def explain_partitions(cursor, query: str, params: Sequence = ()) -> List[str]:
+    """Particiones que MySQL recorrerá para la consulta (columna `partitions` de EXPLAIN)."""
+    await cursor.execute(f"EXPLAIN {query}", params)
+    column = [description[0] for description in cursor.description].index("partitions")
+    partitions = []
+    for row in await cursor.fetchall():
+        value = row["partitions"] if isinstance(row, dict) else row[column]
+        if value:
+            partitions.extend(value.split(","))
+    return partitions
+
+
+def partition_for(value: datetime) -> str:
+    """Partición donde cae una fecha."""
+    return partition_name(month_start(value.date() if isinstance(value, datetime) else value))
+
+
+class PartitionMaintenanceJob:
+    def __init__(self, interval_seconds: float = 86400, months_ahead: int = MONTHS_AHEAD):
+        """
+        Parámetros:
+            interval_seconds (float): Intervalo de la ejecución periódica.
+            months_ahead (int): Meses siguientes que deben tener partición.
+        """
+        self.interval_seconds = interval_seconds
+        self.months_ahead = months_ahead
+        self.db_pool = DBConnectionPool()
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Dict[str, int]:
+        """Crea las particiones que falten. Retorna cuántas se agregaron por tabla."""
+        added = {}
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                for table in PARTITIONED_TABLES:
+                    try:
+                        if not await list_partitions(cursor, table):
+                            continue
+                        added[table] = await ensure_future_partitions(cursor, table, months_ahead=self.months_ahead)
+                    except Exception as err:
+                        logging.exception("Error creando las particiones de %s: %s", table, err)
+        return added
+
+    def start(self) -> None:
+        """Ejecuta el mantenimiento ahora y luego periódicamente en segundo plano (una sola vez)."""
+        if self._task is None or self._task.done():
+            self._task = task_supervisor.spawn(self._loop(), name="partition_maintenance")
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logging.exception("Error en el mantenimiento de particiones: %s", e)
+            await asyncio.sleep(self.interval_seconds)
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+partition_maintenance = PartitionMaintenanceJob(interval_seconds=settings.partition_maintenance_interval_hours * 3600)
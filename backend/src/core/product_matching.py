@@ -0,0 +1,132 @@
+"""
+Resolución de los productos que nombra el LLM ("Go papa x2", "go papa por
+dos", "p-0190…") contra las filas de un pedido o el inventario.
+
+Se prueba en orden:
+    - id: el texto es el id de un candidato,
+    - exact: nombre idéntico,
+    - normalized: mismo nombre sin tildes, mayúsculas ni palabras vacías,
+    - fuzzy: token-set ratio >= PRODUCT_MATCH_MIN_SCORE con un único mejor
+      candidato, y cada palabra de la consulta presente (o con una letra de
+      diferencia) en el nombre del candidato: "Go Papa X3" no es "Papa" ni
+      "La Gringa X4" es "La Gringa X2".
+Si dos candidatos empatan en el mejor puntaje no se elige ninguno: es mejor
+que el LLM pregunte a que se modifique el producto equivocado.
+
+`product_match_stats` cuenta cómo se resolvió cada producto. En
+update_order_product, cada resolución distinta de "exact" es un cambio que
+antes fallaba y le costaba al turno al menos un salto extra de LLM (el modelo
+recibía el error y volvía a llamar la herramienta): ese es el piso que reporta
+`retry_hops_saved`.
+"""
+import threading
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+from core.menu_search import tokenize
+
+PRODUCT_MATCH_MIN_SCORE = 0.85
+# Similitud mínima entre una palabra de la consulta y una del candidato ("grinja" ~ "gringa")
+WORD_MIN_SCORE = 0.8
+MATCH_KINDS = ("exact", "id", "normalized", "fuzzy", "inventory_id", "missing")
+
+
+def _ratio(a: str, b: str) -> float:
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def token_set_ratio(a: Optional[str], b: Optional[str]) -> float:
+    """
+    Similitud 0..1 entre dos nombres sin importar el orden de las palabras ni
+    las palabras de más en uno de ellos ("papa go x2" = "Go Papa X2";
+    "go papa" ~ "Go Papa X2" = 1.0).
+    """
+    left, right = set(tokenize(a)), set(tokenize(b))
+    if not left or not right:
+        return 0.0
+    common = " ".join(sorted(left & right))
+    only_left = " ".join([common] + sorted(left - right)).strip()
+    only_right = " ".join([common] + sorted(right - left)).strip()
+    return max(_ratio(common, only_left), _ratio(common, only_right), _ratio(only_left, only_right))
+
+
+def covers(query: Optional[str], name: Optional[str]) -> bool:
+    """
+    Si cada palabra de `query` está en `name`, con tolerancia a errores de
+    tipeo salvo en las que llevan dígitos (tamaños: "x3" no es "x2").
+    """
+    words = set(tokenize(name))
+    for token in tokenize(query):
+        if token in words:
+            continue
+        if any(char.isdigit() for char in token):
+            return False
+        if not any(_ratio(token, word) >= WORD_MIN_SCORE for word in words):
+            return False
+    return True
+
+
+class ProductMatch(NamedTuple):
+    item: Dict[str, Any]
+    kind: str
+    score: float
+
+
+def match_product(candidates: Iterable[Dict[str, Any]], query: Optional[str], name_key: str = "name",
+                  id_key: str = "id", min_score: float = PRODUCT_MATCH_MIN_SCORE,
+                  fuzzy: bool = True) -> Optional[ProductMatch]:
+    """
+    El candidato al que se refiere `query` (por id o nombre), o None si ninguno
+    alcanza `min_score` o hay empate en el mejor puntaje. Con fuzzy=False solo
+    se aceptan id, nombre idéntico o nombre normalizado.
+    """
+    candidates = list(candidates)
+    if not query or not candidates:
+        return None
+    for kind, same in (
+        ("id", lambda item: item.get(id_key) == query),
+        ("exact", lambda item: item.get(name_key) == query),
+        ("normalized", lambda item: tokenize(item.get(name_key)) == tokenize(query)),
+    ):
+        found = [item for item in candidates if same(item)]
+        if len({item.get(id_key) for item in found}) == 1:
+            return ProductMatch(found[0], kind, 1.0)
+    if not fuzzy:
+        return None
+    scored = sorted(((token_set_ratio(query, item.get(name_key)), index) for index, item in enumerate(candidates)
+                     if covers(query, item.get(name_key))), reverse=True)
+    if not scored:
+        return None
+    best, index = scored[0]
+    if best < min_score or (len(scored) > 1 and scored[1][0] == best):
+        return None
+    return ProductMatch(candidates[index], "fuzzy", round(best, 3))
+
+
+class ProductMatchStats:
+    """
+    Cómo se resolvieron los productos, por origen ("update_order_product",
+    "confirm_order_tool", "update_order_tool") y tipo de coincidencia.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, source: str, kind: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(source, dict.fromkeys(MATCH_KINDS, 0))
+            counts[kind] += 1
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {source: dict(kinds) for source, kinds in self._counts.items()}
+        updates = counts.get("update_order_product", {})
+        return {
+            "sources": counts,
+            # Antes solo el nombre idéntico encontraba la fila; lo demás volvía al LLM como error
+            "retry_hops_saved": sum(updates.get(kind, 0) for kind in ("id", "normalized", "fuzzy", "inventory_id")),
+        }
+
+
+product_match_stats = ProductMatchStats()
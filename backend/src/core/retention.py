@@ -0,0 +1,218 @@
+"""
+Retención de datos históricos de `orders` y `conversations`.
+
+Los pedidos cerrados y los turnos de conversación más antiguos que el período
+de retención salen de las tablas en línea por lotes (SELECT ... FOR UPDATE,
+copia, DELETE y commit por lote) hacia:
+    - table: tablas de archivo sin particionar (`orders_archive`,
+      `conversations_archive`) con las mismas columnas,
+    - jsonl: archivos JSONL comprimidos con gzip, uno por tabla y mes
+      (`<dir>/orders/2025-01.jsonl.gz`).
+
+Al final de cada corrida se eliminan las particiones mensuales que quedaron
+vacías. Las de los próximos meses las crea `partition_maintenance`
+(core.partitioning), que corre aunque la retención esté desactivada.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import aiomysql
+from aiomysql import Error
+
+from core.background_tasks import task_supervisor
+from core.clock import get_clock
+from core.config import settings
+from core.db_pool import DBConnectionPool
+from core.partitioning import (
+    PARTITIONED_TABLES, drop_empty_partitions_before, list_partitions, month_start,
+)
+
+RETENTION_TARGETS = ("table", "jsonl")
+ARCHIVE_TABLES = {"orders": "orders_archive", "conversations": "conversations_archive"}
+
+
+def write_jsonl_archive(archive_dir: str, table: str, rows: List[Dict[str, Any]]) -> List[str]:
+    """
+    Agrega las filas a `<archive_dir>/<table>/<YYYY-MM>.jsonl.gz` según su mes de
+    creación. Cada llamada agrega un miembro gzip (el archivo sigue siendo un gzip válido).
+    """
+    by_month: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_month.setdefault(row["created_at"].strftime("%Y-%m"), []).append(row)
+    paths = []
+    for month, month_rows in sorted(by_month.items()):
+        directory = os.path.join(archive_dir, table)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{month}.jsonl.gz")
+        with gzip.open(path, "at", encoding="utf-8") as archive:
+            for row in month_rows:
+                archive.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        paths.append(path)
+    return paths
+
+
+async def insertable_columns(cursor, table: str) -> List[str]:
+    """Columnas de la tabla que aceptan valores en un INSERT (sin las generadas, como line_total)."""
+    await cursor.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND EXTRA NOT LIKE %s "
+        "ORDER BY ORDINAL_POSITION",
+        (table, "%GENERATED%"),
+    )
+    rows = await cursor.fetchall()
+    return [row["COLUMN_NAME"] if isinstance(row, dict) else row[0] for row in rows]
+
+
+class RetentionJob:
+    def __init__(self, target: str = "table", archive_dir: str = "archive", orders_days: int = 180,
+                 conversations_days: int = 30, closed_states: Sequence[str] = ("pagado", "completado", "cancelado"),
+                 batch_size: int = 1000, interval_seconds: float = 86400):
+        """
+        Parámetros:
+            target (str): "table" (tablas *_archive) o "jsonl" (archivos .jsonl.gz).
+            archive_dir (str): Carpeta de los archivos JSONL.
+            orders_days (int): Días que los pedidos cerrados permanecen en `orders`.
+            conversations_days (int): Días que los turnos permanecen en `conversations`.
+            closed_states (Sequence[str]): Estados de pedido que se pueden archivar.
+            batch_size (int): Filas por transacción.
+            interval_seconds (float): Intervalo de la ejecución periódica.
+        """
+        if target not in RETENTION_TARGETS:
+            raise ValueError(f"Destino de retención no soportado: {target} (use {', '.join(RETENTION_TARGETS)})")
+        self.target = target
+        self.archive_dir = archive_dir
+        self.orders_days = orders_days
+        self.conversations_days = conversations_days
+        self.closed_states = tuple(closed_states)
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.db_pool = DBConnectionPool()
+        self._task: Optional[asyncio.Task] = None
+
+    def cutoff(self, days: int):
+        """Filas creadas antes de este instante (hora de Bogotá) se archivan."""
+        return get_clock().day_start() - timedelta(days=days)
+
+    async def _ensure_archive_table(self, cursor, table: str) -> None:
+        archive = ARCHIVE_TABLES[table]
+        await cursor.execute(f"CREATE TABLE IF NOT EXISTS {archive} LIKE {table}")
+        # LIKE copia también el particionado: el archivo es una sola tabla
+        if await list_partitions(cursor, archive):
+            await cursor.execute(f"ALTER TABLE {archive} REMOVE PARTITIONING")
+
+    async def _archive_table(self, table: str, condition: str, params: tuple) -> int:
+        """Mueve por lotes las filas de `table` que cumplen la condición. Retorna cuántas se movieron."""
+        moved = 0
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                if self.target == "table":
+                    await self._ensure_archive_table(cursor, table)
+                    # Lista explícita: MySQL no acepta valores para las columnas generadas
+                    columns = ", ".join(await insertable_columns(cursor, ARCHIVE_TABLES[table]))
+                while True:
+                    try:
+                        # created_at < corte: MySQL solo lee las particiones anteriores
+                        await cursor.execute(
+                            f"SELECT * FROM {table} WHERE {condition} ORDER BY created_at, id LIMIT %s FOR UPDATE",
+                            params + (self.batch_size,),
+                        )
+                        rows = await cursor.fetchall()
+                        if not rows:
+                            await conn.rollback()
+                            break
+                        # La condición se repite para que MySQL pode las particiones también aquí
+                        ids = [row["id"] for row in rows]
+                        placeholders = ", ".join(["%s"] * len(ids))
+                        if self.target == "table":
+                            # IGNORE: un lote repetido tras una falla no duplica filas
+                            await cursor.execute(
+                                f"INSERT IGNORE INTO {ARCHIVE_TABLES[table]} ({columns}) SELECT {columns} FROM {table} "
+                                f"WHERE {condition} AND id IN ({placeholders})",
+                                params + tuple(ids),
+                            )
+                        else:
+                            await asyncio.to_thread(write_jsonl_archive, self.archive_dir, table, rows)
+                        await cursor.execute(
+                            f"DELETE FROM {table} WHERE {condition} AND id IN ({placeholders})", params + tuple(ids),
+                        )
+                        await conn.commit()
+                        moved += len(rows)
+                    except Error as err:
+                        await conn.rollback()
+                        logging.exception("Error archivando %s: %s", table, err)
+                        break
+        return moved
+
+    async def _drop_archived_partitions(self, cutoffs: Dict[str, date]) -> Dict[str, List[str]]:
+        """Elimina las particiones anteriores al corte que ya quedaron vacías."""
+        dropped = {}
+        pool = await self.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                for table in PARTITIONED_TABLES:
+                    try:
+                        if not await list_partitions(cursor, table):
+                            continue
+                        dropped[table] = await drop_empty_partitions_before(cursor, table, month_start(cutoffs[table]))
+                    except Error as err:
+                        logging.exception("Error manteniendo las particiones de %s: %s", table, err)
+        return dropped
+
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Ejecuta una corrida completa de retención.
+
+        Retorna:
+            Dict con las filas archivadas por tabla y las particiones eliminadas.
+        """
+        orders_cutoff = self.cutoff(self.orders_days)
+        conversations_cutoff = self.cutoff(self.conversations_days)
+        states = ", ".join(["%s"] * len(self.closed_states))
+        report = {
+            "target": self.target,
+            "orders": await self._archive_table(
+                "orders", f"created_at < %s AND state IN ({states})", (orders_cutoff,) + self.closed_states,
+            ),
+            "conversations": await self._archive_table("conversations", "created_at < %s", (conversations_cutoff,)),
+        }
+        report["dropped_partitions"] = await self._drop_archived_partitions(
+            {"orders": orders_cutoff.date(), "conversations": conversations_cutoff.date()}
+        )
+        logging.info("Retención: %s", report)
+        return report
+
+    def start(self) -> None:
+        """Inicia la ejecución periódica en segundo plano (una sola vez)."""
+        if self._task is None or self._task.done():
+            self._task = task_supervisor.spawn(self._loop(), name="data_retention")
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logging.exception("Error en la retención de datos: %s", e)
+            await asyncio.sleep(self.interval_seconds)
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+retention_job = RetentionJob(
+    target=settings.retention_target,
+    archive_dir=settings.retention_archive_dir,
+    orders_days=settings.orders_retention_days,
+    conversations_days=settings.conversations_retention_days,
+    closed_states=settings.retention_closed_states,
+    batch_size=settings.retention_batch_size,
+    interval_seconds=settings.retention_interval_hours * 3600,
+)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Literal
+from typing import Dict, List, Optional, Literal, Union
 from fastapi import UploadFile
 
 
@@ -19,6 +19,19 @@ class RequestHTTPChat(BaseModel):
     conversation_name: str
     query: str
     restaurant_name:Optional[Literal["go_papa"]] = None
+    # Id del mensaje de WhatsApp; si llega, las reentregas repiten la respuesta original
+    message_id: Optional[str] = None
+
+class RequestHTTPChatJob(RequestHTTPChat):
+    # poll: el cliente consulta GET /agent/chat/jobs/{job_id}; whatsapp: además se envía la respuesta al usuario
+    delivery: Literal["poll", "whatsapp"] = "poll"
+
+class ResponseHTTPChatJob(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "done", "rejected", "failed"]
+    id: Optional[str] = None
+    text: Optional[str] = None
+    error: Optional[str] = None
 
 class RequestHTTPVote(BaseModel):
     id: str
@@ -107,7 +120,124 @@ class UpdateProductRequest(BaseModel):
 class DeleteProductRequest(BaseModel):
     product_id: str
     restaurant_id: str
+
+class CatalogChange(BaseModel):
+    name: str
+    # columna -> [antes, después]
+    changes: Dict[str, List[Union[float, int, str, None]]]
+
+class CatalogImportResult(BaseModel):
+    restaurant_id: str
+    dry_run: bool
+    inserted: List[str]
+    updated: List[CatalogChange]
+    unchanged: List[str]
+
+class BulkPriceItem(BaseModel):
+    product_id: Optional[str] = None
+    name: Optional[str] = None
+    price: Optional[float] = None
+    quantity: Optional[int] = None
+
+class BulkPriceUpdateRequest(BaseModel):
+    restaurant_id: str
+    # Precios por producto y/o ajuste porcentual (p. ej. 8 = +8 %) sobre los productos con precio
+    items: List[BulkPriceItem] = []
+    percent: Optional[float] = None
+    round_to: Optional[float] = None
+    tipo_producto: Optional[Literal["menu", "adicion"]] = None
+    dry_run: bool = False
     
     
     
     #
+
+
+# Pedido consolidado (filas de `orders` agrupadas por enum_order_table)
+class OrderProduct(BaseModel):
+    name: str
+    quantity: int
+    price: Optional[float] = None
+    observations: Optional[str] = None
+    adicion: Optional[str] = None
+    details: Optional[str] = None
+
+class ConsolidatedOrder(BaseModel):
+    id: Union[int, str]
+    enum_order_table: Optional[Union[int, str]] = None
+    table_id: Optional[str] = None
+    address: Optional[str] = None
+    customer_name: Optional[str] = None
+    products: List[OrderProduct]
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    state: Optional[str] = None
+
+class OrderStats(BaseModel):
+    total_orders: int
+    pending_orders: int
+    complete_orders: int
+    total_sales: float
+
+class ResponseHTTPTodayOrders(BaseModel):
+    stats: OrderStats
+    orders: List[ConsolidatedOrder]
+
+# /orders/all: pedidos consolidados indexados por enum_order_table
+ResponseHTTPAllOrders = Dict[str, ConsolidatedOrder]
+
+class SalesReportRow(BaseModel):
+    # Día (YYYY-MM-DD), hora del día (0-23) o nombre del producto
+    key: str
+    revenue: float
+    units: int
+    orders: int
+
+class ResponseHTTPSalesReport(BaseModel):
+    group_by: Literal["day", "hour", "product"]
+    start: Optional[str] = None
+    end: Optional[str] = None
+    total_revenue: float
+    rows: List[SalesReportRow]
+
+class ProductRevenue(BaseModel):
+    product: str
+    revenue: float
+    units: int
+
+class RevenueHeatmap(BaseModel):
+    weekdays: List[str]
+    # Filas: días de la semana (lunes primero); columnas: horas 0-23
+    revenue: List[List[float]]
+
+class TicketStats(BaseModel):
+    orders: int
+    average: float
+    median: float
+
+class FulfillmentStats(BaseModel):
+    # Minutos de pendiente a completado
+    orders: int
+    average_minutes: Optional[float] = None
+    p50_minutes: Optional[float] = None
+    p90_minutes: Optional[float] = None
+
+class AddonCount(BaseModel):
+    addon: str
+    count: int
+
+class ResponseHTTPOrdersReport(BaseModel):
+    start: Optional[str] = None
+    end: Optional[str] = None
+    rows: int
+    total_revenue: float
+    products: List[ProductRevenue]
+    heatmap: RevenueHeatmap
+    ticket: TicketStats
+    fulfillment: FulfillmentStats
+    addons: List[AddonCount]
+
+class ResponseHTTPOrdersExport(BaseModel):
+    rows: int
+    files: int
+    watermark: Dict[str, Union[str, int, None]]
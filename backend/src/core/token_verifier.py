@@ -0,0 +1,222 @@
+"""
+Verificación de tokens JWT con firma.
+
+- Tokens de Microsoft Entra ID (RS256): la firma se verifica con las claves
+  públicas del JWKS del tenant. El JWKS se cachea y se refresca en segundo
+  plano; si llega un `kid` desconocido (rotación de claves) se fuerza un
+  refresco, como máximo uno cada `min_refresh_interval` segundos.
+- Tokens de sesión emitidos por /auth/callback (HS256): se verifican con
+  JWT_SECRET.
+
+Los tokens ya validados se recuerdan por su hash SHA-256 hasta que expiran,
+así una solicitud con un token conocido no vuelve a verificar la firma.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+import jwt
+from jwt.algorithms import RSAAlgorithm
+from jwt.exceptions import InvalidTokenError, PyJWTError
+
+from core.background_tasks import task_supervisor
+from core.config import settings
+from core.graph_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSCache:
+    """Claves públicas del JWKS indexadas por `kid`, con refresco periódico en segundo plano."""
+
+    def __init__(self, jwks_uri: str, http_client: Optional[httpx.AsyncClient] = None,
+                 refresh_interval: float = 3600, min_refresh_interval: float = 60):
+        self.jwks_uri = jwks_uri
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._http_client = http_client
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.fetches = 0
+
+    def _client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client()
+
+    async def refresh(self, force: bool = False) -> None:
+        """Descarga el JWKS. Sin `force`, no lo hace si el caché es más reciente que `min_refresh_interval`."""
+        async with self._lock:
+            if not force and self._keys and time.monotonic() - self._fetched_at < self.min_refresh_interval:
+                return
+            response = await self._client().get(self.jwks_uri)
+            response.raise_for_status()
+            keys = {}
+            for jwk in response.json().get("keys", []):
+                if jwk.get("kty") == "RSA" and jwk.get("kid"):
+                    keys[jwk["kid"]] = RSAAlgorithm.from_jwk(json.dumps(jwk))
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            self.fetches += 1
+            logger.info("JWKS actualizado: %d claves", len(keys))
+
+    async def get_key(self, kid: str) -> Any:
+        """Retorna la clave pública de `kid`; refresca el JWKS si no está (rotación de claves)."""
+        self.start()
+        if kid not in self._keys:
+            await self.refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            raise InvalidTokenError(f"Clave de firma desconocida: {kid}")
+        return key
+
+    def start(self) -> None:
+        """Inicia el refresco periódico en segundo plano (una sola vez)."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = task_supervisor.spawn(self._refresh_loop(), name="jwks_refresh")
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh(force=True)
+            except Exception as e:
+                # Se siguen usando las claves anteriores hasta el próximo intento
+                logger.error("Error refrescando el JWKS: %s", e)
+
+    async def aclose(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+
+
+class TokenVerifier:
+    """
+    Verifica tokens (firma, expiración, emisor y audiencia) y recuerda los válidos.
+
+    :param jwks: Caché del JWKS para tokens RS256 (None: no se aceptan).
+    :param issuer: Emisor esperado de los tokens RS256.
+    :param audience: Audiencia esperada de los tokens RS256.
+    :param session_secret: Secreto de los tokens de sesión HS256 (None: no se aceptan).
+    :param max_cached_tokens: Máximo de tokens recordados.
+    """
+
+    def __init__(self, jwks: Optional[JWKSCache] = None, issuer: Optional[str] = None,
+                 audience: Optional[str] = None, session_secret: Optional[str] = None,
+                 max_cached_tokens: int = 10000, leeway: int = 30):
+        self.jwks = jwks
+        self.issuer = issuer
+        self.audience = audience
+        self.session_secret = session_secret
+        self.max_cached_tokens = max_cached_tokens
+        self.leeway = leeway
+        self._validated: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._stats = {"verified": 0, "cache_hits": 0, "rejected": 0}
+
+    @staticmethod
+    def _token_hash(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _remember(self, token_hash: str, claims: Dict[str, Any]) -> None:
+        expires_at = float(claims.get("exp", 0))
+        with self._lock:
+            if len(self._validated) >= self.max_cached_tokens:
+                now = time.time()
+                for expired in [h for h, (exp, _) in self._validated.items() if exp <= now]:
+                    del self._validated[expired]
+                while len(self._validated) >= self.max_cached_tokens:
+                    del self._validated[next(iter(self._validated))]
+            self._validated[token_hash] = (expires_at, claims)
+
+    def _cached(self, token_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._validated.get(token_hash)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._validated[token_hash]
+                return None
+            return entry[1]
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verifica el token y retorna sus claims.
+
+        :raises InvalidTokenError: Si el token es inválido, expiró o no se puede verificar.
+        """
+        token_hash = self._token_hash(token)
+        claims = self._cached(token_hash)
+        if claims is not None:
+            self._stats["cache_hits"] += 1
+            return claims
+        try:
+            claims = await self._verify_signature(token)
+        except PyJWTError:
+            self._stats["rejected"] += 1
+            raise
+        self._stats["verified"] += 1
+        self._remember(token_hash, claims)
+        return claims
+
+    async def _verify_signature(self, token: str) -> Dict[str, Any]:
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg")
+        options = {"require": ["exp"]}
+        if algorithm == "HS256" and self.session_secret:
+            return jwt.decode(token, self.session_secret, algorithms=["HS256"], options=options, leeway=self.leeway)
+        if algorithm == "RS256" and self.jwks is not None:
+            key = await self.jwks.get_key(header.get("kid", ""))
+            return jwt.decode(
+                token, key, algorithms=["RS256"], audience=self.audience, issuer=self.issuer,
+                options={**options, "verify_aud": self.audience is not None, "verify_iss": self.issuer is not None},
+                leeway=self.leeway,
+            )
+        raise InvalidTokenError(f"Algoritmo no permitido: {algorithm}")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self._stats, "cached_tokens": len(self._validated)}
+
+    async def aclose(self) -> None:
+        """Detiene el refresco periódico del JWKS."""
+        if self.jwks is not None:
+            await self.jwks.aclose()
+
+
+_token_verifier: Optional[TokenVerifier] = None
+
+
+def get_token_verifier() -> TokenVerifier:
+    """Verificador global, configurado con el tenant de Entra ID y JWT_SECRET."""
+    global _token_verifier
+    if _token_verifier is None:
+        # Import diferido: AuthSettings exige CLIENT_ID/TENANT_ID solo cuando se usa la autenticación
+        from core.auth_config import get_auth_settings
+
+        auth_settings = get_auth_settings()
+        _token_verifier = TokenVerifier(
+            jwks=JWKSCache(auth_settings.JWKS_URI, refresh_interval=settings.jwks_refresh_seconds),
+            issuer=auth_settings.ISSUER,
+            audience=auth_settings.AUDIENCE,
+            session_secret=auth_settings.JWT_SECRET,
+            max_cached_tokens=settings.auth_token_cache_size,
+        )
+    return _token_verifier
+
+
+def set_token_verifier(verifier: Optional[TokenVerifier]) -> None:
+    """Reemplaza el verificador global (por ejemplo, con un JWKS local en pruebas)."""
+    global _token_verifier
+    _token_verifier = verifier
+
+
+async def close_token_verifier() -> None:
+    """Detiene el refresco del JWKS del verificador global, si se creó (al apagar la aplicación)."""
+    if _token_verifier is not None:
+        await _token_verifier.aclose()
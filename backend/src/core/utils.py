@@ -1,20 +1,91 @@
-from datetime import datetime
-from pytz import timezone
-from docx import Document
-import pandas as pd
+from datetime import datetime, timezone
+import os
+import threading
+import time
 import timeit
 import uuid
-import tiktoken
-import pdb
 import io
+from typing import Optional
+
+from core.clock import get_clock
+
+
+class _UUID7Generator:
+    """
+    UUIDv7 (RFC 9562): 48 bits de milisegundos Unix, 12 bits de contador y 62
+    bits aleatorios. Los ids de un proceso son estrictamente crecientes: en el
+    mismo milisegundo avanza el contador (iniciado al azar en su mitad baja) y,
+    si se agota o el reloj retrocede, se toma el milisegundo siguiente al último.
+    Así las inserciones caen al final del índice en lugar de repartirse como con uuid4.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._counter = 0
+
+    def __call__(self, timestamp_ms: Optional[int] = None) -> uuid.UUID:
+        if timestamp_ms is not None:
+            # Marca de tiempo explícita (migraciones): sin estado de monotonía
+            return self._build(timestamp_ms, int.from_bytes(os.urandom(2), "big") & 0x7FF)
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+            elif self._counter < 0xFFF:
+                self._counter += 1
+            else:
+                self._last_ms += 1
+                self._counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+            return self._build(self._last_ms, self._counter)
+
+    @staticmethod
+    def _build(timestamp_ms: int, counter: int) -> uuid.UUID:
+        rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+        value = ((timestamp_ms & ((1 << 48) - 1)) << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b
+        return uuid.UUID(int=value)
+
+
+uuid7 = _UUID7Generator()
+
+
+def new_id(prefix: str = "") -> str:
+    """Id ordenado por tiempo: prefijo + UUIDv7 en 32 dígitos hexadecimales (p. ej. "p-0190c2...")."""
+    return f"{prefix}{uuid7().hex}"
 
 
-def genereta_id() -> str: 
-    now = datetime.now()
-    str_now = now.strftime("%Y%m%d")
-    uuid_id = str(uuid.uuid4())
-    chat_id = f'{str_now}-{uuid_id}'
-    return chat_id
+def id_to_bytes(value: str) -> bytes:
+    """
+    Los 16 bytes del UUID de un id (canónico, hexadecimal o con prefijo), para
+    columnas BINARY(16): 16 bytes por clave en lugar de 32-36 caracteres.
+
+    Ninguna tabla guarda ids en BINARY(16) todavía: el único id UUIDv7
+    persistido es el de inventory (y orders.product_id que lo referencia), que
+    viaja como texto por la API, el frontend y las herramientas del LLM. Solo
+    lo usa scripts/bench_id_keys.py para medir el ahorro de índice.
+    """
+    return bytes.fromhex(value.replace("-", "")[-32:])
+
+
+def id_from_bytes(value: bytes, prefix: str = "") -> str:
+    """Inverso de `id_to_bytes`: texto con el prefijo de la entidad."""
+    return f"{prefix}{value.hex()}"
+
+
+def id_timestamp(value: str) -> datetime:
+    """Instante (UTC) codificado en un id UUIDv7."""
+    timestamp_ms = int(value.replace("-", "")[-32:][:12], 16)
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+
+
+def genereta_id() -> str:
+    """
+    UUIDv7 canónico de referencia de un pedido en confirm_order_tool. No se
+    guarda: orders.id es BIGINT AUTO_INCREMENT y el número que ve el cliente es
+    el contador enum_order_table.
+    """
+    return str(uuid7())
 
 
 
@@ -41,8 +112,7 @@ def generate_order_id(last_order: Optional[Dict[str, Any]], threshold_minutes: i
         str: El ID de pedido generado (como cadena de caracteres) basado en el contador.
     """
     # Usar la hora de Colombia en lugar de datetime.now()
-    now_str = current_colombian_time()
-    now = datetime.strptime(now_str, '%Y-%m-%d %H:%M:%S')
+    now = get_clock().db_now()
     
     # Si no existe un pedido previo, se retorna el ID inicial "100000"
     if last_order is None:
@@ -73,7 +143,7 @@ def generate_order_id(last_order: Optional[Dict[str, Any]], threshold_minutes: i
 
 
 def current_colombian_time() -> str:
-    current_time = datetime.now(timezone('America/Bogota')).strftime('%Y-%m-%d %H:%M:%S')
+    current_time = get_clock().now().strftime('%Y-%m-%d %H:%M:%S')
     return current_time
 
 def timeit_decorator(func):
@@ -87,6 +157,7 @@ def timeit_decorator(func):
 
 def count_tokens(texts=None, model_reference="cl100k_base"):   
     if texts:
+        import tiktoken
         encoding = tiktoken.get_encoding(model_reference)
         count = encoding.encode(texts)
         return count
@@ -147,6 +218,8 @@ def extract_word_content(content: bytes) -> str:
     Returns:
         str: Texto extraído del archivo Word.
     """
+    from docx import Document
+
     # Convertir los bytes en un stream de memoria
     stream = io.BytesIO(content)
     # Abrir el documento usando python-docx
@@ -171,6 +244,8 @@ def extract_excel_content(content: bytes) -> str:
     Returns:
         str: Un string en formato JSONL con los registros del Excel.
     """
+    import pandas as pd
+
     try:
         # Crear un objeto BytesIO a partir de los bytes del archivo Excel
         excel_io = io.BytesIO(content)
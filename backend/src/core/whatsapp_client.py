@@ -0,0 +1,27 @@
+import asyncio
+import logging
+
+import requests
+
+from core.config import settings
+
+
+async def send_whatsapp_message(phone: str, text: str) -> bool:
+    """
+    Envía un mensaje de texto al usuario a través del gateway de WhatsApp.
+
+    :param phone: Número del usuario (el user_id del chat).
+    :param text: Texto a enviar.
+    :return: True si el gateway aceptó el mensaje, False en caso contrario.
+    """
+    url = f"{settings.whatsapp_api_url}{settings.whatsapp_message_path}"
+    try:
+        # requests es bloqueante: se ejecuta en un hilo para no frenar el event loop
+        response = await asyncio.to_thread(requests.post, url, json={"phone": phone, "message": text}, timeout=30)
+    except Exception as e:
+        logging.exception("Error enviando mensaje de WhatsApp a %s: %s", phone, e)
+        return False
+    if response.status_code != 200:
+        logging.error("El gateway de WhatsApp respondió %s para %s: %s", response.status_code, phone, response.text[:200])
+        return False
+    return True
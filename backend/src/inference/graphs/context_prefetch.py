@@ -0,0 +1,167 @@
+"""
+Precarga especulativa del contexto de un turno de chat.
+
+En un turno típico el flujo hacía, en serie: historial -> perfil del usuario
+(en cada salto del agente) -> get_order_status_tool -> get_menu_tool, con un
+salto de LLM extra por cada herramienta de consulta. Aquí se cargan las cuatro
+cosas en paralelo al inicio del turno y se inyectan en el prompt, de modo que
+el modelo rara vez necesita una herramienta de consulta.
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage
+
+from core.mysql_inventory_manager import MySQLInventoryManager, stock_availability
+from core.mysql_order_manager import MySQLOrderManager
+from core.mysql_user_manager import MySQLUserManager
+from inference.graphs.mysql_saver import MySQLSaver
+from inference.tools.tool_serializers import serialize_menu, serialize_order
+
+MENU_SNAPSHOT_TTL_SECONDS = 60
+
+# Herramientas de consulta que la precarga busca evitar
+LOOKUP_TOOLS = ("get_menu_tool", "search_menu_tool", "get_order_status_tool")
+
+_menu_snapshots: Dict[str, tuple] = {}
+
+
+class TurnStats:
+    """Contadores de un turno: saltos de LLM, herramientas llamadas y consultas a la base de datos."""
+
+    def __init__(self):
+        self.llm_hops = 0
+        self.tool_calls: Dict[str, int] = {}
+        self.prefetch_db_round_trips = 0
+        self.profile_loads_saved = 0
+        self.menu_cache_hit = False
+        # La respuesta final salió de la plantilla de una herramienta terminal
+        self.terminal_reply = False
+        # Instante límite (time.monotonic()) del turno para las llamadas al LLM
+        self.deadline: Optional[float] = None
+
+    def record_tool_call(self, tool_name: str) -> None:
+        self.tool_calls[tool_name] = self.tool_calls.get(tool_name, 0) + 1
+
+
+# El turno en curso; los nodos del grafo heredan el contexto de invoke_flow
+current_turn_stats: ContextVar[Optional[TurnStats]] = ContextVar("current_turn_stats", default=None)
+
+
+class TurnMetrics:
+    """Agregado de TurnStats de todos los turnos del proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {
+            "turns": 0, "llm_hops": 0, "lookup_tool_calls": 0, "tool_calls": 0,
+            "prefetch_db_round_trips": 0, "profile_loads_saved": 0, "menu_cache_hits": 0,
+            "terminal_replies": 0,
+        }
+
+    def record(self, stats: TurnStats) -> None:
+        lookups = sum(stats.tool_calls.get(name, 0) for name in LOOKUP_TOOLS)
+        with self._lock:
+            self._totals["turns"] += 1
+            self._totals["llm_hops"] += stats.llm_hops
+            self._totals["lookup_tool_calls"] += lookups
+            self._totals["tool_calls"] += sum(stats.tool_calls.values())
+            self._totals["prefetch_db_round_trips"] += stats.prefetch_db_round_trips
+            self._totals["profile_loads_saved"] += stats.profile_loads_saved
+            self._totals["menu_cache_hits"] += int(stats.menu_cache_hit)
+            self._totals["terminal_replies"] += int(stats.terminal_reply)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = dict(self._totals)
+        turns = totals["turns"] or 1
+        totals["llm_hops_per_turn"] = round(totals["llm_hops"] / turns, 3)
+        totals["lookup_tool_calls_per_turn"] = round(totals["lookup_tool_calls"] / turns, 3)
+        return totals
+
+
+turn_metrics = TurnMetrics()
+
+
+def format_user_info(user_data: Optional[Dict[str, Any]], user_id: str) -> str:
+    """Sección 'Información del Cliente' del prompt."""
+    if not user_data:
+        return ""
+    return (
+        f"Nombre: {user_data.get('name', 'No disponible')}\n"
+        f"Dirección: {user_data.get('address', 'No disponible')}\n"
+        f"user_id: {user_id}\n"
+    )
+
+
+async def _menu_snapshot(restaurant_name: str, stats: TurnStats) -> str:
+    """
+    Menú compacto del restaurante, cacheado unos segundos entre turnos.
+
+    Los productos se cachean; lo "agotado" sale del caché de existencias, que
+    las reservas de pedidos de este proceso mantienen al día. Si ese caché
+    venció, se vuelve a leer el inventario.
+    """
+    cached = _menu_snapshots.get(restaurant_name)
+    availability = stock_availability.get(restaurant_name)
+    if cached and cached[0] > time.monotonic() and availability is not None:
+        stats.menu_cache_hit = True
+        return serialize_menu(cached[1], availability)
+    stats.prefetch_db_round_trips += 1
+    items = await MySQLInventoryManager().get_inventory(restaurant_name)
+    if items:
+        _menu_snapshots[restaurant_name] = (time.monotonic() + MENU_SNAPSHOT_TTL_SECONDS, items)
+    return serialize_menu(items)
+
+
+def invalidate_menu_snapshot(restaurant_name: Optional[str] = None) -> None:
+    """Descarta el menú cacheado (todos los restaurantes si no se indica uno)."""
+    if restaurant_name is None:
+        _menu_snapshots.clear()
+    else:
+        _menu_snapshots.pop(restaurant_name, None)
+
+
+async def prefetch_turn_context(user_id: str, restaurant_name: str, stats: TurnStats) -> Dict[str, Any]:
+    """
+    Carga en paralelo historial, perfil, pedido actual y menú compacto.
+
+    Un fallo en cualquiera de las cargas no rompe el turno: esa sección queda
+    vacía y el modelo puede seguir usando la herramienta correspondiente.
+
+    Retorna:
+        Dict[str, Any]: {"history": [...], "prompt_context": {"user_info", "current_order", "menu"}}
+    """
+    # historial, perfil y pedido actual (get_order_status_by_user_id hace 2 consultas)
+    stats.prefetch_db_round_trips += 4
+    history, user_data, current_order, menu = await asyncio.gather(
+        MySQLSaver().get_conversation_history(user_id),
+        MySQLUserManager().get_user(user_id),
+        MySQLOrderManager().get_order_status_by_user_id(user_id),
+        _menu_snapshot(restaurant_name, stats),
+        return_exceptions=True,
+    )
+    for name, value in (("historial", history), ("usuario", user_data), ("pedido", current_order), ("menú", menu)):
+        if isinstance(value, Exception):
+            logging.error("Error en la precarga de %s para %s: %s", name, user_id, value)
+
+    history_messages: List[BaseMessage] = [] if isinstance(history, Exception) else history
+    if isinstance(user_data, Exception):
+        user_data = None
+    if isinstance(current_order, Exception):
+        current_order = None
+    if isinstance(menu, Exception):
+        menu = ""
+
+    return {
+        "history": history_messages,
+        "prompt_context": {
+            "user_info": format_user_info(user_data, user_id),
+            "current_order": serialize_order(current_order) if current_order else "El cliente no tiene pedidos hoy.",
+            "menu": menu or "No disponible, usa get_menu_tool.",
+        },
+    }
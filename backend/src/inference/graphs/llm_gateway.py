@@ -0,0 +1,255 @@
+"""
+Capa de llamadas al LLM con plazos, cobertura (hedging), modelo de respaldo y
+cortocircuito (circuit breaker).
+
+Una respuesta lenta de OpenAI dejaba al usuario de WhatsApp esperando decenas de
+segundos. `ResilientLLM` envuelve el modelo con herramientas enlazadas y:
+    - limita cada llamada al menor entre su timeout y lo que queda del
+      presupuesto del turno,
+    - si la primera solicitud supera el p95 observado, lanza un duplicado y se
+      queda con la primera respuesta (la otra se cancela),
+    - si el modelo principal falla o se agota su plazo, reintenta con el modelo
+      de respaldo (OPENAI_FALLBACK_MODEL) con el tiempo restante,
+    - tras varias fallas seguidas abre el circuito y durante el enfriamiento
+      responde de inmediato con LLMUnavailableError, para que el agente envíe un
+      mensaje fijo en vez de esperar a que cada solicitud expire.
+
+Cualquier objeto con `ainvoke(messages)` sirve como modelo, lo que permite
+probarlo con un stub local que inyecta latencia.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from core.config import settings
+
+# Respuesta fija cuando no hay modelo disponible
+LLM_UNAVAILABLE_REPLY = (
+    "😔 En este momento estamos teniendo problemas técnicos para procesar tu mensaje. "
+    "Por favor intenta de nuevo en unos minutos. ¡Gracias por tu paciencia!"
+)
+
+# Muestras mínimas antes de confiar en el p95 observado para decidir el hedge
+MIN_LATENCY_SAMPLES = 20
+
+
+class LLMUnavailableError(Exception):
+    """No se obtuvo respuesta del LLM dentro del plazo (o el circuito está abierto)."""
+
+
+class LatencyTracker:
+    """Ventana deslizante de latencias exitosas para estimar el p95."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+
+class CircuitBreaker:
+    """
+    Circuito de tres estados: cerrado -> abierto (tras `failure_threshold` fallas
+    seguidas) -> semiabierto al terminar el enfriamiento, donde una sola prueba
+    decide si vuelve a cerrarse o a abrirse.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """Libera la prueba semiabierta sin resultado (llamada cancelada): la próxima vuelve a probar."""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            if self._opened_at is None or self._probing:
+                logging.error("Circuito del LLM abierto tras %d fallas seguidas", self._failures)
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class ResilientLLM:
+    """
+    Envoltorio del modelo principal (y opcionalmente uno de respaldo).
+
+    :param primary: Modelo principal con `ainvoke`.
+    :param fallback: Modelo de respaldo con `ainvoke`, o None.
+    :param call_timeout: Plazo máximo por llamada, en segundos.
+    :param hedge_after: Espera antes del hedge mientras no hay suficientes muestras para el p95.
+    :param min_hedge_after: Espera mínima antes del hedge aunque el p95 sea menor.
+    :param breaker: Circuit breaker del modelo principal.
+    """
+
+    def __init__(self, primary: Any, fallback: Any = None, call_timeout: float = 15.0,
+                 hedge_after: float = 5.0, min_hedge_after: float = 0.5,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.primary = primary
+        self.fallback = fallback
+        self.call_timeout = call_timeout
+        self.hedge_after = hedge_after
+        self.min_hedge_after = min_hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self._stats: Dict[str, int] = {
+            "calls": 0, "primary_ok": 0, "hedges": 0, "hedge_wins": 0, "primary_failures": 0,
+            "fallback_calls": 0, "fallback_ok": 0, "breaker_rejections": 0, "unavailable": 0,
+        }
+
+    def _hedge_delay(self) -> float:
+        p95 = self.latency.percentile(95)
+        return max(self.min_hedge_after, p95 if p95 is not None else self.hedge_after)
+
+    def _budget(self, deadline: Optional[float]) -> float:
+        """Segundos disponibles para la próxima llamada."""
+        budget = self.call_timeout
+        if deadline is not None:
+            budget = min(budget, deadline - time.monotonic())
+        return budget
+
+    async def ainvoke(self, messages: List[Any], deadline: Optional[float] = None) -> Any:
+        """
+        Llama al LLM respetando el plazo.
+
+        :param messages: Mensajes del prompt.
+        :param deadline: Instante límite (time.monotonic()) del turno, o None.
+        :return: El mensaje de respuesta del modelo.
+        :raises LLMUnavailableError: Si ningún modelo respondió a tiempo o el circuito está abierto.
+        """
+        self._stats["calls"] += 1
+        if self.breaker.allow():
+            try:
+                response = await self._hedged_call(messages, self._budget(deadline))
+                self.breaker.record_success()
+                self._stats["primary_ok"] += 1
+                return response
+            except Exception as e:
+                self.breaker.record_failure()
+                self._stats["primary_failures"] += 1
+                logging.warning("Falla del modelo principal (%s): %r", type(e).__name__, e)
+            except BaseException:
+                # Turno cancelado a mitad de la llamada (CancelledError): no es una falla del
+                # modelo, pero si era la prueba semiabierta el circuito no puede quedar tomado
+                self.breaker.release_probe()
+                raise
+        else:
+            self._stats["breaker_rejections"] += 1
+
+        budget = self._budget(deadline)
+        if self.fallback is not None and budget > 0:
+            self._stats["fallback_calls"] += 1
+            try:
+                response = await asyncio.wait_for(self.fallback.ainvoke(messages), timeout=budget)
+                self._stats["fallback_ok"] += 1
+                return response
+            except Exception as e:
+                logging.error("Falla del modelo de respaldo (%s): %r", type(e).__name__, e)
+
+        self._stats["unavailable"] += 1
+        raise LLMUnavailableError("No hay respuesta del LLM dentro del plazo")
+
+    async def _hedged_call(self, messages: List[Any], budget: float) -> Any:
+        """Llamada al modelo principal con un duplicado si la primera tarda más del p95."""
+        if budget <= 0:
+            raise asyncio.TimeoutError("Sin presupuesto para llamar al LLM")
+        start = time.monotonic()
+        end = start + budget
+        tasks = [asyncio.ensure_future(self.primary.ainvoke(messages))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=min(self._hedge_delay(), budget))
+            if not done and time.monotonic() < end:
+                self._stats["hedges"] += 1
+                tasks.append(asyncio.ensure_future(self.primary.ainvoke(messages)))
+
+            pending = set(tasks)
+            last_error: Optional[BaseException] = None
+            while pending:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self._stats["hedge_wins"] += 1
+                        self.latency.record(time.monotonic() - start)
+                        return task.result()
+                    last_error = task.exception()
+            if last_error is not None and not pending:
+                raise last_error
+            raise asyncio.TimeoutError(f"El LLM no respondió en {budget:.1f}s")
+        finally:
+            # Cancelar la solicitud perdedora (o ambas si se agotó el plazo)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def metrics(self) -> Dict[str, Any]:
+        p95 = self.latency.percentile(95)
+        return {
+            **self._stats,
+            "breaker_state": self.breaker.state,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+            "hedge_after_seconds": round(self._hedge_delay(), 3),
+        }
+
+
+def build_resilient_llm(tools: List[Any]) -> ResilientLLM:
+    """Construye el modelo principal y el de respaldo (si está configurado) con las herramientas enlazadas."""
+    from langchain_openai import ChatOpenAI
+    from pydantic import SecretStr
+
+    def bound(model: str):
+        # Los reintentos y plazos los maneja ResilientLLM, no el cliente
+        llm = ChatOpenAI(api_key=SecretStr(settings.openai_api_key), model=model,
+                         timeout=settings.llm_call_timeout_seconds, max_retries=0)
+        return llm.bind_tools(tools=tools)
+
+    fallback_model = settings.openai_fallback_model
+    return ResilientLLM(
+        primary=bound(settings.openai_model),
+        fallback=bound(fallback_model) if fallback_model else None,
+        call_timeout=settings.llm_call_timeout_seconds,
+        hedge_after=settings.llm_hedge_after_seconds,
+        breaker=CircuitBreaker(settings.llm_breaker_failures, settings.llm_breaker_cooldown_seconds),
+    )
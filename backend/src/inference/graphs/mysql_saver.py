@@ -7,7 +7,8 @@ from datetime import datetime
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, BaseMessage
 from core.config import settings
 from core.db_pool import DBConnectionPool
-from core.utils import current_colombian_time
+from core.clock import get_clock
+from core.partitioning import default_partition_clause
 
 
 
@@ -24,9 +25,10 @@ class MySQLSaver:
             async with conn.cursor() as cursor:
                 try:
                     # Create conversations table
-                    await cursor.execute("""
+                    # Particionada por mes (core.partitioning): la clave primaria incluye created_at
+                    await cursor.execute(f"""
                     CREATE TABLE IF NOT EXISTS conversations (
-                        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                        id BIGINT AUTO_INCREMENT,
                         user_id VARCHAR(255) NOT NULL,
                         conversation_id VARCHAR(255) NOT NULL,
                         conversation_name VARCHAR(255) NOT NULL,
@@ -41,9 +43,10 @@ class MySQLSaver:
                         ai_message_metadata JSON,
                         ai_message_id VARCHAR(255),
                         rate BOOLEAN DEFAULT FALSE,
+                        PRIMARY KEY (id, created_at),
                         INDEX (conversation_id),
-                        INDEX (user_id)
-                    )
+                        INDEX (user_id, created_at)
+                    ) {default_partition_clause("created_at")}
                     """)
                     await conn.commit()
                     print("Table created successfully")
@@ -57,7 +60,7 @@ class MySQLSaver:
             "additional_kwargs": getattr(message, "additional_kwargs", {}),
             "response_metadata": getattr(message, "response_metadata", {}),
             "id": getattr(message, "id", ""),
-            "created_at": current_colombian_time()
+            "created_at": get_clock().db_now().isoformat(sep=" ")
         }
     
     async def save_conversation(self, user_message: BaseMessage, ai_message: BaseMessage, 
@@ -69,7 +72,8 @@ class MySQLSaver:
         ai_msg_dict = self._message_to_dict(ai_message)
         
         # Generate today's date as conversation_id
-        today_date = current_colombian_time().split()[0]  # Obtener solo la fecha (YYYY-MM-DD)
+        now = get_clock().db_now()
+        today_date = now.date().isoformat()  # Obtener solo la fecha (YYYY-MM-DD)
         
         async with pool.acquire() as conn:
             async with conn.cursor() as cursor:
@@ -81,8 +85,6 @@ class MySQLSaver:
                     ) VALUES (%s, %s, %s, %s, %s, %s)
                     """
                     
-                    now = datetime.strptime(current_colombian_time(), '%Y-%m-%d %H:%M:%S')
-                    
                     await cursor.execute(query, (
                         user_id,
                         today_date,  # Using today's date as conversation_id
@@ -114,10 +116,8 @@ class MySQLSaver:
             
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 try:
-                    # Get today's date range
-                    today = datetime.now().date()
-                    today_start = datetime.combine(today, datetime.min.time())
-                    today_end = datetime.combine(today, datetime.max.time())
+                    # Get today's date range (Bogotá time)
+                    today_start, today_end = get_clock().day_bounds()
                     
                     # Ordenar por created_at para obtener los mensajes en orden cronológico
                     # y limitar a los últimos N mensajes (ajustar según necesidad)
@@ -1,34 +1,20 @@
 from typing import Optional, Literal, List, Any, Union, TypedDict
-from pydantic import SecretStr
+from functools import lru_cache
 
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, BaseMessage, ToolMessage, AnyMessage
 from langgraph.graph import StateGraph, START, MessagesState, END
-from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
-from langgraph.prebuilt import ToolNode
 
 from core.config import settings
 from inference.graphs.mysql_saver import MySQLSaver
 from core.utils import current_colombian_time
-import pdb
-from IPython.display import Image, display
-from langchain_core.runnables.graph import CurveStyle, MermaidDrawMethod, NodeStyles
-from datetime import datetime
-from inference.tools.restaurant_tools import get_menu_tool,confirm_order_tool,get_order_status_tool,send_menu_pdf_tool, get_adiciones_tool, update_order_tool
+from inference.tools.restaurant_tools import get_menu_tool,confirm_order_tool,get_order_status_tool,send_menu_pdf_tool, get_adiciones_tool, update_order_tool, search_menu_tool
+from inference.tools.tool_serializers import serialize_tool_result
+from inference.tools.terminal_replies import render_terminal_reply
+from inference.graphs.llm_gateway import LLM_UNAVAILABLE_REPLY, LLMUnavailableError, build_resilient_llm
+from inference.graphs.context_prefetch import TurnStats, current_turn_stats, format_user_info, prefetch_turn_context, turn_metrics
 import json
+import time
 import asyncio
-from langchain_openai import ChatOpenAI
-import sys
-import asyncio
-
-# Si estamos en Python 3.11 o superior, parcheamos create_task para ignorar el argumento 'context'
-if sys.version_info >= (3, 11):
-    original_create_task = asyncio.create_task
-
-    def create_task_patch(coro, *, context=None, name=None):
-        # Ignoramos 'context' si se pasa, pero pasamos 'name'
-        return original_create_task(coro, name=name)
-
-    asyncio.create_task = create_task_patch
 
 ######################################################
 # 1) Estado del Bot (hereda messages)
@@ -42,6 +28,8 @@ class RestaurantState(MessagesState):
     thread_id: Optional[str] = None
     restaurant_name: Optional[str] = None
     user_id: Optional[str] = None
+    # Secciones del prompt precargadas en invoke_flow (user_info, current_order, menu)
+    turn_context: Optional[dict] = None
         # - consultar_menu:
 
         #     Utiliza esta herramienta para mostrar el menú actualizado del restaurante.
@@ -55,13 +43,23 @@ Eres un asistente de IA especializado en la atención a clientes para nuestro re
 *Información del Cliente:*
 {{user_info}}
 
+*Pedido actual del cliente (al inicio de este mensaje):*
+{{current_order}}
+
+*Menú disponible (id | nombre | precio | descripción):*
+{{menu}}
+
 ---
 
 ### Herramientas Disponibles
 
 1. *get_menu_tool*  
    - *Función:* Obtener el menú actualizado de productos disponibles.  
-   - *Uso:* Utiliza esta herramienta para mostrar al cliente las opciones disponibles o verificar precios y disponibilidad.
+   - *Uso:* El *Menú disponible* ya está en este prompt. Utiliza esta herramienta solo si el menú no está disponible; para encontrar un producto concreto usa *search_menu_tool*.
+
+   *search_menu_tool*  
+   - *Función:* Buscar en el menú los productos que coinciden con lo que dijo el cliente (ej. "la gringa", "go papa por dos").  
+   - *Uso:* Utilízala cuando el producto no aparezca en el *Menú disponible* o no sepas a cuál se refiere el cliente. Retorna solo los productos que coinciden, con id, nombre y precio, ordenados del más al menos parecido; toma el primero salvo que el cliente indique otro.
 
 2. *get_adiciones_tool*  
    - *Función:* Obtener la lista de adiciones disponibles para los platos.  
@@ -76,10 +74,10 @@ Eres un asistente de IA especializado en la atención a clientes para nuestro re
 3. *confirm_order_tool*  
    - *Función:* Registra y actualiza el documento del pedido en MySQL cada vez que se confirme un producto o plato.  
    - *Procedimiento:*  
-     - Antes de usar esta herramienta, llama a *get_menu_tool* para obtener en tiempo real:
-       - La disponibilidad del producto.
+     - Antes de usar esta herramienta, toma del *Menú disponible* (o de *search_menu_tool* si el producto no aparece):
        - El id y nombre del producto.
        - El precio unitario.
+     - La herramienta verifica y reserva las existencias al registrar el pedido; no uses *get_menu_tool* para comprobar disponibilidad. Si responde que el producto está agotado o que no alcanzan las unidades, informa al cliente y ofrece otra cantidad u otro producto.
      - **PROTOCOLO OBLIGATORIO PARA PEDIDOS CON ADICIONES:**
        - Si el cliente menciona CUALQUIER adición o personalización:
          1. **PRIMERO** usa *get_adiciones_tool* para verificar disponibilidad y precios.
@@ -88,8 +86,8 @@ Eres un asistente de IA especializado en la atención a clientes para nuestro re
          4. Al llamar a confirm_order_tool **DEBES INCLUIR** el parámetro "adicion" con el formato: "Nombre adición ($precio) x cantidad".
          5. **NUNCA** omitas el uso de get_adiciones_tool cuando hay adiciones.
      - *Datos requeridos para confirmar un producto:*  
-       - *product_id:* ID obtenido de get_menu_tool.  
-       - *product_name:* Nombre obtenido de get_menu_tool.  
+       - *product_id:* ID obtenido del *Menú disponible*.  
+       - *product_name:* Nombre obtenido del *Menú disponible*.  
        - *quantity:* Cantidad a comprar (preguntar al cliente).  
        - *price:* Precio total (cantidad × precio unitario del producto + suma de precios de todas las adiciones solicitadas).  
        - *observaciones:* Detalles específicos del pedido (añadir si el cliente los menciona, o dejar en blanco).
@@ -119,7 +117,7 @@ Eres un asistente de IA especializado en la atención a clientes para nuestro re
          - Para "una go papa x2 con chicharrón" = 1 porción de chicharrón (no 2)
          - Solo usar cantidad 2 en adiciones si el cliente dice explícitamente "doble porción de chicharrón" o similar
        - La Go Papita es el único plato que no tiene versiones x2 o familiar.
-       - Siempre verifica con get_menu_tool el nombre exacto y precio de cada versión.
+       - Siempre verifica en el *Menú disponible* el nombre exacto y precio de cada versión.
      - *Salchipapas en el menú:*  
        - Pueden ser del tipo "<nombre salchipapa> x2" o "<nombre salchipapa> familiar".  
        - Si el cliente solicita una salchipapa "x2", por defecto registra la cantidad como 1, a menos que el cliente especifique explícitamente que quiere dos unidades.  
@@ -128,7 +126,8 @@ Eres un asistente de IA especializado en la atención a clientes para nuestro re
 4. *get_order_status_tool*  
    - *Función:* Consulta el estado del pedido de un cliente.  
    - *Uso:*  
-     - Llama a esta herramienta cuando el cliente pregunte por el estado de su pedido o su progreso.  
+     - El *Pedido actual del cliente* ya está en este prompt; úsalo para responder directamente.  
+     - Llama a esta herramienta solo cuando el cliente pida el estado actualizado de su pedido o ese dato no esté disponible.  
      - Para su uso, solicita al cliente su dirección. Si no la proporciona, pregunta primero por ella.  
      - Presenta la información de forma clara y amigable.
 
@@ -146,7 +145,7 @@ Eres un asistente de IA especializado en la atención a clientes para nuestro re
      - **IMPORTANTE:** Si el cliente dice frases como "quiero agregar chicharrón", "ponle extra queso", o "con observación sin cebolla" sin haber mencionado un producto específico en la conversación actual, DEBES asumir que quiere modificar un pedido existente y usar esta herramienta.
      - Solo funciona con pedidos en estado 'pendiente' o 'en preparación'.  
    - *Datos requeridos para actualizar un producto:*  
-     - *enum_order_table:* Identificador del pedido a actualizar (obtenido de get_order_status_tool).  
+     - *enum_order_table:* Identificador del pedido a actualizar (el número del *Pedido actual del cliente*).  
      - *product_name:* Nombre del producto a actualizar.  
      - *user_id:* ID del cliente (ya incluido automáticamente).  
      - *quantity:* (Opcional) Nueva cantidad del producto.  
@@ -156,8 +155,8 @@ Eres un asistente de IA especializado en la atención a clientes para nuestro re
      - *new_product_id:* (Opcional) Nuevo ID de producto (para cambiar el producto).  
      - *price:* (Opcional) Nuevo precio.  
    - *Procedimiento:*  
-     - Primero, verifica el estado del pedido con get_order_status_tool.  
-     - Si el cliente quiere cambiar el producto por otro diferente, usa get_menu_tool para obtener la información del nuevo producto.  
+     - Primero, verifica el estado del pedido en *Pedido actual del cliente*.  
+     - Si el cliente quiere cambiar el producto por otro diferente, toma la información del nuevo producto del *Menú disponible*.  
      - Si el cliente quiere modificar adiciones, usa get_adiciones_tool para verificar disponibilidad y precios.  
      - Confirma todos los cambios con el cliente antes de ejecutar la actualización.  
      - Informa al cliente sobre el resultado de la actualización.
@@ -172,12 +171,12 @@ Eres un asistente de IA especializado en la atención a clientes para nuestro re
      "¡Hola! 😊 ¿En qué puedo ayudarte hoy? Puedo ayudarte a tomar tu pedido o enviarte nuestro menú completo. ¿Qué prefieres?"
 
 2. *Verificación de Órdenes Pendientes:*  
-   - Si el cliente no tiene órdenes pendientes (verifica con *get_order_status_tool*), muestra el menú y ayuda a iniciar un pedido.  
+   - Si el cliente no tiene órdenes pendientes (revisa *Pedido actual del cliente*), muestra el menú y ayuda a iniciar un pedido.  
    - Si hay órdenes pendientes, informa al cliente sobre su estado y pregunta si desea agregar más productos.
 
 3. *Proceso para Confirmar un Pedido:*  
-   - Antes de confirmar cualquier producto, *verifica la disponibilidad* usando *get_menu_tool*.  
-   - Una vez confirmada la disponibilidad y seleccionado el producto, confirma la elección con el cliente y llama a *confirm_order_tool* con los datos requeridos.  
+   - No ofrezcas productos marcados como "(agotado)" en el *Menú disponible*.  
+   - Una vez seleccionado el producto, confirma la elección con el cliente y llama a *confirm_order_tool* con los datos requeridos (la herramienta reserva las existencias).  
    - Si el cliente tiene una orden en curso y desea agregar productos, asegúrate de:
      - Usar la misma dirección y nombre del cliente (a menos que la orden esté completada).  
      - No agregar productos si el pedido está "en entrega"; en ese caso, sugiere iniciar un nuevo pedido.
@@ -200,6 +199,18 @@ Eres un asistente de IA especializado en la atención a clientes para nuestro re
 ######################################################
 # 2) main_agent_node (asíncrono) + tools usage
 ######################################################
+@lru_cache(maxsize=1)
+def get_llm_with_tools():
+    """
+    Construye una sola vez el cliente de OpenAI con las herramientas enlazadas.
+    bind_tools => el LLM sabe formatear la tool call como
+    {"tool_calls": [{"name": "search_tool", "args": "..."}]}
+    El cliente va envuelto en ResilientLLM (plazos, hedge, modelo de respaldo y circuit breaker).
+    """
+    return build_resilient_llm(
+        tools=[confirm_order_tool, get_menu_tool, search_menu_tool, get_order_status_tool, send_menu_pdf_tool, get_adiciones_tool, update_order_tool]
+    )
+
 async def main_agent_node(state: RestaurantState) -> RestaurantState:
     """
     1) Inyecta system prompt
@@ -211,48 +222,53 @@ async def main_agent_node(state: RestaurantState) -> RestaurantState:
     """
     # Preparar la conversacion
     max_messages = 10 
-    # Obtener información del usuario si está disponible en el estado
-    user_info = ""
     user_id = state["user_id"]
-        
-        # Importar el gestor de usuarios
-    from core.mysql_user_manager import MySQLUserManager
-    user_manager = MySQLUserManager()
-    
-    # Obtener información del usuario
-    user_data = await user_manager.get_user(user_id)
-    print(f"Información del Usuario: {user_data}")
-    if user_data:
-        user_info = (
-            f"Nombre: {user_data.get('name', 'No disponible')}\n"
-            f"Dirección: {user_data.get('address', 'No disponible')}"
-            f"user_id: {user_id}\n"
-            
-        )
-
-    # Inyectar la información del usuario en el prompt del sistema
-    system_prompt_with_user = SYSTEM_PROMPT.replace("{{fecha-hora}}", current_colombian_time()).replace("{{user_info}}", user_info).replace("{{restaurant_name}}", state.get("restaurant_name", "go_papa"))
+    turn_stats = current_turn_stats.get()
+    if turn_stats is not None:
+        turn_stats.llm_hops += 1
+
+    # Contexto precargado en invoke_flow; si no existe (invocación directa del grafo) se carga el usuario
+    turn_context = state.get("turn_context")
+    if turn_context:
+        if turn_stats is not None:
+            turn_stats.profile_loads_saved += 1
+    else:
+        from core.mysql_user_manager import MySQLUserManager
+        user_data = await MySQLUserManager().get_user(user_id)
+        turn_context = {
+            "user_info": format_user_info(user_data, user_id),
+            "current_order": "No disponible, usa get_order_status_tool.",
+            "menu": "No disponible, usa get_menu_tool.",
+        }
+
+    # Inyectar la información del usuario, su pedido actual y el menú en el prompt del sistema
+    system_prompt_with_user = (
+        SYSTEM_PROMPT.replace("{{fecha-hora}}", current_colombian_time())
+        .replace("{{user_info}}", turn_context["user_info"])
+        .replace("{{current_order}}", turn_context["current_order"])
+        .replace("{{menu}}", turn_context["menu"])
+        .replace("{{restaurant_name}}", state.get("restaurant_name") or "go_papa")
+    )
     system_msg = SystemMessage(content=system_prompt_with_user)
     new_messages = [system_msg] + state["messages"][-max_messages:]
 
-    # 1) Preparamos el LLM que tenga "search_tool" enlazado
-    llm_raw = ChatOpenAI(api_key=SecretStr(settings.openai_api_key),
-                        model=settings.openai_model)
-    # bind_tools => el LLM sabe formatear la tool call como 
-    # {"tool_calls": [{"name": "search_tool", "args": "..."}]}
-    # In main_agent_node function
-    llm_with_tools = llm_raw.bind_tools(
-    tools=[confirm_order_tool, get_menu_tool, get_order_status_tool, send_menu_pdf_tool, get_adiciones_tool, update_order_tool]
-        )
+    # 1) LLM con las herramientas enlazadas (se construye una sola vez por proceso)
+    llm_with_tools = get_llm_with_tools()
     # 2) Usar ainvoke en lugar de invoke para un procesamiento verdaderamente asíncrono
-    response_msg = await llm_with_tools.ainvoke(new_messages)
+    try:
+        response_msg = await llm_with_tools.ainvoke(
+            new_messages, deadline=turn_stats.deadline if turn_stats is not None else None
+        )
+    except LLMUnavailableError:
+        # Sin modelo disponible a tiempo: mensaje fijo en lugar de dejar al usuario esperando
+        response_msg = AIMessage(content=LLM_UNAVAILABLE_REPLY)
     
     # Verificar y procesar llamadas a herramientas
     tool_calls_verified = []
     if isinstance(response_msg, AIMessage) and hasattr(response_msg, 'tool_calls') and response_msg.tool_calls:
         for tool_call in response_msg.tool_calls:
 
-            if tool_call["name"] == "get_menu_tool":
+            if tool_call["name"] in ("get_menu_tool", "search_menu_tool"):
                 print(f"\033[32m Tool Call: {tool_call['name']}  conversation_id {state['thread_id']}\033[0m")
 
                 arguments = tool_call["args"]
@@ -364,6 +380,16 @@ def route_after_agent(
     else:
         return "__end__"
 
+def route_after_tools(state: RestaurantState) -> Literal["AgentNode", "__end__"]:
+    """
+    Tras ejecutar herramientas, termina el turno si ToolsNode ya dejó la respuesta
+    final (herramientas terminales); si no, el agente redacta la respuesta.
+    """
+    last_message = state["messages"][-1]
+    if isinstance(last_message, AIMessage) and not last_message.tool_calls:
+        return "__end__"
+    return "AgentNode"
+
 ######################################################
 # 3) Construir el Graph + checkpoint
 ######################################################
@@ -380,17 +406,18 @@ class RestaurantChatAgent:
         # 3)
         graph.add_edge(START, "AgentNode")
         graph.add_conditional_edges("AgentNode", route_after_agent)
-        graph.add_edge("ToolsNode", "AgentNode")
+        graph.add_conditional_edges("ToolsNode", route_after_tools)
         # graph.add_edge("AgentNode", END)
 
         # 5) Compilar
         self.app = graph.compile() 
 
-        # (Opcional) Generar imagen del grafo
+        # (Opcional) Generar imagen del grafo; las utilidades de dibujo se importan
+        # solo aquí para no cargarlas (IPython, mermaid) en el arranque del servicio
+        # from langchain_core.runnables.graph import MermaidDrawMethod
         # image_data = self.app.get_graph().draw_mermaid_png(draw_method=MermaidDrawMethod.API)
-        # image = Image(image_data)
         # with open("graph_image.png", "wb") as f:
-        #     f.write(image.data)
+        #     f.write(image_data)
 
     async def invoke_flow(
     self,
@@ -400,27 +427,33 @@ class RestaurantChatAgent:
     user_id: str,
     restaurant_name: Optional[str]
     ) -> tuple[RestaurantState, str]:
-        # 1. Recuperar historial previo
-        mysql_saver = MySQLSaver()
-        history_messages = await mysql_saver.get_conversation_history(
-            user_id
-        )
-        # 2. Construir lista de mensajes completa
-        new_human_message = HumanMessage(
-            content=user_input,
-            response_metadata={"timestamp": current_colombian_time()}
-        )
-        all_messages = history_messages + [new_human_message]
-        # 3. Ejecutar el flujo
-        new_state = await self.app.ainvoke(
-            {
-                "messages": all_messages,
-                "thread_id": conversation_id,
-                "restaurant_name": restaurant_name,
-                "user_id": user_id,
-            },
-            config={"configurable": {"thread_id": conversation_id, "user_id": user_id}},
-        )
+        turn_stats = TurnStats()
+        turn_stats.deadline = time.monotonic() + settings.llm_turn_budget_seconds
+        stats_token = current_turn_stats.set(turn_stats)
+        try:
+            # 1. Precargar en paralelo historial, perfil, pedido actual y menú
+            context = await prefetch_turn_context(user_id, restaurant_name or "go_papa", turn_stats)
+            history_messages = context["history"]
+            # 2. Construir lista de mensajes completa
+            new_human_message = HumanMessage(
+                content=user_input,
+                response_metadata={"timestamp": current_colombian_time()}
+            )
+            all_messages = history_messages + [new_human_message]
+            # 3. Ejecutar el flujo
+            new_state = await self.app.ainvoke(
+                {
+                    "messages": all_messages,
+                    "thread_id": conversation_id,
+                    "restaurant_name": restaurant_name,
+                    "user_id": user_id,
+                    "turn_context": context["prompt_context"],
+                },
+                config={"configurable": {"thread_id": conversation_id, "user_id": user_id}},
+            )
+        finally:
+            current_turn_stats.reset(stats_token)
+            turn_metrics.record(turn_stats)
 
         # 4. Extraer y guardar solo el último intercambio
         new_messages = new_state["messages"][len(all_messages):]
@@ -429,7 +462,7 @@ class RestaurantChatAgent:
             raise ValueError("No se generó respuesta de AI")
         ai_response = new_ai_messages[-1]
 
-        doc_id = await mysql_saver.save_conversation(
+        doc_id = await MySQLSaver().save_conversation(
             user_message=new_human_message,
             ai_message=ai_response,
             conversation_id=conversation_id,
@@ -460,14 +493,20 @@ async def parallel_tools_node(state: RestaurantState) -> RestaurantState:
     tasks = []
     tool_call_indices = []
     
+    turn_stats = current_turn_stats.get()
     for i, tool_call in enumerate(tool_calls):
         tool_name = tool_call["name"]
         tool_args = tool_call["args"]
+        if turn_stats is not None:
+            turn_stats.record_tool_call(tool_name)
         
         # Seleccionar la herramienta adecuada
         if tool_name == "get_menu_tool":
             tasks.append(get_menu_tool(**tool_args))
             tool_call_indices.append(i)
+        elif tool_name == "search_menu_tool":
+            tasks.append(search_menu_tool(**tool_args))
+            tool_call_indices.append(i)
         elif tool_name == "confirm_order_tool":
             tasks.append(confirm_order_tool(**tool_args))
             tool_call_indices.append(i)
@@ -485,6 +524,7 @@ async def parallel_tools_node(state: RestaurantState) -> RestaurantState:
             tool_call_indices.append(i)
     
     # Ejecutar todas las herramientas en paralelo
+    tool_results = []
     if tasks:
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
@@ -492,6 +532,7 @@ async def parallel_tools_node(state: RestaurantState) -> RestaurantState:
         for i, result in enumerate(results):
             tool_call_index = tool_call_indices[i]
             tool_call = tool_calls[tool_call_index]
+            tool_results.append((tool_call["name"], result))
             
             if isinstance(result, Exception):
                 # Manejar errores
@@ -501,8 +542,8 @@ async def parallel_tools_node(state: RestaurantState) -> RestaurantState:
                     name=tool_call["name"]
                 )
             else:
-                # Convertir resultado a string si no lo es
-                result_str = json.dumps(result) if not isinstance(result, str) else result
+                # Serializar el resultado en un formato compacto para el LLM
+                result_str = serialize_tool_result(tool_call["name"], result)
                 tool_message = ToolMessage(
                     content=result_str,
                     tool_call_id=tool_call.get("id", ""),
@@ -510,6 +551,18 @@ async def parallel_tools_node(state: RestaurantState) -> RestaurantState:
                 )
             
             new_messages.append(tool_message)
+
+    # Si todas las herramientas son terminales y terminaron bien, la respuesta final
+    # sale de su plantilla y el turno termina sin otro salto de LLM (ver route_after_tools)
+    if len(tool_results) == len(tool_calls):
+        terminal_reply = render_terminal_reply(tool_results)
+        if terminal_reply is not None:
+            new_messages.append(AIMessage(
+                content=terminal_reply,
+                response_metadata={"terminal_tools": [name for name, _ in tool_results]},
+            ))
+            if turn_stats is not None:
+                turn_stats.terminal_reply = True
     
     return {
         "messages": new_messages,
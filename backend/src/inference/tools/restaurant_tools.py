@@ -1,18 +1,17 @@
-import pdb
+import asyncio
 import json
 import os
 import logging
-from typing import Any, Optional, List, Dict, cast
-
-import nest_asyncio
-nest_asyncio.apply()
+from typing import Any, Optional, List, Dict, Tuple, Union, cast
 
 from langchain_core.tools import tool
+from core.background_tasks import task_supervisor
 from core.mysql_order_manager import MySQLOrderManager
 from core.config import settings
 from core.utils import genereta_id, generate_order_id
 from typing import List, Dict, Any
-from core.mysql_inventory_manager import MySQLInventoryManager
+from core.mysql_inventory_manager import InsufficientStock, MySQLInventoryManager
+from core.product_matching import product_match_stats
 from dotenv import load_dotenv
 import os
 load_dotenv(override=True)
@@ -30,6 +29,55 @@ async def get_menu_tool(restaurant_name: str = "go_papa") -> List[Dict[str, Any]
     menu_items = await inventory_manager.get_inventory(restaurant_name)
     return menu_items
 
+async def search_menu_tool(query: str, restaurant_name: str = "go_papa") -> Union[List[Dict[str, Any]], str]:
+    """
+    Busca en el menú los productos que coinciden con lo que pidió el cliente.
+
+    :param query: Producto o descripción mencionada por el cliente (ej. "la gringa", "go papa por dos").
+    :param restaurant_name: Nombre del restaurante a consultar.
+    :return: Los productos que mejor coinciden (id, nombre, precio, descripción) o un mensaje si ninguno coincide.
+    """
+    print(f"\033[92m\nsearch_menu_tool activada \nquery: {query}\nrestaurant_name: {restaurant_name}\033[0m")
+
+    inventory_manager = MySQLInventoryManager()
+    items = await inventory_manager.search_menu(restaurant_name, query, k=settings.menu_search_top_k)
+    if not items:
+        return f"No hay productos en el menú que coincidan con '{query}'. Usa get_menu_tool para ver el menú completo."
+    return items
+
+async def update_user_background(user_id: str, user_name: Optional[str], address: Optional[str]) -> None:
+    """
+    Actualiza nombre y dirección del usuario tras confirmar un pedido.
+    Se ejecuta como trabajo "update_user" del supervisor de tareas en segundo plano.
+    """
+    from core.mysql_user_manager import MySQLUserManager
+    user_manager = MySQLUserManager()
+    updated_user = await user_manager.update_user_by_id(user_id, name=user_name, address=address)
+    if updated_user:
+        logging.info("User information updated successfully: %s", updated_user)
+    else:
+        logging.warning("Failed to update user information for user_id: %s", user_id)
+
+async def canonical_product(source: str, restaurant_id: str, product_name: Optional[str],
+                            product_id: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (product_id, product_name) del menú para lo que escribió el LLM ("Go papa x2"
+    -> "Go Papa X2" con su id). Si no hay un producto claro se conservan los valores recibidos.
+    """
+    inventory_manager = MySQLInventoryManager()
+    match = await inventory_manager.resolve_product(restaurant_id, product_name, product_id)
+    product_match_stats.record(source, match.kind if match else "missing")
+    if not match:
+        return product_id, product_name
+    return match.item["id"], match.item["name"]
+
+def stock_unavailable_message(product_name: str, error: InsufficientStock) -> str:
+    """Mensaje para el LLM cuando la reserva de existencias falla."""
+    if error.available <= 0:
+        return f"No se pudo confirmar: {product_name} está agotado. Ofrece otro producto del menú."
+    return (f"No se pudo confirmar: solo quedan {error.available} unidades de {product_name} "
+            f"(se pidieron {error.requested}). Pregunta al cliente si quiere esa cantidad u otro producto.")
+
 async def confirm_order_tool(
     product_id: str,
     product_name: str,
@@ -41,7 +89,7 @@ async def confirm_order_tool(
     restaurant_id: str = "go_papa",
     user_id: Optional[str] = None,
     adicion: Optional[str] = None
-    ) -> Optional[str]:
+    ) -> Optional[Union[Dict[str, Any], str]]:
     """
     Realiza un pedido de un producto y lo guarda en MySQL.
 
@@ -58,11 +106,18 @@ async def confirm_order_tool(
         adicion (Optional[str]): Información sobre adiciones solicitadas para el pedido.
 
     Retorna:
-        Optional[str]: Mensaje de confirmación si el pedido se realiza con éxito, o None en caso de error.
+        Optional[Union[Dict[str, Any], str]]: El pedido creado si se realiza con éxito, un mensaje si no se
+        pudo crear (por ejemplo, producto agotado), o None en caso de error. El texto que ve el LLM lo arma
+        tool_serializers.serialize_order.
+
+    Las existencias se reservan en la misma transacción del pedido; no hace falta
+    consultar get_menu_tool antes para verificar disponibilidad.
     """
     print(f"\033[92m\nconfirm_order_tool activada \nid: {genereta_id()}\nenum_order_table: {1}\nproduct_id: {product_id}\naddress: {address}\nproduct_name: {product_name}\nquantity: {quantity}\nprice: {price}\nuser_name: {user_name}\nstate: {'pendiente'}\nrestaurant_id: {restaurant_id}\nuser_id: {user_id}\nobservaciones: {observaciones}\nadicion: {adicion}\033[0m")
     
     order_id = genereta_id()
+    # Nombre e id del menú: el pedido reserva existencias del producto correcto
+    product_id, product_name = await canonical_product("confirm_order_tool", restaurant_id, product_name, product_id)
     # Crear una única instancia de MySQLOrderManager
     order_manager = MySQLOrderManager()
     # Obtener el último pedido usando address
@@ -129,32 +184,20 @@ async def confirm_order_tool(
         "adicion": adicion
     }
     try:
-        
-        created_order = await order_manager.create_order(order)
+        try:
+            created_order = await order_manager.create_order(order)
+        except InsufficientStock as e:
+            return stock_unavailable_message(product_name, e)
 
         if created_order:
-            txt_response = f"Pedido creado: {created_order}"
+            txt_response = created_order
             logging.info(f"Pedido creado: {created_order}")
         # Update user information if user_id is provided
         print(user_id)
         if user_id:
-            # Crear una tarea en segundo plano para actualizar la información del usuario
-            async def update_user_background():
-                try:
-                    from core.mysql_user_manager import MySQLUserManager
-                    user_manager = MySQLUserManager()
-                    updated_user = await user_manager.update_user_by_id(str(user_id), name=user_name, address=address)
-                    if updated_user:
-                        logging.info("User information updated successfully: %s", updated_user)
-                        print(f"respuesta_actualizacion{updated_user}")
-                    else:
-                        logging.warning("Failed to update user information for user_id: %s", user_id)
-                except Exception as e:
-                    logging.error(f"Error updating user information in background: {e}")
-
-            # Crear la tarea sin esperar su finalización
-            import asyncio
-            asyncio.create_task(update_user_background())
+            # Actualizar la información del usuario en segundo plano; si llegan varias
+            # actualizaciones del mismo usuario antes de ejecutarse, solo corre la última
+            task_supervisor.submit("update_user", str(user_id), update_user_background, str(user_id), user_name, address)
 
         return txt_response
 
@@ -162,7 +205,7 @@ async def confirm_order_tool(
         logging.exception("Error al confirmar el pedido: %s", e)
         return None
 
-async def get_order_status_tool(user_id: str, restaurant_id: str = "go_papa") -> str:
+async def get_order_status_tool(user_id: str, restaurant_id: str = "go_papa") -> Union[Dict[str, Any], str]:
     """
     Consulta el estado de todos los pedidos de un usuario específico.
     
@@ -171,7 +214,7 @@ async def get_order_status_tool(user_id: str, restaurant_id: str = "go_papa") ->
         restaurant_id (str): Identificador del restaurante. Por defecto "go_papa".
     
     Retorna:
-        str: Información formateada del pedido o un mensaje informativo si no se encuentra.
+        Union[Dict[str, Any], str]: El pedido consolidado o un mensaje informativo si no se encuentra.
     """
     # Crear una única instancia de MySQLOrderManager
     order_manager = MySQLOrderManager()
@@ -184,7 +227,7 @@ async def get_order_status_tool(user_id: str, restaurant_id: str = "go_papa") ->
         f"restaurant_id: {restaurant_id}\n"
         f"order_info: {json.dumps(order_info, indent=4)}\033[0m"
     )
-    return f"Pedido: {order_info}"
+    return order_info
 
 async def send_menu_pdf_tool(user_id: str) -> str:
     """
@@ -201,15 +244,15 @@ async def send_menu_pdf_tool(user_id: str) -> str:
     try:
         import requests
         
-        whatsapp_api_url = "http://198.244.188.104:3001/api/send-images"
+        whatsapp_api_url = f"{settings.whatsapp_api_url}/api/send-images"
         
         # Preparar los datos para la solicitud
         payload = {
             "phone": user_id  # Cambiado de "number" a "phone" para coincidir con la API
         }
         
-        # Realizar la solicitud POST al servicio de WhatsApp
-        response = requests.post(whatsapp_api_url, json=payload)
+        # Realizar la solicitud POST al servicio de WhatsApp en un hilo para no bloquear el event loop
+        response = await asyncio.to_thread(requests.post, whatsapp_api_url, json=payload, timeout=30)
         
         # Verificar la respuesta
         if response.status_code == 200:
@@ -264,7 +307,7 @@ async def update_order_tool(
     new_product_id: Optional[str] = None,
     price: Optional[float] = None,
     restaurant_id: str = "go_papa"
-) -> Optional[str]:
+) -> Optional[Union[Dict[str, Any], str]]:
     """
     Actualiza un producto específico dentro de un pedido existente.
     
@@ -273,7 +316,7 @@ async def update_order_tool(
     
     Parámetros:
         enum_order_table (str): Identificador del pedido a actualizar.
-        product_name (str): Nombre del producto a actualizar.
+        product_name (str): Nombre del producto a actualizar, como aparece en el pedido o en el menú.
         user_id (Optional[str]): ID del usuario que realiza la actualización.
         quantity (Optional[int]): Nueva cantidad del producto.
         observaciones (Optional[str]): Nuevas observaciones para el producto.
@@ -284,13 +327,19 @@ async def update_order_tool(
         restaurant_id (str): Identificador del restaurante. Por defecto "go_papa".
     
     Retorna:
-        Optional[str]: Mensaje de confirmación si la actualización se realiza con éxito, o None en caso de error.
+        Optional[Union[Dict[str, Any], str]]: El pedido consolidado actualizado, un mensaje si no se pudo
+        actualizar, o None en caso de error.
     """
     print(f"\033[92m\nupdate_order_tool activada\nenum_order_table: {enum_order_table}\nproduct_name: {product_name}\nuser_id: {user_id}\033[0m")
     
     # Crear una instancia de MySQLOrderManager
     order_manager = MySQLOrderManager()
     
+    # El producto nuevo se lleva al del menú (nombre e id juntos, para mover la reserva)
+    if new_product_name is not None or new_product_id is not None:
+        new_product_id, new_product_name = await canonical_product(
+            "update_order_tool", restaurant_id, new_product_name, new_product_id)
+    
     # Preparar el diccionario de actualizaciones
     updates = {}
     
@@ -314,12 +363,14 @@ async def update_order_tool(
     
     try:
         # Llamar al método de actualización
-        updated_order = await order_manager.update_order_product(enum_order_table, product_name, updates)
+        try:
+            updated_order = await order_manager.update_order_product(enum_order_table, product_name, updates)
+        except InsufficientStock as e:
+            return stock_unavailable_message(new_product_name or product_name, e)
         
         if updated_order:
-            txt_response = f"Pedido actualizado: {updated_order}"
             logging.info(f"Pedido actualizado: {updated_order}")
-            return txt_response
+            return updated_order
         else:
             return "No se pudo actualizar el pedido. Verifica que el pedido exista y esté en estado 'pendiente' o 'en preparación'."
     
@@ -0,0 +1,96 @@
+"""
+Respuestas terminales de herramientas.
+
+Algunas herramientas (confirmar pedido, actualizar pedido, enviar el menú) solo
+necesitaban un segundo salto de LLM para redactar "tu pedido fue registrado".
+Para ellas hay una plantilla en español que arma la respuesta final a partir del
+resultado; si todas las herramientas del salto la tienen y terminaron bien, el
+grafo responde con ese texto y termina el turno sin volver al agente.
+
+Una plantilla retorna None cuando el resultado es parcial o de error; en ese
+caso el turno sigue por el LLM como antes.
+"""
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from inference.tools.tool_serializers import format_price
+
+MENU_SENT_PREFIX = "Las imágenes del menú han sido enviadas"
+
+
+def _order_line(product: Dict[str, Any]) -> str:
+    line = f"• {product.get('quantity')} x {product.get('name') or product.get('product_name')} — ${format_price(product.get('price'))}"
+    adicion = product.get("adicion")
+    observations = product.get("observaciones") or product.get("observations") or product.get("details")
+    if adicion:
+        line += f" (adición: {adicion})"
+    if observations:
+        line += f" (obs: {observations})"
+    return line
+
+
+def confirm_order_reply(results: List[Any]) -> Optional[str]:
+    """Confirma los productos registrados en el pedido. Todos deben ser filas de `orders`."""
+    if not all(isinstance(result, dict) and result.get("product_name") for result in results):
+        return None
+    first = results[0]
+    lines = [f"¡Listo! 🙌 Registré en tu pedido #{first.get('enum_order_table')}:"]
+    lines += [_order_line(result) for result in results]
+    lines.append(f"📍 Entrega en: {first.get('address')}")
+    lines.append("¿Deseas agregar algo más, como una bebida 🥤 o una adición?")
+    return "\n".join(lines)
+
+
+def update_order_reply(results: List[Any]) -> Optional[str]:
+    """Muestra cómo quedó el pedido tras la última actualización."""
+    if not all(isinstance(result, dict) and result.get("products") is not None for result in results):
+        return None
+    order = results[-1]
+    lines = [f"✅ Actualicé tu pedido #{order.get('enum_order_table') or order.get('id')}. Así quedó:"]
+    lines += [_order_line(product) for product in order["products"]]
+    lines.append("¿Necesitas algún otro cambio?")
+    return "\n".join(lines)
+
+
+def menu_sent_reply(results: List[Any]) -> Optional[str]:
+    """Avisa que se enviaron las imágenes del menú."""
+    if not all(isinstance(result, str) and result.startswith(MENU_SENT_PREFIX) for result in results):
+        return None
+    return "📸 Te acabo de enviar las fotos de nuestro menú. ¿Qué te gustaría pedir hoy? 😊"
+
+
+# Herramientas terminales: nombre -> plantilla sobre los resultados de ese salto
+TERMINAL_TEMPLATES: Dict[str, Callable[[List[Any]], Optional[str]]] = {
+    "confirm_order_tool": confirm_order_reply,
+    "update_order_tool": update_order_reply,
+    "send_menu_pdf_tool": menu_sent_reply,
+}
+
+
+def render_terminal_reply(tool_results: List[tuple]) -> Optional[str]:
+    """
+    Arma la respuesta final de un salto de herramientas, si todas son terminales.
+
+    :param tool_results: Lista de (nombre de la herramienta, resultado) en el orden de las llamadas.
+    :return: Texto para el usuario, o None si el turno debe volver al LLM
+             (alguna herramienta no es terminal, falló o dio un resultado parcial).
+    """
+    if not tool_results:
+        return None
+    grouped: Dict[str, List[Any]] = {}
+    for tool_name, result in tool_results:
+        if tool_name not in TERMINAL_TEMPLATES or result is None or isinstance(result, Exception):
+            return None
+        grouped.setdefault(tool_name, []).append(result)
+
+    parts = []
+    for tool_name, results in grouped.items():
+        try:
+            part = TERMINAL_TEMPLATES[tool_name](results)
+        except Exception as e:
+            logging.exception("Error armando la respuesta terminal de %s: %s", tool_name, e)
+            return None
+        if part is None:
+            return None
+        parts.append(part)
+    return "\n\n".join(parts)
@@ -0,0 +1,177 @@
+"""
+Serializadores de resultados de herramientas.
+
+Todo lo que devuelve una herramienta vuelve al LLM como tokens del siguiente
+salto, así que cada herramienta tiene un serializador que emite solo lo que el
+modelo necesita (por ejemplo, el menú como tabla id | nombre | precio | descripción)
+en lugar del `json.dumps` de todas las columnas de MySQL.
+"""
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config import settings
+
+
+def format_price(value: Any) -> str:
+    """Formatea un precio sin decimales innecesarios (50000.0 -> 50000)."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    return str(int(number)) if number.is_integer() else f"{number:.2f}"
+
+
+def _compact_json(result: Any) -> str:
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def serialize_menu(items: List[Dict[str, Any]], availability: Optional[Dict[str, int]] = None) -> str:
+    """
+    Menú como tabla id | nombre | precio | descripción, con las adiciones aparte.
+    `availability` ({product_id: existencias}) tiene prioridad sobre la cantidad de cada item.
+    """
+    if not items:
+        return "No hay productos disponibles en el menú."
+    availability = availability or {}
+    menu_rows, adicion_rows = [], []
+    for item in items:
+        row = f"{item.get('id')} | {item.get('name')} | {format_price(item.get('price'))} | {item.get('descripcion') or ''}".rstrip(" |")
+        quantity = availability.get(item.get("id"), item.get("quantity"))
+        if quantity is not None and quantity <= 0:
+            row += " (agotado)"
+        if item.get("tipo_producto") == "adicion":
+            adicion_rows.append(row)
+        else:
+            menu_rows.append(row)
+    lines = ["id | nombre | precio | descripción"] + menu_rows
+    if adicion_rows:
+        lines += ["Adiciones:"] + adicion_rows
+    return "\n".join(lines)
+
+
+def serialize_adiciones(items: List[Dict[str, Any]]) -> str:
+    """Adiciones como tabla nombre | precio | descripción."""
+    if not items:
+        return "No hay adiciones disponibles."
+    lines = ["nombre | precio | descripción"]
+    lines += [f"{item.get('name')} | {format_price(item.get('price'))} | {item.get('descripcion') or ''}".rstrip(" |") for item in items]
+    return "\n".join(lines)
+
+
+def _product_line(product: Dict[str, Any]) -> str:
+    line = f"- {product.get('name') or product.get('product_name')} x{product.get('quantity')} | {format_price(product.get('price'))}"
+    adicion = product.get("adicion")
+    observations = product.get("observations") or product.get("details") or product.get("observaciones")
+    if adicion:
+        line += f" | adición: {adicion}"
+    if observations:
+        line += f" | obs: {observations}"
+    return line
+
+
+def serialize_order(order: Any) -> str:
+    """
+    Pedido en texto compacto. Acepta tanto una fila de `orders` (confirm_order_tool)
+    como el pedido consolidado con `products` (get_order_status_tool, update_order_tool).
+    """
+    if not isinstance(order, dict):
+        return order if isinstance(order, str) else _compact_json(order)
+    order_id = order.get("enum_order_table") or order.get("id")
+    address = order.get("address") or order.get("table_id")
+    customer = order.get("customer_name") or order.get("user_name")
+    header = f"Pedido #{order_id} | estado: {order.get('state')} | dirección: {address} | cliente: {customer}"
+    products = order.get("products")
+    if products is None:
+        products = [order]
+    return "\n".join([header] + [_product_line(product) for product in products])
+
+
+TOOL_SERIALIZERS: Dict[str, Callable[[Any], str]] = {
+    "get_menu_tool": serialize_menu,
+    "search_menu_tool": serialize_menu,
+    "get_adiciones_tool": serialize_adiciones,
+    "confirm_order_tool": serialize_order,
+    "get_order_status_tool": serialize_order,
+    "update_order_tool": serialize_order,
+}
+
+
+class ToolTokenReport:
+    """
+    Acumula, por herramienta, los tokens del resultado serializado frente a los
+    del `json.dumps` original. Solo se activa con TOOL_TOKEN_REPORT=true porque
+    contar tokens tiene costo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def record(self, tool_name: str, raw_text: str, compact_text: str) -> None:
+        from core.utils import count_tokens
+
+        raw_tokens = len(count_tokens(raw_text) or [])
+        compact_tokens = len(count_tokens(compact_text) or [])
+        with self._lock:
+            stats = self._stats.setdefault(tool_name, {"calls": 0, "raw_tokens": 0, "compact_tokens": 0})
+            stats["calls"] += 1
+            stats["raw_tokens"] += raw_tokens
+            stats["compact_tokens"] += compact_tokens
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                tool_name: {
+                    **stats,
+                    "saved_pct": round(100 * (1 - stats["compact_tokens"] / stats["raw_tokens"]), 1) if stats["raw_tokens"] else 0.0,
+                }
+                for tool_name, stats in self._stats.items()
+            }
+
+
+tool_token_report = ToolTokenReport()
+
+
+def raw_tool_result(result: Any) -> str:
+    """Serialización original (sin compactar), usada como referencia en los reportes."""
+    return json.dumps(result, default=str) if not isinstance(result, str) else result
+
+
+def serialize_tool_result(tool_name: str, result: Any) -> str:
+    """
+    Convierte el resultado de una herramienta en el texto del ToolMessage.
+
+    :param tool_name: Nombre de la herramienta.
+    :param result: Valor retornado por la herramienta.
+    :return: Texto compacto para el LLM.
+    """
+    serializer = TOOL_SERIALIZERS.get(tool_name)
+    if isinstance(result, str):
+        text = result
+    elif serializer is not None:
+        try:
+            text = serializer(result)
+        except Exception as e:
+            logging.exception("Error serializando el resultado de %s: %s", tool_name, e)
+            text = _compact_json(result)
+    else:
+        text = _compact_json(result)
+
+    if settings.tool_token_report:
+        tool_token_report.record(tool_name, raw_tool_result(result), text)
+    if settings.tool_result_record_path:
+        _record_tool_result(tool_name, result)
+    return text
+
+
+_record_lock = threading.Lock()
+
+
+def _record_tool_result(tool_name: str, result: Any, path: Optional[str] = None) -> None:
+    """Guarda el resultado crudo en JSONL para medir la compactación sobre conversaciones reales."""
+    path = path or settings.tool_result_record_path
+    line = json.dumps({"tool": tool_name, "result": result}, ensure_ascii=False, default=str)
+    with _record_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
@@ -1,30 +1,48 @@
 # app/main.py
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
-from api.chat_agent import chat_agent_router
+from api.chat_agent import chat_agent_router, get_restaurant_chat_agent
 from api.orders import orders_router
 from api.inventory_router import inventory_router
+from api.metrics import metrics_router
+from core.background_tasks import task_supervisor
+from core.asgi_middleware import CacheControlMiddleware, ServerTimingMiddleware
+from core.config import settings
+from core.graph_client import close_http_client
+from core.partitioning import partition_maintenance
+from core.retention import retention_job
+from core.order_export import order_exporter
+from core.token_verifier import close_token_verifier
 
-from fastapi.staticfiles import StaticFiles
-from starlette.responses import Response
+BACKGROUND_DRAIN_TIMEOUT_SECONDS = 20
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for FastAPI application startup and shutdown events."""
+    # Compilar el grafo una sola vez al arrancar, no en el primer mensaje
+    get_restaurant_chat_agent()
+    # Particiones de los próximos meses: independiente de la retención
+    partition_maintenance.start()
+    if settings.retention_enabled:
+        retention_job.start()
+    if settings.orders_export_enabled:
+        order_exporter.start(settings.orders_export_interval_minutes * 60)
     print("Aplicación iniciada")
     yield
+    await partition_maintenance.aclose()
+    await retention_job.aclose()
+    await order_exporter.aclose()
+    await close_token_verifier()
+    # Esperar a que terminen los trabajos en segundo plano antes de apagar
+    await task_supervisor.drain(timeout=BACKGROUND_DRAIN_TIMEOUT_SECONDS)
+    await close_http_client()
 
-app = FastAPI(title="TARS Agents Graphs", lifespan=lifespan, root_path="/api")
-
-@app.middleware("http")
-async def no_cache_middleware(request: Request, call_next):
-    response: Response = await call_next(request)
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate, max-age=0"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
-    return response
+# orjson serializa las respuestas grandes (pedidos, inventario) mucho más rápido que json
+app = FastAPI(title="TARS Agents Graphs", lifespan=lifespan, root_path="/api", default_response_class=ORJSONResponse)
 
 allowed_origins = ["*"]
 
@@ -36,10 +54,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Comprimir solo respuestas mayores al umbral; las pequeñas no compensan el costo.
+# Nivel 6: en /orders/all comprime casi igual que 9 en un tercio del tiempo
+app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_minimum_size, compresslevel=settings.gzip_compress_level)
+
+# Middlewares ASGI puros. Cada ruta puede definir su propio Cache-Control (p. ej. las
+# lecturas con ETag); las que no lo hacen conservan la política sin caché
+app.add_middleware(CacheControlMiddleware)
+# El último agregado es el más externo: mide la solicitud completa
+app.add_middleware(ServerTimingMiddleware)
+
 # Registrar routers sin el prefijo /api ya que está en root_path
 app.include_router(chat_agent_router, prefix="/agent/chat", tags=["RestaurantsAgents"])
 app.include_router(inventory_router, prefix="/inventory/stock", tags=["StockRestaurants"])
 app.include_router(orders_router, prefix="/orders", tags=["Orders"])
+app.include_router(metrics_router, prefix="/metrics", tags=["Metrics"])
 # app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 
 # Montar archivos estáticos (si es necesario)
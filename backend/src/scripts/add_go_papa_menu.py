@@ -325,35 +325,19 @@ async def add_go_papa_menu_items():
         {"name": "Cebolla Crispy", "price": 8000, "descripcion": "Cebolla crujiente para dar un toque especial"}
     ]
 
-    # Add each menu item to the inventory
-    for item in menu_items:
-        result = await inventory_manager.add_product(
-            restaurant_id=restaurant_id,
-            name=item["name"],
-            quantity=item["quantity"],
-            unit=item["unit"],
-            price=item["price"],
-            descripcion=item.get("descripcion", ""),
-            tipo_producto=item.get("tipo_producto", "menu")
-        )
-        
-        if result:
-            print(f"Added {item['name']} to inventory")
-        else:
-            print(f"Failed to add {item['name']} to inventory")
-
-    # Agregar todas las adiciones al inventario
-    for adicion in adiciones_10k + adiciones_8k:
-        await inventory_manager.add_product(
-            restaurant_id=restaurant_id,
-            name=adicion["name"],
-            quantity=100,  # Cantidad inicial en inventario
-            unit="porción",
-            price=adicion["price"],
-            descripcion=adicion["descripcion"],
-            tipo_producto="adicion"  # Importante: marcar como adición
-        )
-        print(f"Adición agregada: {adicion['name']} - ${adicion['price']}")
+    # Una sola carga: upsert por nombre en una transacción (volver a ejecutar el script no duplica)
+    rows = [{"descripcion": "", "tipo_producto": "menu", **item} for item in menu_items]
+    rows += [
+        {**adicion, "quantity": 100, "unit": "porción", "tipo_producto": "adicion"}
+        for adicion in adiciones_10k + adiciones_8k
+    ]
+    result = await inventory_manager.import_catalog(restaurant_id, rows)
+    if result is None:
+        print("No se pudo cargar el menú")
+        return
+    print(f"Nuevos: {len(result['inserted'])}, actualizados: {len(result['updated'])}, "
+          f"sin cambios: {len(result['unchanged'])}")
+    await inventory_manager.close()
 
 if __name__ == "__main__":
     asyncio.run(add_go_papa_menu_items())
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Benchmark de arranque en frío (cold start) del backend.
+
+Importa el módulo de entrada en un proceso nuevo con `python -X importtime`,
+suma el tiempo de importación acumulado y mide el RSS máximo del proceso.
+Falla (exit code 1) si se superan los umbrales o si hay una regresión mayor a la
+tolerancia respecto a un baseline guardado.
+
+Uso:
+    python scripts/bench_cold_start.py --runs 5
+    python scripts/bench_cold_start.py --save-baseline scripts/cold_start_baseline.json
+    python scripts/bench_cold_start.py --baseline scripts/cold_start_baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+
+# Se imprime el RSS máximo del hijo tras importar el módulo (ru_maxrss está en KB en Linux)
+CHILD_CODE = (
+    "import importlib, resource, sys;"
+    "importlib.import_module(sys.argv[1]);"
+    "print('RSS_KB', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, file=sys.stderr)"
+)
+
+
+def run_once(module: str) -> dict:
+    """Ejecuta una importación en frío y retorna tiempos (ms), RSS (MB) y los módulos más pesados."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_CODE, module],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}:\n{proc.stderr[-2000:]}")
+
+    total_us = 0
+    rss_kb = 0
+    modules = []
+    for line in proc.stderr.splitlines():
+        if line.startswith("RSS_KB"):
+            rss_kb = int(line.split()[1])
+            continue
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, raw_name = line[len("import time:"):].split("|")
+        # Solo los módulos de primer nivel (sin sangría) suman al total
+        if not raw_name.startswith("  "):
+            total_us += int(cumulative_us)
+        modules.append((raw_name.strip(), int(cumulative_us)))
+
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return {"import_ms": total_us / 1000, "rss_mb": rss_kb / 1024, "top": modules[:15]}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Cold-start benchmark (import time + RSS)")
+    parser.add_argument("--module", default="main", help="Módulo de entrada a importar (main, function_app)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=float(os.getenv("COLD_START_MAX_IMPORT_MS", 0)))
+    parser.add_argument("--max-rss-mb", type=float, default=float(os.getenv("COLD_START_MAX_RSS_MB", 0)))
+    parser.add_argument("--baseline", help="Archivo JSON con un baseline previo")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Regresión permitida respecto al baseline (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", help="Guardar el resultado como baseline en este archivo")
+    args = parser.parse_args()
+
+    results = [run_once(args.module) for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in results)
+    rss_mb = statistics.median(r["rss_mb"] for r in results)
+
+    print(f"módulo: {args.module}  corridas: {args.runs}")
+    print(f"tiempo de importación (mediana): {import_ms:.1f} ms")
+    print(f"RSS máximo (mediana): {rss_mb:.1f} MB")
+    print("módulos más pesados (acumulado):")
+    for name, cumulative_us in results[-1]["top"]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+
+    failures = []
+    if args.max_import_ms and import_ms > args.max_import_ms:
+        failures.append(f"import {import_ms:.1f} ms > umbral {args.max_import_ms:.1f} ms")
+    if args.max_rss_mb and rss_mb > args.max_rss_mb:
+        failures.append(f"RSS {rss_mb:.1f} MB > umbral {args.max_rss_mb:.1f} MB")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        for key, value in (("import_ms", import_ms), ("rss_mb", rss_mb)):
+            limit = baseline[key] * (1 + args.tolerance)
+            if value > limit:
+                failures.append(f"{key} {value:.1f} > baseline {baseline[key]:.1f} (+{args.tolerance:.0%})")
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps({"module": args.module, "import_ms": import_ms, "rss_mb": rss_mb}, indent=2))
+        print(f"baseline guardado en {args.save_baseline}")
+
+    for failure in failures:
+        print(f"REGRESIÓN: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
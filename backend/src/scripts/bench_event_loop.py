@@ -0,0 +1,92 @@
+"""
+Comparación de throughput entre el event loop por defecto de asyncio y uvloop.
+
+Simula la forma de un turno de chat: cada turno lanza varias "herramientas" en
+paralelo con asyncio.gather, cada una con varios saltos de I/O (sleep(0) y
+pequeñas esperas), y deja una tarea en segundo plano en el TaskSupervisor,
+igual que confirm_order_tool. Cada loop se mide en un proceso nuevo.
+
+Uso:
+    python scripts/bench_event_loop.py --turns 20000 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from core.background_tasks import TaskSupervisor
+
+
+async def fake_tool(hops: int) -> int:
+    for _ in range(hops):
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.0005)
+    return hops
+
+
+async def fake_turn(supervisor: TaskSupervisor) -> None:
+    await asyncio.gather(fake_tool(3), fake_tool(5), fake_tool(2))
+    supervisor.spawn(fake_tool(1), name="background")
+
+
+async def workload(turns: int, concurrency: int) -> float:
+    supervisor = TaskSupervisor()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def guarded() -> None:
+        async with semaphore:
+            await fake_turn(supervisor)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(guarded() for _ in range(turns)))
+    await supervisor.drain()
+    return turns / (time.perf_counter() - start)
+
+
+def run_child(loop_name: str, turns: int, concurrency: int) -> None:
+    if loop_name == "uvloop":
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    turns_per_sec = asyncio.run(workload(turns, concurrency))
+    print(json.dumps({"loop": loop_name, "turns_per_sec": turns_per_sec}))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Throughput asyncio vs uvloop")
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.turns, args.concurrency)
+        return 0
+
+    try:
+        import uvloop  # noqa: F401
+        loops = ["asyncio", "uvloop"]
+    except ImportError:
+        print("uvloop no está instalado; solo se mide el loop por defecto")
+        loops = ["asyncio"]
+
+    results = {}
+    for loop_name in loops:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", loop_name, "--turns", str(args.turns), "--concurrency", str(args.concurrency)],
+            capture_output=True, text=True, check=True
+        )
+        results[loop_name] = json.loads(proc.stdout.strip().splitlines()[-1])["turns_per_sec"]
+        print(f"{loop_name:8s} {results[loop_name]:10.0f} turnos/s")
+
+    if "uvloop" in results:
+        print(f"uvloop / asyncio: {results['uvloop'] / results['asyncio']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Benchmark de claves primarias: velocidad de inserción y tamaño de los índices.
+
+Compara, con una tabla del tamaño de `orders` (clave primaria + índice
+secundario por user_id y created_at):
+    - uuid4 texto:  el antiguo genereta_id() "YYYYMMDD-uuid4" en VARCHAR,
+    - uuid7 texto:  new_id() (UUIDv7, 32 caracteres) en VARCHAR,
+    - uuid7 binario: id_to_bytes(new_id()) en BINARY(16),
+    - bigint:       AUTO_INCREMENT (referencia).
+
+Backends:
+    - sqlite (por defecto, sin servidor): tablas WITHOUT ROWID, que agrupan las
+      filas por la clave primaria como InnoDB; tamaños con dbstat.
+    - mysql: InnoDB con la configuración DB_* de core.config; tamaños de
+      information_schema.TABLES tras ANALYZE TABLE. Usa tablas bench_ids_* que
+      se eliminan al terminar.
+
+Uso:
+    python scripts/bench_id_keys.py --rows 1000000
+    python scripts/bench_id_keys.py --backend mysql --rows 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.utils import id_to_bytes, new_id
+
+BATCH = 1000
+
+
+def uuid4_text() -> str:
+    return f"20250101-{uuid.uuid4()}"
+
+
+# nombre -> (tipo de la columna id en MySQL, tipo en SQLite, generador; None = autoincremental)
+LAYOUTS = {
+    "uuid4 texto": ("VARCHAR(255)", "TEXT", uuid4_text),
+    "uuid7 texto": ("VARCHAR(255)", "TEXT", new_id),
+    "uuid7 binario": ("BINARY(16)", "BLOB", lambda: id_to_bytes(new_id())),
+    "bigint": ("BIGINT AUTO_INCREMENT", "INTEGER", None),
+}
+
+
+def batches(rows: int, make_id):
+    start = datetime(2025, 1, 1)
+    for offset in range(0, rows, BATCH):
+        batch = []
+        for i in range(offset, min(offset + BATCH, rows)):
+            row = (f"user-{random.randrange(5000)}", start + timedelta(seconds=i), "Go Papa X2", 1, 50000.0)
+            batch.append(((make_id(),) + row) if make_id else row)
+        yield batch
+
+
+def bench_sqlite(rows: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (_, column_type, make_id) in LAYOUTS.items():
+            conn = sqlite3.connect(os.path.join(tmp, f"{name.replace(' ', '_')}.db"))
+            without_rowid = "" if make_id is None else " WITHOUT ROWID"
+            conn.execute(f"""
+            CREATE TABLE orders (
+                id {column_type} PRIMARY KEY, user_id TEXT, created_at TEXT,
+                product_name TEXT, quantity INTEGER, price REAL
+            ){without_rowid}""")
+            conn.execute("CREATE INDEX ix_user ON orders (user_id)")
+            conn.execute("CREATE INDEX ix_created ON orders (created_at)")
+            columns = "id, user_id, created_at, product_name, quantity, price" if make_id else \
+                "user_id, created_at, product_name, quantity, price"
+            placeholders = ", ".join(["?"] * len(columns.split(",")))
+            started = time.perf_counter()
+            for batch in batches(rows, make_id):
+                conn.executemany(f"INSERT INTO orders ({columns}) VALUES ({placeholders})",
+                                 [tuple(str(v) if isinstance(v, datetime) else v for v in row) for row in batch])
+                conn.commit()
+            elapsed = time.perf_counter() - started
+            sizes = dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall())
+            results[name] = {
+                "rows_per_second": rows / elapsed,
+                "data_bytes": sizes.get("orders", 0),
+                "index_bytes": sum(size for index, size in sizes.items() if index.startswith(("ix_", "sqlite_autoindex"))),
+            }
+            conn.close()
+    return results
+
+
+async def bench_mysql(rows: int) -> dict:
+    from core.db_pool import DBConnectionPool
+
+    db_pool = DBConnectionPool()
+    pool = await db_pool.get_pool()
+    results = {}
+    try:
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                for name, (column_type, _, make_id) in LAYOUTS.items():
+                    table = f"bench_ids_{name.replace(' ', '_')}"
+                    await cursor.execute(f"DROP TABLE IF EXISTS {table}")
+                    await cursor.execute(f"""
+                    CREATE TABLE {table} (
+                        id {column_type} PRIMARY KEY, user_id VARCHAR(255), created_at DATETIME,
+                        product_name VARCHAR(255), quantity INT, price FLOAT,
+                        INDEX (user_id), INDEX (created_at)
+                    ) ENGINE=InnoDB""")
+                    columns = "id, user_id, created_at, product_name, quantity, price" if make_id else \
+                        "user_id, created_at, product_name, quantity, price"
+                    placeholders = ", ".join(["%s"] * len(columns.split(",")))
+                    started = time.perf_counter()
+                    for batch in batches(rows, make_id):
+                        await cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", batch)
+                        await conn.commit()
+                    elapsed = time.perf_counter() - started
+                    await cursor.execute(f"ANALYZE TABLE {table}")
+                    await cursor.fetchall()
+                    await cursor.execute(
+                        "SELECT data_length, index_length FROM information_schema.TABLES "
+                        "WHERE table_schema = DATABASE() AND table_name = %s", (table,),
+                    )
+                    data_bytes, index_bytes = await cursor.fetchone()
+                    results[name] = {"rows_per_second": rows / elapsed, "data_bytes": data_bytes,
+                                     "index_bytes": index_bytes}
+                    await cursor.execute(f"DROP TABLE {table}")
+    finally:
+        await db_pool.close()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Inserción y tamaño de índices según el tipo de clave primaria")
+    parser.add_argument("--backend", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    random.seed(7)
+    results = bench_sqlite(args.rows) if args.backend == "sqlite" else asyncio.run(bench_mysql(args.rows))
+
+    print(f"{args.backend}, {args.rows:,} filas, lotes de {BATCH}")
+    print(f"{'clave':15s} {'filas/s':>10s} {'datos (MB)':>11s} {'índices (MB)':>13s}")
+    for name, result in results.items():
+        print(f"{name:15s} {result['rows_per_second']:10,.0f} {result['data_bytes'] / 2**20:11.1f} "
+              f"{result['index_bytes'] / 2**20:13.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Benchmark de la pila de middlewares: solicitudes por segundo en una ruta trivial.
+
+Compara, en el mismo proceso y sin red (httpx + ASGITransport):
+    - antes: no_cache_middleware y el middleware de autenticación con
+      `@app.middleware("http")` (BaseHTTPMiddleware),
+    - ahora: CacheControlMiddleware + ServerTimingMiddleware (ASGI puros).
+
+Uso:
+    python scripts/bench_middleware.py --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+from fastapi import FastAPI, Request
+
+from core.asgi_middleware import CacheControlMiddleware, RequestMetrics, ServerTimingMiddleware
+from core.auth_middleware import is_excluded_route
+from core.event_loop import install_uvloop
+
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/orders/today")
+    async def ping():
+        return {"ok": True}
+
+    if stack == "before":
+        @app.middleware("http")
+        async def no_cache_middleware(request: Request, call_next):
+            response = await call_next(request)
+            response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate, max-age=0"
+            response.headers["Pragma"] = "no-cache"
+            response.headers["Expires"] = "0"
+            return response
+
+        @app.middleware("http")
+        async def auth_middleware(request: Request, call_next):
+            # Ruta excluida, como /orders/today: solo la contabilidad de tiempo del original
+            start_time = time.time()
+            if is_excluded_route(request.url.path):
+                return await call_next(request)
+            response = await call_next(request)
+            print(f"{time.time() - start_time:.4f}", file=sys.stderr)
+            return response
+    else:
+        app.add_middleware(CacheControlMiddleware)
+        app.add_middleware(ServerTimingMiddleware, metrics=RequestMetrics())
+    return app
+
+
+async def run(stack: str, total: int, concurrency: int) -> float:
+    app = build_app(stack)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Calentamiento
+        for _ in range(100):
+            await client.get("/orders/today")
+
+        remaining = total
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get("/orders/today")
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Solicitudes/s con la pila de middlewares anterior y la nueva")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    install_uvloop()
+    results = {}
+    for stack in ("before", "after"):
+        results[stack] = max(asyncio.run(run(stack, args.requests, args.concurrency)) for _ in range(args.rounds))
+        print(f"{stack:6s}: {results[stack]:8.0f} req/s")
+    print(f"mejora: {results['after'] / results['before']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Latencia del login con MSAL: ruta fría y caliente, contra un authority local.
+
+El authority de Entra ID se reemplaza por `LocalAuthority`, un cliente HTTP en
+proceso que responde el descubrimiento (openid-configuration) y el endpoint de
+tokens, y simula la latencia de red de cada solicitud con `--rtt-ms`.
+
+Escenarios (cada uno en una fábrica nueva, como un proceso recién iniciado):
+    - fría: sin caché persistido -> descubrimiento + canje del código,
+    - reinicio con caché: el archivo cifrado trae los metadatos del authority
+      -> solo el canje del código,
+    - usuario que vuelve: token en el caché persistido -> acquire_token_silent,
+      sin ninguna solicitud al authority.
+
+Uso:
+    python scripts/bench_msal_login.py --rtt-ms 120 --runs 5
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.msal_client import EncryptedFileStore, MSALClientFactory, derive_cache_key
+
+AUTHORITY = "https://login.local.test/tenant-bench"
+CLIENT_ID = "client-bench"
+SCOPES = ["https://graph.microsoft.com/User.Read"]
+REDIRECT_URI = "https://app.local.test/auth/callback"
+
+
+def _b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+class LocalResponse:
+    """Respuesta mínima con la interfaz que MSAL usa de requests.Response (serializable con pickle)."""
+
+    def __init__(self, status_code: int, payload: dict):
+        self.status_code = status_code
+        self.text = json.dumps(payload)
+        self.headers = {"Content-Type": "application/json"}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class LocalAuthority:
+    """Authority de Entra ID en proceso: descubrimiento y endpoint de tokens, con latencia simulada."""
+
+    def __init__(self, rtt_ms: float = 0):
+        self.rtt_seconds = rtt_ms / 1000
+        self.calls = {"discovery": 0, "token": 0}
+
+    def _tenant_url(self, url: str) -> str:
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}/{parsed.path.strip('/').split('/')[0]}"
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        time.sleep(self.rtt_seconds)
+        self.calls["discovery"] += 1
+        base = self._tenant_url(url)
+        return LocalResponse(200, {
+            "authorization_endpoint": f"{base}/oauth2/v2.0/authorize",
+            "token_endpoint": f"{base}/oauth2/v2.0/token",
+            "issuer": f"{base}/v2.0",
+        })
+
+    def post(self, url, params=None, data=None, headers=None, **kwargs):
+        time.sleep(self.rtt_seconds)
+        self.calls["token"] += 1
+        now = int(time.time())
+        id_token = ".".join([
+            _b64({"alg": "none", "typ": "JWT"}),
+            _b64({"iss": f"{self._tenant_url(url)}/v2.0", "aud": CLIENT_ID, "iat": now, "exp": now + 3600,
+                  "oid": "user-oid", "tid": "tenant-bench", "preferred_username": "ana@contoso.com",
+                  "name": "Ana"}),
+            "",
+        ])
+        return LocalResponse(200, {
+            "token_type": "Bearer",
+            "scope": " ".join(SCOPES),
+            "expires_in": 3600,
+            "access_token": f"access-{self.calls['token']}",
+            "refresh_token": f"refresh-{self.calls['token']}",
+            "id_token": id_token,
+            "client_info": _b64({"uid": "user-oid", "utid": "tenant-bench"}),
+        })
+
+    def close(self):
+        pass
+
+
+def new_factory(authority: LocalAuthority, cache_path: str) -> MSALClientFactory:
+    store = EncryptedFileStore(cache_path, derive_cache_key("bench-secret"))
+    # validate_authority=False: el host local no está en la lista de Microsoft (sin instance discovery)
+    return MSALClientFactory(CLIENT_ID, "bench-secret", AUTHORITY, store=store, http_client=authority,
+                             validate_authority=False)
+
+
+def timed_login(authority: LocalAuthority, cache_path: str, silent: bool = False) -> tuple:
+    before = dict(authority.calls)
+    start = time.perf_counter()
+    factory = new_factory(authority, cache_path)
+    if silent:
+        result = factory.acquire_token_silent(SCOPES, username="ana@contoso.com")
+    else:
+        result = factory.acquire_token_by_authorization_code("code", SCOPES, REDIRECT_URI)
+    elapsed = (time.perf_counter() - start) * 1000
+    assert result and "access_token" in result, result
+    calls = {name: authority.calls[name] - before[name] for name in authority.calls}
+    return elapsed, calls
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Latencia del login MSAL en frío y en caliente")
+    parser.add_argument("--rtt-ms", type=float, default=120, help="latencia simulada por solicitud al authority")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    authority = LocalAuthority(rtt_ms=args.rtt_ms)
+    results = {"fría (sin caché)": [], "reinicio con caché": [], "usuario que vuelve": []}
+    calls = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(args.runs):
+            cache_path = os.path.join(tmp, f"msal_cache_{run}.bin")
+            for name, silent in (("fría (sin caché)", False), ("reinicio con caché", False), ("usuario que vuelve", True)):
+                elapsed, calls[name] = timed_login(authority, cache_path, silent=silent)
+                results[name].append(elapsed)
+
+    print(f"authority local, RTT simulado {args.rtt_ms:.0f} ms, {args.runs} corridas (mediana)")
+    for name, times in results.items():
+        print(f"{name:20s}: {statistics.median(times):7.1f} ms  solicitudes al authority: {calls[name]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
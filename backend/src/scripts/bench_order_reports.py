@@ -0,0 +1,87 @@
+"""
+Benchmark del motor de reportes de pedidos (core.order_reports).
+
+Genera un año sintético de líneas de pedido con la forma de normalize_orders y mide:
+    - carga: DataFrame -> columnas NumPy de la instantánea (se paga una vez por exportación),
+    - reporte: /orders/reports completo sobre la instantánea en caché (año completo y un mes).
+
+Uso:
+    python scripts/bench_order_reports.py --orders-per-day 900 --runs 5
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from core.order_reports import OrderReportSnapshot, ReportColumns
+
+PRODUCTS = ("Go Papa X1", "Go Papa X2", "La Gringa X2", "Chicken X2", "Maicitos", "Salchipapa", "Gaseosa", "Limonada")
+ADDONS = ("", "", "", "queso extra", "tocineta", "queso extra, tocineta", "maicitos + salsa de ajo")
+
+
+def synthetic_year(orders_per_day: int, lines_per_order: int = 3, seed: int = 7) -> pd.DataFrame:
+    """Un año de pedidos (≈ orders_per_day * 365 * lines_per_order filas)."""
+    rng = np.random.default_rng(seed)
+    orders = orders_per_day * 365
+    order_start = (np.datetime64("2025-01-01T11:00", "us")
+                   + np.repeat(np.arange(365), orders_per_day) * np.timedelta64(1, "D")
+                   + rng.integers(0, 11 * 3600, orders) * np.timedelta64(1, "s"))
+    n = orders * lines_per_order
+    order_index = np.repeat(np.arange(orders), lines_per_order)
+    created_at = order_start[order_index]
+    state = np.where(rng.random(orders) < 0.03, "cancelado", "completado")[order_index]
+    completed_at = np.where(state == "completado", created_at + rng.integers(10, 60, n) * np.timedelta64(1, "m"),
+                            np.datetime64("NaT", "us"))
+    quantity = rng.integers(1, 4, n)
+    price = rng.choice([8000.0, 25000.0, 45000.0, 50000.0], n)
+    return pd.DataFrame({
+        "id": np.arange(n, dtype=np.int64),
+        "enum_order_table": (order_index + 1000).astype(str),
+        "product_name": np.asarray(PRODUCTS)[rng.integers(0, len(PRODUCTS), n)],
+        "quantity": quantity.astype(np.int32),
+        "price": price,
+        "revenue": quantity * price,
+        "state": state,
+        "adicion": np.asarray(ADDONS)[rng.integers(0, len(ADDONS), n)],
+        "created_at": created_at,
+        "completed_at": completed_at,
+    })
+
+
+def timed(func, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders-per-day", type=int, default=900)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    frame = synthetic_year(args.orders_per_day)
+    print(f"filas: {len(frame):,} ({args.orders_per_day} pedidos/día, 365 días)")
+    print(f"carga de la instantánea:   {timed(lambda: ReportColumns(frame), args.runs):8.1f} ms")
+
+    # Instantánea ya cargada: lo que paga cada request mientras no haya exportación nueva
+    snapshot = OrderReportSnapshot(export_dir="", fmt="parquet")
+    snapshot._columns = ReportColumns(frame)
+    snapshot.columns = lambda: snapshot._columns
+    print(f"reporte año completo:      {timed(lambda: snapshot.report(), args.runs):8.1f} ms")
+    print(f"reporte un mes:            "
+          f"{timed(lambda: snapshot.report(date(2025, 6, 1), date(2025, 6, 30)), args.runs):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark de serialización de respuestas grandes de pedidos.
+
+Genera un payload de /orders/all con N pedidos consolidados y compara:
+    - antes: response_model=Dict[str, Any] -> jsonable_encoder + JSONResponse (json.dumps)
+    - ahora: response_model tipado (ResponseHTTPAllOrders) -> ORJSONResponse
+y los bytes en el cable sin compresión y con GZip (GZIP_COMPRESS_LEVEL, 6 por defecto).
+
+Uso:
+    python scripts/bench_orders_payload.py --orders 5000 --runs 5
+"""
+import argparse
+import gzip
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from core.config import settings
+from core.schema_http import ResponseHTTPAllOrders
+
+
+def build_payload(n_orders: int, products_per_order: int = 3) -> dict:
+    """Pedidos con la misma forma que MySQLOrderManager.get_all_orders."""
+    payload = {}
+    for i in range(n_orders):
+        enum_order_table = str(1000 + i)
+        payload[enum_order_table] = {
+            "id": enum_order_table,
+            "address": f"Calle {i % 120} # {i % 45}-{i % 90}, Bogotá",
+            "customer_name": f"Cliente {i}",
+            "enum_order_table": enum_order_table,
+            "products": [
+                {"name": f"Go Papa X{p + 1}", "quantity": 1 + (i + p) % 3, "price": 25000.0 + 5000 * p,
+                 "details": "sin cebolla" if p == 0 else ""}
+                for p in range(products_per_order)
+            ],
+            "created_at": "2025-04-10T18:22:05",
+            "updated_at": "2025-04-10T18:40:51",
+            "state": ("pendiente", "en preparación", "completado")[i % 3],
+        }
+    return payload
+
+
+def timed(func, runs: int) -> tuple:
+    times = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serialización y bytes de /orders/all")
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = build_payload(args.orders)
+    adapter = TypeAdapter(ResponseHTTPAllOrders)
+
+    def before() -> bytes:
+        return JSONResponse(jsonable_encoder(payload)).body
+
+    def after() -> bytes:
+        # Lo que hace FastAPI con un response_model tipado: validar, volcar y responder
+        content = adapter.dump_python(adapter.validate_python(payload), mode="json", exclude_unset=True)
+        return ORJSONResponse(content).body
+
+    before_ms, before_body = timed(before, args.runs)
+    after_ms, after_body = timed(after, args.runs)
+    gzip_ms, gzipped = timed(lambda: gzip.compress(after_body, compresslevel=settings.gzip_compress_level), args.runs)
+
+    print(f"pedidos: {args.orders}  corridas: {args.runs} (mediana)")
+    print(f"Dict[str, Any] + jsonable_encoder + json : {before_ms:8.1f} ms  {len(before_body) / 1024:9.1f} KB")
+    print(f"modelo tipado + orjson                   : {after_ms:8.1f} ms  {len(after_body) / 1024:9.1f} KB")
+    print(f"gzip del cuerpo orjson                   : {gzip_ms:8.1f} ms  {len(gzipped) / 1024:9.1f} KB")
+    print(f"aceleración de la serialización: {before_ms / after_ms:.1f}x; bytes en el cable con gzip: "
+          f"{100 * len(gzipped) / len(after_body):.1f}% del original")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Cuántos saltos de LLM evita core.product_matching en update_order_product.
+
+Arma pedidos sintéticos con productos del menú de Go Papa y para cada producto
+del pedido prueba las variantes que suele escribir el LLM (minúsculas, sin
+tildes, palabras en otro orden, "por dos", un artículo de más, una letra de
+menos). Compara:
+    - antes: solo el nombre idéntico encontraba la fila; cada fallo volvía al
+      LLM como error y le costaba al turno al menos un salto más,
+    - ahora: match_product sobre las filas del pedido (sin el respaldo por id
+      del inventario, que necesita MySQL).
+Una resolución a un producto distinto del pedido se cuenta como error. También
+se prueban nombres que no están en el pedido (tamaños que no existen, variantes
+de más: "Go Papa X3", "Chorizo Argentino"), que nunca deben resolverse.
+
+Uso:
+    python scripts/bench_product_matching.py --orders 2000
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.menu_search import fold
+from core.product_matching import match_product
+
+MENU = (
+    "Go Papa X2", "Go Papa Familiar", "La Gringa X2", "La Gringa Familiar", "Chicken X2", "Chicken Familiar",
+    "La Mexa X2", "La Mexa Familiar", "Hawaiana X2", "Hawaiana Familiar", "Montañera X2", "Montañera Familiar",
+    "Clasica X2", "Clasica Familiar", "Go Papita", "Agua", "Soda", "Hit 400 ml", "Coca Cola", "Coca Cola Zero",
+    "Postobón 1.5 Lt", "Papa", "Chorizo", "Chorizo Español", "Maicitos",
+)
+
+
+def absent_variants(name: str) -> list:
+    """Nombres que contienen el del producto pero se refieren a otro."""
+    return [name.replace("X2", "X3") if "X2" in name else f"{name} X4", f"{name} Argentino"]
+
+
+def variants(name: str) -> list:
+    words = name.split()
+    typo = max(words, key=len)
+    return [
+        name.lower(),
+        fold(name),
+        " ".join(reversed(words)),
+        name.replace("X2", "por dos"),
+        f"la {name.lower()}" if not name.startswith("La ") else name[3:],
+        name.replace(typo, typo[:-1]) if len(typo) > 4 else name.upper(),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    attempts = exact_hits = resolved = wrong = absent = absent_wrong = 0
+    for order in range(args.orders):
+        names = rng.sample(MENU, rng.randint(1, 4))
+        rows = [{"id": f"{order}-{i}", "product_id": f"p-{MENU.index(name)}", "product_name": name}
+                for i, name in enumerate(names)]
+        for row in rows:
+            for query in variants(row["product_name"]):
+                attempts += 1
+                exact_hits += any(other["product_name"] == query for other in rows)
+                match = match_product(rows, query, name_key="product_name", id_key="product_id")
+                if match and match.item is row:
+                    resolved += 1
+                elif match:
+                    wrong += 1
+            for query in absent_variants(row["product_name"]):
+                if any(fold(other["product_name"]) == fold(query) for other in rows):
+                    continue
+                absent += 1
+                match = match_product(rows, query, name_key="product_name", id_key="product_id")
+                absent_wrong += match is not None
+
+    print(f"actualizaciones con nombre variado: {attempts:,}")
+    print(f"antes (nombre idéntico): {exact_hits:,} encontradas, {attempts - exact_hits:,} saltos extra de LLM")
+    print(f"ahora (product_matching): {resolved:,} encontradas, {attempts - resolved - wrong:,} sin resolver, "
+          f"{wrong:,} a otro producto")
+    print(f"nombres que no están en el pedido: {absent:,}, {absent_wrong:,} resueltos a otro producto")
+    print(f"saltos evitados: {resolved - exact_hits:,} ({(resolved - exact_hits) / attempts:.1%})")
+
+
+if __name__ == "__main__":
+    main()
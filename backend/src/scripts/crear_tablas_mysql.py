@@ -13,6 +13,8 @@ from mysql.connector import Error
 import mysql.connector
 
 from core.config import settings
+from core.partitioning import default_partition_clause
+from core.money import LINE_TOTAL_SQL, MONEY_SQL_TYPE
 
 def create_tables():
     """Create all necessary tables in MySQL database if they don't exist."""
@@ -29,7 +31,7 @@ def create_tables():
         cursor = connection.cursor()
         try:
             # Create inventory table
-            cursor.execute("""
+            cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS inventory (
                 id_auto BIGINT AUTO_INCREMENT,
                 id VARCHAR(255) NOT NULL,
@@ -37,42 +39,48 @@ def create_tables():
                 name VARCHAR(255) NOT NULL,
                 quantity INT NOT NULL,
                 unit VARCHAR(50) NOT NULL,
-                price FLOAT,
+                price {MONEY_SQL_TYPE},
                 descripcion TEXT,
                 tipo_producto ENUM('menu', 'adicion') DEFAULT 'menu',
                 last_updated DATETIME NOT NULL,
                 PRIMARY KEY (id_auto),
                 UNIQUE KEY (id),
-                INDEX (restaurant_id)
+                INDEX (restaurant_id),
+                UNIQUE KEY uq_inventory_restaurant_name (restaurant_id, name)
             )
             """)
             print("Inventory table created successfully")
             
             # Create orders table
-            cursor.execute("""
+            cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS orders (
-                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                id BIGINT AUTO_INCREMENT,
                 enum_order_table VARCHAR(255) NOT NULL,
                 product_id VARCHAR(255) NOT NULL,
                 product_name VARCHAR(255) NOT NULL,
                 quantity INT NOT NULL,
-                price FLOAT DEFAULT 0,
+                price {MONEY_SQL_TYPE} NOT NULL DEFAULT 0,
+                {LINE_TOTAL_SQL},
                 details TEXT,
                 state VARCHAR(50) DEFAULT 'pendiente',
                 address VARCHAR(255) NOT NULL,
                 user_name VARCHAR(255),
                 user_id VARCHAR(255),
                 restaurant_id VARCHAR(255) DEFAULT 'go_papa',
+                reserved_quantity INT NOT NULL DEFAULT 0,
                 observaciones TEXT,
                 adicion TEXT,
                 created_at DATETIME NOT NULL,
                 updated_at DATETIME NOT NULL,
+                completed_at DATETIME NULL,
+                PRIMARY KEY (id, created_at),
                 INDEX (enum_order_table),
                 INDEX (address),
                 INDEX (state),
                 INDEX (created_at),
-                INDEX (user_id)
-            )
+                INDEX (user_id),
+                INDEX ix_orders_updated (updated_at, id)
+            ) {default_partition_clause("created_at")}
             """)
             print("Orders table created successfully")
             
@@ -93,20 +101,30 @@ def create_tables():
             print("Users table created successfully")
             
             # Create conversations table
-            cursor.execute("""
+            cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS conversations (
-                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                id BIGINT AUTO_INCREMENT,
                 user_id VARCHAR(255) NOT NULL,
                 conversation_id VARCHAR(255) NOT NULL,
                 created_at DATETIME NOT NULL,
                 user_message_content TEXT NOT NULL,
                 ai_message_content TEXT NOT NULL,
                 rate BOOLEAN DEFAULT FALSE,
+                PRIMARY KEY (id, created_at),
                 INDEX (conversation_id),
-                INDEX (user_id)
-            )
+                INDEX (user_id, created_at)
+            ) {default_partition_clause("created_at")}
             """)
             print("Conversations table created successfully")
+
+            # Create change counters table (versions for ETags)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS change_counters (
+                name VARCHAR(100) PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0
+            )
+            """)
+            print("Change counters table created successfully")
             
             connection.commit()
             print("All tables created successfully")
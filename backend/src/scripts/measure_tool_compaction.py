@@ -0,0 +1,57 @@
+"""
+Mide el ahorro de tokens de los serializadores de herramientas sobre resultados grabados.
+
+Los resultados se graban en producción o en pruebas con
+TOOL_RESULT_RECORD_PATH=/ruta/tool_results.jsonl (una línea por llamada:
+{"tool": ..., "result": ...}). Este script re-serializa cada resultado con el
+formato original (json.dumps) y con el compacto, y reporta tokens por herramienta.
+
+Uso:
+    python scripts/measure_tool_compaction.py tool_results.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.utils import count_tokens
+from inference.tools.tool_serializers import TOOL_SERIALIZERS, raw_tool_result, serialize_tool_result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Ahorro de tokens por herramienta")
+    parser.add_argument("recordings", help="Archivo JSONL con los resultados grabados")
+    args = parser.parse_args()
+
+    stats = {}
+    with open(args.recordings, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            tool_name, result = record["tool"], record["result"]
+            raw_tokens = len(count_tokens(raw_tool_result(result)) or [])
+            compact_tokens = len(count_tokens(serialize_tool_result(tool_name, result)) or [])
+            tool_stats = stats.setdefault(tool_name, [0, 0, 0])
+            tool_stats[0] += 1
+            tool_stats[1] += raw_tokens
+            tool_stats[2] += compact_tokens
+
+    print(f"{'herramienta':24s} {'llamadas':>8s} {'tokens antes':>13s} {'tokens después':>15s} {'ahorro':>7s}")
+    total_raw = total_compact = 0
+    for tool_name, (calls, raw_tokens, compact_tokens) in sorted(stats.items()):
+        total_raw += raw_tokens
+        total_compact += compact_tokens
+        saved = 100 * (1 - compact_tokens / raw_tokens) if raw_tokens else 0.0
+        marker = "" if tool_name in TOOL_SERIALIZERS else " (json compacto)"
+        print(f"{tool_name:24s} {calls:8d} {raw_tokens:13d} {compact_tokens:15d} {saved:6.1f}%{marker}")
+    if total_raw:
+        print(f"{'TOTAL':24s} {'':8s} {total_raw:13d} {total_compact:15d} {100 * (1 - total_compact / total_raw):6.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Migraciones del esquema MySQL para bases de datos ya existentes.
+
+`create_tables` de cada gestor solo crea las tablas que faltan (CREATE TABLE IF
+NOT EXISTS); los cambios sobre tablas existentes se registran aquí, en orden.
+Cada migración se aplica una sola vez y queda anotada en `schema_migrations`.
+Un paso puede ser una sentencia SQL o una función async que recibe el cursor
+(migraciones de datos).
+
+El DDL actual (`create_tables` y scripts/crear_tablas_mysql.py) ya incluye los
+cambios de cada migración, así que los pasos de esquema consultan
+information_schema y no hacen nada si la columna o el índice ya existen: en una
+base creada por el código actual las migraciones solo quedan anotadas.
+
+Uso:
+    python scripts/migrations.py            # aplica las pendientes
+    python scripts/migrations.py --list     # muestra cuáles están aplicadas
+"""
+import argparse
+import asyncio
+import os
+import sys
+from typing import Awaitable, Callable, List, Optional, Tuple, Union
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.clock import get_clock
+from core.config import settings
+from core.db_pool import DBConnectionPool
+from core.money import LINE_TOTAL_SQL, MONEY_SQL_TYPE
+from core.partitioning import MONTHS_AHEAD, PARTITIONED_TABLES, add_months, list_partitions, partition_clause
+from core.utils import uuid7
+
+async def table_exists(cursor, table: str) -> bool:
+    await cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,),
+    )
+    return bool((await cursor.fetchone())[0])
+
+
+async def column_type(cursor, table: str, column: str) -> Optional[str]:
+    """Tipo de la columna ("int", "decimal", ...); None si no existe."""
+    await cursor.execute(
+        "SELECT DATA_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column),
+    )
+    row = await cursor.fetchone()
+    return row[0].lower() if row else None
+
+
+async def column_exists(cursor, table: str, column: str) -> bool:
+    return await column_type(cursor, table, column) is not None
+
+
+async def index_columns(cursor, table: str, index: str) -> List[str]:
+    """Columnas del índice en orden; lista vacía si no existe."""
+    await cursor.execute(
+        "SELECT COLUMN_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s ORDER BY SEQ_IN_INDEX",
+        (table, index),
+    )
+    return [row[0] for row in await cursor.fetchall()]
+
+
+def add_column(table: str, column: str, definition: str) -> Callable[..., Awaitable[None]]:
+    """Paso que agrega la columna si la tabla todavía no la tiene."""
+    async def step(cursor) -> None:
+        if await column_exists(cursor, table, column):
+            print(f"  {table}.{column} ya existe")
+            return
+        await cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+
+def add_index(table: str, index: str, definition: str) -> Callable[..., Awaitable[None]]:
+    """Paso que agrega el índice (`definition`: "INDEX nombre (...)", "UNIQUE KEY nombre (...)") si no existe."""
+    async def step(cursor) -> None:
+        if await index_columns(cursor, table, index):
+            print(f"  índice {table}.{index} ya existe")
+            return
+        await cursor.execute(f"ALTER TABLE {table} ADD {definition}")
+    return step
+
+
+async def conversations_user_created_index(cursor) -> None:
+    """El índice user_id de conversations pasa de (user_id) a (user_id, created_at)."""
+    if await index_columns(cursor, "conversations", "user_id") == ["user_id", "created_at"]:
+        print("  índice conversations.user_id ya incluye created_at")
+        return
+    await cursor.execute("ALTER TABLE conversations DROP INDEX user_id, ADD INDEX user_id (user_id, created_at)")
+
+
+# Ids de producto anteriores: "p-{timestamp}" con segundos Unix y decimales
+LEGACY_PRODUCT_ID = r"^p-[0-9]+(\.[0-9]+)?$"
+
+
+def legacy_product_id_to_uuid7(product_id: str) -> str:
+    """Id UUIDv7 de un producto antiguo, con su misma marca de tiempo (conserva el orden de alta)."""
+    return f"p-{uuid7(int(float(product_id[2:]) * 1000)).hex}"
+
+
+async def uuid7_product_ids(cursor) -> None:
+    """Reescribe los ids p-{timestamp} del inventario y las referencias en orders.product_id."""
+    await cursor.execute("SELECT id FROM inventory WHERE id REGEXP %s", (LEGACY_PRODUCT_ID,))
+    mapping = [(legacy_product_id_to_uuid7(row[0]), row[0]) for row in await cursor.fetchall()]
+    if mapping:
+        await cursor.executemany("UPDATE orders SET product_id = %s WHERE product_id = %s", mapping)
+        await cursor.executemany("UPDATE inventory SET id = %s WHERE id = %s", mapping)
+    print(f"  {len(mapping)} productos con id UUIDv7")
+
+
+async def partition_by_month(cursor) -> None:
+    """
+    Particiona por mes las tablas de PARTITIONED_TABLES desde su fila más antigua.
+    La clave primaria pasa a (id, created_at), requisito de MySQL. Reconstruye la
+    tabla: ejecutar en una ventana de mantenimiento.
+    """
+    today = get_clock().today()
+    for table, column in PARTITIONED_TABLES.items():
+        if await list_partitions(cursor, table):
+            print(f"  {table} ya está particionada")
+            continue
+        await cursor.execute(f"SELECT MIN({column}) FROM {table}")
+        first = (await cursor.fetchone())[0]
+        first = first.date() if first else today
+        await cursor.execute(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, {column})")
+        await cursor.execute(f"ALTER TABLE {table} {partition_clause(column, first, add_months(today, MONTHS_AHEAD))}")
+        print(f"  {table} particionada por mes desde {first:%Y-%m}")
+
+
+async def decimal_money(cursor) -> None:
+    """
+    price FLOAT -> DECIMAL(12,2) en inventory y orders (y en orders_archive si ya
+    existe) y columna generada line_total = price * quantity. MySQL redondea cada
+    precio al centavo al convertirlo. Reconstruye las tablas: ejecutar en una
+    ventana de mantenimiento.
+    """
+    if await column_type(cursor, "inventory", "price") != "decimal":
+        await cursor.execute(f"ALTER TABLE inventory MODIFY price {MONEY_SQL_TYPE}")
+    for table in ("orders", "orders_archive"):
+        if not await table_exists(cursor, table):
+            continue
+        changes = []
+        if await column_type(cursor, table, "price") != "decimal":
+            # La columna pasa a NOT NULL: los pedidos sin precio quedan en 0, como el DEFAULT anterior
+            await cursor.execute(f"UPDATE {table} SET price = 0 WHERE price IS NULL")
+            changes.append(f"MODIFY price {MONEY_SQL_TYPE} NOT NULL DEFAULT 0")
+        if not await column_exists(cursor, table, "line_total"):
+            changes.append(f"ADD COLUMN {LINE_TOTAL_SQL}")
+        if not changes:
+            print(f"  {table} ya tiene price {MONEY_SQL_TYPE} y line_total")
+            continue
+        await cursor.execute(f"ALTER TABLE {table} {', '.join(changes)}")
+        print(f"  {table}: price {MONEY_SQL_TYPE} y line_total")
+
+
+async def idempotency_lease(cursor) -> None:
+    """
+    Arriendo de las claves de idempotencia en proceso (lease_until). La tabla se
+    crea al primer uso: si no existe, la crea el código ya con la columna, y si
+    el código nuevo ya atendió solicitudes antes de migrar, la columna también
+    existe. Las claves en proceso sin arriendo reciben uno desde su creación, así
+    las que quedaron de una caída se pueden reintentar.
+    """
+    if not await table_exists(cursor, "idempotency_keys"):
+        return
+    await add_column("idempotency_keys", "lease_until", "DATETIME NULL")(cursor)
+    await cursor.execute(
+        "UPDATE idempotency_keys SET lease_until = created_at + INTERVAL %s SECOND "
+        "WHERE status = 'in_progress' AND lease_until IS NULL",
+        (int(settings.idempotency_lease_seconds),),
+    )
+
+
+# (nombre, sentencias) en orden de aplicación. No modificar las ya publicadas: agregar nuevas al final.
+MIGRATIONS: List[Tuple[str, List[Union[str, Callable[..., Awaitable[None]]]]]] = [
+    ("0001_orders_reserved_quantity", [
+        # Unidades descontadas del inventario por cada fila del pedido; los pedidos
+        # anteriores quedan en 0 (no retienen existencias)
+        add_column("orders", "reserved_quantity", "INT NOT NULL DEFAULT 0"),
+    ]),
+    ("0002_inventory_natural_key", [
+        # Clave natural de la carga masiva del catálogo (upsert por nombre). Falla si
+        # el inventario ya tiene nombres repetidos en un restaurante: depurarlos antes
+        add_index("inventory", "uq_inventory_restaurant_name",
+                  "UNIQUE KEY uq_inventory_restaurant_name (restaurant_id, name)"),
+    ]),
+    ("0003_inventory_uuid7_ids", [
+        # Los ids p-{timestamp} colisionaban con dos altas en el mismo segundo
+        uuid7_product_ids,
+    ]),
+    ("0004_monthly_partitions", [
+        # El historial del día se consulta por (user_id, created_at)
+        conversations_user_created_index,
+        partition_by_month,
+    ]),
+    ("0005_orders_updated_index", [
+        # Paginación por clave (updated_at, id) de la exportación incremental
+        add_index("orders", "ix_orders_updated", "INDEX ix_orders_updated (updated_at, id)"),
+    ]),
+    ("0006_orders_completed_at", [
+        # Momento en que el pedido pasó a completado (tiempo de preparación en los reportes).
+        # Para los pedidos ya completados se aproxima con su última actualización
+        add_column("orders", "completed_at", "DATETIME NULL"),
+        "UPDATE orders SET completed_at = updated_at WHERE state = 'completado' AND completed_at IS NULL",
+    ]),
+    ("0007_decimal_money", [
+        # FLOAT acumulaba errores de redondeo en los totales; las sumas pasan a SQL (SUM(line_total))
+        decimal_money,
+    ]),
+    ("0008_idempotency_lease", [
+        # Una clave en proceso de una instancia caída bloqueaba los reintentos hasta vencer (24 h)
+        idempotency_lease,
+    ]),
+]
+
+
+async def applied_migrations(cursor) -> List[str]:
+    await cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        name VARCHAR(100) PRIMARY KEY,
+        applied_at DATETIME NOT NULL
+    )
+    """)
+    await cursor.execute("SELECT name FROM schema_migrations ORDER BY name")
+    return [row[0] for row in await cursor.fetchall()]
+
+
+async def migrate(list_only: bool = False) -> int:
+    db_pool = DBConnectionPool()
+    pool = await db_pool.get_pool()
+    try:
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                done = set(await applied_migrations(cursor))
+                await conn.commit()
+                for name, statements in MIGRATIONS:
+                    if list_only or name in done:
+                        print(f"{'aplicada ' if name in done else 'pendiente'}  {name}")
+                        continue
+                    print(f"aplicando  {name}")
+                    # Los DDL de MySQL hacen commit implícito: cada sentencia queda aplicada al ejecutarse
+                    for statement in statements:
+                        if callable(statement):
+                            await statement(cursor)
+                        else:
+                            await cursor.execute(statement)
+                    await cursor.execute(
+                        "INSERT INTO schema_migrations (name, applied_at) VALUES (%s, %s)",
+                        (name, get_clock().db_now()),
+                    )
+                    await conn.commit()
+    finally:
+        await db_pool.close()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Aplica las migraciones pendientes del esquema MySQL")
+    parser.add_argument("--list", action="store_true", help="solo mostrar el estado de las migraciones")
+    args = parser.parse_args()
+    return asyncio.run(migrate(list_only=args.list))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from core.admission import AdmissionController, AdmissionRejected
+
+
+def test_per_user_token_bucket_limits_bursts_without_affecting_other_users():
+    controller = AdmissionController(max_concurrency=10, user_rate_per_minute=0.0001, user_burst=2)
+
+    async def scenario():
+        for _ in range(2):
+            async with controller.admit("573001"):
+                pass
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit("573001"):
+                pass
+        assert rejected.value.reason == "rate_limited"
+        async with controller.admit("573002"):
+            pass
+
+    asyncio.run(scenario())
+    assert controller.metrics()["admitted"] == 3
+    assert controller.metrics()["rate_limited"] == 1
+
+
+def test_bounded_queue_sheds_overflow_and_times_out_waiters():
+    controller = AdmissionController(max_concurrency=2, max_queue=2, queue_timeout=0.2, user_burst=100)
+    release = asyncio.Event()
+    outcomes = []
+
+    async def turn(user_id):
+        try:
+            async with controller.admit(user_id):
+                await release.wait()
+            outcomes.append("ok")
+        except AdmissionRejected as e:
+            outcomes.append(e.reason)
+
+    async def scenario():
+        tasks = [asyncio.create_task(turn(f"user-{i}")) for i in range(6)]
+        await asyncio.sleep(0.05)
+        assert controller.metrics()["in_flight"] == 2
+        assert controller.metrics()["queue_depth"] == 2
+        await asyncio.sleep(0.3)
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert sorted(outcomes) == ["ok", "ok", "queue_full", "queue_full", "queue_timeout", "queue_timeout"]
+    assert controller.metrics()["rejected"] == 4
+    assert controller.metrics()["in_flight"] == 0
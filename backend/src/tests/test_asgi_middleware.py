@@ -0,0 +1,62 @@
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from core.asgi_middleware import CacheControlMiddleware, RequestMetrics, ServerTimingMiddleware
+from core.auth_middleware import AuthMiddleware
+from core.token_verifier import TokenVerifier
+
+
+def build_app(metrics):
+    app = FastAPI()
+
+    @app.get("/orders/{order_id}")
+    async def get_order(order_id: str, response: Response):
+        response.headers["Cache-Control"] = "private, no-cache"
+        return {"id": order_id}
+
+    @app.get("/inventory/stream")
+    async def stream():
+        return StreamingResponse(iter([b"a", b"b", b"c"]))
+
+    app.add_middleware(AuthMiddleware, verifier=TokenVerifier(session_secret="secreto"))
+    app.add_middleware(CacheControlMiddleware)
+    app.add_middleware(ServerTimingMiddleware, metrics=metrics)
+    return app
+
+
+def test_route_cache_control_timing_and_auth_rejections(monkeypatch):
+    monkeypatch.setattr("core.auth_middleware.EXCLUDED_ROUTES", ["/orders/"])
+    metrics = RequestMetrics()
+    client = TestClient(build_app(metrics))
+
+    for order_id in ("57", "58"):
+        response = client.get(f"/orders/{order_id}")
+        assert response.headers["cache-control"] == "private, no-cache"
+        assert response.headers["server-timing"].startswith("app;dur=")
+
+    protected = client.get("/inventory/stream", headers={"Authorization": "Bearer x"})
+    assert protected.status_code == 401
+    assert protected.headers["cache-control"] == "no-cache, no-store, must-revalidate, max-age=0"
+
+    report = metrics.report()
+    assert report["in_flight"] == 0
+    assert report["routes"]["GET /orders/{order_id}"]["count"] == 2
+    assert report["routes"]["GET /orders/{order_id}"]["status"] == {"2xx": 2}
+    assert report["status"] == {"200": 2, "401": 1}
+
+
+def test_streaming_responses_pass_through():
+    metrics = RequestMetrics()
+    app = FastAPI()
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([b"a", b"b", b"c"]))
+
+    app.add_middleware(CacheControlMiddleware)
+    app.add_middleware(ServerTimingMiddleware, metrics=metrics)
+
+    response = TestClient(app).get("/stream")
+    assert response.content == b"abc"
+    assert "GET /stream" in metrics.report()["routes"]
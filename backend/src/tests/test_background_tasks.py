@@ -0,0 +1,55 @@
+import asyncio
+
+from core.background_tasks import TaskSupervisor
+
+
+def test_submit_coalesces_by_key_and_bounds_concurrency():
+    async def scenario():
+        supervisor = TaskSupervisor()
+        supervisor.configure("update_user", max_concurrency=2, max_pending=10)
+        running = 0
+        peak = 0
+        applied = []
+
+        async def update(user_id, name):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            applied.append((user_id, name))
+            running -= 1
+
+        for user_id in ("a", "b", "c", "d"):
+            supervisor.submit("update_user", user_id, update, user_id, "v1")
+        # Mientras "a" corre, dos actualizaciones nuevas: solo la última debe aplicarse
+        await asyncio.sleep(0)
+        supervisor.submit("update_user", "a", update, "a", "v2")
+        supervisor.submit("update_user", "a", update, "a", "v3")
+
+        await supervisor.drain(timeout=1)
+        return supervisor.metrics(), peak, applied
+
+    metrics, peak, applied = asyncio.run(scenario())
+    stats = metrics["job_types"]["update_user"]
+
+    assert peak == 2
+    assert [name for user_id, name in applied if user_id == "a"] == ["v1", "v3"]
+    assert stats["submitted"] == 6 and stats["coalesced"] == 1 and stats["succeeded"] == 5
+    assert stats["queued"] == 0 and stats["running"] == 0 and metrics["live_tasks"] == 0
+
+
+def test_submit_rejects_when_queue_is_full_and_counts_failures():
+    async def scenario():
+        supervisor = TaskSupervisor()
+        supervisor.configure("update_user", max_concurrency=1, max_pending=1)
+
+        async def boom():
+            raise RuntimeError("db caída")
+
+        accepted = [supervisor.submit("update_user", key, boom) for key in ("a", "b")]
+        await supervisor.drain(timeout=1)
+        return accepted, supervisor.metrics()["job_types"]["update_user"]
+
+    accepted, stats = asyncio.run(scenario())
+    assert accepted == [True, False]
+    assert stats["rejected"] == 1 and stats["failed"] == 1
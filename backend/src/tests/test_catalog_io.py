@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import pytest
+
+from core.catalog_io import catalog_format, diff_catalog, dump_catalog, parse_catalog, price_change_rows
+from core.mysql_inventory_manager import CATALOG_UPSERT_BATCH, MySQLInventoryManager
+
+EXISTING = [
+    {"id": "p-1", "name": "Go Papa X2", "quantity": 10, "unit": "porción", "price": 50000.0,
+     "descripcion": "Papas fritas", "tipo_producto": "menu"},
+    {"id": "p-2", "name": "Guacamole", "quantity": 100, "unit": "porción", "price": 8000.0,
+     "descripcion": "Guacamole fresco", "tipo_producto": "adicion"},
+]
+
+
+def test_parse_csv_with_spanish_headers_and_semicolons():
+    content = "Nombre;Cantidad;Precio;Tipo\ngo papa x2;12;52000;MENU\nMaduro Calado;;8000;adicion\n".encode("utf-8")
+    assert parse_catalog(content, catalog_format("menu.csv")) == [
+        {"name": "go papa x2", "quantity": 12, "price": 52000.0, "tipo_producto": "menu"},
+        {"name": "Maduro Calado", "price": 8000.0, "tipo_producto": "adicion"},
+    ]
+    # Una sola columna: sin separador que detectar
+    assert parse_catalog(b"nombre\nAgua\nSoda\n", "csv") == [{"name": "Agua"}, {"name": "Soda"}]
+
+
+def test_parse_rejects_invalid_rows_and_repeated_names():
+    with pytest.raises(ValueError, match="Fila 2"):
+        parse_catalog(b"name,quantity\nGo Papa X2,1.5\n", "csv")
+    with pytest.raises(ValueError, match="repetido"):
+        parse_catalog(json.dumps({"products": [{"name": "A"}, {"name": "a"}]}).encode(), "json")
+    with pytest.raises(ValueError, match="Formato no soportado"):
+        catalog_format("menu.txt")
+
+
+def test_exported_catalog_imports_back_unchanged():
+    for fmt in ("csv", "json"):
+        rows = parse_catalog(dump_catalog(EXISTING, fmt), fmt)
+        diff = diff_catalog(EXISTING, rows, new_id=lambda: "nuevo")
+        assert diff["upserts"] == [] and diff["unchanged"] == ["Go Papa X2", "Guacamole"]
+
+
+def test_diff_classifies_rows_by_natural_key():
+    rows = [
+        {"name": "go papa x2", "quantity": 12, "price": 50000.001},
+        {"name": "Guacamole", "price": 8000},
+        {"name": "Maduro Calado", "price": 8000.0, "tipo_producto": "adicion"},
+    ]
+    diff = diff_catalog(EXISTING, rows, new_id=lambda: "p-nuevo")
+    assert diff["inserted"] == ["Maduro Calado"]
+    assert diff["updated"] == ["Go Papa X2"]
+    assert diff["unchanged"] == ["Guacamole"]
+    assert diff["changes"] == {"Go Papa X2": {"quantity": [10, 12]}}
+    updated, inserted = diff["upserts"]
+    # El producto existente conserva id, nombre y las columnas que no vienen en el archivo
+    assert updated == {**EXISTING[0], "quantity": 12}
+    assert inserted == {"id": "p-nuevo", "name": "Maduro Calado", "quantity": 0, "unit": "unidad",
+                        "price": 8000.0, "descripcion": "", "tipo_producto": "adicion"}
+
+
+def test_price_change_rows_by_percent_and_by_item():
+    rows = price_change_rows(EXISTING, percent=10, round_to=1000, tipo_producto="menu")
+    assert rows == [{"name": "Go Papa X2", "price": 55000}]
+
+    rows = price_change_rows(EXISTING, items=[{"product_id": "p-2", "price": 9000}, {"name": "go papa x2", "quantity": 5}])
+    assert rows == [{"name": "Guacamole", "price": 9000}, {"name": "Go Papa X2", "quantity": 5}]
+
+    with pytest.raises(ValueError, match="no encontrado"):
+        price_change_rows(EXISTING, items=[{"name": "Salchipapa"}])
+
+
+def test_upsert_uses_multi_row_statements():
+    class RecordingCursor:
+        def __init__(self):
+            self.statements = []
+
+        async def execute(self, query, params=()):
+            self.statements.append((query, params))
+
+    products = [{"id": f"p-{i}", "name": f"Producto {i}", "quantity": i, "unit": "unidad", "price": 1000.0,
+                 "descripcion": "", "tipo_producto": "menu"} for i in range(CATALOG_UPSERT_BATCH + 1)]
+    cursor = RecordingCursor()
+    asyncio.run(MySQLInventoryManager()._upsert_products(cursor, "go_papa", products))
+
+    assert len(cursor.statements) == 2
+    query, params = cursor.statements[0]
+    assert query.startswith("INSERT INTO inventory (id, restaurant_id, name, quantity")
+    assert "ON DUPLICATE KEY UPDATE quantity = VALUES(quantity)" in query
+    assert len(params) == CATALOG_UPSERT_BATCH * 9 and params[:3] == ["p-0", "go_papa", "Producto 0"]
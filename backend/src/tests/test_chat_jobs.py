@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from fastapi import Response
+from langchain_core.messages import AIMessage
+
+import api.chat_agent as chat_agent
+import core.chat_job_store as chat_job_store
+from core.background_tasks import task_supervisor
+from core.chat_job_store import ChatJobStore, InMemoryChatJobStore
+from core.schema_http import RequestHTTPChatJob
+
+
+class FakeAgent:
+    async def invoke_flow(self, user_input, conversation_id, conversation_name, user_id, restaurant_name):
+        await asyncio.sleep(0.01)
+        if user_input == "falla":
+            raise RuntimeError("sin conexión")
+        return {"messages": [AIMessage(content=f"eco: {user_input}")]}, "msg-1"
+
+
+def test_job_is_accepted_immediately_then_polled_and_pushed(monkeypatch):
+    # monkeypatch restaura el almacén global al terminar la prueba
+    monkeypatch.setattr(chat_job_store, "_chat_job_store", InMemoryChatJobStore())
+    monkeypatch.setattr(chat_agent, "restaurant_chat_agent", FakeAgent())
+    pushed = []
+
+    async def fake_push(phone, text):
+        pushed.append((phone, text))
+        return True
+
+    monkeypatch.setattr(chat_agent, "send_whatsapp_message", fake_push)
+
+    def request(query, delivery):
+        return RequestHTTPChatJob(user_id="573001", conversation_id="c", conversation_name="n",
+                                  query=query, delivery=delivery)
+
+    async def scenario():
+        accepted = await chat_agent.endpoint_create_chat_job(request("hola", "whatsapp"), Response(), None)
+        failed = await chat_agent.endpoint_create_chat_job(request("falla", "poll"), Response(), None)
+        assert accepted["status"] == "queued"
+        await task_supervisor.drain(timeout=5)
+        return (await chat_agent.endpoint_get_chat_job(accepted["job_id"]),
+                await chat_agent.endpoint_get_chat_job(failed["job_id"]))
+
+    done, failed = asyncio.run(scenario())
+
+    assert done == {"job_id": done["job_id"], "status": "done", "id": "msg-1", "text": "eco: hola", "error": None}
+    assert failed["status"] == "failed" and failed["error"] == "sin conexión"
+    assert pushed == [("573001", "eco: hola")]
+
+
+def test_job_store_implementations_must_define_every_operation():
+    class WithoutGet(ChatJobStore):
+        async def create(self, job):
+            pass
+
+        async def update(self, job_id, **fields):
+            pass
+
+    with pytest.raises(TypeError):
+        WithoutGet()
@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+
+from core.clock import BOGOTA_TZ, FrozenClock, get_clock, set_clock
+from core.utils import current_colombian_time, generate_order_id
+
+
+def test_day_bounds_follow_bogota_not_utc():
+    # 03:30 UTC del 2 de marzo sigue siendo 1 de marzo en Bogotá (UTC-5)
+    clock = FrozenClock(datetime(2025, 3, 2, 3, 30, tzinfo=timezone.utc))
+    start, end = clock.day_bounds()
+
+    assert clock.now().tzinfo is BOGOTA_TZ
+    assert clock.db_now() == datetime(2025, 3, 1, 22, 30)
+    assert start == datetime(2025, 3, 1, 0, 0)
+    assert end.date() == start.date() and end.hour == 23
+
+
+def test_now_is_cached_within_the_same_second():
+    clock = FrozenClock(datetime(2025, 3, 1, 12, 0, 0))
+    first = clock.now()
+    assert clock.now() is first
+
+    clock.advance(seconds=1)
+    assert clock.now() is not first
+    assert clock.db_now() == datetime(2025, 3, 1, 12, 0, 1)
+
+
+def test_set_clock_injects_into_helpers():
+    previous = set_clock(FrozenClock(datetime(2025, 3, 1, 20, 0)))
+    try:
+        assert current_colombian_time() == "2025-03-01 20:00:00"
+        last_order = {"created_at": "2025-03-01T18:30:00", "state": "pendiente", "enum_order_table": "100005"}
+        assert generate_order_id(last_order) == "100006"
+        get_clock().advance(minutes=-60)
+        assert generate_order_id(last_order) == "100005"
+    finally:
+        set_clock(previous)
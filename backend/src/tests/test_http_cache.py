@@ -0,0 +1,39 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.orders as orders
+
+
+def test_orders_today_returns_304_without_running_the_query(monkeypatch):
+    state = {"version": 7, "queries": 0}
+
+    async def fake_version():
+        return state["version"]
+
+    async def fake_today():
+        state["queries"] += 1
+        return {
+            "stats": {"total_orders": 1, "pending_orders": 1, "complete_orders": 0, "total_sales": 0.0},
+            "orders": [{"id": "57", "table_id": "Calle 10", "customer_name": "Ana", "state": "pendiente",
+                        "products": [{"name": "Go Papa X2", "quantity": 1, "price": 60000.0, "observations": "", "adicion": None}],
+                        "created_at": "2025-04-10T18:22:05", "updated_at": "2025-04-10T18:22:05"}],
+        }
+
+    monkeypatch.setattr(orders.order_manager, "get_orders_version", fake_version)
+    monkeypatch.setattr(orders.order_manager, "get_today_orders_not_paid", fake_today)
+    app = FastAPI()
+    app.include_router(orders.orders_router, prefix="/orders")
+    client = TestClient(app)
+
+    first = client.get("/orders/today")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.headers["cache-control"] == "private, no-cache"
+
+    cached = client.get("/orders/today", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+    assert state["queries"] == 1
+
+    state["version"] = 8
+    changed = client.get("/orders/today", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert state["queries"] == 2
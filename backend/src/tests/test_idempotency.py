@@ -0,0 +1,123 @@
+import asyncio
+import os
+import uuid
+from datetime import timedelta
+
+import pytest
+
+from core.idempotency import IdempotencyStore
+
+
+def test_duplicates_replay_the_original_response_without_rerunning():
+    store = IdempotencyStore(use_db=False)
+    runs = []
+
+    async def create_order():
+        runs.append(1)
+        await asyncio.sleep(0.02)
+        return {"id": "o-1", "product_name": "Go Papa X2"}
+
+    async def scenario():
+        # Dos entregas concurrentes y una reentrega posterior del mismo mensaje
+        first, concurrent = await asyncio.gather(
+            store.run("orders.create", "wamid.1", create_order),
+            store.run("orders.create", "wamid.1", create_order),
+        )
+        later = await store.run("orders.create", "wamid.1", create_order)
+        other = await store.run("orders.create", "wamid.2", create_order)
+        return first, concurrent, later, other
+
+    first, concurrent, later, other = asyncio.run(scenario())
+
+    assert first == ({"id": "o-1", "product_name": "Go Papa X2"}, False)
+    assert concurrent == (first[0], True)
+    assert later == (first[0], True)
+    assert other[1] is False
+    assert len(runs) == 2
+    assert store.metrics()["joined_inflight"] == 1 and store.metrics()["replayed_memory"] == 1
+
+
+def test_failed_requests_release_the_key_and_missing_keys_always_run():
+    store = IdempotencyStore(use_db=False)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("timeout de OpenAI")
+        return {"id": "m-1", "text": "listo"}
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await store.run("chat", "wamid.9", flaky)
+        assert await store.run("chat", "wamid.9", flaky) == ({"id": "m-1", "text": "listo"}, False)
+        await store.run("chat", None, flaky)
+        await store.run("chat", None, flaky)
+
+    asyncio.run(scenario())
+    assert len(attempts) == 4
+
+
+def test_in_progress_key_renews_its_lease_while_the_request_runs():
+    store = IdempotencyStore(lease_seconds=0.03)
+    calls = []
+
+    async def record(name):
+        calls.append(name)
+        return True
+
+    store._db_claim = lambda scope, key: record("claim")
+    store._db_renew = lambda scope, key: record("renew")
+    store._db_complete = lambda scope, key, response: record("complete")
+
+    async def slow_chat():
+        await asyncio.sleep(0.1)
+        return {"text": "listo"}
+
+    async def scenario():
+        response = await store.run("chat", "wamid.3", slow_chat)
+        renewed = calls.count("renew")
+        await asyncio.sleep(0.05)
+        return response, renewed
+
+    response, renewed = asyncio.run(scenario())
+    assert response == ({"text": "listo"}, False)
+    assert renewed >= 2
+    # La renovación se detiene al terminar la solicitud
+    assert calls.count("renew") == renewed and calls[-1] == "complete"
+
+
+@pytest.mark.skipif(os.getenv("RUN_MYSQL_TESTS") != "1", reason="requiere MySQL (RUN_MYSQL_TESTS=1 y DB_*)")
+def test_key_abandoned_by_a_crashed_instance_is_taken_over_after_its_lease():
+    from core.clock import get_clock
+
+    store = IdempotencyStore(lease_seconds=60)
+    key = f"wamid.{uuid.uuid4().hex}"
+
+    async def scenario():
+        await store._create_tables()
+        now = get_clock().db_now()
+        pool = await store.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                # Clave en proceso de una instancia que se cayó: vigente 24 h, arriendo vencido
+                await cursor.execute(
+                    "INSERT INTO idempotency_keys (scope, idem_key, status, response, created_at, expires_at, "
+                    "lease_until) VALUES ('chat', %s, 'in_progress', NULL, %s, %s, %s)",
+                    (key, now - timedelta(minutes=5), now + timedelta(hours=24), now - timedelta(minutes=3)),
+                )
+                await conn.commit()
+        taken = await store._db_claim("chat", key)
+        # Con el arriendo renovado por la nueva dueña, otra reentrega no la toma
+        again = await store._db_claim("chat", key)
+        row = await store._db_get("chat", key)
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("DELETE FROM idempotency_keys WHERE idem_key = %s", (key,))
+                await conn.commit()
+        return taken, again, row
+
+    taken, again, row = asyncio.run(scenario())
+    assert taken is True
+    assert again is False
+    assert row["status"] == "in_progress"
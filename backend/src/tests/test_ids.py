@@ -0,0 +1,59 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+from core.utils import genereta_id, id_from_bytes, id_timestamp, id_to_bytes, new_id, uuid7
+from scripts.migrations import legacy_product_id_to_uuid7, uuid7_product_ids
+
+
+def test_uuid7_ids_are_strictly_increasing_across_threads():
+    ids = []
+
+    def generate():
+        ids.extend(uuid7() for _ in range(5000))
+
+    threads = [threading.Thread(target=generate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(ids)) == 20000
+    assert all(value.version == 7 and value.variant == "specified in RFC 4122" for value in ids)
+    # Orden de generación == orden de bytes (el que usa el índice)
+    single = [uuid7() for _ in range(10000)]
+    assert single == sorted(single) and [v.bytes for v in single] == sorted(v.bytes for v in single)
+
+
+def test_text_and_binary_forms_round_trip():
+    product_id = new_id("p-")
+    assert product_id.startswith("p-") and len(product_id) == 34
+
+    raw = id_to_bytes(product_id)
+    assert len(raw) == 16 and id_from_bytes(raw, "p-") == product_id
+    assert id_to_bytes(genereta_id()) != raw
+    assert abs((id_timestamp(product_id) - datetime.now(timezone.utc)).total_seconds()) < 5
+
+
+def test_legacy_product_ids_keep_their_timestamp_and_update_orders():
+    new = legacy_product_id_to_uuid7("p-1718000000.123456")
+    assert id_timestamp(new) == datetime.fromtimestamp(1718000000.123, tz=timezone.utc)
+
+    class FakeCursor:
+        def __init__(self):
+            self.updates = []
+
+        async def execute(self, query, params=()):
+            pass
+
+        async def fetchall(self):
+            return [("p-1718000000.5",), ("p-1718000001",)]
+
+        async def executemany(self, query, params):
+            self.updates.append((query.split()[1], [old for _, old in params]))
+
+    cursor = FakeCursor()
+    asyncio.run(uuid7_product_ids(cursor))
+    # Primero las referencias de los pedidos, luego los productos
+    assert cursor.updates == [("orders", ["p-1718000000.5", "p-1718000001"]),
+                              ("inventory", ["p-1718000000.5", "p-1718000001"])]
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+
+from inference.graphs.llm_gateway import CircuitBreaker, LLMUnavailableError, ResilientLLM
+
+
+class LatencyStub:
+    """Modelo local que responde tras la latencia indicada para cada llamada."""
+
+    def __init__(self, name, latencies):
+        self.name = name
+        self.latencies = list(latencies)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def ainvoke(self, messages):
+        latency = self.latencies[min(self.calls, len(self.latencies) - 1)]
+        self.calls += 1
+        try:
+            await asyncio.sleep(latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if latency < 0:
+            raise RuntimeError("falla")
+        return f"{self.name}:{self.calls}"
+
+
+def test_hedge_wins_over_a_slow_first_request_and_the_loser_is_cancelled():
+    primary = LatencyStub("primary", [1.0, 0.02])
+    llm = ResilientLLM(primary, call_timeout=2.0, hedge_after=0.05, min_hedge_after=0.01)
+
+    start = time.monotonic()
+    result = asyncio.run(llm.ainvoke(["hola"]))
+
+    assert result == "primary:2"
+    assert time.monotonic() - start < 0.5
+    assert primary.cancelled == 1
+    assert llm.metrics()["hedges"] == 1 and llm.metrics()["hedge_wins"] == 1
+
+
+def test_deadline_falls_back_then_breaker_opens():
+    primary = LatencyStub("primary", [1.0])
+    fallback = LatencyStub("fallback", [0.01])
+    llm = ResilientLLM(primary, fallback, call_timeout=0.1, hedge_after=0.05,
+                       breaker=CircuitBreaker(failure_threshold=2, cooldown_seconds=60))
+
+    async def scenario():
+        assert await llm.ainvoke(["hola"]) == "fallback:1"
+        assert await llm.ainvoke(["hola"]) == "fallback:2"
+        # Circuito abierto: no se llama al principal
+        calls = primary.calls
+        assert await llm.ainvoke(["hola"]) == "fallback:3"
+        assert primary.calls == calls
+        # Sin presupuesto restante en el turno ni respaldo: error inmediato
+        llm.fallback = None
+        with pytest.raises(LLMUnavailableError):
+            await llm.ainvoke(["hola"], deadline=time.monotonic() - 1)
+
+    asyncio.run(scenario())
+    assert llm.metrics()["breaker_state"] == "open"
+    assert llm.metrics()["breaker_rejections"] == 2
+
+
+def test_cancelled_half_open_probe_lets_the_breaker_probe_again():
+    primary = LatencyStub("primary", [-1, 1.0, 0.01])
+    llm = ResilientLLM(primary, call_timeout=2.0, breaker=CircuitBreaker(failure_threshold=1, cooldown_seconds=0.05))
+
+    async def scenario():
+        with pytest.raises(LLMUnavailableError):
+            await llm.ainvoke(["hola"])
+        await asyncio.sleep(0.06)
+        assert llm.breaker.state == "half_open"
+        # El cliente se desconecta mientras la prueba semiabierta está en curso
+        probe = asyncio.ensure_future(llm.ainvoke(["hola"]))
+        await asyncio.sleep(0.02)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return await llm.ainvoke(["hola"])
+
+    assert asyncio.run(scenario()) == "primary:3"
+    assert primary.cancelled == 1
+    assert llm.metrics()["breaker_state"] == "closed"
@@ -0,0 +1,100 @@
+import asyncio
+
+from core.menu_search import MenuIndex, MenuSearch, fold, tokenize
+from core.mysql_inventory_manager import MySQLInventoryManager
+from inference.tools.tool_serializers import serialize_tool_result
+
+MENU = [
+    {"id": "p-1", "name": "Go Papa X2", "descripcion": "Papa criolla con carne desmechada y queso", "price": 50000.0,
+     "quantity": 10, "tipo_producto": "menu"},
+    {"id": "p-2", "name": "Go Papa Familiar", "descripcion": "Papa criolla con carne desmechada para compartir",
+     "price": 80000.0, "quantity": 10, "tipo_producto": "menu"},
+    {"id": "p-3", "name": "La Gringa X2", "descripcion": "Papas a la francesa con tocineta, maíz y queso cheddar",
+     "price": 50000.0, "quantity": 10, "tipo_producto": "menu"},
+    {"id": "p-4", "name": "Salchipapa Clásica X2", "descripcion": "Salchicha americana y papas", "price": 38000.0,
+     "quantity": 10, "tipo_producto": "menu"},
+    {"id": "p-5", "name": "Queso extra", "descripcion": "Porción de queso mozzarella", "price": 5000.0,
+     "quantity": 10, "tipo_producto": "adicion"},
+]
+
+
+def _index():
+    index = MenuIndex()
+    for item in MENU:
+        index.upsert(item)
+    return index
+
+
+def _names(results):
+    return [item["name"] for _, item in results]
+
+
+def test_text_is_folded_and_aliases_applied():
+    assert fold("Salchipapa CLÁSICA-x2 ñ") == "salchipapa clasica x2 n"
+    assert tokenize("Quiero una go papa por dos") == ["go", "papa", "x2"]
+
+
+def test_search_ranks_by_name_and_tolerates_typos():
+    index = _index()
+    assert _names(index.search("la gringa", 5)) == ["La Gringa X2"]
+    assert _names(index.search("go papa por dos", 2)) == ["Go Papa X2", "Go Papa Familiar"]
+    assert _names(index.search("una go papa familiar", 5))[0] == "Go Papa Familiar"
+    assert _names(index.search("clasica", 5)) == ["Salchipapa Clásica X2"]
+    assert _names(index.search("grinda", 5)) == ["La Gringa X2"]
+    assert _names(index.search("salchi", 5)) == ["Salchipapa Clásica X2"]
+    assert _names(index.search("queso", 5, tipo_producto="adicion")) == ["Queso extra"]
+    assert index.search("pizza", 5) == []
+
+
+def test_index_is_updated_product_by_product():
+    index = _index()
+    index.upsert(dict(MENU[2], name="La Gringa Familiar"))
+    assert _names(index.search("gringa familiar", 1)) == ["La Gringa Familiar"]
+    index.remove("p-3")
+    assert index.search("gringa", 5) == [] and len(index) == 4
+    # Los términos que ya no usa ningún producto salen del vocabulario (y de la búsqueda aproximada)
+    assert index.search("grinda", 5) == []
+
+
+def test_registry_applies_local_writes_until_the_ttl_expires():
+    search = MenuSearch(ttl_seconds=60)
+    assert search.needs_load("go_papa")
+    search.upsert("go_papa", [MENU[0]])  # sin índice cargado: se ignora
+    search.load("go_papa", MENU)
+    assert not search.needs_load("go_papa")
+
+    search.upsert("go_papa", [{"id": "p-3", "name": "La Gringa Especial"}])
+    [(_, item)] = search.search("go_papa", "gringa especial", 1)
+    assert item["name"] == "La Gringa Especial" and item["price"] == 50000.0
+    search.remove("go_papa", ["p-3"])
+    assert search.search("go_papa", "gringa", 5) == []
+
+    assert MenuSearch(ttl_seconds=0).needs_load("go_papa")
+
+
+def test_search_menu_loads_once_and_reports_current_stock(monkeypatch):
+    import core.mysql_inventory_manager as inventory
+
+    search = MenuSearch(ttl_seconds=60)
+    monkeypatch.setattr(inventory, "menu_search", search)
+    manager = MySQLInventoryManager()
+    loads = []
+
+    async def get_inventory(restaurant_id):
+        loads.append(restaurant_id)
+        return MENU
+
+    async def get_availability(restaurant_id):
+        return {"p-3": 0}
+
+    monkeypatch.setattr(manager, "get_inventory", get_inventory)
+    monkeypatch.setattr(manager, "get_availability", get_availability)
+
+    items = asyncio.run(manager.search_menu("go_papa", "la gringa"))
+    assert asyncio.run(manager.search_menu("go_papa", "pizza")) == []
+    assert loads == ["go_papa"]
+    assert [(item["id"], item["quantity"]) for item in items] == [("p-3", 0)]
+    assert serialize_tool_result("search_menu_tool", items).splitlines() == [
+        "id | nombre | precio | descripción",
+        "p-3 | La Gringa X2 | 50000 | Papas a la francesa con tocineta, maíz y queso cheddar (agotado)",
+    ]
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime
+
+from scripts.migrations import MIGRATIONS
+
+
+class SchemaCursor:
+    """
+    Responde las consultas a information_schema con un esquema en memoria y
+    registra las demás sentencias (ALTER, UPDATE) sin ejecutarlas.
+    """
+
+    def __init__(self, columns, indexes, partitioned=()):
+        self.columns = columns  # {tabla: {columna: tipo}}
+        self.indexes = indexes  # {tabla: {índice: [columnas]}}
+        self.partitioned = set(partitioned)
+        self.statements = []
+        self._rows = []
+
+    async def execute(self, query, params=()):
+        query = " ".join(query.split())
+        if "information_schema.TABLES" in query:
+            self._rows = [(int(params[0] in self.columns),)]
+        elif "information_schema.COLUMNS" in query:
+            kind = self.columns.get(params[0], {}).get(params[1])
+            self._rows = [(kind,)] if kind else []
+        elif "information_schema.STATISTICS" in query:
+            self._rows = [(column,) for column in self.indexes.get(params[0], {}).get(params[1], [])]
+        elif "information_schema.PARTITIONS" in query:
+            self._rows = [("p202601",), ("pmax",)] if params[0] in self.partitioned else []
+        elif query.startswith("SELECT MIN("):
+            self._rows = [(datetime(2025, 11, 3),)]
+        elif query.startswith("SELECT id FROM inventory"):
+            self._rows = []
+        else:
+            self.statements.append(query)
+            self._rows = []
+
+    async def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    async def fetchall(self):
+        return self._rows
+
+    async def executemany(self, query, params):
+        self.statements.append(" ".join(query.split()))
+
+
+def run_migrations(cursor):
+    async def scenario():
+        for _, steps in MIGRATIONS:
+            for step in steps:
+                if callable(step):
+                    await step(cursor)
+                else:
+                    await cursor.execute(step)
+
+    asyncio.run(scenario())
+    return [statement for statement in cursor.statements if statement.startswith("ALTER")]
+
+
+def test_migrations_are_a_no_op_on_a_schema_created_by_the_current_ddl():
+    cursor = SchemaCursor(
+        columns={
+            "orders": {"price": "decimal", "line_total": "decimal", "reserved_quantity": "int",
+                       "completed_at": "datetime"},
+            "inventory": {"price": "decimal"},
+            "conversations": {"user_id": "varchar"},
+            "idempotency_keys": {"lease_until": "datetime"},
+        },
+        indexes={
+            "orders": {"ix_orders_updated": ["updated_at", "id"]},
+            "inventory": {"uq_inventory_restaurant_name": ["restaurant_id", "name"]},
+            "conversations": {"user_id": ["user_id", "created_at"]},
+        },
+        partitioned=("orders", "conversations"),
+    )
+
+    assert run_migrations(cursor) == []
+    # Los rellenos de datos no pisan valores que el código nuevo ya escribió
+    assert "UPDATE orders SET completed_at = updated_at WHERE state = 'completado' AND completed_at IS NULL" \
+        in cursor.statements
+    assert any(s.startswith("UPDATE idempotency_keys") and s.endswith("AND lease_until IS NULL")
+               for s in cursor.statements)
+
+
+def test_migrations_alter_a_schema_from_before_the_series():
+    cursor = SchemaCursor(
+        columns={
+            "orders": {"price": "float"},
+            "inventory": {"price": "float"},
+            "conversations": {"user_id": "varchar"},
+            "idempotency_keys": {"status": "varchar"},
+        },
+        indexes={"conversations": {"user_id": ["user_id"]}},
+    )
+
+    alters = run_migrations(cursor)
+
+    assert "ALTER TABLE orders ADD COLUMN reserved_quantity INT NOT NULL DEFAULT 0" in alters
+    assert "ALTER TABLE inventory ADD UNIQUE KEY uq_inventory_restaurant_name (restaurant_id, name)" in alters
+    assert "ALTER TABLE conversations DROP INDEX user_id, ADD INDEX user_id (user_id, created_at)" in alters
+    assert "ALTER TABLE orders ADD INDEX ix_orders_updated (updated_at, id)" in alters
+    assert "ALTER TABLE orders ADD COLUMN completed_at DATETIME NULL" in alters
+    assert any(s.startswith("ALTER TABLE orders MODIFY price DECIMAL(12,2)") and "ADD COLUMN line_total" in s
+               for s in alters)
+    assert "ALTER TABLE idempotency_keys ADD COLUMN lease_until DATETIME NULL" in alters
+    assert sum("PARTITION BY" in s for s in alters) == 2
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+from core.money import MONEY_CONVERSIONS, to_money
+from core.mysql_order_manager import MySQLOrderManager
+
+
+def test_to_money_rounds_to_the_cent():
+    assert to_money(0.1) == Decimal("0.10")
+    assert to_money(49999.995) == Decimal("50000.00")
+    assert to_money("12500") == Decimal("12500.00")
+    assert to_money(None) is None
+    for invalid in ("abc", float("nan")):
+        with pytest.raises(ValueError):
+            to_money(invalid)
+
+
+def test_pool_reads_decimal_columns_as_float():
+    assert MONEY_CONVERSIONS[FIELD_TYPE.NEWDECIMAL]("49999.99") == 49999.99
+    assert MONEY_CONVERSIONS[FIELD_TYPE.LONG] is int
+
+
+class DashboardCursor:
+    """La agregación del tablero y las filas del día, como las retornaría MySQL."""
+
+    def __init__(self, stats, rows):
+        self.stats = stats
+        self.rows = rows
+        self.statements = []
+
+    async def execute(self, query, params=()):
+        self.statements.append(" ".join(query.split()))
+
+    async def fetchone(self):
+        return self.stats
+
+    async def fetchall(self):
+        return self.rows
+
+
+class DashboardConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, *args):
+        return _Context(self._cursor)
+
+    async def begin(self):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class _Context:
+    def __init__(self, value):
+        self.value = value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class DashboardPool:
+    def __init__(self, cursor):
+        self.conn = DashboardConnection(cursor)
+
+    async def get_pool(self):
+        return self
+
+    def acquire(self):
+        return _Context(self.conn)
+
+
+def test_dashboard_stats_come_from_a_single_sql_sum():
+    created = datetime(2025, 1, 6, 19, 0)
+    rows = [
+        {"enum_order_table": "100", "address": "Mesa 1", "user_name": "Ana", "product_name": "Go Papa X2",
+         "quantity": 2, "price": 50000.0, "line_total": 100000.0, "observaciones": "", "adicion": "",
+         "created_at": created, "updated_at": created, "state": "completado"},
+        {"enum_order_table": "101", "address": "Mesa 2", "user_name": "Luis", "product_name": "Maicitos",
+         "quantity": 1, "price": 8000.0, "line_total": 8000.0, "observaciones": "", "adicion": "",
+         "created_at": created, "updated_at": created, "state": "pendiente"},
+    ]
+    # SUM(...) de MySQL llega como float (DECIMAL) y los conteos como float (SUM de booleanos)
+    cursor = DashboardCursor({"total_orders": 2, "pending_orders": 1.0, "complete_orders": 1.0,
+                              "total_sales": 100000.0}, rows)
+    manager = MySQLOrderManager()
+    manager.db_pool = DashboardPool(cursor)
+
+    result = asyncio.run(manager.get_today_orders_not_paid())
+
+    assert result["stats"] == {"total_orders": 2, "pending_orders": 1, "complete_orders": 1, "total_sales": 100000.0}
+    assert "SUM(line_total)" in cursor.statements[1]
+    assert [order["id"] for order in result["orders"]] == ["100", "101"]
+    assert result["orders"][0]["products"][0] == {"name": "Go Papa X2", "quantity": 2, "price": 50000.0,
+                                                  "observations": "", "adicion": ""}
+
+
+@pytest.mark.skipif(os.getenv("RUN_MYSQL_TESTS") != "1", reason="requiere MySQL (RUN_MYSQL_TESTS=1 y DB_*)")
+def test_line_total_is_exact_in_mysql():
+    async def scenario():
+        manager = MySQLOrderManager()
+        await manager.create_tables()
+        table = f"test-{uuid.uuid4().hex[:8]}"
+        for _ in range(3):
+            await manager.create_order({"enum_order_table": table, "product_id": "no-existe", "product_name": "Limonada",
+                                        "quantity": 3, "price": 0.1, "state": "completado", "address": "Mesa 1"})
+        pool = await manager.db_pool.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT SUM(line_total) FROM orders WHERE enum_order_table = %s", (table,))
+                total = (await cursor.fetchone())[0]
+                await cursor.execute("DELETE FROM orders WHERE enum_order_table = %s", (table,))
+            await conn.commit()
+        return total
+
+    # Con FLOAT: 0.1 * 3 * 3 = 0.9000000134110451
+    assert asyncio.run(scenario()) == 0.9
@@ -0,0 +1,91 @@
+import base64
+import json
+import time
+
+from cryptography.fernet import Fernet
+
+from core.msal_client import EncryptedFileStore, MSALClientFactory, derive_cache_key
+
+AUTHORITY = "https://login.local.test/tenant-test"
+SCOPES = ["https://graph.microsoft.com/User.Read"]
+
+
+def _b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+class StubResponse:
+    def __init__(self, payload: dict):
+        self.status_code = 200
+        self.text = json.dumps(payload)
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+
+class StubAuthority:
+    """Authority local: descubrimiento y endpoint de tokens, contando las solicitudes."""
+
+    def __init__(self):
+        self.gets = 0
+        self.posts = 0
+
+    def get(self, url, **kwargs):
+        self.gets += 1
+        return StubResponse({
+            "authorization_endpoint": f"{AUTHORITY}/oauth2/v2.0/authorize",
+            "token_endpoint": f"{AUTHORITY}/oauth2/v2.0/token",
+        })
+
+    def post(self, url, **kwargs):
+        self.posts += 1
+        now = int(time.time())
+        claims = {"iss": f"{AUTHORITY}/v2.0", "aud": "client-test", "iat": now, "exp": now + 3600,
+                  "oid": "oid-1", "tid": "tenant-test", "preferred_username": "ana@contoso.com"}
+        return StubResponse({
+            "token_type": "Bearer", "scope": " ".join(SCOPES), "expires_in": 3600,
+            "access_token": "access-secret-value", "refresh_token": "refresh-1",
+            "id_token": f"{_b64({'alg': 'none'})}.{_b64(claims)}.",
+            "client_info": _b64({"uid": "oid-1", "utid": "tenant-test"}),
+        })
+
+    def close(self):
+        pass
+
+
+def _factory(authority, path, key=derive_cache_key("secret")):
+    return MSALClientFactory("client-test", "secret", AUTHORITY, store=EncryptedFileStore(str(path), key),
+                             http_client=authority, validate_authority=False)
+
+
+def test_app_is_created_lazily_once_and_the_cache_survives_a_restart(tmp_path):
+    authority = StubAuthority()
+    path = tmp_path / "msal_cache.bin"
+
+    factory = _factory(authority, path)
+    assert authority.gets == 0 and not factory.metrics()["created"]
+    assert factory.get_app() is factory.get_app()
+    result = factory.acquire_token_by_authorization_code("code", SCOPES, "https://app.test/auth/callback")
+    assert result["access_token"] == "access-secret-value"
+    assert (authority.gets, authority.posts) == (1, 1)
+
+    # Nueva instancia (reinicio): sin descubrimiento y con el token en caché
+    restarted = _factory(authority, path)
+    silent = restarted.acquire_token_silent(SCOPES, username="ana@contoso.com")
+    assert silent["access_token"] == "access-secret-value"
+    assert (authority.gets, authority.posts) == (1, 1)
+    assert restarted.metrics()["cache_loaded"] is True
+
+    # El archivo está cifrado
+    assert b"access-secret-value" not in path.read_bytes()
+
+
+def test_cache_encrypted_with_another_key_is_ignored(tmp_path):
+    authority = StubAuthority()
+    path = tmp_path / "msal_cache.bin"
+    _factory(authority, path).acquire_token_by_authorization_code("code", SCOPES, "https://app.test/auth/callback")
+
+    other = _factory(authority, path, key=Fernet.generate_key())
+    assert other.acquire_token_silent(SCOPES) is None
+    assert authority.gets == 2
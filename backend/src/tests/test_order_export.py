@@ -0,0 +1,154 @@
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from core.clock import get_clock
+from core.order_export import EXPORT_FORMATS, OrderExporter, load_orders, normalize_orders, sales_report
+
+
+def _row(id, product, quantity, price, created_at, state="pagado", updated_at=None, table=None):
+    return {"id": id, "enum_order_table": table or str(100 + id), "product_id": f"p-{product}",
+            "product_name": product, "quantity": quantity, "price": price, "state": state, "user_id": "u-1",
+            "restaurant_id": "go_papa", "adicion": None, "created_at": created_at,
+            "updated_at": updated_at or created_at}
+
+
+class KeysetCursor:
+    """Responde las consultas por clave (updated_at, id) sobre filas en memoria."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+        self._result = []
+
+    async def execute(self, query, params=()):
+        self.queries += 1
+        ordered = sorted(self.rows, key=lambda row: (row["updated_at"], row["id"]))
+        cutoff, limit = params[0], params[-1]
+        ordered = [row for row in ordered if row["updated_at"] < cutoff]
+        if "updated_at > %s" in query:
+            _, updated_at, _, last_id, _ = params
+            ordered = [row for row in ordered if (row["updated_at"], row["id"]) > (updated_at, last_id)]
+        self._result = [dict(row) for row in ordered[:limit]]
+
+    async def fetchall(self):
+        return self._result
+
+
+class _Context:
+    def __init__(self, value):
+        self.value = value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, *args):
+        return _Context(self._cursor)
+
+    async def commit(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, cursor):
+        self.conn = FakeConnection(cursor)
+
+    async def get_pool(self):
+        return self
+
+    def acquire(self):
+        return _Context(self.conn)
+
+
+def _exporter(tmp_path, rows, fmt="pickle", chunk_size=2):
+    exporter = OrderExporter(str(tmp_path), fmt=fmt, chunk_size=chunk_size)
+    cursor = KeysetCursor(rows)
+    exporter.db_pool = FakePool(cursor)
+    return exporter, cursor
+
+
+@pytest.fixture
+def pickle_format(monkeypatch):
+    # Formato de prueba sin pyarrow; parquet/arrow usan el mismo camino
+    monkeypatch.setitem(EXPORT_FORMATS, "pickle", (".pkl", lambda frame, path: frame.to_pickle(path), pd.read_pickle))
+
+
+def test_normalize_orders_derives_revenue_date_and_hour():
+    frame = normalize_orders([_row(1, "Go Papa X2", 2, 50000.0, datetime(2025, 1, 5, 19, 30)),
+                              _row(2, "Maicitos", 1, None, datetime(2025, 1, 6, 8, 0), state="Cancelado")])
+    assert frame["revenue"].tolist() == [100000.0, 0.0]
+    assert frame["date"].tolist() == ["2025-01-05", "2025-01-06"]
+    assert frame["hour"].tolist() == [19, 8] and str(frame["hour"].dtype) == "int8"
+    assert frame["state"].tolist() == ["pagado", "cancelado"]
+
+
+def test_incremental_export_and_sales_report(tmp_path, pickle_format):
+    rows = [
+        _row(1, "Go Papa X2", 2, 50000.0, datetime(2025, 1, 5, 19, 0)),
+        _row(2, "La Gringa X2", 1, 50000.0, datetime(2025, 1, 5, 20, 0)),
+        _row(3, "Go Papa X2", 1, 50000.0, datetime(2025, 1, 6, 19, 0), state="cancelado"),
+        _row(4, "Chicken X2", 1, 45000.0, datetime(2025, 1, 6, 12, 0)),
+        _row(5, "Go Papa X2", 1, 50000.0, datetime(2025, 1, 7, 19, 0)),
+    ]
+    exporter, cursor = _exporter(tmp_path, rows)
+
+    first = asyncio.run(exporter.export())
+    assert first["rows"] == 5 and first["watermark"]["id"] == 5
+    assert sorted(d for d in os.listdir(tmp_path) if d.startswith("date=")) == [
+        "date=2025-01-05", "date=2025-01-06", "date=2025-01-07"]
+
+    # Sin cambios: una sola consulta y nada escrito
+    queries = cursor.queries
+    assert asyncio.run(exporter.export())["rows"] == 0 and cursor.queries == queries + 1
+
+    # El pedido 5 se cancela: solo se exporta esa fila y gana la última versión
+    rows[4] = dict(rows[4], state="cancelado", updated_at=datetime(2025, 1, 7, 21, 0))
+    assert asyncio.run(exporter.export())["rows"] == 1
+
+    frame = load_orders(str(tmp_path), "pickle")
+    assert len(frame) == 5
+    assert sales_report(frame, "day") == [
+        {"key": "2025-01-05", "revenue": 150000.0, "units": 3, "orders": 2},
+        {"key": "2025-01-06", "revenue": 45000.0, "units": 1, "orders": 1},
+    ]
+    assert [row["key"] for row in sales_report(frame, "hour")] == ["12", "19", "20"]
+    assert sales_report(frame, "product")[0] == {"key": "Go Papa X2", "revenue": 100000.0, "units": 2, "orders": 1}
+
+    # Solo se abren las particiones del rango pedido
+    ranged = load_orders(str(tmp_path), "pickle", start=date(2025, 1, 6), end=date(2025, 1, 6))
+    assert sorted(ranged["id"].tolist()) == [3, 4]
+
+
+def test_rows_committed_late_are_not_skipped(tmp_path, pickle_format):
+    now = get_clock().db_now()
+    rows = [_row(1, "Go Papa X2", 1, 50000.0, now - timedelta(hours=1))]
+    exporter, _ = _exporter(tmp_path, rows)
+    exporter.safety_lag_seconds = 60
+
+    # El pedido 2 ya se escribió (updated_at=hace 10 s) pero el 3, con updated_at anterior,
+    # aún no hizo commit: dentro del margen no se exporta ninguno de los dos
+    rows.append(_row(2, "Maicitos", 1, 8000.0, now - timedelta(seconds=10)))
+    assert asyncio.run(exporter.export())["rows"] == 1
+
+    rows.append(_row(3, "La Gringa X2", 1, 50000.0, now - timedelta(seconds=20)))
+    exporter.safety_lag_seconds = 0
+    assert asyncio.run(exporter.export())["rows"] == 2
+    assert sorted(load_orders(str(tmp_path), "pickle")["id"].tolist()) == [1, 2, 3]
+
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip("pyarrow")
+    exporter, _ = _exporter(tmp_path, [_row(1, "Go Papa X2", 2, 50000.0, datetime(2025, 1, 5, 19, 0))], fmt="parquet")
+    asyncio.run(exporter.export())
+    assert sales_report(load_orders(str(tmp_path), "parquet"), "day")[0]["revenue"] == 100000.0
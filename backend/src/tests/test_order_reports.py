@@ -0,0 +1,85 @@
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+from core.order_export import EXPORT_FORMATS, normalize_orders, write_partitions, write_watermark
+from core.order_reports import OrderReportSnapshot
+
+
+def _line(id, table, product, quantity, price, created_at, state="completado", completed_at=None, adicion=None):
+    return {"id": id, "enum_order_table": table, "product_id": f"p-{product}", "product_name": product,
+            "quantity": quantity, "price": price, "state": state, "user_id": "u-1", "restaurant_id": "go_papa",
+            "adicion": adicion, "created_at": created_at, "updated_at": completed_at or created_at,
+            "completed_at": completed_at}
+
+
+LINES = [
+    # Pedido 100: lunes 19:00, completado a los 30 minutos
+    _line(1, "100", "Go Papa X2", 2, 50000.0, datetime(2025, 1, 6, 19, 0), completed_at=datetime(2025, 1, 6, 19, 30),
+          adicion="Queso extra, tocineta"),
+    _line(2, "100", "Maicitos", 1, 8000.0, datetime(2025, 1, 6, 19, 0), completed_at=datetime(2025, 1, 6, 19, 30)),
+    # Pedido 101: martes 12:00, completado a los 10 minutos
+    _line(3, "101", "Chicken X2", 1, 45000.0, datetime(2025, 1, 7, 12, 0), completed_at=datetime(2025, 1, 7, 12, 10),
+          adicion="queso extra"),
+    # Pedido 102: cancelado, no cuenta
+    _line(4, "102", "Go Papa X2", 3, 50000.0, datetime(2025, 1, 7, 20, 0), state="cancelado", adicion="tocineta"),
+    # Pedido 103: miércoles, todavía pendiente
+    _line(5, "103", "Go Papa X2", 1, 50000.0, datetime(2025, 1, 8, 21, 15), state="pendiente",
+          adicion="tocineta + salsa de ajo"),
+]
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    # Formato de prueba sin pyarrow
+    monkeypatch.setitem(EXPORT_FORMATS, "pickle", (".pkl", lambda frame, path: frame.to_pickle(path), pd.read_pickle))
+    write_partitions(normalize_orders(LINES), str(tmp_path), 1, "pickle")
+    write_watermark(str(tmp_path), {"updated_at": None, "id": 5, "sequence": 1})
+    return OrderReportSnapshot(str(tmp_path), "pickle")
+
+
+def test_report_excludes_cancelled_orders(snapshot):
+    report = snapshot.report()
+    assert report["rows"] == 4 and report["total_revenue"] == 203000.0
+    assert report["products"] == [
+        {"product": "Go Papa X2", "revenue": 150000.0, "units": 3},
+        {"product": "Chicken X2", "revenue": 45000.0, "units": 1},
+        {"product": "Maicitos", "revenue": 8000.0, "units": 1},
+    ]
+    assert report["ticket"] == {"orders": 3, "average": 67666.67, "median": 50000.0}
+    assert report["addons"] == [
+        {"addon": "queso extra", "count": 2}, {"addon": "tocineta", "count": 2}, {"addon": "salsa de ajo", "count": 1},
+    ]
+
+
+def test_heatmap_and_fulfillment(snapshot):
+    report = snapshot.report()
+    revenue = report["heatmap"]["revenue"]
+    assert report["heatmap"]["weekdays"][0] == "lunes"
+    assert revenue[0][19] == 108000.0 and revenue[1][12] == 45000.0 and revenue[1][20] == 0.0
+    assert sum(map(sum, revenue)) == report["total_revenue"]
+    # Solo los pedidos 100 y 101 llegaron a completado
+    assert report["fulfillment"] == {"orders": 2, "average_minutes": 20.0, "p50_minutes": 20.0, "p90_minutes": 28.0}
+
+
+def test_date_range_and_snapshot_reload(snapshot, tmp_path):
+    ranged = snapshot.report(start=date(2025, 1, 7), end=date(2025, 1, 7), top=1)
+    assert ranged["rows"] == 1 and ranged["products"] == [{"product": "Chicken X2", "revenue": 45000.0, "units": 1}]
+
+    columns = snapshot.columns()
+    assert snapshot.columns() is columns
+
+    # Una exportación nueva (pedido 103 completado) invalida la instantánea
+    finished = dict(LINES[4], state="completado", completed_at=datetime(2025, 1, 8, 21, 45),
+                    updated_at=datetime(2025, 1, 8, 21, 45))
+    write_partitions(normalize_orders([finished]), str(tmp_path), 2, "pickle")
+    write_watermark(str(tmp_path), {"updated_at": None, "id": 5, "sequence": 2})
+    assert snapshot.columns() is not columns
+    assert snapshot.report()["fulfillment"]["orders"] == 3
+
+
+def test_empty_export(tmp_path):
+    report = OrderReportSnapshot(str(tmp_path), "parquet").report()
+    assert report["rows"] == 0 and report["products"] == [] and report["addons"] == []
+    assert report["ticket"]["orders"] == 0 and report["fulfillment"]["average_minutes"] is None
@@ -0,0 +1,201 @@
+import asyncio
+import gzip
+import json
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from core.clock import get_clock
+from core.partitioning import (
+    PARTITIONED_TABLES, PartitionMaintenanceJob, add_months, drop_empty_partitions_before, explain_partitions,
+    missing_partitions_statement, month_start, partition_clause, partition_for, partition_name,
+)
+from core.retention import RetentionJob, write_jsonl_archive
+
+
+def test_partition_clause_covers_each_month_and_future_rows():
+    clause = partition_clause("created_at", date(2024, 12, 20), date(2025, 2, 1))
+    assert clause.splitlines()[1:] == [
+        "    PARTITION p202412 VALUES LESS THAN ('2025-01-01'),",
+        "    PARTITION p202501 VALUES LESS THAN ('2025-02-01'),",
+        "    PARTITION p202502 VALUES LESS THAN ('2025-03-01'),",
+        "    PARTITION pmax VALUES LESS THAN (MAXVALUE)",
+        ")",
+    ]
+    assert partition_for(datetime(2025, 1, 31, 23, 59)) == "p202501"
+
+
+def test_missing_partitions_are_split_out_of_pmax():
+    statement = missing_partitions_statement("orders", ["p202501", "p202502", "pmax"], date(2025, 3, 1))
+    assert statement.startswith("ALTER TABLE orders REORGANIZE PARTITION pmax INTO")
+    assert "p202503 VALUES LESS THAN ('2025-04-01')" in statement and "p202504" not in statement
+    assert missing_partitions_statement("orders", ["p202501", "pmax"], date(2025, 1, 1)) is None
+    assert missing_partitions_statement("orders", [], date(2025, 1, 1)) is None
+
+
+class PartitionCursor:
+    """information_schema.PARTITIONS y conteo por partición en memoria."""
+
+    def __init__(self, rows_by_partition):
+        self.rows_by_partition = rows_by_partition
+        self.statements = []
+        self._result = []
+
+    async def execute(self, query, params=()):
+        self.statements.append(query)
+        if "information_schema.PARTITIONS" in query:
+            self._result = [(name,) for name in self.rows_by_partition]
+        elif "PARTITION (" in query:
+            name = query.split("PARTITION (")[1].split(")")[0]
+            self._result = [(1,)] if self.rows_by_partition[name] else []
+
+    async def fetchall(self):
+        return self._result
+
+    async def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def cursor(self, *args):
+        return FakePool(self)
+
+
+def test_only_empty_months_before_the_cutoff_are_dropped():
+    cursor = PartitionCursor({"p202410": 0, "p202411": 3, "p202412": 0, "p202501": 0, "pmax": 0})
+    dropped = asyncio.run(drop_empty_partitions_before(cursor, "orders", date(2025, 1, 1)))
+    assert dropped == ["p202410", "p202412"]
+    assert cursor.statements[-1] == "ALTER TABLE orders DROP PARTITION p202410, p202412"
+
+
+class FakePool:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    async def get_pool(self):
+        return self
+
+    def acquire(self):
+        return self
+
+    def __call__(self, *args):
+        return self
+
+    async def __aenter__(self):
+        return self.cursor
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_partition_upkeep_adds_the_coming_months_without_retention():
+    # Tabla creada hace meses: sin mantenimiento las filas nuevas caerían en pmax
+    last = partition_name(add_months(month_start(get_clock().today()), -2))
+    cursor = PartitionCursor({"p202401": 0, last: 0, "pmax": 0})
+    job = PartitionMaintenanceJob()
+    job.db_pool = FakePool(cursor)
+
+    added = asyncio.run(job.run_once())
+
+    assert added == {"orders": 5, "conversations": 5}
+    reorganize = [query for query in cursor.statements if "REORGANIZE" in query]
+    assert len(reorganize) == 2
+    assert partition_name(add_months(month_start(get_clock().today()), 3)) in reorganize[0]
+
+
+class ArchiveCursor:
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.deleted = []
+        self._rows = []
+
+    def cursor(self, *args):
+        return FakePool(self)
+
+    async def execute(self, query, params=()):
+        if query.startswith("SELECT *"):
+            self._rows = self.batches.pop(0) if self.batches else []
+        elif query.startswith("DELETE"):
+            self.deleted.extend(params[-len(self._rows):])
+
+    async def fetchall(self):
+        return self._rows
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+def test_closed_orders_are_moved_to_monthly_jsonl_files(tmp_path):
+    old = get_clock().day_start() - timedelta(days=200)
+    rows = [{"id": i, "state": "pagado", "created_at": old + timedelta(days=i * 20), "price": 50000.0}
+            for i in range(1, 4)]
+    cursor = ArchiveCursor([rows[:2], rows[2:]])
+    job = RetentionJob(target="jsonl", archive_dir=str(tmp_path), batch_size=2)
+    job.db_pool = FakePool(cursor)
+
+    moved = asyncio.run(job._archive_table("orders", "created_at < %s AND state IN (%s)", (old, "pagado")))
+
+    assert moved == 3 and cursor.deleted == [1, 2, 3]
+    archived = []
+    for name in sorted(os.listdir(tmp_path / "orders")):
+        with gzip.open(tmp_path / "orders" / name, "rt", encoding="utf-8") as archive:
+            archived.extend(json.loads(line)["id"] for line in archive)
+    assert archived == [1, 2, 3]
+    assert {name[:7] for name in os.listdir(tmp_path / "orders")} == {r["created_at"].strftime("%Y-%m") for r in rows}
+
+
+def test_jsonl_archive_appends_gzip_members(tmp_path):
+    row = {"id": 1, "created_at": datetime(2025, 1, 5, 12, 0)}
+    write_jsonl_archive(str(tmp_path), "conversations", [row])
+    [path] = write_jsonl_archive(str(tmp_path), "conversations", [dict(row, id=2)])
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        assert [json.loads(line) for line in archive] == [
+            {"id": 1, "created_at": "2025-01-05 12:00:00"}, {"id": 2, "created_at": "2025-01-05 12:00:00"},
+        ]
+
+
+@pytest.mark.skipif(os.getenv("RUN_MYSQL_TESTS") != "1", reason="requiere MySQL (RUN_MYSQL_TESTS=1 y DB_*)")
+def test_daily_queries_only_read_the_current_month_partition(monkeypatch):
+    import aiomysql
+
+    from core.db_pool import DBConnectionPool
+    from core.mysql_order_manager import MySQLOrderManager
+    from inference.graphs.mysql_saver import MySQLSaver
+
+    # Se registran las consultas que ejecutan los gestores, no copias escritas a mano
+    executed = []
+    execute = aiomysql.Cursor.execute
+
+    async def recording_execute(cursor, query, args=None):
+        executed.append((query, args))
+        return await execute(cursor, query, args)
+
+    monkeypatch.setattr(aiomysql.Cursor, "execute", recording_execute)
+
+    async def scenario():
+        order_manager, saver = MySQLOrderManager(), MySQLSaver()
+        await order_manager.create_tables()
+        await saver._create_tables()
+        executed.clear()
+        await order_manager.get_today_orders_not_paid()
+        await order_manager.get_order_status_by_user_id("u-1")
+        await order_manager.get_pending_orders_by_user_id("u-1")
+        await saver.get_conversation_history("u-1")
+        daily = [(query, args) for query, args in executed
+                 if query.lstrip().startswith("SELECT") and "created_at" in query
+                 and any(f"FROM {table}" in " ".join(query.split()) for table in PARTITIONED_TABLES)]
+        pool = await DBConnectionPool().get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                return daily, [await explain_partitions(cursor, query, args) for query, args in daily]
+
+    daily, explained = asyncio.run(scenario())
+
+    # Totales y pedidos del tablero, estado y pedido pendiente del usuario, historial del día
+    assert len(daily) == 5
+    current = partition_for(get_clock().db_now())
+    for (query, _), partitions in zip(daily, explained):
+        # created_at >= hoy también puede tocar pmax (fechas futuras)
+        assert partitions and set(partitions) <= {current, "pmax"} and current in partitions, query
@@ -0,0 +1,189 @@
+import asyncio
+from datetime import datetime
+
+from core.menu_search import menu_search
+from core.mysql_inventory_manager import MySQLInventoryManager
+from core.mysql_order_manager import MySQLOrderManager
+from core.product_matching import ProductMatchStats, match_product, token_set_ratio
+
+ROWS = [
+    {"id": "o-1", "product_id": "p-1", "product_name": "Go Papa X2"},
+    {"id": "o-2", "product_id": "p-2", "product_name": "La Gringa Familiar"},
+    {"id": "o-3", "product_id": "p-3", "product_name": "Maicitos"},
+]
+
+
+def resolve(query):
+    match = match_product(ROWS, query, name_key="product_name", id_key="product_id")
+    return (match.item["id"], match.kind) if match else None
+
+
+def test_token_set_ratio_ignores_order_accents_and_extra_words():
+    assert token_set_ratio("papa go X2", "Go Papa X2") == 1.0
+    assert token_set_ratio("la gringa", "La Gringa Familiar") == 1.0
+    assert token_set_ratio("salchipapá", "Salchipapa") == 1.0
+    assert token_set_ratio("chicken x2", "Go Papa X2") < 0.5
+    assert token_set_ratio("", "Go Papa X2") == 0.0
+
+
+def test_match_product_resolves_llm_spellings_to_one_order_row():
+    assert resolve("Go Papa X2") == ("o-1", "exact")
+    assert resolve("p-3") == ("o-3", "id")
+    assert resolve("Go papa x2") == ("o-1", "normalized")
+    assert resolve("go papa por dos") == ("o-1", "normalized")
+    assert resolve("la grinja familiar") == ("o-2", "fuzzy")
+    assert resolve("chicken x2") is None
+
+    # Dos filas empatan: no se adivina cuál cambiar
+    assert match_product([{"id": 1, "name": "Go Papa X1"}, {"id": 2, "name": "Go Papa X2"}], "go papa") is None
+
+
+GO_PAPA_MENU = [
+    {"id": f"m-{i}", "name": name} for i, name in enumerate((
+        "Go Papa X2", "Go Papa Familiar", "La Gringa X2", "La Gringa Familiar", "Chicken X2",
+        "Papa", "Chorizo", "Chorizo Español", "Maicitos", "Coca Cola", "Coca Cola Zero",
+    ))
+]
+
+
+def test_fuzzy_match_never_drops_size_or_variant_words():
+    for query in ("Go Papa X3", "Chorizo Argentino", "La Gringa X4", "Coca Cola Light"):
+        assert match_product(GO_PAPA_MENU, query) is None, query
+
+    assert match_product(GO_PAPA_MENU, "la grinja x2").item["name"] == "La Gringa X2"
+    assert match_product(GO_PAPA_MENU, "chorizo espanol").item["name"] == "Chorizo Español"
+
+
+def test_resolve_product_only_canonicalizes_unambiguous_names():
+    menu_search.load("test-menu", GO_PAPA_MENU)
+    manager = MySQLInventoryManager()
+    try:
+        resolve = lambda name, product_id=None: asyncio.run(manager.resolve_product("test-menu", name, product_id))
+        assert resolve("Go papa x2").item["id"] == "m-0"
+        assert resolve("Go Papa X3") is None
+        # Un parecido se deja como lo envió el LLM: no se pide otro producto en silencio
+        assert resolve("la grinja x2") is None
+        assert resolve("cualquier nombre", "m-8").item["name"] == "Maicitos"
+    finally:
+        menu_search.invalidate("test-menu")
+
+
+def test_stats_count_retry_hops_saved_only_for_order_updates():
+    stats = ProductMatchStats()
+    for kind in ("exact", "normalized", "fuzzy", "inventory_id", "missing"):
+        stats.record("update_order_product", kind)
+    stats.record("confirm_order_tool", "normalized")
+    report = stats.report()
+    assert report["retry_hops_saved"] == 3
+    assert report["sources"]["confirm_order_tool"]["normalized"] == 1
+
+
+class UpdateCursor:
+    """Filas del pedido para el SELECT ... FOR UPDATE; registra las sentencias."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+        self.rowcount = 0
+
+    async def execute(self, query, params=()):
+        self.statements.append((" ".join(query.split()), params))
+        self.rowcount = 1 if query.startswith("UPDATE orders") else 0
+
+    async def fetchall(self):
+        return self.rows
+
+    async def fetchone(self):
+        return {"version": 1}
+
+
+class _Context:
+    def __init__(self, value):
+        self.value = value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class UpdateConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.rollbacks = 0
+
+    def cursor(self, *args):
+        return _Context(self._cursor)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+class UpdatePool:
+    def __init__(self, cursor):
+        self.connection = UpdateConnection(cursor)
+
+    async def get_pool(self):
+        return self
+
+    def acquire(self):
+        return _Context(self.connection)
+
+
+def order_rows():
+    created_at = datetime(2026, 3, 1, 12, 0)
+    return [
+        {"id": "o-1", "created_at": created_at, "product_id": "p-1", "product_name": "Go Papa X2",
+         "quantity": 1, "reserved_quantity": 1, "restaurant_id": "test-match", "state": "pendiente",
+         "address": "Calle 1", "user_name": "Ana", "price": 50000.0, "details": "", "adicion": ""},
+        {"id": "o-2", "created_at": created_at, "product_id": "p-2", "product_name": "Maicitos",
+         "quantity": 1, "reserved_quantity": 0, "restaurant_id": "test-match", "state": "pendiente",
+         "address": "Calle 1", "user_name": "Ana", "price": 8000.0, "details": "", "adicion": ""},
+    ]
+
+
+def run_update(product_name, updates, rows=None):
+    manager = MySQLOrderManager()
+    cursor = UpdateCursor(order_rows() if rows is None else rows)
+    manager.db_pool = UpdatePool(cursor)
+    result = asyncio.run(manager.update_order_product("42", product_name, updates))
+    updated = [(query, params) for query, params in cursor.statements if query.startswith("UPDATE orders")]
+    return result, updated, manager.db_pool.connection.rollbacks
+
+
+def test_update_order_product_is_one_keyed_update_for_a_misspelled_name():
+    result, updates, _ = run_update("Go papa x2", {"details": "sin salsa"})
+
+    assert result is not None
+    assert len(updates) == 1
+    query, params = updates[0]
+    assert query.endswith("WHERE id = %s AND created_at = %s")
+    assert params[-2:] == ["o-1", datetime(2026, 3, 1, 12, 0)]
+
+
+def test_update_order_product_falls_back_to_the_inventory_id():
+    # El pedido guarda el nombre viejo; el LLM usa el nombre actual del menú
+    menu_search.load("test-match", [{"id": "p-2", "name": "Maíz Tierno", "restaurant_id": "test-match"}])
+    try:
+        result, updates, _ = run_update("maiz tierno", {"details": "con queso"})
+    finally:
+        menu_search.invalidate("test-match")
+
+    assert result is not None
+    assert updates[0][1][-2] == "o-2"
+
+    result, updates, rollbacks = run_update("chicken x2", {"details": "x"})
+    assert result is None and updates == []
+    assert rollbacks == 1
+
+
+def test_update_order_product_releases_locks_when_it_does_not_update():
+    delivered = [{**row, "state": "completado"} for row in order_rows()]
+    for product_name, rows in (("Go Papa X2", []), ("Go Papa X2", delivered), ("Chicken X2", None)):
+        result, updates, rollbacks = run_update(product_name, {"details": "x"}, rows)
+        assert result is None and updates == []
+        assert rollbacks == 1
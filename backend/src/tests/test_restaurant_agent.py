@@ -1,6 +1,7 @@
 import asyncio
 import logging
 from datetime import datetime
+from core.event_loop import run
 from inference.graphs.restaurant_graph import RestaurantChatAgent
 from langchain_core.messages import HumanMessage
 
@@ -49,4 +50,4 @@ async def test_restaurant_agent():
         logger.exception(f"Error during agent testing: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(test_restaurant_agent())
\ No newline at end of file
+    run(test_restaurant_agent())
\ No newline at end of file
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from core.mysql_inventory_manager import InsufficientStock, MySQLInventoryManager, StockAvailabilityCache
+from inference.tools.tool_serializers import serialize_menu
+
+
+class FakeCursor:
+    """Cursor con las respuestas que daría MySQL al UPDATE condicional y al SELECT posterior."""
+
+    def __init__(self, updated: bool, row=None):
+        self.updated = updated
+        self.row = row
+        self.rowcount = 0
+        self.statements = []
+
+    async def execute(self, query, params=()):
+        self.statements.append(" ".join(query.split()))
+        self.rowcount = 1 if query.startswith("UPDATE") and self.updated else 0
+
+    async def fetchone(self):
+        return self.row
+
+
+def test_reserve_stock_distinguishes_sold_out_from_untracked_products():
+    manager = MySQLInventoryManager()
+
+    reserved = FakeCursor(updated=True)
+    assert asyncio.run(manager.reserve_stock(reserved, "p-1", 2)) == 2
+    assert reserved.statements == ["UPDATE inventory SET quantity = quantity - %s WHERE id = %s AND quantity >= %s"]
+
+    with pytest.raises(InsufficientStock) as error:
+        asyncio.run(manager.reserve_stock(FakeCursor(updated=False, row={"quantity": 1}), "p-1", 2))
+    assert (error.value.requested, error.value.available) == (2, 1)
+
+    # Producto que no está en el inventario: se registra sin reservar
+    assert asyncio.run(manager.reserve_stock(FakeCursor(updated=False, row=None), "no-existe", 2)) == 0
+
+
+def test_availability_cache_applies_committed_reservations_and_renders_sold_out():
+    cache = StockAvailabilityCache(ttl_seconds=60)
+    cache.put("go_papa", {"p-1": 2, "p-2": 5})
+    cache.apply([("p-1", -2), ("p-2", -1), ("otro", -1)])
+    availability = cache.get("go_papa")
+    assert availability == {"p-1": 0, "p-2": 4}
+
+    items = [{"id": "p-1", "name": "Go Papa X2", "price": 50000.0, "quantity": 2},
+             {"id": "p-2", "name": "La Gringa X2", "price": 50000.0, "quantity": 5}]
+    assert serialize_menu(items, availability).splitlines()[1:] == [
+        "p-1 | Go Papa X2 | 50000 (agotado)",
+        "p-2 | La Gringa X2 | 50000",
+    ]
+
+    expired = StockAvailabilityCache(ttl_seconds=0)
+    expired.put("go_papa", {"p-1": 1})
+    assert expired.get("go_papa") is None
+
+
+@pytest.mark.skipif(os.getenv("RUN_MYSQL_TESTS") != "1", reason="requiere MySQL (RUN_MYSQL_TESTS=1 y DB_*)")
+def test_no_overselling_under_1000_simultaneous_orders():
+    from core.db_pool import DBConnectionPool
+    from core.mysql_order_manager import MySQLOrderManager
+
+    stock, orders = 100, 1000
+    restaurant_id = f"test-{uuid.uuid4().hex[:8]}"
+
+    async def scenario():
+        inventory_manager, order_manager = MySQLInventoryManager(), MySQLOrderManager()
+        await inventory_manager._create_tables()
+        await order_manager.create_tables()
+        product = await inventory_manager.add_product(restaurant_id, "Go Papa X2", stock, "porción", 50000)
+
+        async def place(i: int):
+            try:
+                return await order_manager.create_order({
+                    "enum_order_table": f"{restaurant_id}-{i}", "product_id": product["id"],
+                    "product_name": "Go Papa X2", "quantity": 1, "price": 50000, "state": "pendiente",
+                    "address": "Calle 1", "user_name": "Test", "user_id": f"u-{i}", "restaurant_id": restaurant_id,
+                })
+            except InsufficientStock:
+                return "agotado"
+
+        results = await asyncio.gather(*(place(i) for i in range(orders)))
+
+        created = [r for r in results if isinstance(r, dict)]
+        remaining = (await inventory_manager.get_inventory(restaurant_id))[0]["quantity"]
+
+        # Cancelar uno y eliminar otro devuelve sus unidades
+        await order_manager.update_order_status(created[0]["enum_order_table"], "cancelado")
+        await order_manager.delete_order(created[1]["enum_order_table"])
+        after_release = (await inventory_manager.get_inventory(restaurant_id))[0]["quantity"]
+
+        pool = await DBConnectionPool().get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("DELETE FROM orders WHERE restaurant_id = %s", (restaurant_id,))
+                await cursor.execute("DELETE FROM inventory WHERE restaurant_id = %s", (restaurant_id,))
+                await conn.commit()
+        return created, results, remaining, after_release
+
+    created, results, remaining, after_release = asyncio.run(scenario())
+
+    # Ningún pedido falló por otra razón (None): cada uno se creó o se rechazó por existencias
+    assert len(created) == stock and len({row["id"] for row in created}) == stock
+    assert results.count("agotado") == orders - stock
+    # Cada unidad vendida está reservada en exactamente un pedido
+    assert [row["reserved_quantity"] for row in created] == [1] * stock
+    assert remaining == 0
+    assert after_release == 2
+
+
+@pytest.mark.skipif(os.getenv("RUN_MYSQL_TESTS") != "1", reason="requiere MySQL (RUN_MYSQL_TESTS=1 y DB_*)")
+def test_creates_and_cancels_in_the_same_restaurant_do_not_deadlock():
+    from core.db_pool import DBConnectionPool
+    from core.mysql_order_manager import MySQLOrderManager
+
+    orders = 200
+    restaurant_id = f"test-{uuid.uuid4().hex[:8]}"
+
+    async def scenario():
+        inventory_manager, order_manager = MySQLInventoryManager(), MySQLOrderManager()
+        await inventory_manager._create_tables()
+        await order_manager.create_tables()
+        go_papa = await inventory_manager.add_product(restaurant_id, "Go Papa X2", orders, "porción", 50000)
+        gringa = await inventory_manager.add_product(restaurant_id, "La Gringa X2", orders, "porción", 50000)
+
+        def order(product, i):
+            return {
+                "enum_order_table": f"{restaurant_id}-{product['name']}-{i}", "product_id": product["id"],
+                "product_name": product["name"], "quantity": 1, "price": 50000, "state": "pendiente",
+                "address": "Calle 1", "user_name": "Test", "user_id": f"u-{i}", "restaurant_id": restaurant_id,
+            }
+
+        to_cancel = [await order_manager.create_order(order(gringa, i)) for i in range(orders)]
+        # Cancelar (inventario y luego orders) mientras se crean pedidos de otro producto
+        results = await asyncio.gather(
+            *(order_manager.create_order(order(go_papa, i)) for i in range(orders)),
+            *(order_manager.update_order_status(row["enum_order_table"], "cancelado") for row in to_cancel),
+        )
+        quantities = {p["name"]: p["quantity"] for p in await inventory_manager.get_inventory(restaurant_id)}
+
+        pool = await DBConnectionPool().get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("DELETE FROM orders WHERE restaurant_id = %s", (restaurant_id,))
+                await cursor.execute("DELETE FROM inventory WHERE restaurant_id = %s", (restaurant_id,))
+                await conn.commit()
+        return results, quantities
+
+    results, quantities = asyncio.run(scenario())
+
+    # Un deadlock abortaría una de las dos transacciones y retornaría None
+    assert all(result is not None for result in results)
+    assert quantities == {"Go Papa X2": 0, "La Gringa X2": orders}
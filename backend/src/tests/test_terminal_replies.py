@@ -0,0 +1,32 @@
+from inference.tools.terminal_replies import render_terminal_reply
+
+
+def test_confirmed_products_render_a_single_final_reply():
+    rows = [
+        {"enum_order_table": 57, "product_name": "Go Papa X2", "quantity": 1, "price": 60000.0,
+         "address": "Calle 10", "adicion": "Chicharrón ($10000) x 1"},
+        {"enum_order_table": 57, "product_name": "Coca-Cola", "quantity": 2, "price": 8000.0, "address": "Calle 10"},
+    ]
+    reply = render_terminal_reply([("confirm_order_tool", row) for row in rows])
+
+    assert reply.splitlines() == [
+        "¡Listo! 🙌 Registré en tu pedido #57:",
+        "• 1 x Go Papa X2 — $60000 (adición: Chicharrón ($10000) x 1)",
+        "• 2 x Coca-Cola — $8000",
+        "📍 Entrega en: Calle 10",
+        "¿Deseas agregar algo más, como una bebida 🥤 o una adición?",
+    ]
+
+
+def test_errors_partial_results_and_non_terminal_tools_fall_back_to_the_llm():
+    row = {"enum_order_table": 57, "product_name": "Go Papa X2", "quantity": 1, "price": 60000.0, "address": "Calle 10"}
+
+    assert render_terminal_reply([("confirm_order_tool", row), ("confirm_order_tool", None)]) is None
+    assert render_terminal_reply([("confirm_order_tool", row), ("get_menu_tool", [])]) is None
+    assert render_terminal_reply([("update_order_tool", "No se pudo actualizar el pedido.")]) is None
+    assert render_terminal_reply([("send_menu_pdf_tool", "No se pudo enviar el menú: timeout")]) is None
+    assert render_terminal_reply([("send_menu_pdf_tool", RuntimeError("boom"))]) is None
+    assert render_terminal_reply([]) is None
+    assert render_terminal_reply([
+        ("send_menu_pdf_tool", "Las imágenes del menú han sido enviadas exitosamente al número 573001234567."),
+    ]).startswith("📸")
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from jwt.algorithms import RSAAlgorithm
+
+from core.auth_middleware import AuthMiddleware
+from core.graph_client import GraphClient
+from core.token_verifier import JWKSCache, TokenVerifier
+
+ISSUER = "https://login.microsoftonline.com/tenant-test/v2.0"
+AUDIENCE = "client-test"
+
+
+def _rsa_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+class JWKSStub:
+    """JWKS local servido con httpx.MockTransport; cuenta las descargas."""
+
+    def __init__(self, keys: dict):
+        self.keys = keys
+        self.requests = 0
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        jwks = []
+        for kid, key in self.keys.items():
+            jwk = json.loads(RSAAlgorithm.to_jwk(key.public_key()))
+            jwks.append({**jwk, "kid": kid, "use": "sig"})
+        return httpx.Response(200, json={"keys": jwks})
+
+
+def _token(key, kid: str = "k1", expires_in: int = 3600, **claims) -> str:
+    payload = {"sub": "user-1", "iss": ISSUER, "aud": AUDIENCE, "exp": int(time.time()) + expires_in, **claims}
+    return jwt.encode(payload, key, algorithm="RS256", headers={"kid": kid})
+
+
+def _verifier(stub: JWKSStub, **kwargs) -> TokenVerifier:
+    jwks = JWKSCache("https://login.test/keys", http_client=stub.client, min_refresh_interval=0)
+    return TokenVerifier(jwks=jwks, issuer=ISSUER, audience=AUDIENCE, **kwargs)
+
+
+def test_valid_tokens_are_verified_once_and_then_memoized():
+    key = _rsa_key()
+    stub = JWKSStub({"k1": key})
+    verifier = _verifier(stub)
+    token = _token(key, name="Ana")
+
+    async def scenario():
+        first = await verifier.verify(token)
+        second = await verifier.verify(token)
+        await verifier.jwks.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first["name"] == "Ana" and second is first
+    assert stub.requests == 1
+    assert verifier.metrics()["verified"] == 1 and verifier.metrics()["cache_hits"] == 1
+
+
+@pytest.mark.parametrize("case", ["expired", "bad_signature", "wrong_audience", "wrong_issuer"])
+def test_invalid_tokens_are_rejected_and_not_memoized(case):
+    key = _rsa_key()
+    stub = JWKSStub({"k1": key})
+    verifier = _verifier(stub)
+    token = {
+        "expired": lambda: _token(key, expires_in=-3600),
+        "bad_signature": lambda: _token(_rsa_key()),
+        "wrong_audience": lambda: _token(key, aud="otra-app"),
+        "wrong_issuer": lambda: _token(key, iss="https://login.test/otro/v2.0"),
+    }[case]()
+
+    async def scenario():
+        try:
+            for _ in range(2):
+                with pytest.raises(jwt.InvalidTokenError):
+                    await verifier.verify(token)
+        finally:
+            await verifier.jwks.aclose()
+
+    asyncio.run(scenario())
+
+    assert verifier.metrics() == {"verified": 0, "cache_hits": 0, "rejected": 2, "cached_tokens": 0}
+
+
+def test_unknown_kid_refreshes_the_jwks_after_key_rotation():
+    old_key, new_key = _rsa_key(), _rsa_key()
+    stub = JWKSStub({"k1": old_key})
+    verifier = _verifier(stub)
+
+    async def scenario():
+        await verifier.verify(_token(old_key, kid="k1"))
+        # Entra ID rota las claves: el JWKS ahora publica k2
+        stub.keys = {"k2": new_key}
+        claims = await verifier.verify(_token(new_key, kid="k2"))
+        with pytest.raises(jwt.InvalidTokenError):
+            await verifier.verify(_token(old_key, kid="k3"))
+        await verifier.jwks.aclose()
+        return claims
+
+    claims = asyncio.run(scenario())
+
+    assert claims["sub"] == "user-1"
+    assert stub.requests == 3
+
+
+def test_session_tokens_and_middleware():
+    key = _rsa_key()
+    stub = JWKSStub({"k1": key})
+    verifier = _verifier(stub, session_secret="secreto")
+    app = FastAPI()
+
+    @app.get("/orders/all")
+    async def protected(request: Request):
+        return {"sub": request.state.user["sub"]}
+
+    app.add_middleware(AuthMiddleware, verifier=verifier)
+    session = jwt.encode({"sub": "ana@example.com", "exp": int(time.time()) + 60}, "secreto", algorithm="HS256")
+    forged = jwt.encode({"sub": "ana@example.com", "exp": int(time.time()) + 60}, "otro", algorithm="HS256")
+    unsigned = jwt.encode({"sub": "x", "exp": int(time.time()) + 60}, None, algorithm="none")
+
+    with TestClient(app) as client:
+        assert client.get("/orders/all").status_code == 401
+        assert client.get("/orders/all", headers={"Authorization": f"Bearer {_token(key)}"}).json() == {"sub": "user-1"}
+        assert client.get("/orders/all", headers={"Authorization": f"Bearer {session}"}).json() == {"sub": "ana@example.com"}
+        assert client.get("/orders/all", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+        assert client.get("/orders/all", headers={"Authorization": f"Bearer {unsigned}"}).status_code == 401
+        expired = client.get("/orders/all", headers={"Authorization": f"Bearer {_token(key, expires_in=-3600)}"})
+        assert expired.status_code == 401 and expired.json() == {"detail": "Token expirado"}
+
+
+def test_graph_profile_uses_the_shared_client():
+    seen = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers["authorization"])
+        return httpx.Response(200, json={"displayName": "Ana", "userPrincipalName": "ana@contoso.com"})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handle)) as http_client:
+            return await GraphClient(http_client, base_url="https://graph.test/v1.0").get_profile("graph-token")
+
+    assert asyncio.run(scenario()) == ("Ana", "ana@contoso.com")
+    assert seen == ["Bearer graph-token"]
+
+
+def _unreachable_verifier() -> TokenVerifier:
+    """Verificador cuyo JWKS no responde (caída de Entra ID o de la red)."""
+
+    def unreachable(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("login.microsoftonline.com inaccesible", request=request)
+
+    jwks = JWKSCache("https://login.test/keys", http_client=httpx.AsyncClient(transport=httpx.MockTransport(unreachable)))
+    return TokenVerifier(jwks=jwks, issuer=ISSUER, audience=AUDIENCE)
+
+
+def test_middleware_answers_503_when_the_jwks_is_unreachable():
+    app = FastAPI()
+
+    @app.get("/orders/all")
+    async def protected(request: Request):
+        return {"sub": request.state.user["sub"]}
+
+    app.add_middleware(AuthMiddleware, verifier=_unreachable_verifier())
+
+    with TestClient(app) as client:
+        response = client.get("/orders/all", headers={"Authorization": f"Bearer {_token(_rsa_key())}"})
+
+    # La validez del token es desconocida, no inválida: el cliente puede reintentar
+    assert response.status_code == 503
+    assert "claves de firma" in response.json()["detail"]
+
+
+def test_verify_token_endpoint_returns_503_when_the_jwks_is_unreachable(monkeypatch):
+    # api.auth importa la configuración de MSAL (pydantic_settings)
+    auth = pytest.importorskip("api.auth")
+    from core import token_verifier
+
+    monkeypatch.setattr(token_verifier, "_token_verifier", _unreachable_verifier())
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/auth")
+
+    with TestClient(app) as client:
+        response = client.get("/auth/verify-token", headers={"Authorization": f"Bearer {_token(_rsa_key())}"})
+
+    assert response.status_code == 503
+    assert response.json()["isValid"] is False
+
+
+def test_closing_the_global_verifier_stops_the_jwks_refresh(monkeypatch):
+    from core import token_verifier
+    from core.background_tasks import task_supervisor
+
+    key = _rsa_key()
+    verifier = _verifier(JWKSStub({"k1": key}))
+    monkeypatch.setattr(token_verifier, "_token_verifier", verifier)
+
+    async def scenario():
+        await verifier.verify(_token(key))
+        refreshing = task_supervisor.pending
+        # Lo que hace el lifespan al apagar, antes de task_supervisor.drain
+        await token_verifier.close_token_verifier()
+        return refreshing, task_supervisor.pending
+
+    refreshing, after = asyncio.run(scenario())
+
+    assert refreshing == after + 1
+    assert verifier.jwks._refresh_task is None
@@ -0,0 +1,30 @@
+from inference.tools.tool_serializers import serialize_tool_result
+
+
+def test_menu_is_rendered_as_compact_table():
+    menu = [
+        {"id": "p-1", "restaurant_id": "go_papa", "name": "Go Papa X2", "quantity": 10, "unit": "porción",
+         "price": 50000.0, "descripcion": "Papas, chicharrón", "tipo_producto": "menu", "last_updated": "2025-04-10T18:22:05"},
+        {"id": "p-2", "restaurant_id": "go_papa", "name": "Chicharrón", "quantity": 0, "unit": "porción",
+         "price": 10000.0, "descripcion": "", "tipo_producto": "adicion", "last_updated": "2025-04-10T18:22:05"},
+    ]
+    text = serialize_tool_result("get_menu_tool", menu)
+
+    assert text.splitlines() == [
+        "id | nombre | precio | descripción",
+        "p-1 | Go Papa X2 | 50000 | Papas, chicharrón",
+        "Adiciones:",
+        "p-2 | Chicharrón | 10000 (agotado)",
+    ]
+
+
+def test_order_row_and_plain_strings():
+    order = {"id": 812, "enum_order_table": "57", "product_name": "Go Papa X2", "quantity": 1, "price": 60000.0,
+             "state": "pendiente", "address": "Calle 10", "user_name": "Ana", "adicion": "Chicharrón ($10000) x 1"}
+
+    assert serialize_tool_result("confirm_order_tool", order) == (
+        "Pedido #57 | estado: pendiente | dirección: Calle 10 | cliente: Ana\n"
+        "- Go Papa X2 x1 | 60000 | adición: Chicharrón ($10000) x 1"
+    )
+    assert serialize_tool_result("get_order_status_tool", "No tiene pedido pedientes.") == "No tiene pedido pedientes."
+    assert serialize_tool_result("otra_tool", {"a": "é"}) == '{"a":"é"}'